@@ -0,0 +1,60 @@
+from dataclasses import asdict
+from fastapi import APIRouter
+from pydantic import BaseModel
+from typing import Optional
+
+from app.engine.cancellation import cancellation_stats
+from app.engine.events import stream_stats
+from app.engine.lm_cache import lm_cache
+from app.engine.retention import RetentionPolicy, compact_checkpoints, get_checkpoint_stats
+from app.engine.storage import get_graph_checkpointer
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+class CompactionRequest(BaseModel):
+    # Overrides for the configured retention policy (None = use default)
+    keep_last: Optional[int] = None
+    max_age_hours: Optional[float] = None
+    thread_ttl_hours: Optional[float] = None
+
+@router.get("/checkpoints/stats")
+async def checkpoint_stats():
+    stats = await get_checkpoint_stats()
+    stats["retention_policy"] = asdict(RetentionPolicy())
+    return stats
+
+@router.post("/checkpoints/compact")
+async def compact(request: Optional[CompactionRequest] = None):
+    """Prunes checkpoints according to the retention policy and vacuums the database."""
+    overrides = request.model_dump(exclude_none=True) if request else {}
+    policy = RetentionPolicy(**overrides)
+    report = await compact_checkpoints(policy=policy)
+    report["stats"] = await get_checkpoint_stats()
+    return report
+
+@router.post("/checkpoints/train-dictionary")
+async def train_checkpoint_dictionary():
+    """Retrains the zstd dictionary used for checkpoints from stored messages."""
+    saver = await get_graph_checkpointer()
+    dict_id = await saver.retrain_dictionary()
+    return {"trained": dict_id is not None, "dict_id": dict_id}
+
+@router.get("/streams")
+async def streaming_stats():
+    """Queue depth and dropped/coalesced events of the connected run streams."""
+    return stream_stats()
+
+@router.get("/cancellations")
+async def run_cancellations():
+    """How many runs were stopped and how quickly their in-flight work was released."""
+    return cancellation_stats()
+
+@router.get("/lm-cache")
+async def lm_cache_stats():
+    """Size of the persistent LM response cache and its hit rate per profile namespace."""
+    return lm_cache.stats()
+
+@router.delete("/lm-cache")
+async def clear_lm_cache(namespace: Optional[str] = None):
+    """Drops cached LM responses of one namespace (e.g. `profile-3`), or all of them."""
+    return {"removed": lm_cache.clear(namespace)}
@@ -0,0 +1,72 @@
+import os
+import shutil
+import uuid
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi.responses import FileResponse
+from sqlmodel import Session
+from typing import List
+
+from app.database import get_session
+from app.models.flow import Flow
+from app.schemas.batch import BatchCreate, BatchProgress, BatchRead
+from app.services.batch_runner import batch_runner
+
+router = APIRouter()
+
+@router.post("/batches/datasets")
+def upload_dataset(file: UploadFile = File(...)):
+    """Stores an uploaded JSONL/CSV dataset and returns its path for `POST /batches`."""
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in (".jsonl", ".csv"):
+        raise HTTPException(status_code=400, detail="Dataset must be a .jsonl or .csv file")
+    datasets_dir = os.path.join(batch_runner.batches_dir, "datasets")
+    os.makedirs(datasets_dir, exist_ok=True)
+    path = os.path.join(datasets_dir, f"{uuid.uuid4()}{extension}")
+    with open(path, "wb") as f:
+        shutil.copyfileobj(file.file, f)
+    return {"dataset_path": path}
+
+@router.post("/batches", response_model=BatchRead, status_code=202)
+async def create_batch(batch_in: BatchCreate, session: Session = Depends(get_session)):
+    if not session.get(Flow, batch_in.flow_id):
+        raise HTTPException(status_code=404, detail="Flow not found")
+    try:
+        return await batch_runner.submit(
+            batch_in.flow_id,
+            batch_in.dataset_path,
+            input_field=batch_in.input_field,
+            version=batch_in.version,
+            concurrency=batch_in.concurrency,
+            recursion_limit=batch_in.recursion_limit,
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/batches", response_model=List[BatchRead])
+async def list_batches(limit: int = 50):
+    return await batch_runner.list(limit=limit)
+
+@router.get("/batches/{batch_id}", response_model=BatchProgress)
+async def get_batch(batch_id: str):
+    """Progress of a batch: rows done, failures, throughput, ETA and latency percentiles."""
+    report = await batch_runner.progress(batch_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return report
+
+@router.get("/batches/{batch_id}/results")
+async def get_batch_results(batch_id: str):
+    """Results written so far, one JSON line per processed row (in completion order)."""
+    batch = await batch_runner.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    if not os.path.exists(batch.output_path):
+        raise HTTPException(status_code=404, detail="No results yet")
+    return FileResponse(batch.output_path, media_type="application/x-ndjson")
+
+@router.post("/batches/{batch_id}/cancel", response_model=BatchRead)
+async def cancel_batch(batch_id: str):
+    batch = await batch_runner.cancel(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
@@ -0,0 +1,48 @@
+import asyncio
+from fastapi import APIRouter, HTTPException
+from typing import List
+
+from app.engine.ingestion import ingest
+from app.engine.vector_store import RAG_EMBEDDER, RAG_TOP_K, vector_store
+from app.schemas.collection import CollectionRead, IngestReport, IngestRequest, SearchHit
+
+router = APIRouter()
+
+def _collection(name: str):
+    try:
+        return vector_store.get(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Collection not found")
+
+@router.get("/collections", response_model=List[CollectionRead])
+async def list_collections():
+    return [vector_store.get(name).stats() for name in vector_store.names()]
+
+@router.get("/collections/{name}", response_model=CollectionRead)
+async def get_collection(name: str):
+    return _collection(name).stats()
+
+@router.post("/collections/{name}/ingest", response_model=IngestReport)
+async def ingest_documents(name: str, request: IngestRequest):
+    """
+    Ingests server-side files and directories, creating the collection if
+    needed. Unchanged documents are skipped, changed ones only embed their
+    new chunks; runs off the event loop and waits for the report.
+    """
+    try:
+        collection = vector_store.create(name, embedder=request.embedder or RAG_EMBEDDER)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    options = request.model_dump(include={"chunk_tokens", "overlap_tokens", "batch_size", "concurrency"}, exclude_none=True)
+    try:
+        return await asyncio.to_thread(ingest, collection, request.paths, prune=request.prune, **options)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/collections/{name}/search", response_model=List[SearchHit])
+async def search_collection(name: str, q: str, top_k: int = RAG_TOP_K):
+    """The chunks a RAG node with this collection would retrieve for `q`."""
+    collection = _collection(name)
+    return await asyncio.to_thread(collection.search, q, top_k)
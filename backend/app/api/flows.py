@@ -1,50 +1,289 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import hashlib
+import json
+from typing import Any, List, Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy import and_, or_, update
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime
 
-from app.database import get_session
+from app.database import get_async_session, get_session
+from app.engine.graph_cache import graph_cache
 from app.models.flow import Flow
-from app.schemas.flow import FlowCreate, FlowRead, FlowUpdate
+from app.schemas.flow import FlowCreate, FlowPatch, FlowRead, FlowSearchResult, FlowSummary, FlowUpdate, FlowVersionData, FlowVersionRead
+from app.services.flow_search import SEARCH_FIELDS, index_flow, search_flows, unindex_flow
+from app.services.flow_versions import (
+    FlowPatchConflictError,
+    FlowPatchError,
+    apply_flow_patch,
+    delete_versions,
+    find_version,
+    list_versions,
+    materialize,
+    record_version,
+)
 
 router = APIRouter()
 
-@router.get("/flows", response_model=List[FlowRead])
-def read_flows(session: Session = Depends(get_session)):
-    flows = session.exec(select(Flow)).all()
-    return flows
+# Sort keys accepted by the flow list; `id` breaks ties so cursors are stable
+SORT_COLUMNS = {
+    "updated_at": Flow.updated_at,
+    "created_at": Flow.created_at,
+    "name": Flow.name,
+    "id": Flow.id,
+}
+
+def encode_cursor(sort: str, order: str, value: Any, flow_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, order, value, flow_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, sort: str, order: str) -> Tuple[Any, int]:
+    """(sort value, id) of the last row of the previous page."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, cursor_order, value, flow_id = json.loads(base64.urlsafe_b64decode(padded))
+        if (cursor_sort, cursor_order) != (sort, order):
+            raise ValueError("cursor belongs to another ordering")
+        if sort in ("updated_at", "created_at"):
+            value = datetime.fromisoformat(value)
+        return value, int(flow_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def make_etag(payload: bytes) -> str:
+    return '"' + hashlib.sha256(payload).hexdigest()[:32] + '"'
+
+def flow_etag(flow_id: int, version: int, updated_at: datetime) -> str:
+    # Every write bumps `updated_at`, so the blob itself never needs hashing
+    return make_etag(f"{flow_id}:{version}:{updated_at.isoformat()}".encode("utf-8"))
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or any(c.removeprefix("W/") == etag for c in candidates)
+
+@router.get("/flows", response_model=List[FlowSummary])
+async def read_flows(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    sort: str = "updated_at",
+    order: Literal["asc", "desc"] = "desc",
+    view: Literal["summary", "full"] = "summary",
+    if_none_match: Optional[str] = Header(None),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    One page of flows. The default `summary` view never reads the `data`
+    column; `view=full` includes it. The cursor of the next page is returned
+    in the `X-Next-Cursor` header (absent on the last page).
+    """
+    column = SORT_COLUMNS.get(sort)
+    if column is None:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by '{sort}', expected one of {sorted(SORT_COLUMNS)}")
+
+    fields = list(FlowRead.model_fields if view == "full" else FlowSummary.model_fields)
+    statement = select(*(getattr(Flow, name) for name in fields))
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort, order)
+        if order == "desc":
+            statement = statement.where(or_(column < value, and_(column == value, Flow.id < last_id)))
+        else:
+            statement = statement.where(or_(column > value, and_(column == value, Flow.id > last_id)))
+    if order == "desc":
+        statement = statement.order_by(column.desc(), Flow.id.desc())
+    else:
+        statement = statement.order_by(column.asc(), Flow.id.asc())
+    rows = [dict(row._mapping) for row in (await session.exec(statement.limit(limit + 1))).all()]
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(sort, order, rows[-1][sort], rows[-1]["id"])
+    # Rows only hold scalars and datetimes: plain json.dumps is much cheaper than jsonable_encoder
+    body = json.dumps(rows, separators=(",", ":"), default=datetime.isoformat).encode("utf-8")
+    headers["ETag"] = make_etag(body)
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/flows/search", response_model=List[FlowSearchResult])
+async def search(
+    q: str = Query(..., min_length=1),
+    field: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Ranked full-text search over flow names, descriptions and node configs
+    (labels, prompts, goals, tools, profiles). `field` restricts it to one of them.
+    """
+    if field is not None and field not in SEARCH_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Cannot search in '{field}', expected one of {list(SEARCH_FIELDS)}")
+    return await search_flows(session, q, field, limit)
 
 @router.get("/flows/{flow_id}", response_model=FlowRead)
-def read_flow(flow_id: int, session: Session = Depends(get_session)):
-    flow = session.get(Flow, flow_id)
-    if not flow:
+async def read_flow(
+    flow_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    session: AsyncSession = Depends(get_async_session),
+):
+    # Revalidation only reads the version columns, not the blob
+    current = (await session.exec(select(Flow.version, Flow.updated_at).where(Flow.id == flow_id))).first()
+    if not current:
         raise HTTPException(status_code=404, detail="Flow not found")
-    return flow
+    etag = flow_etag(flow_id, *current)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return await session.get(Flow, flow_id)
 
 @router.post("/flows", response_model=FlowRead)
-def create_flow(flow_in: FlowCreate, session: Session = Depends(get_session)):
+def create_flow(flow_in: FlowCreate, response: Response, session: Session = Depends(get_session)):
     flow = Flow.model_validate(flow_in) # Convert schema to model
     flow.created_at = datetime.utcnow()
     flow.updated_at = datetime.utcnow()
+    flow.refresh_summary()
     session.add(flow)
+    session.flush()
+    record_version(session, flow)
+    index_flow(session, flow)
     session.commit()
     session.refresh(flow)
+    response.headers["ETag"] = flow_etag(flow.id, flow.version, flow.updated_at)
     return flow
 
+def lock_flow(session: Session, flow_id: int, base_hash: Optional[str] = None) -> Optional[Flow]:
+    """
+    Takes the database write lock for a save of the flow and returns the flow
+    re-read under it, so the version bump and history entry of two saves
+    cannot interleave. With `base_hash` the lock is only taken while that is
+    still the flow's content hash; None when the flow is gone or changed.
+    """
+    # A write that changes nothing: it only serves to take the lock
+    statement = update(Flow).where(Flow.id == flow_id).values(version=Flow.version)
+    if base_hash is not None:
+        statement = statement.where(Flow.data_hash == base_hash)
+    if session.exec(statement).rowcount == 0:
+        return None
+    return session.get(Flow, flow_id, populate_existing=True)
+
 @router.put("/flows/{flow_id}", response_model=FlowRead)
-def update_flow(flow_id: int, flow_update: FlowUpdate, session: Session = Depends(get_session)):
-    db_flow = session.get(Flow, flow_id)
+def update_flow(flow_id: int, flow_update: FlowUpdate, response: Response, session: Session = Depends(get_session)):
+    db_flow = lock_flow(session, flow_id)
     if not db_flow:
         raise HTTPException(status_code=404, detail="Flow not found")
     
     flow_data = flow_update.model_dump(exclude_unset=True)
+    previous_data = db_flow.data
+    changed = "data" in flow_data and flow_data["data"] != db_flow.data
+    if changed:
+        db_flow.version = (db_flow.version or 1) + 1
     for key, value in flow_data.items():
         setattr(db_flow, key, value)
+    if "data" in flow_data:
+        db_flow.refresh_summary()
+    if changed:
+        record_version(session, db_flow, previous_data)
+    index_flow(session, db_flow)
     
     db_flow.updated_at = datetime.utcnow()
     session.add(db_flow)
     session.commit()
     session.refresh(db_flow)
+    graph_cache.invalidate(flow_id)
+    response.headers["ETag"] = flow_etag(db_flow.id, db_flow.version, db_flow.updated_at)
+    return db_flow
+
+@router.patch("/flows/{flow_id}", response_model=FlowSummary)
+def patch_flow(flow_id: int, flow_patch: FlowPatch, response: Response, session: Session = Depends(get_session)):
+    """
+    Applies JSON Patch operations to the flow's `data`. The patch must be
+    based on the current version (`base_hash` = its `data_hash`), otherwise
+    409 is returned with the current hash so the client can rebase.
+    The response omits `data`: the client already has it.
+    """
+    db_flow = session.get(Flow, flow_id)
+    if not db_flow:
+        raise HTTPException(status_code=404, detail="Flow not found")
+    try:
+        # The hash check and the write are one statement: of two saves based on
+        # the same version, the second one waits for the lock and then conflicts
+        locked = lock_flow(session, flow_id, flow_patch.base_hash)
+        if locked is None:
+            session.rollback()
+            session.refresh(db_flow)
+            raise FlowPatchConflictError(flow_patch.base_hash, db_flow.data_hash)
+        db_flow = locked
+        data = apply_flow_patch(db_flow.data, flow_patch.patch)
+    except FlowPatchConflictError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "current_hash": e.current_hash})
+    except FlowPatchError as e:
+        session.rollback()
+        raise HTTPException(status_code=422, detail=f"Invalid patch: {e}")
+
+    previous_data = db_flow.data
+    db_flow.data = data
+    db_flow.refresh_summary()
+    if db_flow.data_hash != flow_patch.base_hash:
+        db_flow.version = (db_flow.version or 1) + 1
+        record_version(session, db_flow, previous_data, flow_patch.patch)
+    else:
+        # Content unchanged (e.g. only `test` ops): keep the stored formatting
+        db_flow.data = previous_data
+    for key, value in flow_patch.model_dump(include={"name", "description"}, exclude_unset=True).items():
+        setattr(db_flow, key, value)
+    index_flow(session, db_flow)
+
+    db_flow.updated_at = datetime.utcnow()
+    session.add(db_flow)
+    session.commit()
+    session.refresh(db_flow)
+    graph_cache.invalidate(flow_id)
+    response.headers["ETag"] = flow_etag(db_flow.id, db_flow.version, db_flow.updated_at)
+    return db_flow
+
+@router.get("/flows/{flow_id}/versions", response_model=List[FlowVersionRead])
+def read_flow_versions(flow_id: int, limit: int = Query(100, ge=1, le=1000), session: Session = Depends(get_session)):
+    if not session.get(Flow, flow_id):
+        raise HTTPException(status_code=404, detail="Flow not found")
+    return list_versions(session, flow_id, limit)
+
+@router.get("/flows/{flow_id}/versions/{ref}", response_model=FlowVersionData)
+def read_flow_version(flow_id: int, ref: str, session: Session = Depends(get_session)):
+    """A past version of the flow, by version number or content hash."""
+    entry = find_version(session, flow_id, ref)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Flow version not found")
+    return FlowVersionData(**FlowVersionRead.model_validate(entry).model_dump(), data=materialize(session, flow_id, entry.version))
+
+@router.post("/flows/{flow_id}/versions/{ref}/restore", response_model=FlowRead)
+def restore_flow_version(flow_id: int, ref: str, response: Response, session: Session = Depends(get_session)):
+    """Makes a past version current again. History is kept: the restore is recorded as a new version."""
+    db_flow = lock_flow(session, flow_id)
+    if not db_flow:
+        raise HTTPException(status_code=404, detail="Flow not found")
+    entry = find_version(session, flow_id, ref)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Flow version not found")
+
+    if entry.hash != db_flow.data_hash:
+        previous_data = db_flow.data
+        db_flow.data = materialize(session, flow_id, entry.version)
+        db_flow.refresh_summary()
+        db_flow.version = (db_flow.version or 1) + 1
+        record_version(session, db_flow, previous_data)
+        index_flow(session, db_flow)
+        db_flow.updated_at = datetime.utcnow()
+        session.add(db_flow)
+        session.commit()
+        session.refresh(db_flow)
+        graph_cache.invalidate(flow_id)
+    response.headers["ETag"] = flow_etag(db_flow.id, db_flow.version, db_flow.updated_at)
     return db_flow
 
 @router.delete("/flows/{flow_id}")
@@ -53,5 +292,8 @@ def delete_flow(flow_id: int, session: Session = Depends(get_session)):
     if not flow:
         raise HTTPException(status_code=404, detail="Flow not found")
     session.delete(flow)
+    delete_versions(session, flow_id)
+    unindex_flow(session, flow_id)
     session.commit()
+    graph_cache.invalidate(flow_id, drop_versions=True)
     return {"ok": True}
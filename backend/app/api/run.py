@@ -1,113 +1,177 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import asyncio
 import json
 import logging
+import uuid
+from dataclasses import asdict
 
+from app.engine.budget import BudgetExceededError, BudgetTracker, RunBudget, budget_exceeded_event, enforce_deadline, with_budget
+from app.engine.cancellation import cancel_and_wait
 from app.engine.compiler import compile_graph
+from app.engine.events import EventQueue, WS_OVERFLOW_POLICY, stream_run_events
+from app.engine.graph_cache import graph_cache, CachedGraph
+from app.engine.replay import prepare_replay, run_metadata
 from app.engine.storage import get_graph_checkpointer
 from langchain_core.messages import HumanMessage
-# We need a way to load graph data. For now, we accept it in the payload or load mock/db.
-# The requirement says "load_graph_from_db(graph_id)". 
-# We don't have that service yet, so we will expect the graph definition in the init message 
-# OR implementing a mock loader.
 
 router = APIRouter()
 
-# Mock loader for now
-async def load_graph_from_db(graph_id: str) -> Dict[str, Any]:
-    # TODO: Implement actual DB load
-    # Return empty structure or raise error if not found
-    # For MVP we might need to assume the Frontend sends the JSON first.
-    return {"nodes": [], "edges": []} 
+async def send_events(websocket: WebSocket, queue: EventQueue):
+    """Consumer side of the run's event queue; a failed send stops the producer."""
+    try:
+        while (event := await queue.get()) is not None:
+            await websocket.send_json(event)
+    except Exception as e:
+        await queue.abort(e)
+        raise
+
+async def receive_control(websocket: WebSocket) -> str:
+    """
+    Reads client messages while a run streams, so a disconnect is noticed
+    right away instead of at the next failed send. Returns the reason to stop.
+    """
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            if isinstance(message, dict) and message.get("type") == "stop":
+                return "stop"
+    except WebSocketDisconnect:
+        return "disconnect"
+
+async def load_graph_from_db(graph_id: str, version: Optional[int] = None) -> CachedGraph:
+    """
+    Loads a saved flow by id (optionally pinned to a version) through the warm graph cache.
+    The DB read and compilation only happen on a cache miss, off the event loop.
+    """
+    try:
+        flow_id = int(graph_id)
+    except (TypeError, ValueError):
+        raise LookupError(f"Invalid flow id '{graph_id}'")
+    return await asyncio.to_thread(graph_cache.get, flow_id, version)
 
 @router.websocket("/ws/run/{graph_id}")
 async def websocket_endpoint(websocket: WebSocket, graph_id: str):
     await websocket.accept()
     
     try:
-        # 1. Initialization: Receive Graph JSON (or load from DB)
-        # The prompt implies: "1. Charger et compiler le graphe ... graph_data = load_graph_from_db(graph_id)"
-        # But since we are building the tool and the user draws it, 
-        # normally we save the graph first via REST API, then Run it via WS.
-        # Assuming the graph is saved. We'll use a placeholder or check if US 2 was implemented (it says "Epic 2 (Le JSON du graphe est disponible)").
-        # So we assume there IS a way to get it. 
-        # I'll add a provisional "graph_data" load.
-        
-        # For now, if load_graph_from_db returns empty, we might try to receive it from WS for dev testing.
-        # Check first message.
+        # 1. Initialization
+        # Saved flows are run by id: the init message only carries the input
+        # (plus optional thread_id / version pin). An inline "graph" is still
+        # accepted for unsaved playground graphs and is compiled ad hoc.
         init_data = await websocket.receive_json()
         
-        graph_data = None
-        if "graph" in init_data:
-             graph_data = init_data["graph"]
-        else:
-             # Assume load from DB
-             # graph_data = await load_graph_from_db(graph_id)
-             pass
-        
+        cached_graph = None
+        graph_data = init_data.get("graph")
         if not graph_data:
-            await websocket.send_json({"error": "No graph data provided"})
-            await websocket.close()
-            return
+            try:
+                cached_graph = await load_graph_from_db(graph_id, init_data.get("version"))
+            except LookupError as e:
+                await websocket.send_json({"type": "error", "message": str(e)})
+                await websocket.close()
+                return
+            await websocket.send_json({
+                "type": "flow_loaded",
+                "flow_id": cached_graph.flow_id,
+                "version": cached_graph.version
+            })
 
-        # Setup Persistence - use context manager
-        # checkpointer is an AsyncContextManager, so we must use 'async with'
-        cm = await get_graph_checkpointer()
-        async with cm as checkpointer:
-            # Compile
+        # Setup Persistence
+        # The checkpointer is process-wide (opened in the app lifespan), runs only borrow it.
+        checkpointer = await get_graph_checkpointer()
+
+        # Compile (or reuse the cached compiled flow)
+        if cached_graph is not None:
+            app = cached_graph.bind(checkpointer)
+        else:
             app = compile_graph(graph_data, checkpointer=checkpointer)
-            
-            # 2. Input Handling
-            user_input = init_data.get("input")
-            thread_id = init_data.get("thread_id", "default_thread")
-            
+        
+        # 2. Input Handling
+        user_input = init_data.get("input")
+        # Every run gets its own thread unless the client resumes an existing one
+        thread_id = init_data.get("thread_id") or f"run-{uuid.uuid4()}"
+        graph_data = cached_graph.graph_data if cached_graph is not None else graph_data
+
+        # Replay: fork a previous run's thread and only re-execute the nodes
+        # whose config changed (and what follows them). No new input is needed.
+        replay = init_data.get("replay")
+        if replay:
+            plan = await prepare_replay(
+                app, graph_data, replay["thread_id"],
+                thread_id=f"replay-{uuid.uuid4()}",
+                checkpoint_id=replay.get("checkpoint_id"),
+            )
+            thread_id = plan.thread_id
+            await websocket.send_json({"type": "replay_plan", **asdict(plan)})
+            inputs = None
+        else:
             if not user_input:
                 # Wait for input
                 msg = await websocket.receive_json()
                 user_input = msg.get("input")
-                
             inputs = {"messages": [HumanMessage(content=user_input)]}
-            config = {"configurable": {"thread_id": thread_id}}
-            
-            # 3. Execution with Streaming
-            recursion_limit = init_data.get("recursion_limit", 50)
-            config = {
-                "configurable": {"thread_id": thread_id},
-                "recursion_limit": recursion_limit
-            }
-            
-            async for event in app.astream_events(inputs, config=config, version="v2"):
-                kind = event["event"]
-                
-                if kind == "on_chat_model_stream":
-                    content = event["data"]["chunk"].content
-                    if content:
-                        await websocket.send_json({"type": "token", "content": content})
-                        
-                elif kind == "on_chain_start":
-                    # Detect if it's a node start
-                    node_name = event["name"]
-                    if node_name and node_name not in ["__start__", "__end__", "LangGraph"]:
-                        await websocket.send_json({"type": "node_active", "node_id": node_name})
-                
-                elif kind == "on_chain_end":
-                     await websocket.send_json({"type": "node_finished", "node_id": event["name"]})
+        
+        # 3. Execution with Streaming
+        recursion_limit = init_data.get("recursion_limit", 50)
+        config = {
+            "configurable": {"thread_id": thread_id},
+            "recursion_limit": recursion_limit,
+            # Per-node config fingerprints, recorded in checkpoints for later replays
+            "metadata": run_metadata(graph_data)
+        }
+        # Token / LLM-call / wall-clock limits, on top of the recursion limit
+        tracker = BudgetTracker(RunBudget.from_request(init_data.get("budget"), graph_data))
+        config = with_budget(config, tracker)
+        
+        # Execution only feeds a bounded queue; a separate task sends to the client,
+        # so a slow client costs dropped/coalesced tokens instead of throughput.
+        queue = EventQueue(policy=init_data.get("overflow", WS_OVERFLOW_POLICY))
+        sender = asyncio.create_task(send_events(websocket, queue))
+
+        async def execute():
+            try:
+                async with enforce_deadline(tracker):
+                    async for ui_event in stream_run_events(app, inputs, config):
+                        await queue.put(ui_event)
+            finally:
+                await queue.close()
 
-                elif kind == "on_tool_start":
-                    await websocket.send_json({
-                        "type": "tool_start", 
-                        "name": event["name"], 
-                        "input": event["data"].get("input")
-                    })
+        # A 'stop' message or a disconnect cancels the run: the cancellation reaches
+        # the node tasks and with them the in-flight LLM / MCP requests.
+        run_task = asyncio.create_task(execute())
+        receiver = asyncio.create_task(receive_control(websocket))
+        await asyncio.wait({run_task, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        if not run_task.done():
+            reason = "disconnect" if receiver.exception() else receiver.result()
+            released_ms = await cancel_and_wait(run_task, reason)
+            await asyncio.gather(sender, return_exceptions=True)
+            if reason == "stop":
+                await websocket.send_json({"type": "cancelled", "thread_id": thread_id, "released_ms": released_ms})
+                await websocket.close()
+            return
 
-                elif kind == "on_tool_end":
-                    await websocket.send_json({
-                        "type": "tool_end", 
-                        "name": event["name"], 
-                        "output": event["data"].get("output")
-                    })
-                     
-            await websocket.send_json({"type": "done"})
+        receiver.cancel()
+        await asyncio.gather(sender, receiver, return_exceptions=True)
+        if sender.exception():
+            raise sender.exception()
+        if isinstance(run_task.exception(), BudgetExceededError):
+            # Graceful stop: the run's state is kept up to its last checkpoint
+            await websocket.send_json(await budget_exceeded_event(app, thread_id, run_task.exception()))
+            await websocket.close()
+            return
+        if run_task.exception():
+            raise run_task.exception()
+                 
+        # The thread id lets the client resume or replay this run later
+        await websocket.send_json({
+            "type": "done",
+            "thread_id": thread_id,
+            "usage": tracker.usage(),
+            "stream": queue.stats()
+        })
         
     except WebSocketDisconnect:
         print(f"Client disconnected {graph_id}")
@@ -0,0 +1,79 @@
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+from typing import List, Optional
+
+from app.database import get_session
+from app.models.flow import Flow
+from app.schemas.run import RunCancelRead, RunCreate, RunRead
+from app.services.run_manager import run_manager
+
+router = APIRouter()
+
+@router.post("/runs", response_model=RunRead, status_code=202)
+async def create_run(run_in: RunCreate, session: Session = Depends(get_session)):
+    """Queues a detached run of a saved flow; it keeps running without any client attached."""
+    if not session.get(Flow, run_in.flow_id):
+        raise HTTPException(status_code=404, detail="Flow not found")
+    return await run_manager.submit(
+        run_in.flow_id,
+        run_in.input,
+        thread_id=run_in.thread_id,
+        version=run_in.version,
+        priority=run_in.priority,
+        recursion_limit=run_in.recursion_limit,
+        budget=run_in.budget,
+    )
+
+@router.get("/runs", response_model=List[RunRead])
+async def list_runs(limit: int = 50, status: Optional[str] = None):
+    return await run_manager.list(limit=limit, status=status)
+
+@router.get("/runs/{run_id}", response_model=RunRead)
+async def get_run(run_id: str):
+    run = await run_manager.get(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run
+
+@router.post("/runs/{run_id}/cancel", response_model=RunCancelRead)
+async def cancel_run(run_id: str):
+    run, released_ms = await run_manager.cancel(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return RunCancelRead(**RunRead.model_validate(run).model_dump(), released_ms=released_ms)
+
+@router.get("/runs/{run_id}/events")
+async def stream_run(run_id: str, offset: int = 0, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events stream of a run, replayed from `offset`.
+    Reconnecting clients resume after the `Last-Event-ID` they received.
+    """
+    if last_event_id is not None and last_event_id.isdigit():
+        offset = int(last_event_id) + 1
+    events = await run_manager.follow(run_id, offset)
+    if events is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    async def sse():
+        async for event in events:
+            yield f"id: {event['seq']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(sse(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.websocket("/ws/runs/{run_id}")
+async def attach_run(websocket: WebSocket, run_id: str, offset: int = 0):
+    """Attaches to a detached run; disconnecting only stops following, not the run."""
+    await websocket.accept()
+    events = await run_manager.follow(run_id, offset)
+    if events is None:
+        await websocket.send_json({"type": "error", "message": "Run not found"})
+        await websocket.close()
+        return
+    try:
+        async for event in events:
+            await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        print(f"Client detached from run {run_id}")
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
 
-from app.database import get_session
+from app.database import get_async_session, get_session
 from app.models.settings import LLMProfile, ProviderType
-from app.schemas.settings import LLMProfileCreate
+from app.schemas.settings import LLMProfileCreate, ProfileHealth
+from app.services.profile_health import profile_prober
 from app.services.security import save_api_key, delete_api_key, get_api_key
 from pydantic import BaseModel
 from typing import Optional
@@ -40,8 +42,8 @@ def create_model_profile(profile: LLMProfileCreate, session: Session = Depends(g
     return db_profile
 
 @router.get("/models", response_model=List[LLMProfile])
-def list_model_profiles(session: Session = Depends(get_session)):
-    profiles = session.exec(select(LLMProfile)).all()
+async def list_model_profiles(session: AsyncSession = Depends(get_async_session)):
+    profiles = (await session.exec(select(LLMProfile))).all()
     # Explicitly do NOT return the api_key, but LLMProfile model doesn't have it field anyway.
     # The api_key_ref is returned.
     return profiles
@@ -59,9 +61,31 @@ def delete_model_profile(model_id: int, session: Session = Depends(get_session))
     # Delete from Keyring
     if profile.api_key_ref:
         delete_api_key(profile.api_key_ref)
-        
+
+    profile_prober.forget(model_id)
     return {"ok": True}
 
+@router.get("/models/health", response_model=List[ProfileHealth])
+async def list_model_health(session: AsyncSession = Depends(get_async_session)):
+    """Measured TTFT, tokens/s and error rate of every profile, from the background probes."""
+    profile_ids = (await session.exec(select(LLMProfile.id))).all()
+    return [profile_prober.stats(profile_id) for profile_id in profile_ids]
+
+@router.get("/models/{model_id}/health", response_model=ProfileHealth)
+async def get_model_health(model_id: int, session: AsyncSession = Depends(get_async_session)):
+    if not await session.get(LLMProfile, model_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile_prober.stats(model_id)
+
+@router.post("/models/{model_id}/health/probe", response_model=ProfileHealth)
+async def probe_model(model_id: int, session: AsyncSession = Depends(get_async_session)):
+    """Probes the profile now instead of waiting for the next background cycle."""
+    profile = await session.get(LLMProfile, model_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    await profile_prober.probe(profile)
+    return profile_prober.stats(model_id)
+
 class TestConnectionRequest(BaseModel):
     provider: str
     api_key: Optional[str] = None
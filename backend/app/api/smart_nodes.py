@@ -1,20 +1,103 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Path
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
+from typing import List, Optional
 from app.database import get_session
-from app.schemas.dspy_schema import OptimizationRequest, OptimizationResponse
-from app.engine.dspy_optimizer import optimize_node
+from app.models.run import RunStatus
+from app.engine.dspy_metrics import METRICS
+from app.engine.program_store import program_store
+from app.models.settings import LLMProfile
+from app.schemas.dspy_schema import CompiledProgramHistory, OptimizationJobRead, OptimizationRequest, OptimizationResponse
+from app.services.optimization_jobs import optimization_jobs
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+async def _submit(request: OptimizationRequest, session: Session):
+    if request.metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric '{request.metric}' (expected one of {', '.join(METRICS)})")
+    if request.objective not in ("score", "pareto"):
+        raise HTTPException(status_code=400, detail=f"Unknown objective '{request.objective}' (expected score or pareto)")
+    profile = session.get(LLMProfile, request.llm_profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail=f"LLM Profile {request.llm_profile_id} not found")
+    return await optimization_jobs.submit(request, profile)
+
 @router.post("/smart-nodes/optimize", response_model=OptimizationResponse)
 async def optimize_smart_node(request: OptimizationRequest, session: Session = Depends(get_session)):
+    """Optimizes and waits for the result; the work runs in a background job, off the event loop."""
+    job = await _submit(request, session)
+    job = await optimization_jobs.wait(job.id)
+    if job.status != RunStatus.SUCCEEDED:
+        logger.error(f"Optimization failed: {job.error}")
+        raise HTTPException(status_code=500, detail=job.error or f"Optimization {job.status.value}")
+    return job.result
+
+@router.post("/smart-nodes/optimize/jobs", response_model=OptimizationJobRead, status_code=202)
+async def submit_optimization(request: OptimizationRequest, session: Session = Depends(get_session)):
+    """Queues an optimization; follow it with the status or events endpoints."""
+    return await _submit(request, session)
+
+@router.get("/smart-nodes/optimize/jobs", response_model=List[OptimizationJobRead])
+async def list_optimizations():
+    return optimization_jobs.list()
+
+@router.get("/smart-nodes/optimize/jobs/{job_id}", response_model=OptimizationJobRead)
+async def get_optimization(job_id: str):
+    job = optimization_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Optimization job not found")
+    return job
+
+@router.post("/smart-nodes/optimize/jobs/{job_id}/cancel", response_model=OptimizationJobRead)
+async def cancel_optimization(job_id: str):
+    job = await optimization_jobs.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Optimization job not found")
+    return job
+
+@router.get("/smart-nodes/optimize/jobs/{job_id}/events")
+async def stream_optimization(job_id: str, offset: int = 0, last_event_id: Optional[str] = Header(None)):
+    """Server-Sent Events of a job: started, progress (rounds, candidates, best score), outcome."""
+    if last_event_id is not None and last_event_id.isdigit():
+        offset = int(last_event_id) + 1
+    events = optimization_jobs.follow(job_id, offset)
+    if events is None:
+        raise HTTPException(status_code=404, detail="Optimization job not found")
+
+    async def sse():
+        async for event in events:
+            yield f"id: {event['seq']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(sse(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# Keeps path parameters from pointing outside the store
+SignatureHash = Path(..., pattern="^[0-9a-f]{64}$")
+
+def _program_history(signature_hash: str) -> CompiledProgramHistory:
+    signature = program_store.signature(signature_hash)
+    if signature is None:
+        raise HTTPException(status_code=404, detail="Compiled program not found")
+    current = program_store.current_version(signature_hash)
+    return CompiledProgramHistory(
+        signature_hash=signature_hash,
+        signature=signature,
+        current_version=current,
+        versions=[{**record, "active": record["version"] == current} for record in program_store.history(signature_hash)],
+    )
+
+@router.get("/smart-nodes/programs/{signature_hash}", response_model=CompiledProgramHistory)
+def get_program_history(signature_hash: str = SignatureHash):
+    """Every optimization stored for a signature (score, optimizer, profile, timestamp) and the active one."""
+    return _program_history(signature_hash)
+
+@router.post("/smart-nodes/programs/{signature_hash}/versions/{version}/activate", response_model=CompiledProgramHistory)
+def activate_program_version(version: int, signature_hash: str = SignatureHash):
+    """Rolls a signature's program back (or forward) to a stored version; running nodes pick it up on their next call."""
     try:
-        response = await optimize_node(request, session)
-        return response
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        logger.error(f"Optimization failed: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        program_store.activate(signature_hash, version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Version {version} of program {signature_hash} not found")
+    return _program_history(signature_hash)
@@ -1,14 +1,119 @@
-from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel import SQLModel, create_engine, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event, inspect, or_, text
+from sqlalchemy.ext.asyncio import create_async_engine
 import os
 
 # Get absolute path to the backend directory (parent of app)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sqlite_file_name = os.path.join(BASE_DIR, "database.db")
 sqlite_url = f"sqlite:///{sqlite_file_name}"
+async_sqlite_url = f"sqlite+aiosqlite:///{sqlite_file_name}"
+
+# SQLite tuning, applied to every connection of both engines. WAL lets the async
+# readers proceed while a write is in progress; synchronous=NORMAL is durable
+# across application crashes in WAL mode and avoids an fsync per commit.
+DB_SYNCHRONOUS = os.environ.get("AGENTIC_DB_SYNCHRONOUS", "NORMAL")
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("AGENTIC_DB_BUSY_TIMEOUT_MS", "5000"))
+# Memory-mapped I/O for reads (0 = off)
+DB_MMAP_SIZE_MB = int(os.environ.get("AGENTIC_DB_MMAP_SIZE_MB", "256"))
+# Page cache per connection
+DB_CACHE_SIZE_MB = int(os.environ.get("AGENTIC_DB_CACHE_SIZE_MB", "16"))
+# Connections kept open by each engine (async readers mostly)
+DB_POOL_SIZE = int(os.environ.get("AGENTIC_DB_POOL_SIZE", "8"))
 
 connect_args = {"check_same_thread": False}
-engine = create_engine(sqlite_url, connect_args=connect_args)
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE_MB * 1024 * 1024}")
+    cursor.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_MB * 1024}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def create_db_engine(url: str = sqlite_url, **kwargs):
+    """Sync engine (writes, services running in threads) with the pragmas applied."""
+    db_engine = create_engine(url, connect_args=connect_args, **kwargs)
+    event.listen(db_engine, "connect", apply_sqlite_pragmas)
+    return db_engine
+
+def create_async_db_engine(url: str = async_sqlite_url, **kwargs):
+    """aiosqlite engine for the read paths of the REST layer, served on the event loop."""
+    if "poolclass" not in kwargs:
+        kwargs.setdefault("pool_size", DB_POOL_SIZE)
+        kwargs.setdefault("max_overflow", DB_POOL_SIZE)
+    db_engine = create_async_engine(url, connect_args=connect_args, **kwargs)
+    event.listen(db_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    return db_engine
+
+engine = create_db_engine(pool_size=DB_POOL_SIZE)
+async_engine = create_async_db_engine()
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+def migrate_schema(target_engine=engine):
+    """
+    Adds columns that exist on the models but not yet in the database.
+    `create_all` only creates missing tables, so existing local databases
+    would otherwise break whenever a model gains a field.
+    """
+    inspector = inspect(target_engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with target_engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=target_engine.dialect)
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if default is not None:
+                    ddl += f" DEFAULT {_sql_literal(default)}"
+                conn.execute(text(ddl))
+
+def _sql_literal(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return str(value)
+    escaped = str(value).replace("'", "''")
+    return f"'{escaped}'"
+
+def backfill_flow_summaries(target_engine=engine):
+    """
+    Fills the list-view summary columns of flows saved before they existed,
+    and the indexes `create_all` does not add to an existing table. Duplicate
+    history entries left by concurrent saves (only the first one is
+    consistent with the next version's base) are dropped before the
+    one-entry-per-version index is created.
+    """
+    from app.models.flow import Flow
+
+    with target_engine.begin() as conn:
+        conn.execute(text('CREATE INDEX IF NOT EXISTS "ix_flow_updated_at" ON "flow" ("updated_at")'))
+        if "flowversion" in inspect(target_engine).get_table_names():
+            conn.execute(text(
+                'DELETE FROM "flowversion" WHERE id NOT IN (SELECT MIN(id) FROM "flowversion" GROUP BY flow_id, version)'
+            ))
+            conn.execute(text(
+                'CREATE UNIQUE INDEX IF NOT EXISTS "uq_flowversion_flow_id_version" ON "flowversion" ("flow_id", "version")'
+            ))
+    with Session(target_engine) as session:
+        pending = session.exec(select(Flow).where(or_(Flow.data_size.is_(None), Flow.data_hash.is_(None)))).all()
+        for flow in pending:
+            flow.refresh_summary()
+            session.add(flow)
+        session.commit()
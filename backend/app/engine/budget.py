@@ -0,0 +1,235 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+
+# Defaults applied to every run (0 = unlimited); a run may set its own limits
+RUN_MAX_TOKENS = int(os.environ.get("AGENTIC_RUN_MAX_TOKENS", "0"))
+RUN_MAX_LLM_CALLS = int(os.environ.get("AGENTIC_RUN_MAX_LLM_CALLS", "0"))
+RUN_MAX_SECONDS = float(os.environ.get("AGENTIC_RUN_MAX_SECONDS", "0"))
+
+
+@dataclass
+class NodeBudget:
+    max_tokens: Optional[int] = None
+    max_llm_calls: Optional[int] = None
+
+
+@dataclass
+class RunBudget:
+    max_tokens: Optional[int] = None
+    max_llm_calls: Optional[int] = None
+    max_seconds: Optional[float] = None
+    nodes: Dict[str, NodeBudget] = field(default_factory=dict)
+
+    @property
+    def unlimited(self) -> bool:
+        return not (self.max_tokens or self.max_llm_calls or self.max_seconds or self.nodes)
+
+    @classmethod
+    def from_request(cls, data: Optional[Dict[str, Any]] = None, graph_data: Optional[Dict[str, Any]] = None) -> "RunBudget":
+        """
+        Run limits from the request (falling back to the AGENTIC_RUN_* defaults).
+        Per-node limits come from the request's "nodes" map or from a node's own
+        "budget" in the flow; the request wins.
+        """
+        data = data or {}
+        nodes: Dict[str, NodeBudget] = {}
+        for node in (graph_data or {}).get("nodes", []):
+            node_budget = node.get("data", {}).get("budget")
+            if node_budget:
+                nodes[node["id"]] = NodeBudget(node_budget.get("max_tokens"), node_budget.get("max_llm_calls"))
+        for node_id, node_budget in (data.get("nodes") or {}).items():
+            nodes[node_id] = NodeBudget(node_budget.get("max_tokens"), node_budget.get("max_llm_calls"))
+        return cls(
+            max_tokens=data.get("max_tokens") or RUN_MAX_TOKENS or None,
+            max_llm_calls=data.get("max_llm_calls") or RUN_MAX_LLM_CALLS or None,
+            max_seconds=data.get("max_seconds") or RUN_MAX_SECONDS or None,
+            nodes=nodes,
+        )
+
+
+class BudgetExceededError(Exception):
+    def __init__(self, limit: str, scope: str, usage: Dict[str, Any], budget: RunBudget):
+        super().__init__(f"Run budget exceeded: {limit} ({scope})")
+        self.limit = limit  # "tokens" | "llm_calls" | "wall_clock"
+        self.scope = scope  # "run" or the node id
+        self.usage = usage
+        self.budget = budget
+
+    def to_event(self) -> Dict[str, Any]:
+        return {
+            "type": "budget_exceeded",
+            "limit": self.limit,
+            "scope": self.scope,
+            "usage": self.usage,
+            "budget": asdict(self.budget),
+        }
+
+
+class BudgetTracker(AsyncCallbackHandler):
+    """
+    Callback handler enforcing a RunBudget across every LLM call of a run.
+    Token usage is read from the provider response metadata. A call that would
+    exceed the call limit is refused; a response that crosses a token limit is
+    kept, and the run stops when the next node or LLM call starts, so the last
+    checkpoint holds everything that was paid for.
+    """
+
+    raise_error = True  # Exceptions raised here abort the node, and with it the run
+
+    def __init__(self, budget: RunBudget):
+        self.budget = budget
+        self.started = time.monotonic()
+        self.tokens = 0
+        self.llm_calls = 0
+        self.node_tokens: Dict[str, int] = {}
+        self.node_calls: Dict[str, int] = {}
+        self._call_nodes: Dict[UUID, Optional[str]] = {}
+        self._exceeded: Optional[BudgetExceededError] = None
+
+    def usage(self) -> Dict[str, Any]:
+        return {
+            "tokens": self.tokens,
+            "llm_calls": self.llm_calls,
+            "elapsed_s": round(time.monotonic() - self.started, 3),
+            "nodes": {
+                node: {"tokens": self.node_tokens.get(node, 0), "llm_calls": self.node_calls.get(node, 0)}
+                for node in sorted(set(self.node_tokens) | set(self.node_calls))
+            },
+        }
+
+    def remaining_s(self) -> Optional[float]:
+        if not self.budget.max_seconds:
+            return None
+        return max(0.0, self.budget.max_seconds - (time.monotonic() - self.started))
+
+    def exceeded(self, limit: str, scope: str = "run") -> BudgetExceededError:
+        return BudgetExceededError(limit, scope, self.usage(), self.budget)
+
+    def _check_pending(self):
+        if self._exceeded is not None:
+            raise self._exceeded
+        if self.remaining_s() == 0.0:
+            raise self.exceeded("wall_clock")
+
+    async def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        # Node boundaries are where an overspent run stops
+        if metadata and metadata.get("langgraph_node") and parent_run_id is not None:
+            self._check_pending()
+
+    def start_call(self, node: Optional[str]):
+        """Counts an LLM call of the node, refused if it would exceed a call limit."""
+        self._check_pending()
+        node_budget = self.budget.nodes.get(node) if node else None
+        if self.budget.max_llm_calls and self.llm_calls >= self.budget.max_llm_calls:
+            raise self.exceeded("llm_calls")
+        if node_budget and node_budget.max_llm_calls and self.node_calls.get(node, 0) >= node_budget.max_llm_calls:
+            raise self.exceeded("llm_calls", node)
+        self.llm_calls += 1
+        if node:
+            self.node_calls[node] = self.node_calls.get(node, 0) + 1
+
+    def record_tokens(self, node: Optional[str], tokens: int):
+        """Adds a response's tokens; crossing a limit stops the run at its next call or node."""
+        self.tokens += tokens
+        if node:
+            self.node_tokens[node] = self.node_tokens.get(node, 0) + tokens
+        node_budget = self.budget.nodes.get(node) if node else None
+        if self._exceeded is None:
+            if self.budget.max_tokens and self.tokens > self.budget.max_tokens:
+                self._exceeded = self.exceeded("tokens")
+            elif node_budget and node_budget.max_tokens and self.node_tokens[node] > node_budget.max_tokens:
+                self._exceeded = self.exceeded("tokens", node)
+
+    async def _start_call(self, run_id: UUID, metadata: Optional[Dict[str, Any]]):
+        node = (metadata or {}).get("langgraph_node")
+        self.start_call(node)
+        self._call_nodes[run_id] = node
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        await self._start_call(run_id, metadata)
+
+    async def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        await self._start_call(run_id, metadata)
+
+    async def on_llm_end(self, response: LLMResult, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        self.record_tokens(self._call_nodes.pop(run_id, None), response_tokens(response))
+
+    async def on_llm_error(self, error: BaseException, *, run_id, **kwargs):
+        self._call_nodes.pop(run_id, None)
+
+
+def response_tokens(response: LLMResult) -> int:
+    """Total tokens of an LLM response, from the message usage metadata or the provider's llm_output."""
+    total = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                total += usage.get("total_tokens") or usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+    if total:
+        return total
+    token_usage = (response.llm_output or {}).get("token_usage") or (response.llm_output or {}).get("usage") or {}
+    return token_usage.get("total_tokens") or token_usage.get("prompt_tokens", 0) + token_usage.get("completion_tokens", 0)
+
+
+def with_budget(config: Dict[str, Any], tracker: BudgetTracker) -> Dict[str, Any]:
+    """Run config with the tracker added to its callbacks."""
+    return {**config, "callbacks": [*(config.get("callbacks") or []), tracker]}
+
+
+def budget_tracker(config: Optional[Dict[str, Any]]) -> Optional[BudgetTracker]:
+    """
+    The run's tracker, from a node's config. For LLM calls made outside
+    LangChain (DSPy / litellm in smart nodes), which never reach the callbacks.
+    """
+    callbacks = (config or {}).get("callbacks")
+    handlers = getattr(callbacks, "handlers", callbacks) or []
+    return next((handler for handler in handlers if isinstance(handler, BudgetTracker)), None)
+
+
+@asynccontextmanager
+async def enforce_deadline(tracker: BudgetTracker):
+    """
+    Wall-clock limit for the enclosed run loop: at the deadline the in-flight
+    node is cancelled and the run ends on its last checkpoint.
+    Must wrap the consuming loop itself (same task as the graph stream).
+    """
+    remaining = tracker.remaining_s()
+    if remaining is None:
+        yield
+        return
+    # A timer cancelling this task rather than asyncio.timeout (Python 3.11+)
+    task = asyncio.current_task()
+    expired = False
+
+    def expire():
+        nonlocal expired
+        expired = True
+        task.cancel()
+
+    handle = asyncio.get_running_loop().call_later(remaining, expire)
+    try:
+        yield
+    except asyncio.CancelledError:
+        if not expired:
+            raise
+        if hasattr(task, "uncancel"):
+            task.uncancel()
+        raise tracker.exceeded("wall_clock") from None
+    finally:
+        handle.cancel()
+
+
+async def budget_exceeded_event(app, thread_id: str, error: BudgetExceededError) -> Dict[str, Any]:
+    """`budget_exceeded` event pointing at the checkpoint the run can be resumed from."""
+    state = await app.aget_state({"configurable": {"thread_id": thread_id}})
+    checkpoint_id = state.config["configurable"].get("checkpoint_id") if state and state.config else None
+    return {**error.to_event(), "thread_id": thread_id, "checkpoint_id": checkpoint_id}
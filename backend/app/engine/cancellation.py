@@ -0,0 +1,38 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+# How long a cancelled run may take to unwind before it is reported as stuck
+CANCEL_GRACE_S = float(os.environ.get("AGENTIC_CANCEL_GRACE_S", "5"))
+
+_stats: Dict[str, Any] = {"cancelled": 0, "stuck": 0, "last_release_ms": None, "max_release_ms": 0.0, "by_reason": {}}
+
+
+async def cancel_and_wait(task: asyncio.Task, reason: str, timeout: float = CANCEL_GRACE_S) -> Optional[float]:
+    """
+    Cancels a run task and waits for it to unwind: LangGraph cancels the
+    in-flight node tasks, which aborts their provider HTTP streams and MCP
+    requests. Returns the release time in ms, or None if it did not finish
+    within `timeout` (e.g. a sync tool blocking a worker thread).
+    """
+    if task.done():
+        return 0.0
+    started = time.monotonic()
+    task.cancel()
+    done, _ = await asyncio.wait({task}, timeout=timeout)
+    _stats["cancelled"] += 1
+    _stats["by_reason"][reason] = _stats["by_reason"].get(reason, 0) + 1
+    if not done:
+        _stats["stuck"] += 1
+        print(f"Run did not release within {timeout}s after {reason}")
+        return None
+    released_ms = (time.monotonic() - started) * 1000
+    _stats["last_release_ms"] = round(released_ms, 3)
+    _stats["max_release_ms"] = round(max(_stats["max_release_ms"], released_ms), 3)
+    print(f"Run cancelled ({reason}), released in {released_ms:.1f} ms")
+    return released_ms
+
+
+def cancellation_stats() -> Dict[str, Any]:
+    return {**_stats, "by_reason": dict(_stats["by_reason"])}
@@ -0,0 +1,115 @@
+import json
+import re
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+import dspy
+
+# A metric scores one prediction against its example in [0, 1]
+Metric = Callable[..., float]
+
+
+def normalize(value: Any) -> str:
+    """Case- and whitespace-insensitive text of a field value."""
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True) if isinstance(value, (dict, list)) else str(value)
+    return " ".join(value.split()).lower()
+
+
+def exact_match(expected: Any, predicted: Any) -> float:
+    return float(normalize(expected) == normalize(predicted))
+
+
+def token_f1(expected: Any, predicted: Any) -> float:
+    """Token overlap F1 (as in SQuAD): partial credit for free-text answers."""
+    expected_tokens = re.findall(r"\w+", normalize(expected))
+    predicted_tokens = re.findall(r"\w+", normalize(predicted))
+    if not expected_tokens or not predicted_tokens:
+        return float(expected_tokens == predicted_tokens)
+    common = sum((Counter(expected_tokens) & Counter(predicted_tokens)).values())
+    if common == 0:
+        return 0.0
+    precision = common / len(predicted_tokens)
+    recall = common / len(expected_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+def contains(expected: Any, predicted: Any) -> float:
+    return float(normalize(expected) in normalize(predicted))
+
+
+def _as_json(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def json_match(expected: Any, predicted: Any) -> float:
+    """Share of the expected JSON object's keys the prediction has with the same value."""
+    expected, predicted = _as_json(expected), _as_json(predicted)
+    if not isinstance(expected, dict):
+        return exact_match(expected, predicted)
+    if not isinstance(predicted, dict) or not expected:
+        return float(expected == predicted)
+    return sum(normalize(predicted.get(k)) == normalize(v) for k, v in expected.items() if k in predicted) / len(expected)
+
+
+class JudgeAnswer(dspy.Signature):
+    """Judge whether the predicted value gives the same answer as the expected one. Wording may differ."""
+    field: str = dspy.InputField(desc="What the value is")
+    expected: str = dspy.InputField()
+    predicted: str = dspy.InputField()
+    correct: bool = dspy.OutputField()
+
+
+_judge = dspy.Predict(JudgeAnswer)
+
+
+def llm_judge(expected: Any, predicted: Any, field: str = "") -> float:
+    """Asks the LM in context (the optimization's teacher) to grade the prediction."""
+    if exact_match(expected, predicted):
+        return 1.0
+    verdict = _judge(field=field, expected=normalize(expected), predicted=normalize(predicted))
+    return float(bool(verdict.correct))
+
+
+METRICS: Dict[str, Callable[..., float]] = {
+    "exact_match": exact_match,
+    "f1": token_f1,
+    "contains": contains,
+    "json_match": json_match,
+    "llm_judge": llm_judge,
+}
+
+# Score a bootstrapped demo must reach to be kept (graded metrics accept near misses)
+DEFAULT_THRESHOLDS = {"f1": 0.8}
+
+
+def make_metric(name: str, outputs: List[Dict[str, Any]]) -> Metric:
+    """DSPy metric averaging the named comparison over the node's output fields."""
+    if name not in METRICS:
+        raise ValueError(f"Unknown metric '{name}' (expected one of {', '.join(METRICS)})")
+    compare = METRICS[name]
+    fields = [(o["name"], o.get("desc") or o["name"]) for o in outputs]
+
+    def metric(example, pred, trace=None) -> float:
+        scores = []
+        for key, desc in fields:
+            expected, predicted = getattr(example, key, None), getattr(pred, key, None)
+            if predicted is None:
+                scores.append(0.0)
+            elif compare is llm_judge:
+                scores.append(llm_judge(expected, predicted, field=desc))
+            else:
+                scores.append(compare(expected, predicted))
+        return sum(scores) / len(scores) if scores else 0.0
+
+    metric.__name__ = name
+    return metric
+
+
+def metric_threshold(name: str, threshold: Optional[float] = None) -> float:
+    return threshold if threshold is not None else DEFAULT_THRESHOLDS.get(name, 1.0)
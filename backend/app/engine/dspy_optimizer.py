@@ -1,110 +1,266 @@
 import dspy
-import os
+import hashlib
 import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from dspy.teleprompt import BootstrapFewShot
-from app.schemas.dspy_schema import OptimizationRequest, OptimizationResponse
+from app.engine.dspy_metrics import make_metric, metric_threshold
+from app.engine.dspy_pareto import (
+    CANDIDATE_MODES,
+    MeteredLM,
+    MeteredProgram,
+    demo_counts,
+    mark_frontier,
+    select_candidate,
+    with_demos,
+    within_budget,
+)
+from app.schemas.dspy_schema import OptimizationRequest, OptimizationResponse, ProgramCandidate
 from app.engine.dspy_utils import get_dspy_lm
+from app.engine.lm_cache import lm_cache
+from app.engine.program_store import program_store, signature_definition
+from app.engine.smart_node_cache import build_module
 from app.models.settings import LLMProfile
-from sqlmodel import Session, select
 
-# Directory to save compiled programs
-COMPILED_NODES_DIR = "resources/smart_nodes"
-os.makedirs(COMPILED_NODES_DIR, exist_ok=True)
+# Threads evaluating a program on the validation set (LM calls are I/O bound)
+OPTIMIZE_EVAL_THREADS = int(os.environ.get("AGENTIC_OPTIMIZE_EVAL_THREADS", "8"))
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+logger = logging.getLogger(__name__)
+
+# BootstrapFewShot method run once per (example, round). DSPy has no public hook
+# for bootstrap attempts, so progress comes from overriding this private one.
+BOOTSTRAP_HOOK = "_bootstrap_one_example"
 
 class SmartNodeSignature(dspy.Signature):
     # Base class, but we usually build dynamically.
     pass
 
-async def optimize_node(request: OptimizationRequest, session: Session) -> OptimizationResponse:
-    # 1. Fetch LLM Profile
-    profile = session.get(LLMProfile, request.llm_profile_id)
-    if not profile:
-        raise ValueError(f"LLM Profile {request.llm_profile_id} not found")
-    
+class ProgressBootstrapFewShot(BootstrapFewShot):
+    """
+    BootstrapFewShot that reports each bootstrap attempt: the round, the
+    candidates evaluated so far and the share of training examples that
+    produced a passing demo (the score, and the best one seen).
+    Without the hook in the installed DSPy, compiling still works but no
+    bootstrap progress is reported.
+    """
+    def __init__(self, *args, on_progress: Optional[ProgressCallback] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if on_progress and not hasattr(BootstrapFewShot, BOOTSTRAP_HOOK):
+            logger.warning("BootstrapFewShot.%s is missing in this DSPy version: no bootstrap progress", BOOTSTRAP_HOOK)
+        self.on_progress = on_progress
+        self.candidates = 0
+        self.bootstrapped = 0
+        self.best_score = 0.0
+        self._attempted = set()
+
+    def _bootstrap_one_example(self, example, round_idx=0):
+        success = super()._bootstrap_one_example(example, round_idx)
+        self.candidates += 1
+        self._attempted.add(id(example))
+        if success:
+            self.bootstrapped += 1
+        self.best_score = max(self.best_score, self.score)
+        if self.on_progress:
+            self.on_progress({
+                "phase": "bootstrap",
+                "round": round_idx + 1,
+                "max_rounds": self.max_rounds,
+                "examples": len(self._attempted),
+                "trainset": len(self.trainset),
+                "candidates": self.candidates,
+                "bootstrapped": self.bootstrapped,
+                "score": self.score,
+                "best_score": self.best_score,
+            })
+        return success
+
+    @property
+    def score(self) -> float:
+        return self.bootstrapped / len(self._attempted) if self._attempted else 0.0
+
+def _split_rank(example: Any, seed: int) -> float:
+    data = example.toDict() if hasattr(example, "toDict") else example
+    digest = hashlib.sha256(f"{seed}:{json.dumps(data, sort_keys=True, default=str)}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+def split_examples(examples: List[Any], val_fraction: float, seed: int = 0) -> Tuple[List[Any], List[Any]]:
+    """
+    (train, validation) split decided per example by a hash of its content,
+    so adding examples never moves the existing ones to the other side (and
+    their LM calls stay cached between runs). With fewer than two examples
+    there is nothing to hold out, so both sets are the same examples.
+    """
+    if len(examples) < 2 or val_fraction <= 0:
+        return list(examples), list(examples)
+    ranked = sorted(examples, key=lambda example: _split_rank(example, seed))
+    val_size = sum(1 for example in examples if _split_rank(example, seed) < val_fraction)
+    val_size = min(len(examples) - 1, max(1, val_size))
+    val = ranked[:val_size]
+    held_out = {id(example) for example in val}
+    return [example for example in examples if id(example) not in held_out], val
+
+def compile_program(
+    request: OptimizationRequest,
+    profile: LLMProfile,
+    on_progress: Optional[ProgressCallback] = None,
+) -> OptimizationResponse:
+    """
+    Scores the node's program on held-out examples, runs BootstrapFewShot on
+    the rest, scores the compiled program and saves it.
+    With the "pareto" objective, both module types with fewer and fewer of the
+    demos are scored and measured, and the best one within the budget is saved.
+    CPU bound and blocking: called in an optimization job's worker process.
+    """
+    report = on_progress or (lambda progress: None)
     teacher_lm = get_dspy_lm(profile)
-    
-    # 2. Optimization within Context
+    metric = make_metric(request.metric, request.outputs)
+    # Re-runs with a tweaked goal or more examples mostly replay cached LM calls
+    namespace = getattr(teacher_lm, "namespace", None)
+    cache_before = lm_cache.namespace_stats(namespace) if namespace else None
+
+    # Optimization within Context
     # dspy.settings.configure(...) is not async-safe for concurrent requests.
     # Use context manager instead.
     with dspy.context(lm=teacher_lm):
-        
-        # Dynamic connection signature
-        try:
-             # Merge inputs and outputs into a single definition dict
-            # format: {name: dspy.InputField or dspy.OutputField}
-            signature_fields = {}
-            
-            for i in request.inputs:
-                signature_fields[i["name"]] = dspy.InputField(desc=i.get("desc", ""))
-                
-            for o in request.outputs:
-                signature_fields[o["name"]] = dspy.OutputField(desc=o.get("desc", ""))
-            
-            DynamicSignature = dspy.make_signature(
-                signature_fields,
-                instructions=request.goal,
-                signature_name=f"Node_{request.node_id}"
-            )
-
-            # Create Module to Optimize
-            if request.mode == "Predict":
-                module = dspy.Predict(DynamicSignature)
-            else:
-                module = dspy.ChainOfThought(DynamicSignature)
-
-            # Prepare Training Data
-            trainset = []
-            for ex in request.examples:
-                # dspy.Example(input_key=val, output_key=val).with_inputs('input_key')
-                d_ex = dspy.Example(**ex.inputs, **ex.outputs).with_inputs(*[i["name"] for i in request.inputs])
-                trainset.append(d_ex)
-
-            if not trainset:
-                 # Need at least one example to even try "FewShot" usually, 
-                 # but BootstrapFewShot needs a trainset to bootstrap from.
-                 return OptimizationResponse(status="skipped", compiled_program_path="", score=0.0)
-
-            # Define Metric
-            def validate_answer(example, pred, trace=None):
-                for o in request.outputs:
-                    key = o["name"]
-                    if getattr(example, key) != getattr(pred, key):
-                        return False
-                return True
-
-            # Run Optimizer (BootstrapFewShot)
-            # Run Optimizer (BootstrapFewShot)
-            # Uses the same LM for teacher and student for simplicity.
-            # Use user-provided max_rounds or fallback to 10
-            max_rounds = request.max_rounds if request.max_rounds else 10
-            
-            # Cap max_rounds at len(trainset) because we can't have more rounds than examples to bootstrap from
-            # (DSPy limitation/logic: each round picks a candidate)
-            # Actually, DSPy allows max_rounds > len(trainset) but it's redundant if deterministic.
-            # Since we bootstrap, randomness is involved, so strict capping isn't strictly necessary but good practice to avoid over-work.
-            # Let's trust the user's setting but capped at 50 for safety.
-            max_rounds = min(max_rounds, 50) 
-
-            teleprompter = BootstrapFewShot(
-                metric=validate_answer, 
-                max_bootstrapped_demos=4, 
-                max_labeled_demos=8, 
-                max_rounds=max_rounds
-            )
-            
-            # Compile!
-            compiled_module = teleprompter.compile(module, trainset=trainset)
-
-            # Save
-            save_path = os.path.join(COMPILED_NODES_DIR, f"{request.node_id}_compiled.json")
-            compiled_module.save(save_path)
-            
-            return OptimizationResponse(
-                status="success",
-                compiled_program_path=save_path,
-                score=1.0 # Placeholder
-            )
-
-        except Exception as e:
-            # Re-raise to be caught by api wrapper which prints trace
-            raise e
+        # Create Module to Optimize
+        module = build_module(request.node_id, request.mode, request.goal, request.inputs, request.outputs)
+
+        # Prepare Training Data
+        examples = []
+        for ex in request.examples:
+            # dspy.Example(input_key=val, output_key=val).with_inputs('input_key')
+            d_ex = dspy.Example(**ex.inputs, **ex.outputs).with_inputs(*[i["name"] for i in request.inputs])
+            examples.append(d_ex)
+
+        if not examples:
+             # Need at least one example to even try "FewShot" usually,
+             # but BootstrapFewShot needs a trainset to bootstrap from.
+             return OptimizationResponse(status="skipped", compiled_program_path="", score=0.0)
+
+        trainset, valset = split_examples(examples, request.val_fraction, request.seed)
+        # Evaluation calls run on threads; the LM context follows them
+        evaluate = dspy.Evaluate(
+            devset=valset,
+            metric=metric,
+            num_threads=max(1, request.eval_threads or OPTIMIZE_EVAL_THREADS),
+            display_progress=False,
+        )
+
+        report({"phase": "baseline", "train_size": len(trainset), "val_size": len(valset)})
+        started = time.perf_counter()
+        baseline_score = evaluate(module).score / 100
+        eval_seconds = time.perf_counter() - started
+
+        # Run Optimizer (BootstrapFewShot)
+        # Uses the same LM for teacher and student for simplicity.
+        # Use user-provided max_rounds or fallback to 10, capped at 50 for safety
+        max_rounds = request.max_rounds if request.max_rounds else 10
+        max_rounds = min(max_rounds, 50)
+
+        teleprompter = ProgressBootstrapFewShot(
+            metric=metric,
+            metric_threshold=metric_threshold(request.metric, request.metric_threshold),
+            max_bootstrapped_demos=4,
+            max_labeled_demos=8,
+            max_rounds=max_rounds,
+            on_progress=on_progress,
+        )
+
+        # Compile!
+        compiled_module = teleprompter.compile(module, trainset=trainset)
+
+        report({"phase": "evaluation", "baseline_score": baseline_score})
+        mode, demos, candidates, measured = request.mode, compiled_module.predictors()[0].demos, [], {}
+        if request.objective == "pareto":
+            # Every mode with the bootstrapped demos (then labeled ones) pruned to
+            # fewer and fewer, each measured for tokens and latency per call
+            counts = demo_counts(len(demos))
+            programs = []
+            for candidate_mode in CANDIDATE_MODES:
+                for count in counts:
+                    program = with_demos(
+                        build_module(request.node_id, candidate_mode, request.goal, request.inputs, request.outputs),
+                        demos[:count],
+                    )
+                    meter = MeteredLM(teacher_lm)
+                    started = time.perf_counter()
+                    candidate_score = evaluate(MeteredProgram(program, meter)).score / 100
+                    eval_seconds += time.perf_counter() - started
+                    candidate = ProgramCandidate(mode=candidate_mode, demos=count, score=candidate_score, **meter.measurements())
+                    candidate.within_budget = within_budget(candidate, request.budget)
+                    candidates.append(candidate)
+                    programs.append(program)
+                    report({
+                        "phase": "candidates",
+                        "candidates": len(candidates),
+                        "total": len(CANDIDATE_MODES) * len(counts),
+                        "best_score": max((c.score for c in candidates if c.within_budget), default=None),
+                    })
+            mark_frontier(candidates)
+            chosen = select_candidate(candidates)
+            if chosen is None:
+                # Nothing fits: keep the active program rather than save one over budget
+                return OptimizationResponse(
+                    status="over_budget",
+                    compiled_program_path="",
+                    score=0.0,
+                    baseline_score=baseline_score,
+                    train_size=len(trainset),
+                    val_size=len(valset),
+                    eval_seconds=eval_seconds,
+                    candidates=candidates,
+                )
+            chosen.selected = True
+            compiled_module = programs[candidates.index(chosen)]
+            mode, demos, score = chosen.mode, demos[:chosen.demos], chosen.score
+            measured = chosen.model_dump(include={"prompt_tokens", "output_tokens", "p50_latency_ms", "p95_latency_ms"})
+        else:
+            started = time.perf_counter()
+            score = evaluate(compiled_module).score / 100
+            eval_seconds += time.perf_counter() - started
+
+        # Save as a new version of the signature's program (and activate it)
+        record = program_store.save(
+            signature_definition(mode, request.goal, request.inputs, request.outputs),
+            compiled_module.dump_state(),
+            {
+                "node_id": request.node_id,
+                "optimizer": "BootstrapFewShot",
+                "objective": request.objective,
+                "metric": request.metric,
+                "score": score,
+                "baseline_score": baseline_score,
+                "demos": len(demos),
+                **measured,
+                "train_size": len(trainset),
+                "val_size": len(valset),
+                "profile": {"id": profile.id, "name": profile.name, "provider": profile.provider, "model_id": profile.model_id},
+            },
+        )
+
+        cache_hit_rate = None
+        if cache_before is not None:
+            cache_after = lm_cache.namespace_stats(namespace)
+            hits = cache_after["hits"] - cache_before["hits"]
+            calls = hits + cache_after["misses"] - cache_before["misses"]
+            cache_hit_rate = hits / calls if calls else None
+
+        return OptimizationResponse(
+            status="success",
+            compiled_program_path=program_store.path(record["signature_hash"], record["version"]),
+            signature_hash=record["signature_hash"],
+            version=record["version"],
+            score=score,
+            baseline_score=baseline_score,
+            train_size=len(trainset),
+            val_size=len(valset),
+            eval_seconds=eval_seconds,
+            lm_cache_hit_rate=cache_hit_rate,
+            mode=mode,
+            demos=len(demos),
+            candidates=candidates,
+        )
@@ -0,0 +1,125 @@
+import statistics
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import dspy
+import litellm
+
+from app.schemas.dspy_schema import InferenceBudget, ProgramCandidate
+
+CANDIDATE_MODES = ("Predict", "ChainOfThought")
+
+
+class MeteredLM(dspy.BaseLM):
+    """
+    Wraps the optimization's LM to measure every call of a candidate program:
+    prompt and output tokens (the provider's usage, counted locally when it
+    reports none) and latency. Answers from the LM cache report the usage
+    and provider latency they were first fetched with, so a re-run measures
+    the same costs.
+    """
+
+    def __init__(self, lm: dspy.LM):
+        super().__init__(model=lm.model, model_type=lm.model_type, cache=False, **lm.kwargs)
+        self.lm = lm
+        self.calls: List[Dict[str, float]] = []
+        self._lock = threading.Lock()
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        messages = messages or [{"role": "user", "content": prompt}]
+        started = time.perf_counter()
+        response = self.lm.forward(messages=messages, **kwargs)
+        latency_s = time.perf_counter() - started
+        if getattr(response, "cache_hit", False):
+            latency_s = getattr(response, "provider_latency_s", latency_s)
+
+        usage = dict(getattr(response, "cached_usage", None) or response.usage or {})
+        prompt_tokens = usage.get("prompt_tokens") or litellm.token_counter(model=self.model, messages=messages)
+        output_tokens = usage.get("completion_tokens")
+        if output_tokens is None:
+            output_tokens = sum(litellm.token_counter(model=self.model, text=choice.message.content or "") for choice in response.choices)
+        with self._lock:
+            self.calls.append({"prompt_tokens": prompt_tokens, "output_tokens": output_tokens, "latency_s": latency_s})
+        return response
+
+    def measurements(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            calls = list(self.calls)
+        latencies = [call["latency_s"] * 1000 for call in calls]
+        return {
+            "prompt_tokens": sum(call["prompt_tokens"] for call in calls) / len(calls) if calls else 0.0,
+            "output_tokens": sum(call["output_tokens"] for call in calls) / len(calls) if calls else 0.0,
+            "p50_latency_ms": statistics.median(latencies) if latencies else None,
+            "p95_latency_ms": p95(latencies),
+        }
+
+
+class MeteredProgram(dspy.Module):
+    """Runs a candidate with the metered LM; the metric (e.g. an LLM judge) keeps the plain one."""
+
+    def __init__(self, program: dspy.Module, lm: MeteredLM):
+        super().__init__()
+        self.program = program
+        self.meter = lm
+
+    def forward(self, **kwargs):
+        with dspy.context(lm=self.meter):
+            return self.program(**kwargs)
+
+
+def p95(values: List[float]) -> Optional[float]:
+    if len(values) < 2:
+        return values[0] if values else None
+    return statistics.quantiles(values, n=20, method="inclusive")[-1]
+
+
+def demo_counts(available: int) -> List[int]:
+    """Demo counts tried per mode: none, a few, then doubling up to all of them."""
+    counts = {0, available}
+    count = 1
+    while count < available:
+        counts.add(count)
+        count *= 2
+    return sorted(counts)
+
+
+def with_demos(module: dspy.Module, demos: List[Any]) -> dspy.Module:
+    for predictor in module.predictors():
+        predictor.demos = list(demos)
+    return module
+
+
+def within_budget(candidate: ProgramCandidate, budget: Optional[InferenceBudget]) -> bool:
+    if budget is None:
+        return True
+    limits = (
+        (candidate.prompt_tokens, budget.max_prompt_tokens),
+        (candidate.output_tokens, budget.max_output_tokens),
+        (candidate.p95_latency_ms, budget.max_p95_latency_ms),
+    )
+    return all(limit is None or (value is not None and value <= limit) for value, limit in limits)
+
+
+def _costs(candidate: ProgramCandidate):
+    return (candidate.prompt_tokens, candidate.output_tokens, candidate.p95_latency_ms or 0.0)
+
+
+def dominates(a: ProgramCandidate, b: ProgramCandidate) -> bool:
+    """a scores at least as well as b for no more tokens or latency, and is strictly better somewhere."""
+    no_worse = a.score >= b.score and all(x <= y for x, y in zip(_costs(a), _costs(b)))
+    better = a.score > b.score or any(x < y for x, y in zip(_costs(a), _costs(b)))
+    return no_worse and better
+
+
+def mark_frontier(candidates: List[ProgramCandidate]):
+    for candidate in candidates:
+        candidate.pareto = not any(dominates(other, candidate) for other in candidates if other is not candidate)
+
+
+def select_candidate(candidates: List[ProgramCandidate]) -> Optional[ProgramCandidate]:
+    """Best score within the budget; cheaper and faster programs win ties."""
+    feasible = [candidate for candidate in candidates if candidate.within_budget]
+    if not feasible:
+        return None
+    return min(feasible, key=lambda candidate: (-candidate.score, *_costs(candidate)))
@@ -1,8 +1,66 @@
+import threading
 import dspy
 import keyring
+from typing import Dict, Optional, Tuple
+from app.engine.budget import BudgetTracker
+from app.engine.lm_cache import LM_CACHE_ENABLED, CachedLM
 from app.models.settings import LLMProfile, ProviderType
 
+# One LM per profile configuration, reused by every smart node call and optimization
+_lm_instances: Dict[Tuple, dspy.LM] = {}
+_lm_lock = threading.Lock()
+
+def profile_namespace(profile: LLMProfile) -> str:
+    """LM cache namespace of a profile."""
+    return f"profile-{profile.id}" if profile.id is not None else f"model-{profile.provider}-{profile.model_id}"
+
 def get_dspy_lm(profile: LLMProfile) -> dspy.LM:
+    """
+    DSPy LM client for an LLMProfile, created once per profile configuration
+    (an edited profile gets a new one). Responses go through the persistent
+    LM cache unless it is disabled.
+    """
+    key = (profile.id, str(profile.provider), profile.model_id, profile.base_url, profile.api_key_ref)
+    lm = _lm_instances.get(key)
+    if lm is None:
+        lm = _create_dspy_lm(profile)
+        with _lm_lock:
+            lm = _lm_instances.setdefault(key, lm)
+    return lm
+
+class BudgetedLM(dspy.BaseLM):
+    """
+    Counts a smart node's LM calls and tokens into the run's BudgetTracker,
+    like the LangChain callbacks do for agents: a call over a call limit is
+    refused, and a response crossing a token limit stops the next call.
+    Answers from the LM cache cost no tokens.
+    """
+
+    def __init__(self, lm: dspy.BaseLM, tracker: BudgetTracker, node: Optional[str]):
+        super().__init__(model=lm.model, model_type=lm.model_type, cache=False, **lm.kwargs)
+        self.lm = lm
+        self.tracker = tracker
+        self.node = node
+
+    def _record(self, response):
+        usage = {} if getattr(response, "cache_hit", False) else dict(getattr(response, "usage", None) or {})
+        tokens = usage.get("total_tokens") or (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0)
+        self.tracker.record_tokens(self.node, tokens)
+        return response
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        self.tracker.start_call(self.node)
+        return self._record(self.lm.forward(prompt=prompt, messages=messages, **kwargs))
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        self.tracker.start_call(self.node)
+        return self._record(await self.lm.aforward(prompt=prompt, messages=messages, **kwargs))
+
+def clear_dspy_lms():
+    with _lm_lock:
+        _lm_instances.clear()
+
+def _create_dspy_lm(profile: LLMProfile) -> dspy.LM:
     """
     Factory to create a DSPy LM client from an LLMProfile.
     Uses the unified dspy.LM interface (DSPy 2.5/3.0+).
@@ -73,6 +131,8 @@ def get_dspy_lm(profile: LLMProfile) -> dspy.LM:
     # 2. Instantiate dspy.LM
     # print(f"Initializing DSPy LM: {model_path} with base {kwargs.get('api_base')}")
     try:
+        if LM_CACHE_ENABLED:
+            return CachedLM(model_path, namespace=profile_namespace(profile), **kwargs)
         return dspy.LM(model_path, **kwargs)
     except Exception as e:
         print(f"Error initializing dspy.LM for {model_path}: {e}")
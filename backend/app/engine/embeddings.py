@@ -0,0 +1,89 @@
+import hashlib
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Sequence
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbedder:
+    """
+    Offline embedder: lowercase words and word bigrams hashed into a signed,
+    L2-normalized bag of features. No model and no network, deterministic
+    across processes, so collections built in tests or without a provider
+    can still be searched by lexical overlap.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self.spec = f"hashing:{dimension}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            words = TOKEN_PATTERN.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                index, sign = _feature_slot(feature, self.dimension)
+                vectors[i, index] += sign
+        return normalize(vectors)
+
+
+@lru_cache(maxsize=200_000)
+def _feature_slot(feature: str, dimension: int):
+    # blake2b rather than hash(): str hashes are salted per process
+    value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return value % dimension, 1.0 if value >> 63 else -1.0
+
+
+class LiteLLMEmbedder:
+    """
+    Embedding model behind LiteLLM, e.g. `ollama/nomic-embed-text` for a
+    local model or `openai/text-embedding-3-small`.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.spec = f"litellm:{model}"
+        self.dimension = None
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        import litellm
+
+        if not texts:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        response = litellm.embedding(model=self.model, input=list(texts))
+        vectors = np.asarray([item["embedding"] for item in response.data], dtype=np.float32)
+        self.dimension = vectors.shape[1]
+        return normalize(vectors)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Unit rows, so a dot product is the cosine similarity; zero rows stay zero."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+_embedders: Dict[str, object] = {}
+_embedders_lock = threading.Lock()
+
+
+def get_embedder(spec: str):
+    """
+    Embedder for a collection's spec: `hashing[:dimension]` or
+    `litellm:<model>`. Instances are shared between collections.
+    """
+    with _embedders_lock:
+        if spec not in _embedders:
+            kind, _, arg = spec.partition(":")
+            if kind == "hashing":
+                _embedders[spec] = HashingEmbedder(int(arg) if arg else 384)
+            elif kind == "litellm" and arg:
+                _embedders[spec] = LiteLLMEmbedder(arg)
+            else:
+                raise ValueError(f"Unknown embedder: {spec}")
+        return _embedders[spec]
+
@@ -0,0 +1,220 @@
+import asyncio
+import os
+import time
+import weakref
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+from langchain_core.messages import BaseMessage
+
+# LangGraph-internal chain names that are not user-visible nodes
+_INTERNAL_NODES = ["__start__", "__end__", "LangGraph"]
+
+# Events buffered per client connection before the overflow policy applies
+WS_QUEUE_SIZE = int(os.environ.get("AGENTIC_WS_QUEUE_SIZE", "256"))
+# coalesce: merge pending tokens | drop: discard intermediate events | pause: block execution
+WS_OVERFLOW_POLICY = os.environ.get("AGENTIC_WS_OVERFLOW", "coalesce")
+OVERFLOW_POLICIES = ("coalesce", "drop", "pause")
+# Events that may be merged or discarded without breaking the UI state machine
+_INTERMEDIATE_EVENTS = {"token"}
+# Custom event dispatched by smart nodes for each chunk of an output field
+SMART_NODE_TOKEN_EVENT = "smart_node_token"
+
+
+def to_jsonable(value: Any) -> Any:
+    """Tool inputs/outputs may contain messages or arbitrary objects; events must be JSON."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, BaseMessage):
+        return value.content
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    return str(value)
+
+
+def translate_event(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Maps a LangGraph `astream_events` (v2) event to the JSON event sent to the UI.
+    Returns None for events the UI does not care about.
+    """
+    kind = event["event"]
+
+    if kind == "on_chat_model_stream":
+        content = event["data"]["chunk"].content
+        if content:
+            return {"type": "token", "content": content}
+
+    elif kind == "on_custom_event" and event["name"] == SMART_NODE_TOKEN_EVENT:
+        data = event["data"]
+        if data["content"]:
+            return {"type": "token", "content": data["content"], "node_id": data["node_id"], "field": data["field"]}
+
+    elif kind == "on_chain_start":
+        # Detect if it's a node start
+        node_name = event["name"]
+        if node_name and node_name not in _INTERNAL_NODES:
+            return {"type": "node_active", "node_id": node_name}
+
+    elif kind == "on_chain_end":
+        return {"type": "node_finished", "node_id": event["name"]}
+
+    elif kind == "on_tool_start":
+        return {
+            "type": "tool_start",
+            "name": event["name"],
+            "input": to_jsonable(event["data"].get("input"))
+        }
+
+    elif kind == "on_tool_end":
+        return {
+            "type": "tool_end",
+            "name": event["name"],
+            "output": to_jsonable(event["data"].get("output"))
+        }
+
+    return None
+
+
+async def stream_run_events(app, inputs: Dict[str, Any], config: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """Executes a compiled graph and yields UI events (without the final 'done')."""
+    async for event in app.astream_events(inputs, config=config, version="v2"):
+        ui_event = translate_event(event)
+        if ui_event is not None:
+            yield ui_event
+
+
+class EventQueue:
+    """
+    Bounded buffer between a run (producer) and one client connection (consumer),
+    so graph execution does not wait on the client rendering each event.
+
+    When the buffer is full the policy decides: "coalesce" merges consecutive
+    tokens (which also happens whenever the client lags behind), "drop" discards
+    tokens, "pause" blocks the producer. Events that cannot be merged or
+    dropped always wait for room, so memory stays bounded.
+    """
+
+    def __init__(self, maxsize: int = WS_QUEUE_SIZE, policy: str = WS_OVERFLOW_POLICY):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}', expected one of {OVERFLOW_POLICIES}")
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self._events: Deque[Dict[str, Any]] = deque()
+        self._changed = asyncio.Condition()
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self.enqueued = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.paused_s = 0.0
+        _ACTIVE_QUEUES.add(self)
+
+    @property
+    def depth(self) -> int:
+        return len(self._events)
+
+    def _try_coalesce(self, event: Dict[str, Any]) -> bool:
+        if self.policy != "coalesce" or event["type"] != "token" or not self._events:
+            return False
+        last = self._events[-1]
+        if last["type"] != "token" or not isinstance(last["content"], str) or not isinstance(event["content"], str):
+            return False
+        # Smart node tokens stay apart per node and output field
+        if (last.get("node_id"), last.get("field")) != (event.get("node_id"), event.get("field")):
+            return False
+        self._events[-1] = {**last, "content": last["content"] + event["content"]}
+        self.coalesced += 1
+        return True
+
+    def _try_drop(self, event: Dict[str, Any]) -> bool:
+        """Makes room (or discards `event`) under the drop policy."""
+        if self.policy != "drop":
+            return False
+        if event["type"] in _INTERMEDIATE_EVENTS:
+            self.dropped += 1
+            return True
+        for index, queued in enumerate(self._events):
+            if queued["type"] in _INTERMEDIATE_EVENTS:
+                del self._events[index]
+                self.dropped += 1
+                return False
+        return False
+
+    async def put(self, event: Dict[str, Any]):
+        async with self._changed:
+            if self._error is not None:
+                raise self._error
+            self.enqueued += 1
+            if self._try_coalesce(event):
+                return
+            while len(self._events) >= self.maxsize:
+                if self._try_drop(event):
+                    return
+                if len(self._events) < self.maxsize:
+                    continue
+                started = time.monotonic()
+                await self._changed.wait()
+                self.paused_s += time.monotonic() - started
+                if self._error is not None:
+                    raise self._error
+            self._events.append(event)
+            self.max_depth = max(self.max_depth, len(self._events))
+            self._changed.notify_all()
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        """Next event, or None once the queue is closed and drained."""
+        async with self._changed:
+            while not self._events and not self._closed:
+                await self._changed.wait()
+            if not self._events:
+                return None
+            event = self._events.popleft()
+            self.sent += 1
+            self._changed.notify_all()
+            return event
+
+    async def close(self):
+        async with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+    async def abort(self, error: BaseException):
+        """The consumer is gone: pending events are discarded and the producer gets `error`."""
+        async with self._changed:
+            self._error = error
+            self._closed = True
+            self._events.clear()
+            self._changed.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "maxsize": self.maxsize,
+            "depth": len(self._events),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "paused_s": round(self.paused_s, 3),
+        }
+
+
+# Queues of connected clients, for the admin metrics endpoint
+_ACTIVE_QUEUES: "weakref.WeakSet[EventQueue]" = weakref.WeakSet()
+
+
+def stream_stats() -> Dict[str, Any]:
+    """Backpressure metrics of every currently streaming connection."""
+    queues = [q.stats() for q in list(_ACTIVE_QUEUES) if not q._closed]
+    return {
+        "connections": len(queues),
+        "queued_events": sum(q["depth"] for q in queues),
+        "coalesced": sum(q["coalesced"] for q in queues),
+        "dropped": sum(q["dropped"] for q in queues),
+        "queues": queues,
+    }
+
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from sqlmodel import Session
+
+from app.database import engine
+from app.engine.compiler import compile_graph
+from app.models.flow import Flow
+from app.services.flow_versions import materialize
+
+# Maximum number of compiled (flow_id, version) entries kept warm.
+GRAPH_CACHE_SIZE = int(os.environ.get("AGENTIC_GRAPH_CACHE_SIZE", "64"))
+
+
+class FlowNotFoundError(LookupError):
+    pass
+
+
+class FlowVersionUnavailableError(LookupError):
+    pass
+
+
+@dataclass
+class CachedGraph:
+    flow_id: int
+    version: int
+    graph_data: Dict[str, Any]
+    app: Any  # CompiledStateGraph compiled without checkpointer
+
+    def bind(self, checkpointer: Optional[BaseCheckpointSaver] = None):
+        """
+        Returns the compiled app attached to the given checkpointer.
+        The cached app itself is never mutated, so concurrent runs can share it.
+        """
+        if checkpointer is None:
+            return self.app
+        return self.app.copy(update={"checkpointer": checkpointer})
+
+
+def load_flow_from_db(flow_id: int) -> Tuple[int, Dict[str, Any]]:
+    """Default loader: reads (version, parsed graph JSON) from the Flow table."""
+    with Session(engine) as session:
+        flow = session.get(Flow, flow_id)
+        if not flow:
+            raise FlowNotFoundError(f"Flow {flow_id} not found")
+        return flow.version or 1, json.loads(flow.data)
+
+
+def load_flow_version_from_db(flow_id: int, version: int) -> Optional[Dict[str, Any]]:
+    """Default version loader: the graph JSON of an earlier version, rebuilt from the flow's history."""
+    with Session(engine) as session:
+        data = materialize(session, flow_id, version)
+        return json.loads(data) if data is not None else None
+
+
+class GraphCache:
+    """
+    Warm cache of parsed and compiled flows keyed by (flow_id, version).
+
+    Entries for a given version are immutable, so a run that pinned a version
+    keeps using it while the flow is edited. `invalidate` only forgets which
+    version is the latest, forcing the next unpinned lookup back to the DB.
+    A pinned version that is no longer cached (evicted, or compiled by a
+    previous process) is rebuilt from the flow's version history.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[int], Tuple[int, Dict[str, Any]]] = load_flow_from_db,
+        max_entries: int = GRAPH_CACHE_SIZE,
+        version_loader: Callable[[int, int], Optional[Dict[str, Any]]] = load_flow_version_from_db,
+    ):
+        self._loader = loader
+        self._version_loader = version_loader
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[int, int], CachedGraph]" = OrderedDict()
+        self._latest: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, flow_id: int, version: Optional[int] = None) -> CachedGraph:
+        with self._lock:
+            key_version = version if version is not None else self._latest.get(flow_id)
+            if key_version is not None:
+                entry = self._entries.get((flow_id, key_version))
+                if entry is not None:
+                    self._entries.move_to_end((flow_id, key_version))
+                    self.hits += 1
+                    return entry
+
+        # Miss: load and compile outside the lock (compilation can be slow).
+        db_version, graph_data = self._loader(flow_id)
+        entry_version = db_version
+        if version is not None and version != db_version:
+            graph_data = self._version_loader(flow_id, version) if version < db_version else None
+            if graph_data is None:
+                raise FlowVersionUnavailableError(
+                    f"Flow {flow_id} version {version} is not available (current version is {db_version})"
+                )
+            entry_version = version
+
+        entry = CachedGraph(
+            flow_id=flow_id,
+            version=entry_version,
+            graph_data=graph_data,
+            app=compile_graph(graph_data),
+        )
+
+        with self._lock:
+            self.misses += 1
+            key = (flow_id, entry_version)
+            # Another request may have compiled the same version meanwhile; keep the first.
+            existing = self._entries.get(key)
+            if existing is not None:
+                entry = existing
+            else:
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if entry_version == db_version and self._latest.get(flow_id, 0) <= db_version:
+                self._latest[flow_id] = db_version
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, flow_id: int, drop_versions: bool = False):
+        """
+        Called on flow update/delete. By default already compiled versions are
+        kept so in-flight or pinned runs are unaffected; `drop_versions` evicts them.
+        """
+        with self._lock:
+            self._latest.pop(flow_id, None)
+            if drop_versions:
+                for key in [k for k in self._entries if k[0] == flow_id]:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._latest.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# Process-wide cache used by the run endpoint and invalidated by the flows API.
+graph_cache = GraphCache()
@@ -0,0 +1,317 @@
+"""
+Streams files into a RAG collection: load, chunk, embed in batches, append.
+
+Usage (from backend/):
+    python -m app.engine.ingestion <collection> <path> [<path> ...] [--chunk-tokens 256] [--overlap-tokens 32]
+"""
+import argparse
+import bisect
+import hashlib
+import io
+import logging
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.engine.vector_store import RAG_EMBEDDER, VectorCollection, text_hash, vector_store
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+logger = logging.getLogger(__name__)
+
+# Size of a chunk and of the overlap with the previous one, in (approximate) tokens
+RAG_CHUNK_TOKENS = int(os.environ.get("AGENTIC_RAG_CHUNK_TOKENS", "256"))
+RAG_CHUNK_OVERLAP_TOKENS = int(os.environ.get("AGENTIC_RAG_CHUNK_OVERLAP_TOKENS", "32"))
+# Chunks per embedding request, and requests in flight while files are read
+RAG_EMBED_BATCH_SIZE = int(os.environ.get("AGENTIC_RAG_EMBED_BATCH_SIZE", "64"))
+RAG_EMBED_CONCURRENCY = int(os.environ.get("AGENTIC_RAG_EMBED_CONCURRENCY", "4"))
+
+# Words and single punctuation marks: close to a subword tokenizer's count
+# for prose, without depending on a model's tokenizer
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+# Paragraph breaks and markdown headings: preferred places to cut a chunk
+BLOCK_PATTERN = re.compile(r"\n[ \t]*\n|^#{1,6} ", re.MULTILINE)
+
+
+class _TextExtractor(HTMLParser):
+    SKIPPED = {"script", "style", "head"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts: List[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED:
+            self._skipping += 1
+        elif tag in ("p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6"):
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED and self._skipping:
+            self._skipping -= 1
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def _load_text(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+def _load_html(data: bytes) -> str:
+    parser = _TextExtractor()
+    parser.feed(_load_text(data))
+    return "".join(parser.parts)
+
+
+def _load_pdf(data: bytes) -> str:
+    return "\n\n".join(page.extract_text() or "" for page in PdfReader(io.BytesIO(data)).pages)
+
+
+LOADERS: Dict[str, Callable[[bytes], str]] = {
+    **{ext: _load_text for ext in (".txt", ".md", ".markdown", ".rst", ".csv", ".tsv", ".log", ".json", ".jsonl", ".yaml", ".yml", ".py")},
+    ".html": _load_html,
+    ".htm": _load_html,
+}
+if PdfReader is not None:
+    LOADERS[".pdf"] = _load_pdf
+
+
+def chunk_text(text: str, chunk_tokens: int = RAG_CHUNK_TOKENS, overlap_tokens: int = RAG_CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """
+    Splits text into chunks of at most `chunk_tokens` tokens, each starting
+    with the last `overlap_tokens` of the previous one. A chunk ends at the
+    last paragraph or heading boundary in the second half of its window when
+    there is one, so edits to one section rarely shift the chunks of the
+    next sections (and re-ingestion reuses their embeddings).
+    """
+    spans = [m.span() for m in TOKEN_PATTERN.finditer(text)]
+    if not spans:
+        return []
+    starts = [span[0] for span in spans]
+    boundaries = sorted({bisect.bisect_left(starts, m.start()) for m in BLOCK_PATTERN.finditer(text)})
+    overlap_tokens = min(overlap_tokens, chunk_tokens // 2)
+
+    chunks = []
+    start = 0
+    while True:
+        end = min(start + chunk_tokens, len(spans))
+        if end < len(spans):
+            i = bisect.bisect_right(boundaries, end) - 1
+            if i >= 0 and boundaries[i] > start + chunk_tokens // 2:
+                end = boundaries[i]
+        chunks.append(text[spans[start][0]:spans[end - 1][1]])
+        if end == len(spans):
+            return chunks
+        start = max(end - overlap_tokens, start + 1)
+
+
+def iter_files(paths: Sequence[str], report: Dict[str, Any]) -> Iterator[str]:
+    """Supported files under the paths, in a stable order; hidden files and directories are skipped."""
+    for path in paths:
+        if os.path.isfile(path):
+            candidates = [path]
+        else:
+            candidates = []
+            for directory, dirnames, filenames in os.walk(path):
+                dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+                candidates.extend(os.path.join(directory, f) for f in sorted(filenames) if not f.startswith("."))
+        for candidate in candidates:
+            if os.path.splitext(candidate)[1].lower() in LOADERS:
+                yield candidate
+            else:
+                report["skipped"] += 1
+
+
+@dataclass
+class _Document:
+    source: str
+    content_hash: str
+    texts: List[str]
+    stale_rows: List[int]
+    # (embedding batch, offset in it, chunks) covering `texts` once submitted
+    parts: List[Tuple[Future, int, int]] = field(default_factory=list)
+
+    def submitted(self) -> bool:
+        return sum(count for _, _, count in self.parts) == len(self.texts)
+
+
+def ingest(
+    collection: VectorCollection,
+    paths: Sequence[str],
+    chunk_tokens: int = RAG_CHUNK_TOKENS,
+    overlap_tokens: int = RAG_CHUNK_OVERLAP_TOKENS,
+    batch_size: int = RAG_EMBED_BATCH_SIZE,
+    concurrency: int = RAG_EMBED_CONCURRENCY,
+    prune: bool = True,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Ingests files and directories into the collection, incrementally:
+    documents whose content hash is unchanged are not read further, changed
+    ones only embed the chunks the collection does not have yet (their
+    vanished chunks are tombstoned), and with `prune` documents under the
+    given paths that no longer exist are tombstoned. A file that cannot be
+    read or parsed is counted as `failed` and keeps its previous chunks.
+
+    Files are read, chunked and committed one at a time in walk order, while
+    up to `concurrency` batches of `batch_size` chunks (possibly spanning
+    several small files) are being embedded; the reader waits when that many
+    are in flight, so memory stays bounded however large the corpus.
+    """
+    roots = [os.path.abspath(path) for path in paths]
+    for root in roots:
+        if not os.path.exists(root):
+            raise FileNotFoundError(f"No such file or directory: {root}")
+
+    started = time.perf_counter()
+    report = {
+        "collection": collection.name,
+        "documents": 0, "added": 0, "updated": 0, "unchanged": 0, "deleted": 0, "skipped": 0, "failed": 0,
+        "chunks_embedded": 0, "chunks_reused": 0, "chunks_tombstoned": 0,
+        "seconds": 0.0, "documents_per_s": 0.0, "chunks_per_s": 0.0,
+    }
+    known = collection.sources()
+    seen = set()
+    pending: deque = deque()
+    inflight: deque = deque()
+    batch: List[str] = []
+    owners: List[Tuple[_Document, int, int]] = []
+
+    def update_rates():
+        report["seconds"] = time.perf_counter() - started
+        report["documents_per_s"] = report["documents"] / report["seconds"] if report["seconds"] else 0.0
+        report["chunks_per_s"] = report["chunks_embedded"] / report["seconds"] if report["seconds"] else 0.0
+
+    def submit(pool: ThreadPoolExecutor):
+        if not batch:
+            return
+        future = pool.submit(collection.embedder.embed, list(batch))
+        inflight.append(future)
+        for doc, offset, count in owners:
+            doc.parts.append((future, offset, count))
+        batch.clear()
+        owners.clear()
+
+    def commit(doc: _Document):
+        vectors = None
+        if doc.texts:
+            vectors = np.concatenate([future.result()[offset:offset + count] for future, offset, count in doc.parts])
+        collection.write_source(doc.source, doc.content_hash, doc.texts, vectors, stale_rows=doc.stale_rows)
+        if progress:
+            update_rates()
+            progress(report)
+
+    def drain(block: bool):
+        while inflight and inflight[0].done():
+            inflight.popleft()
+        while pending and pending[0].submitted():
+            head = pending[0]
+            if not (block or len(inflight) >= concurrency or all(future.done() for future, _, _ in head.parts)):
+                break
+            commit(pending.popleft())
+            while inflight and inflight[0].done():
+                inflight.popleft()
+
+    with ThreadPoolExecutor(max(1, concurrency)) as pool:
+        for path in iter_files(roots, report):
+            source = os.path.abspath(path)
+            seen.add(source)
+            report["documents"] += 1
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                content_hash = hashlib.sha256(data).hexdigest()
+                if known.get(source) == content_hash:
+                    report["unchanged"] += 1
+                    continue
+                chunks = chunk_text(LOADERS[os.path.splitext(path)[1].lower()](data), chunk_tokens, overlap_tokens)
+            except Exception as e:
+                logger.warning("Could not ingest %s: %s", source, e)
+                report["failed"] += 1
+                continue
+
+            existing = collection.source_chunks(source)
+            hashes = {text_hash(chunk): chunk for chunk in chunks}
+            doc = _Document(
+                source, content_hash,
+                texts=[chunk for h, chunk in hashes.items() if h not in existing],
+                stale_rows=[row for h, row in existing.items() if h not in hashes],
+            )
+            report["updated" if source in known else "added"] += 1
+            report["chunks_embedded"] += len(doc.texts)
+            report["chunks_reused"] += len(hashes) - len(doc.texts)
+            report["chunks_tombstoned"] += len(doc.stale_rows)
+
+            offset = 0
+            while offset < len(doc.texts):
+                count = min(batch_size - len(batch), len(doc.texts) - offset)
+                owners.append((doc, len(batch), count))
+                batch.extend(doc.texts[offset:offset + count])
+                offset += count
+                if len(batch) >= batch_size:
+                    submit(pool)
+            pending.append(doc)
+            drain(block=False)
+
+        submit(pool)
+        drain(block=True)
+
+    if prune:
+        for source in set(known) - seen:
+            if any(source == root or source.startswith(root.rstrip(os.sep) + os.sep) for root in roots):
+                report["chunks_tombstoned"] += collection.remove_source(source)
+                report["deleted"] += 1
+
+    update_rates()
+    return report
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Ingest files or directories into a RAG collection")
+    parser.add_argument("collection")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--embedder", default=RAG_EMBEDDER, help="Embedder of a new collection")
+    parser.add_argument("--chunk-tokens", type=int, default=RAG_CHUNK_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=RAG_CHUNK_OVERLAP_TOKENS)
+    parser.add_argument("--batch-size", type=int, default=RAG_EMBED_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=RAG_EMBED_CONCURRENCY)
+    parser.add_argument("--no-prune", action="store_true", help="Keep documents that were deleted from the paths")
+    args = parser.parse_args(argv)
+
+    collection = vector_store.create(args.collection, embedder=args.embedder)
+    last = [0.0]
+
+    def progress(report):
+        if report["seconds"] - last[0] >= 1:
+            last[0] = report["seconds"]
+            print(f"{report['documents']} documents, {report['chunks_embedded']} chunks embedded ({report['documents_per_s']:.1f} docs/s)")
+
+    report = ingest(
+        collection, args.paths,
+        chunk_tokens=args.chunk_tokens, overlap_tokens=args.overlap_tokens,
+        batch_size=args.batch_size, concurrency=args.concurrency,
+        prune=not args.no_prune, progress=progress,
+    )
+    print(
+        f"{report['documents']} documents in {report['seconds']:.1f}s ({report['documents_per_s']:.1f} docs/s): "
+        f"{report['added']} added, {report['updated']} updated, {report['unchanged']} unchanged, "
+        f"{report['deleted']} deleted, {report['skipped']} skipped, {report['failed']} failed; "
+        f"{report['chunks_embedded']} chunks embedded, {report['chunks_reused']} reused, {report['chunks_tombstoned']} tombstoned"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import diskcache
+import dspy
+from pydantic import BaseModel
+
+from app.database import BASE_DIR
+
+# Persistent LM response cache shared by smart node runs and optimization jobs (0 disables it)
+LM_CACHE_ENABLED = os.environ.get("AGENTIC_LM_CACHE", "1") != "0"
+# Where cached responses are stored; shared between the API and optimization worker processes
+LM_CACHE_DIR = os.environ.get("AGENTIC_LM_CACHE_DIR", os.path.join(BASE_DIR, "resources", "lm_cache"))
+# Disk budget; least recently used responses are evicted beyond it
+LM_CACHE_SIZE_MB = int(os.environ.get("AGENTIC_LM_CACHE_SIZE_MB", "1024"))
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, type) and issubclass(value, BaseModel):
+        return value.model_json_schema()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return repr(value)
+
+
+class LMCallCache:
+    """
+    Content-keyed LM responses on disk (diskcache, so several processes can
+    share it). Every profile has its own namespace: two profiles serving the
+    same model name from different endpoints never share answers, and one
+    profile's entries can be dropped on their own. Hits and misses are counted
+    per namespace, also on disk, so optimization workers report to the API.
+    """
+
+    def __init__(self, directory: str = LM_CACHE_DIR, size_limit_mb: int = LM_CACHE_SIZE_MB):
+        self.directory = directory
+        self.size_limit_bytes = size_limit_mb * 1024 * 1024
+        self._disk: Optional[diskcache.FanoutCache] = None
+        self._counters: Optional[diskcache.Cache] = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        with self._lock:
+            if self._disk is None:
+                self._disk = diskcache.FanoutCache(
+                    self.directory,
+                    shards=8,
+                    timeout=10,
+                    size_limit=self.size_limit_bytes,
+                    eviction_policy="least-recently-used",
+                    tag_index=True,
+                )
+                self._counters = diskcache.Cache(os.path.join(self.directory, "stats"), timeout=10)
+        return self._disk, self._counters
+
+    @staticmethod
+    def key(namespace: str, request: Dict[str, Any]) -> str:
+        payload = json.dumps({"namespace": namespace, "request": request}, sort_keys=True, default=_jsonable)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, namespace: str, request: Dict[str, Any]) -> Any:
+        disk, counters = self._open()
+        response = disk.get(self.key(namespace, request), default=None, retry=True)
+        counters.incr(("hits" if response is not None else "misses", namespace), retry=True)
+        if response is not None and hasattr(response, "usage"):
+            # No tokens were spent on a cached answer (what it cost first is kept for measurements)
+            response.cached_usage = response.usage
+            response.usage = {}
+            response.cache_hit = True
+        return response
+
+    def put(self, namespace: str, request: Dict[str, Any], response: Any):
+        disk, _ = self._open()
+        disk.set(self.key(namespace, request), response, tag=namespace, retry=True)
+
+    def namespace_stats(self, namespace: str) -> Dict[str, Any]:
+        _, counters = self._open()
+        hits = counters.get(("hits", namespace), 0, retry=True)
+        misses = counters.get(("misses", namespace), 0, retry=True)
+        return {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else None}
+
+    def stats(self) -> Dict[str, Any]:
+        disk, counters = self._open()
+        namespaces = sorted({namespace for _, namespace in counters.iterkeys()})
+        return {
+            "enabled": LM_CACHE_ENABLED,
+            "directory": self.directory,
+            "entries": len(disk),
+            "size_bytes": disk.volume(),
+            "size_limit_bytes": self.size_limit_bytes,
+            "namespaces": {namespace: self.namespace_stats(namespace) for namespace in namespaces},
+        }
+
+    def clear(self, namespace: Optional[str] = None) -> int:
+        """Drops the cached responses (and counters) of one namespace, or all of them."""
+        disk, counters = self._open()
+        if namespace is None:
+            counters.clear(retry=True)
+            return disk.clear(retry=True)
+        for kind in ("hits", "misses"):
+            counters.delete((kind, namespace), retry=True)
+        return disk.evict(namespace, retry=True)
+
+
+lm_cache = LMCallCache()
+
+
+class CachedLM(dspy.LM):
+    """
+    dspy.LM answering from the persistent cache before calling the provider.
+    The key is the full request (model, messages, sampling parameters,
+    rollout id) without the API key, inside the profile's namespace.
+    Responses keep the provider latency they were fetched with
+    (`provider_latency_s`), so cached answers can still be profiled.
+    """
+
+    def __init__(self, model: str, namespace: str, **kwargs):
+        # DSPy's own process cache would only duplicate ours
+        super().__init__(model, cache=False, **kwargs)
+        self.namespace = namespace
+
+    def _cache_request(self, prompt, messages, kwargs) -> Dict[str, Any]:
+        request = {**self.kwargs, **kwargs, "model": self.model, "messages": messages or [{"role": "user", "content": prompt}]}
+        request.pop("api_key", None)
+        if request.get("rollout_id") is None:
+            request.pop("rollout_id", None)
+        return request
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        if not kwargs.pop("cache", True):
+            return super().forward(prompt=prompt, messages=messages, **kwargs)
+        request = self._cache_request(prompt, messages, kwargs)
+        response = lm_cache.get(self.namespace, request)
+        if response is None:
+            started = time.perf_counter()
+            response = super().forward(prompt=prompt, messages=messages, **kwargs)
+            response.provider_latency_s = time.perf_counter() - started
+            lm_cache.put(self.namespace, request, response)
+        return response
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        if not kwargs.pop("cache", True):
+            return await super().aforward(prompt=prompt, messages=messages, **kwargs)
+        request = self._cache_request(prompt, messages, kwargs)
+        # diskcache is a local SQLite read/write, short enough for the event loop
+        response = lm_cache.get(self.namespace, request)
+        if response is None:
+            started = time.perf_counter()
+            response = await super().aforward(prompt=prompt, messages=messages, **kwargs)
+            response.provider_latency_s = time.perf_counter() - started
+            lm_cache.put(self.namespace, request, response)
+        return response
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.database import BASE_DIR
+
+# Root of the compiled smart node programs: one directory per signature hash,
+# one JSON file per optimization (program + metadata), plus the active version
+PROGRAM_STORE_DIR = os.environ.get("AGENTIC_PROGRAM_STORE_DIR", os.path.join(BASE_DIR, "resources", "smart_nodes"))
+
+CURRENT_FILE = "current"
+SIGNATURE_FILE = "signature.json"
+
+
+def signature_hash(mode: str, goal: str, inputs: List[Dict[str, Any]], outputs: List[Dict[str, Any]]) -> str:
+    """
+    Hash of what a compiled program depends on: module type, instructions and
+    fields. The node id is left out, so a copied flow or a renamed node keeps
+    its program, while any signature change gets a new (empty) history.
+    """
+    return hashlib.sha256(_canonical(signature_definition(mode, goal, inputs, outputs))).hexdigest()
+
+
+def signature_definition(mode: str, goal: str, inputs: List[Dict[str, Any]], outputs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "mode": mode,
+        "goal": goal,
+        "inputs": [{"name": i["name"], "desc": i.get("desc", "")} for i in inputs],
+        "outputs": [{"name": o["name"], "desc": o.get("desc", "")} for o in outputs],
+    }
+
+
+def _canonical(value: Any) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _write_atomic(path: str, data: bytes):
+    """Readers see the previous file or the new one, never a partial write."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ProgramStore:
+    """
+    Versioned compiled programs keyed by signature hash:
+
+        {root}/{signature_hash}/signature.json   definition the hash covers
+        {root}/{signature_hash}/v0001.json       program state + metadata
+        {root}/{signature_hash}/current          active version number
+
+    Files are written to a temporary file and renamed into place. A version
+    number is claimed with a hard link, which fails if another process took
+    it first, so concurrent optimizations of one signature never overwrite
+    each other. Saving activates the new version; `activate` rolls back.
+    """
+
+    def __init__(self, root: str = PROGRAM_STORE_DIR):
+        self.root = os.path.abspath(root)
+        # signature hash -> ((inode, mtime_ns, size) of `current`, version)
+        self._current: Dict[str, Tuple[Tuple[int, int, int], int]] = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, sig_hash: str) -> str:
+        return os.path.join(self.root, sig_hash)
+
+    def path(self, sig_hash: str, version: int) -> str:
+        return os.path.join(self._dir(sig_hash), f"v{version:04d}.json")
+
+    def save(self, signature: Dict[str, Any], program: Dict[str, Any], metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Stores a new version of the signature's program and makes it the active one."""
+        sig_hash = hashlib.sha256(_canonical(signature)).hexdigest()
+        directory = self._dir(sig_hash)
+        os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(os.path.join(directory, SIGNATURE_FILE)):
+            _write_atomic(os.path.join(directory, SIGNATURE_FILE), _canonical(signature))
+
+        record = {
+            **metadata,
+            "signature_hash": sig_hash,
+            "program_hash": hashlib.sha256(_canonical(program)).hexdigest(),
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            version = max(self.versions(sig_hash), default=0) + 1
+            while True:
+                record["version"] = version
+                with open(fd, "wb", closefd=False) as f:
+                    f.seek(0)
+                    f.truncate()
+                    f.write(_canonical({**record, "program": program}))
+                    f.flush()
+                    os.fsync(f.fileno())
+                try:
+                    os.link(tmp_path, self.path(sig_hash, version))
+                    break
+                except FileExistsError:
+                    version += 1
+        finally:
+            os.close(fd)
+            os.unlink(tmp_path)
+
+        self.activate(sig_hash, version)
+        return record
+
+    def versions(self, sig_hash: str) -> List[int]:
+        try:
+            names = os.listdir(self._dir(sig_hash))
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[1:-5]) for name in names if name.startswith("v") and name.endswith(".json"))
+
+    def history(self, sig_hash: str) -> List[Dict[str, Any]]:
+        """Metadata of every version, oldest first."""
+        history = []
+        for version in self.versions(sig_hash):
+            record = self.load(sig_hash, version)
+            record.pop("program", None)
+            history.append(record)
+        return history
+
+    def load(self, sig_hash: str, version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """A version (default: the active one) with its program state, None if missing."""
+        version = version or self.current_version(sig_hash)
+        if version is None:
+            return None
+        try:
+            with open(self.path(sig_hash, version), "rb") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def signature(self, sig_hash: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self._dir(sig_hash), SIGNATURE_FILE), "rb") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def current_version(self, sig_hash: str) -> Optional[int]:
+        """
+        Active version, None when the signature was never optimized.
+        Called on every SmartNode execution: the pointer file is only re-read
+        when a stat shows it was replaced (e.g. by an optimization worker).
+        """
+        path = os.path.join(self._dir(sig_hash), CURRENT_FILE)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        fingerprint = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        known = self._current.get(sig_hash)
+        if known and known[0] == fingerprint:
+            return known[1]
+        with open(path, "rb") as f:
+            version = int(f.read())
+        with self._lock:
+            self._current[sig_hash] = (fingerprint, version)
+        return version
+
+    def activate(self, sig_hash: str, version: int):
+        if not os.path.exists(self.path(sig_hash, version)):
+            raise KeyError(f"Program {sig_hash} has no version {version}")
+        _write_atomic(os.path.join(self._dir(sig_hash), CURRENT_FILE), str(version).encode("ascii"))
+
+
+program_store = ProgramStore()
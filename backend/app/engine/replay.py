@@ -0,0 +1,135 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from langgraph.checkpoint.base import BaseCheckpointSaver, copy_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+
+# Checkpoint metadata key holding the config fingerprint of every node of the run's graph.
+# LangGraph only copies scalar metadata into checkpoints, hence a JSON string.
+FINGERPRINTS_METADATA_KEY = "node_fingerprints"
+
+
+def _digest(payload: str) -> str:
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def config_fingerprints(graph_data: Dict[str, Any]) -> Dict[str, str]:
+    """Fingerprint of each node's configuration (type + data; UI position is ignored)."""
+    return {
+        node["id"]: _digest(json.dumps({"type": node.get("type"), "data": node.get("data", {})}, sort_keys=True, default=str))
+        for node in graph_data.get("nodes", [])
+    }
+
+
+def run_metadata(graph_data: Dict[str, Any]) -> Dict[str, Any]:
+    """`config["metadata"]` for a run, so its checkpoints record what each node was configured with."""
+    return {FINGERPRINTS_METADATA_KEY: json.dumps(config_fingerprints(graph_data), sort_keys=True)}
+
+
+@dataclass
+class ReplayPlan:
+    source_thread_id: str
+    thread_id: str  # New thread the replay runs on
+    fork_checkpoint_id: str
+    reused_nodes: List[str] = field(default_factory=list)  # Executed in the source run, not re-executed
+    rerun_from: List[str] = field(default_factory=list)  # Nodes executed first on the fork
+    changed_nodes: List[str] = field(default_factory=list)  # Nodes whose config differs from the source run
+
+
+async def plan_replay(
+    app,
+    graph_data: Dict[str, Any],
+    source_thread_id: str,
+    thread_id: str,
+    checkpoint_id: Optional[str] = None,
+) -> Tuple[ReplayPlan, Any]:
+    """
+    Picks the checkpoint of `source_thread_id` to fork from: the last one before
+    a node whose config fingerprint differs under `graph_data`. Everything
+    executed before it is reused as-is. Reuse depends on config only: a replay
+    takes no new input, and the fork copies the source checkpoint, so every
+    node before the fork saw the same input state in the source run. An
+    explicit `checkpoint_id` overrides the choice. Returns the plan and the
+    state snapshot to fork.
+    """
+    history = [s async for s in app.aget_state_history({"configurable": {"thread_id": source_thread_id}})]
+    if not history:
+        raise LookupError(f"No checkpoints for thread '{source_thread_id}'")
+    history.reverse()
+
+    # Only the latest turn of the thread is replayed
+    inputs = [i for i, s in enumerate(history) if s.metadata.get("source") == "input"]
+    turn = history[inputs[-1] if inputs else 0:]
+
+    new_fps = config_fingerprints(graph_data)
+    old_fps = json.loads(turn[0].metadata.get(FINGERPRINTS_METADATA_KEY) or "{}")
+    changed = sorted(n for n in new_fps if old_fps.get(n) != new_fps[n])
+
+    fork, reused = turn[-1], []
+    for snapshot in turn:
+        if checkpoint_id is not None:
+            if snapshot.config["configurable"]["checkpoint_id"] == checkpoint_id:
+                fork = snapshot
+                break
+            reused.extend(n for n in snapshot.next if n != "__start__")
+            continue
+
+        recorded = json.loads(snapshot.metadata.get(FINGERPRINTS_METADATA_KEY) or "{}")
+        pending = [n for n in snapshot.next if n != "__start__"]
+        if any(recorded.get(n) != new_fps.get(n) for n in pending):
+            fork = snapshot
+            break
+        reused.extend(pending)
+    else:
+        if checkpoint_id is not None:
+            raise LookupError(f"Checkpoint '{checkpoint_id}' not found in the latest turn of '{source_thread_id}'")
+
+    plan = ReplayPlan(
+        source_thread_id=source_thread_id,
+        thread_id=thread_id,
+        fork_checkpoint_id=fork.config["configurable"]["checkpoint_id"],
+        reused_nodes=reused,
+        rerun_from=list(fork.next),
+        changed_nodes=changed,
+    )
+    return plan, fork
+
+
+async def fork_thread(
+    checkpointer: BaseCheckpointSaver,
+    snapshot,
+    thread_id: str,
+    graph_data: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Copies a checkpoint into a new thread; the source thread is left untouched."""
+    saved = await checkpointer.aget_tuple(snapshot.config)
+    checkpoint = copy_checkpoint(saved.checkpoint)
+    # Fresh time-ordered id so retention treats the fork as new
+    checkpoint["id"] = str(uuid6(clock_seq=saved.metadata.get("step", 0)))
+    metadata = {
+        **saved.metadata,
+        "source": "fork",
+        "forked_from": f"{snapshot.config['configurable']['thread_id']}:{saved.checkpoint['id']}",
+        **run_metadata(graph_data),
+    }
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    return await checkpointer.aput(config, checkpoint, metadata, checkpoint["channel_versions"])
+
+
+async def prepare_replay(
+    app,
+    graph_data: Dict[str, Any],
+    source_thread_id: str,
+    thread_id: str,
+    checkpoint_id: Optional[str] = None,
+) -> ReplayPlan:
+    """
+    Forks `source_thread_id` onto `thread_id` at the reuse boundary. Running
+    the app on `thread_id` with `None` input then only executes the changed
+    nodes and what follows them.
+    """
+    plan, snapshot = await plan_replay(app, graph_data, source_thread_id, thread_id, checkpoint_id)
+    await fork_thread(app.checkpointer, snapshot, thread_id, graph_data)
+    return plan
@@ -0,0 +1,275 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from langgraph.checkpoint.base.id import UUID as UUID6
+
+from app.engine.storage import PooledSqliteSaver, get_graph_checkpointer
+
+# Retention policy defaults. 0 disables the corresponding rule.
+CHECKPOINT_KEEP_LAST = int(os.environ.get("AGENTIC_CHECKPOINT_KEEP_LAST", "50"))
+CHECKPOINT_MAX_AGE_HOURS = float(os.environ.get("AGENTIC_CHECKPOINT_MAX_AGE_HOURS", "168"))
+CHECKPOINT_THREAD_TTL_HOURS = float(os.environ.get("AGENTIC_CHECKPOINT_THREAD_TTL_HOURS", "720"))
+# Background compaction period in seconds. 0 disables the background task.
+CHECKPOINT_COMPACTION_INTERVAL_S = float(os.environ.get("AGENTIC_CHECKPOINT_COMPACTION_INTERVAL_S", "3600"))
+# Pages released per `incremental_vacuum` call (0 = all free pages)
+CHECKPOINT_VACUUM_PAGES = int(os.environ.get("AGENTIC_CHECKPOINT_VACUUM_PAGES", "0"))
+
+# Offset between the UUID epoch (1582-10-15) and the Unix epoch, in 100ns intervals
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+@dataclass
+class RetentionPolicy:
+    keep_last: int = CHECKPOINT_KEEP_LAST
+    max_age_hours: float = CHECKPOINT_MAX_AGE_HOURS
+    thread_ttl_hours: float = CHECKPOINT_THREAD_TTL_HOURS
+
+
+def checkpoint_id_for_time(timestamp: float) -> str:
+    """
+    Smallest UUIDv6 checkpoint id for a unix timestamp.
+    LangGraph checkpoint ids are UUIDv6, which sort by creation time, so age
+    rules can be expressed as plain `checkpoint_id < ?` comparisons.
+    """
+    ticks = int(timestamp * 10_000_000) + _UUID_EPOCH_OFFSET
+    value = ((ticks >> 12) & 0xFFFF_FFFF_FFFF) << 80 | (ticks & 0x0FFF) << 64
+    return str(UUID6(int=value, version=6))
+
+
+def checkpoint_id_to_time(checkpoint_id: str) -> Optional[float]:
+    try:
+        parsed = UUID6(checkpoint_id)
+    except ValueError:
+        return None
+    if parsed.version != 6:
+        return None
+    ticks = parsed.time
+    return (ticks - _UUID_EPOCH_OFFSET) / 10_000_000
+
+
+async def _scalar(conn, query: str, params: tuple = ()) -> Any:
+    async with conn.execute(query, params) as cur:
+        row = await cur.fetchone()
+        return row[0] if row else None
+
+
+async def _file_bytes(conn) -> int:
+    """Size of the main database file plus its WAL (on-disk footprint)."""
+    path = await _database_path(conn)
+    if not path:
+        page_size = await _scalar(conn, "PRAGMA page_size")
+        page_count = await _scalar(conn, "PRAGMA page_count")
+        return page_size * page_count
+    total = 0
+    for candidate in (path, f"{path}-wal"):
+        if os.path.exists(candidate):
+            total += os.path.getsize(candidate)
+    return total
+
+
+async def _database_path(conn) -> Optional[str]:
+    async with conn.execute("PRAGMA database_list") as cur:
+        async for _, name, file in cur:
+            if name == "main":
+                return file or None
+    return None
+
+
+async def get_checkpoint_stats(saver: Optional[PooledSqliteSaver] = None) -> Dict[str, Any]:
+    saver = saver or await get_graph_checkpointer()
+    await saver.setup()
+    conn = saver.conn
+    async with saver.lock:
+        page_size = await _scalar(conn, "PRAGMA page_size")
+        page_count = await _scalar(conn, "PRAGMA page_count")
+        freelist = await _scalar(conn, "PRAGMA freelist_count")
+        stats = {
+            "path": await _database_path(conn),
+            "file_bytes": await _file_bytes(conn),
+            "page_size": page_size,
+            "page_count": page_count,
+            "free_pages": freelist,
+            "free_bytes": freelist * page_size,
+            "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(await _scalar(conn, "PRAGMA auto_vacuum")),
+            "threads": await _scalar(conn, "SELECT COUNT(DISTINCT thread_id) FROM checkpoints"),
+            "checkpoints": await _scalar(conn, "SELECT COUNT(*) FROM checkpoints"),
+            "writes": await _scalar(conn, "SELECT COUNT(*) FROM writes"),
+            "checkpoint_bytes": await _scalar(
+                conn, "SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints"
+            ),
+            "write_bytes": await _scalar(conn, "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes"),
+            "message_blobs": await _scalar(conn, "SELECT COUNT(*) FROM checkpoint_blobs"),
+            "message_blob_bytes": await _scalar(conn, "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM checkpoint_blobs"),
+            "serde_dictionaries": await _scalar(conn, "SELECT COUNT(*) FROM checkpoint_serde_dictionaries"),
+        }
+        oldest = await _scalar(conn, "SELECT MIN(checkpoint_id) FROM checkpoints")
+        newest = await _scalar(conn, "SELECT MAX(checkpoint_id) FROM checkpoints")
+    stats["oldest_checkpoint_at"] = checkpoint_id_to_time(oldest) if oldest else None
+    stats["newest_checkpoint_at"] = checkpoint_id_to_time(newest) if newest else None
+    return stats
+
+
+async def prune_checkpoints(
+    saver: Optional[PooledSqliteSaver] = None,
+    policy: Optional[RetentionPolicy] = None,
+    now: Optional[float] = None,
+) -> Dict[str, int]:
+    """
+    Applies the retention policy. Returns the number of deleted rows per rule.
+
+    - thread_ttl_hours: whole threads whose latest checkpoint is older are deleted.
+    - max_age_hours: older checkpoints are deleted, except each thread's latest one
+      (so a thread stays resumable until the inactivity rule removes it).
+    - keep_last: only the newest N checkpoints of each thread/namespace are kept.
+    Pending writes whose checkpoint no longer exists are removed afterwards.
+    """
+    saver = saver or await get_graph_checkpointer()
+    policy = policy or RetentionPolicy()
+    now = time.time() if now is None else now
+    await saver.setup()
+    conn = saver.conn
+    deleted = {
+        "threads": 0,
+        "expired_threads_checkpoints": 0,
+        "aged_checkpoints": 0,
+        "excess_checkpoints": 0,
+        "orphan_writes": 0,
+        "orphan_blobs": 0,
+    }
+
+    async with saver.lock:
+        if policy.thread_ttl_hours > 0:
+            cutoff = checkpoint_id_for_time(now - policy.thread_ttl_hours * 3600)
+            async with conn.execute(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(checkpoint_id) < ?", (cutoff,)
+            ) as cur:
+                stale_threads = [row[0] async for row in cur]
+            for thread_id in stale_threads:
+                async with conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,)) as cur:
+                    deleted["expired_threads_checkpoints"] += cur.rowcount
+                async with conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,)):
+                    pass
+            deleted["threads"] = len(stale_threads)
+
+        if policy.max_age_hours > 0:
+            cutoff = checkpoint_id_for_time(now - policy.max_age_hours * 3600)
+            async with conn.execute(
+                """
+                DELETE FROM checkpoints
+                WHERE checkpoint_id < ?
+                  AND checkpoint_id < (
+                      SELECT MAX(c.checkpoint_id) FROM checkpoints c
+                      WHERE c.thread_id = checkpoints.thread_id AND c.checkpoint_ns = checkpoints.checkpoint_ns
+                  )
+                """,
+                (cutoff,),
+            ) as cur:
+                deleted["aged_checkpoints"] = cur.rowcount
+
+        if policy.keep_last > 0:
+            async with conn.execute(
+                """
+                DELETE FROM checkpoints WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, ROW_NUMBER() OVER (
+                            PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                        ) AS rank
+                        FROM checkpoints
+                    ) WHERE rank > ?
+                )
+                """,
+                (policy.keep_last,),
+            ) as cur:
+                deleted["excess_checkpoints"] = cur.rowcount
+
+        async with conn.execute(
+            """
+            DELETE FROM writes WHERE NOT EXISTS (
+                SELECT 1 FROM checkpoints c
+                WHERE c.thread_id = writes.thread_id
+                  AND c.checkpoint_ns = writes.checkpoint_ns
+                  AND c.checkpoint_id = writes.checkpoint_id
+            )
+            """
+        ) as cur:
+            deleted["orphan_writes"] = cur.rowcount
+
+        # Deduplicated message blobs no longer referenced by any checkpoint
+        async with conn.execute(
+            """
+            DELETE FROM checkpoint_blob_refs WHERE NOT EXISTS (
+                SELECT 1 FROM checkpoints c WHERE c.thread_id = checkpoint_blob_refs.thread_id
+            )
+            """
+        ):
+            pass
+        async with conn.execute(
+            """
+            DELETE FROM checkpoint_blobs WHERE NOT EXISTS (
+                SELECT 1 FROM checkpoint_blob_refs r WHERE r.hash = checkpoint_blobs.hash
+            )
+            """
+        ) as cur:
+            deleted["orphan_blobs"] = cur.rowcount
+        # The saver must re-insert blobs it believed were already stored
+        saver.forget_known_blobs()
+        await conn.commit()
+    return deleted
+
+
+async def vacuum_checkpoints(saver: Optional[PooledSqliteSaver] = None, pages: int = CHECKPOINT_VACUUM_PAGES) -> None:
+    """
+    Returns free pages to the filesystem. The first call on a database created
+    without `auto_vacuum=INCREMENTAL` runs one full VACUUM to switch modes;
+    afterwards only the cheap `incremental_vacuum` is used.
+    """
+    saver = saver or await get_graph_checkpointer()
+    conn = saver.conn
+    async with saver.lock:
+        # VACUUM cannot run inside a transaction, flush any grouped writes first
+        await conn.commit()
+        if await _scalar(conn, "PRAGMA auto_vacuum") != 2:
+            await conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            await conn.execute("VACUUM")
+        else:
+            await conn.execute(f"PRAGMA incremental_vacuum({int(pages)})" if pages else "PRAGMA incremental_vacuum")
+            await conn.commit()
+        await conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+async def compact_checkpoints(
+    saver: Optional[PooledSqliteSaver] = None,
+    policy: Optional[RetentionPolicy] = None,
+) -> Dict[str, Any]:
+    """Prune + vacuum, reporting how many bytes were returned to the filesystem."""
+    saver = saver or await get_graph_checkpointer()
+    started = time.perf_counter()
+    async with saver.lock:
+        bytes_before = await _file_bytes(saver.conn)
+    deleted = await prune_checkpoints(saver, policy)
+    await vacuum_checkpoints(saver)
+    async with saver.lock:
+        bytes_after = await _file_bytes(saver.conn)
+    return {
+        "deleted": deleted,
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "reclaimed_bytes": max(0, bytes_before - bytes_after),
+        "duration_s": round(time.perf_counter() - started, 3),
+    }
+
+
+async def run_compaction_loop(interval_s: float = CHECKPOINT_COMPACTION_INTERVAL_S):
+    """Background task started by the app lifespan."""
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            report = await compact_checkpoints()
+            print(f"Checkpoint compaction: reclaimed {report['reclaimed_bytes']} bytes, deleted {report['deleted']}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Checkpoint compaction failed: {e}")
@@ -0,0 +1,168 @@
+import logging
+import random
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import zstandard as zstd
+except ImportError:
+    # Compression is optional: without zstandard the serializer only passes through.
+    zstd = None
+
+logger = logging.getLogger(__name__)
+
+# Type tag prefix for compressed payloads, e.g. "zstd+msgpack"
+ZSTD_PREFIX = "zstd+"
+DEFAULT_DICTIONARY_SIZE = 16 * 1024
+
+
+class CompactSerializer(SerializerProtocol):
+    """
+    Checkpoint serializer: MessagePack (via LangGraph's JsonPlusSerializer)
+    compressed with zstd, optionally using trained dictionaries.
+
+    Frames carry their dictionary id, so data written with an older dictionary
+    stays readable after a new one is trained. Payloads without the zstd
+    prefix (the previous format) are delegated to the inner serializer as-is.
+    """
+
+    def __init__(
+        self,
+        inner: Optional[SerializerProtocol] = None,
+        level: int = 3,
+        min_size: int = 64,
+    ):
+        self.inner = inner or JsonPlusSerializer()
+        self.level = level
+        self.min_size = min_size
+        self.dictionaries: Dict[int, Any] = {}
+        self.active_dict_id = 0
+        # zstd (de)compressors are not thread-safe, the sync saver API may call from threads
+        self._local = threading.local()
+        if zstd is None:
+            logger.warning("zstandard is not installed: checkpoints are stored uncompressed")
+
+    @property
+    def compression_enabled(self) -> bool:
+        return zstd is not None
+
+    def add_dictionary(self, data: bytes, activate: bool = True) -> int:
+        if zstd is None:
+            return 0
+        dictionary = zstd.ZstdCompressionDict(data)
+        dict_id = dictionary.dict_id()
+        self.dictionaries[dict_id] = dictionary
+        if activate and dict_id >= self.active_dict_id:
+            self.active_dict_id = dict_id
+        self._local = threading.local()
+        return dict_id
+
+    def _compressor(self):
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            dictionary = self.dictionaries.get(self.active_dict_id)
+            compressor = zstd.ZstdCompressor(level=self.level, dict_data=dictionary, write_dict_id=True)
+            self._local.compressor = compressor
+        return compressor
+
+    def _decompressor(self, dict_id: int):
+        cache = getattr(self._local, "decompressors", None)
+        if cache is None:
+            cache = self._local.decompressors = {}
+        decompressor = cache.get(dict_id)
+        if decompressor is None:
+            dictionary = self.dictionaries.get(dict_id) if dict_id else None
+            if dict_id and dictionary is None:
+                raise ValueError(f"Unknown zstd dictionary {dict_id}")
+            decompressor = zstd.ZstdDecompressor(dict_data=dictionary)
+            cache[dict_id] = decompressor
+        return decompressor
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor().compress(data)
+
+    def decompress(self, frame: bytes) -> bytes:
+        dict_id = zstd.get_frame_parameters(frame).dict_id
+        return self._decompressor(dict_id).decompress(frame)
+
+    def pack(self, type_: str, data: bytes) -> tuple[str, bytes]:
+        """Compresses a payload already serialized by the inner serializer."""
+        if zstd is None or len(data) < self.min_size:
+            return type_, data
+        return ZSTD_PREFIX + type_, self.compress(data)
+
+    def unpack(self, type_: str, data: bytes) -> tuple[str, bytes]:
+        """Inverse of `pack`: returns the inner (type, bytes)."""
+        if type_.startswith(ZSTD_PREFIX):
+            if zstd is None:
+                raise ImportError("zstandard is required to read compressed checkpoints")
+            return type_[len(ZSTD_PREFIX):], self.decompress(data)
+        return type_, data
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        return self.pack(*self.inner.dumps_typed(obj))
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        return self.inner.loads_typed(self.unpack(*data))
+
+
+def sample_message_payloads(serde: Optional[SerializerProtocol] = None, count: int = 400, seed: int = 0) -> List[bytes]:
+    """
+    Synthetic serialized messages covering the shapes our nodes produce
+    (user input, agent replies with and without tool calls, tool results,
+    injected system context). Used to bootstrap the first dictionary.
+    """
+    serde = serde or JsonPlusSerializer()
+    rnd = random.Random(seed)
+    words = (
+        "the agent tool result context flow node input output user answer question data "
+        "please summarize file content json error value list item step plan search query"
+    ).split()
+
+    def text(low: int, high: int) -> str:
+        return " ".join(rnd.choice(words) for _ in range(rnd.randint(low, high)))
+
+    samples = []
+    for i in range(count):
+        kind = i % 5
+        if kind == 0:
+            message = HumanMessage(content=text(3, 40), id=f"human-{i}-{rnd.random()}")
+        elif kind == 1:
+            message = AIMessage(
+                content=text(10, 120),
+                id=f"run-{rnd.getrandbits(64):x}",
+                name=f"agent_{rnd.randint(1, 9)}",
+                response_metadata={"model_name": "model", "finish_reason": "stop"},
+                usage_metadata={"input_tokens": rnd.randint(10, 2000), "output_tokens": rnd.randint(1, 500), "total_tokens": rnd.randint(10, 2500)},
+            )
+        elif kind == 2:
+            message = AIMessage(
+                content="",
+                id=f"run-{rnd.getrandbits(64):x}",
+                name=f"agent_{rnd.randint(1, 9)}",
+                tool_calls=[{"name": rnd.choice(["read_local_file", "write_local_file", "search"]), "args": {"query": text(1, 8)}, "id": f"call_{rnd.getrandbits(48):x}"}],
+            )
+        elif kind == 3:
+            message = ToolMessage(content=text(5, 150), tool_call_id=f"call_{rnd.getrandbits(48):x}", name="read_local_file", id=f"tool-{i}")
+        else:
+            message = SystemMessage(content=f"Background Context:\n{text(10, 80)}", id=f"system-{i}")
+        samples.append(serde.dumps_typed(message)[1])
+    return samples
+
+
+def train_dictionary(samples: Iterable[bytes], dict_id: int, size: int = DEFAULT_DICTIONARY_SIZE) -> Optional[bytes]:
+    """Trains a zstd dictionary; returns None if zstandard is missing or there are too few samples."""
+    if zstd is None:
+        return None
+    samples = [s for s in samples if s]
+    if len(samples) < 32:
+        return None
+    try:
+        return zstd.train_dictionary(size, samples, dict_id=dict_id).as_bytes()
+    except zstd.ZstdError as e:
+        print(f"zstd dictionary training failed: {e}")
+        return None
@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import dspy
+
+from app.engine.program_store import ProgramStore, program_store, signature_hash
+
+# Maximum number of built DSPy modules kept warm.
+SMART_NODE_CACHE_SIZE = int(os.environ.get("AGENTIC_SMART_NODE_CACHE_SIZE", "128"))
+
+
+def signature_key(
+    node_id: str,
+    mode: str,
+    goal: str,
+    inputs: List[Dict[str, Any]],
+    outputs: List[Dict[str, Any]],
+    batch_field: Optional[str] = None,
+) -> str:
+    """Canonical definition of a node's signature and module type."""
+    return json.dumps(
+        {"node": node_id, "mode": mode, "goal": goal, "inputs": inputs, "outputs": outputs, "batch": batch_field},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+
+
+class SmartNodeModuleCache:
+    """
+    Built DSPy modules (signature + Predict/ChainOfThought + compiled demos)
+    keyed by signature definition and compiled program version, so a
+    SmartNode call only pays for the LM request.
+
+    Programs come from the program store, looked up by signature hash: a node
+    whose signature changed finds no program instead of an incompatible one.
+    Re-optimizing (or rolling back) activates another version, which changes
+    the key: the next call builds a fresh module and the old entry ages out.
+    Modules keep no per-call state, so concurrent runs can share one.
+    """
+
+    def __init__(self, max_entries: int = SMART_NODE_CACHE_SIZE, store: ProgramStore = program_store):
+        self._max_entries = max_entries
+        self.store = store
+        self._entries: "OrderedDict[Tuple[str, str, Optional[int]], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self,
+        node_id: str,
+        mode: str,
+        goal: str,
+        inputs: List[Dict[str, Any]],
+        outputs: List[Dict[str, Any]],
+        batch_field: Optional[str] = None,
+    ):
+        sig_hash = signature_hash(mode, goal, inputs, outputs)
+        # Compiled demos are single-item examples: batched modules run without them
+        version = self.store.current_version(sig_hash) if batch_field is None else None
+        key = (signature_key(node_id, mode, goal, inputs, outputs, batch_field), sig_hash, version)
+        with self._lock:
+            module = self._entries.get(key)
+            if module is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return module
+
+        module = build_module(node_id, mode, goal, inputs, outputs, batch_field)
+        if version is not None:
+            try:
+                module.load_state(self.store.load(sig_hash, version)["program"])
+            except Exception as e:
+                print(f"Failed to load compiled program {sig_hash} v{version} for {node_id}: {e}")
+
+        with self._lock:
+            self.misses += 1
+            module = self._entries.setdefault(key, module)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return module
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def build_module(
+    node_id: str,
+    mode: str,
+    goal: str,
+    inputs: List[Dict[str, Any]],
+    outputs: List[Dict[str, Any]],
+    batch_field: Optional[str] = None,
+):
+    """
+    Uncompiled Predict / ChainOfThought module for a node's dynamic signature.
+    With `batch_field`, that input takes a list of items and every output is
+    a list with one value per item (map mode's request batching).
+    """
+    # dspy.make_signature(signature_name, instructions, input_fields, output_fields)
+    # input_fields/output_fields are dicts or tuples
+    signature_fields = {}
+    for i in inputs:
+        if i["name"] == batch_field:
+            signature_fields[i["name"]] = (list, dspy.InputField(desc=f"{i.get('desc', '')} (a list: one item per element)"))
+        else:
+            signature_fields[i["name"]] = dspy.InputField(desc=i.get("desc", ""))
+    for o in outputs:
+        if batch_field:
+            signature_fields[o["name"]] = (list, dspy.OutputField(desc=f"{o.get('desc', '')} (a list: one value per item of {batch_field}, in order)"))
+        else:
+            signature_fields[o["name"]] = dspy.OutputField(desc=o.get("desc", ""))
+
+    if batch_field:
+        goal = f"{goal}\nProcess each item of `{batch_field}` on its own and answer for every item, in the same order."
+    DynamicSignature = dspy.make_signature(
+        signature_fields,
+        instructions=goal,
+        signature_name=f"Node_{node_id}"
+    )
+
+    if mode == "Predict":
+        return dspy.Predict(DynamicSignature)
+    return dspy.ChainOfThought(DynamicSignature)
+
+
+# Process-wide cache shared by every SmartNode instance.
+smart_node_modules = SmartNodeModuleCache()
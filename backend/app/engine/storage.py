@@ -1,3 +1,25 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import aiosqlite
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_metadata,
+)
+
 try:
     from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 except ImportError:
@@ -7,11 +29,474 @@ except ImportError:
     except ImportError:
          raise ImportError("Could not import AsyncSqliteSaver. Please ensure langgraph-checkpoint-sqlite is installed.")
 
-# Singleton or factory for checkpointer
-# We use a separate DB file for checkpoints to avoid locking issues with main DB, 
-# or we can use the same matching the setup. Start with separate to be safe/simple.
-CHECKPOINT_DB = "checkpoints.sqlite"
+from app.database import BASE_DIR
+from app.engine.serde import CompactSerializer, sample_message_payloads, train_dictionary
+
+logger = logging.getLogger(__name__)
+
+# We use a separate DB file for checkpoints to avoid locking issues with the main DB.
+# The path is absolute (relative to the backend dir) so it no longer depends on the CWD.
+CHECKPOINT_DB = os.environ.get("AGENTIC_CHECKPOINT_DB", os.path.join(BASE_DIR, "checkpoints.sqlite"))
+
+# SQLite tuning. WAL lets readers proceed while a run writes; synchronous=NORMAL is
+# durable across application crashes in WAL mode and avoids an fsync per commit.
+CHECKPOINT_SYNCHRONOUS = os.environ.get("AGENTIC_CHECKPOINT_SYNCHRONOUS", "NORMAL")
+CHECKPOINT_BUSY_TIMEOUT_MS = int(os.environ.get("AGENTIC_CHECKPOINT_BUSY_TIMEOUT_MS", "5000"))
+# How long the first writer of a group waits for others before committing.
+# 0 still groups every write that queued up while the previous commit was running.
+CHECKPOINT_COMMIT_INTERVAL_MS = float(os.environ.get("AGENTIC_CHECKPOINT_COMMIT_INTERVAL_MS", "0"))
+# Checkpoint serializer: "compact" (zstd-compressed msgpack) or "default" (LangGraph's msgpack)
+CHECKPOINT_SERDE = os.environ.get("AGENTIC_CHECKPOINT_SERDE", "compact")
+# Store each message once and reference it from every checkpoint that contains it
+CHECKPOINT_DEDUP = os.environ.get("AGENTIC_CHECKPOINT_DEDUP", "1").lower() not in ("0", "false", "no")
+
+# Placeholder stored in channel values instead of a deduplicated message
+BLOB_REF_KEY = "__blob_ref__"
+_BLOB_CACHE_SIZE = 10_000
+
+_EXTRA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+    hash TEXT PRIMARY KEY,
+    type TEXT,
+    data BLOB
+);
+CREATE TABLE IF NOT EXISTS checkpoint_blob_refs (
+    thread_id TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (thread_id, hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_checkpoint_blob_refs_hash ON checkpoint_blob_refs (hash);
+CREATE TABLE IF NOT EXISTS checkpoint_serde_dictionaries (
+    dict_id INTEGER PRIMARY KEY,
+    data BLOB NOT NULL,
+    created_at REAL
+);
+"""
+
+
+def make_checkpoint_serde(kind: str = CHECKPOINT_SERDE) -> Optional[SerializerProtocol]:
+    if kind == "compact":
+        return CompactSerializer()
+    if kind in ("default", "", None):
+        return None
+    raise ValueError(f"Unknown checkpoint serializer '{kind}'")
+
+
+def _is_blob_ref(item: Any) -> bool:
+    return isinstance(item, dict) and len(item) == 1 and BLOB_REF_KEY in item
+
+
+class _LRU(OrderedDict):
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+
+    def get_fresh(self, key):
+        value = self.get(key)
+        if value is not None:
+            self.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        while len(self) > self.max_size:
+            self.popitem(last=False)
+
+
+class PooledSqliteSaver(AsyncSqliteSaver):
+    """
+    AsyncSqliteSaver that is shared by every run of the process.
+
+    All runs go through one long-lived connection (SQLite only has one writer
+    anyway) and commits are grouped: each `aput`/`aput_writes` executes its
+    statement, then waits for the next group commit instead of committing on
+    its own. Callers still only return once their write is committed.
+
+    With `dedup`, messages in list channels (e.g. `messages`) are stored once
+    in `checkpoint_blobs` and checkpoints only keep references to them, so
+    consecutive checkpoints of a growing conversation no longer copy the
+    whole history. Note: messages are assumed immutable once checkpointed.
+    """
+
+    def __init__(
+        self,
+        conn: aiosqlite.Connection,
+        *,
+        serde: Optional[SerializerProtocol] = None,
+        commit_interval: float = CHECKPOINT_COMMIT_INTERVAL_MS / 1000,
+        dedup: bool = CHECKPOINT_DEDUP,
+    ):
+        super().__init__(conn, serde=serde)
+        self.commit_interval = commit_interval
+        self.dedup = dedup
+        # hashes / (thread_id, hash) refs known to be in the DB (cleared by blob GC)
+        self._known_blobs = _LRU(_BLOB_CACHE_SIZE * 10)
+        self._known_refs = _LRU(_BLOB_CACHE_SIZE * 10)
+        # id(message) -> (message, hash, type, data): avoids re-serializing unchanged messages
+        self._message_blobs = _LRU(_BLOB_CACHE_SIZE)
+        # hash -> (type, data) for reads
+        self._blob_cache = _LRU(_BLOB_CACHE_SIZE)
+        self._pending: List[asyncio.Future] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # Counters, exposed for benchmarks and admin stats
+        self.commits = 0
+        self.committed_writes = 0
+
+    async def setup(self) -> None:
+        if self.is_setup:
+            return
+        await super().setup()
+        async with self.lock:
+            async with self.conn.executescript(_EXTRA_SCHEMA):
+                pass
+            await self.conn.commit()
+            if isinstance(self.serde, CompactSerializer):
+                await self._load_dictionaries()
+
+    async def _load_dictionaries(self):
+        async with self.conn.execute("SELECT dict_id, data FROM checkpoint_serde_dictionaries ORDER BY dict_id") as cur:
+            rows = await cur.fetchall()
+        for _, data in rows:
+            self.serde.add_dictionary(data)
+        if not rows and self.serde.compression_enabled:
+            # Bootstrap from synthetic message shapes; `retrain_dictionary` can
+            # later replace it with one trained on real checkpoints.
+            data = train_dictionary(sample_message_payloads(self.serde.inner), dict_id=1)
+            if data:
+                await self._store_dictionary(1, data)
+
+    async def _store_dictionary(self, dict_id: int, data: bytes):
+        await self.conn.execute(
+            "INSERT OR REPLACE INTO checkpoint_serde_dictionaries (dict_id, data, created_at) VALUES (?, ?, ?)",
+            (dict_id, data, time.time()),
+        )
+        await self.conn.commit()
+        self.serde.add_dictionary(data)
 
-async def get_graph_checkpointer():
-    # Return a new context manager for each request
-    return AsyncSqliteSaver.from_conn_string(CHECKPOINT_DB)
+    async def retrain_dictionary(self, max_samples: int = 2000) -> Optional[int]:
+        """Trains a new zstd dictionary from stored messages; older frames stay readable."""
+        if not isinstance(self.serde, CompactSerializer):
+            return None
+        await self.setup()
+        async with self.lock:
+            async with self.conn.execute(
+                "SELECT type, data FROM checkpoint_blobs ORDER BY RANDOM() LIMIT ?", (max_samples,)
+            ) as cur:
+                rows = await cur.fetchall()
+            samples = [self.serde.unpack(type_, data)[1] for type_, data in rows]
+            new_id = max(self.serde.dictionaries or {0: None}) + 1
+            data = train_dictionary(samples, dict_id=new_id)
+            if not data:
+                return None
+            await self._store_dictionary(new_id, data)
+            return new_id
+
+    def _message_blob(self, message: BaseMessage) -> Tuple[str, str, bytes]:
+        cached = self._message_blobs.get_fresh(id(message))
+        if cached is not None and cached[0] is message:
+            return cached[1], cached[2], cached[3]
+        inner = getattr(self.serde, "inner", self.serde)
+        raw_type, raw = inner.dumps_typed(message)
+        digest = hashlib.blake2b(raw_type.encode() + b"\0" + raw, digest_size=16).hexdigest()
+        if isinstance(self.serde, CompactSerializer):
+            type_, data = self.serde.pack(raw_type, raw)
+        else:
+            type_, data = raw_type, raw
+        # Keep a strong reference so id(message) cannot be reused while cached
+        self._message_blobs.put(id(message), (message, digest, type_, data))
+        return digest, type_, data
+
+    def _dedup_checkpoint(self, checkpoint: Checkpoint):
+        """Returns (checkpoint with message refs, new blobs, referenced hashes)."""
+        channel_values = checkpoint.get("channel_values") or {}
+        new_values = None
+        blobs: Dict[str, Tuple[str, bytes]] = {}
+        hashes: List[str] = []
+        for channel, value in channel_values.items():
+            if not isinstance(value, list) or not any(isinstance(item, BaseMessage) for item in value):
+                continue
+            refs = []
+            for item in value:
+                if isinstance(item, BaseMessage):
+                    digest, type_, data = self._message_blob(item)
+                    if digest not in self._known_blobs:
+                        blobs[digest] = (type_, data)
+                    hashes.append(digest)
+                    refs.append({BLOB_REF_KEY: digest})
+                else:
+                    refs.append(item)
+            if new_values is None:
+                new_values = dict(channel_values)
+            new_values[channel] = refs
+        if new_values is None:
+            return checkpoint, {}, []
+        return {**checkpoint, "channel_values": new_values}, blobs, hashes
+
+    async def _fetch_blobs(self, hashes: Iterable[str]) -> Dict[str, Tuple[str, bytes]]:
+        found = {}
+        missing = []
+        for digest in hashes:
+            cached = self._blob_cache.get_fresh(digest)
+            if cached is not None:
+                found[digest] = cached
+            else:
+                missing.append(digest)
+        # Blobs are immutable, so no saver lock is needed (alist holds it while yielding)
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            async with self.conn.execute(
+                f"SELECT hash, type, data FROM checkpoint_blobs WHERE hash IN ({placeholders})", chunk
+            ) as cur:
+                async for digest, type_, data in cur:
+                    found[digest] = (type_, data)
+                    self._blob_cache.put(digest, (type_, data))
+        return found
+
+    async def _resolve_refs(self, checkpoint_tuple: Optional[CheckpointTuple]) -> Optional[CheckpointTuple]:
+        if checkpoint_tuple is None:
+            return None
+        channel_values = checkpoint_tuple.checkpoint.get("channel_values") or {}
+        wanted = {
+            item[BLOB_REF_KEY]
+            for value in channel_values.values() if isinstance(value, list)
+            for item in value if _is_blob_ref(item)
+        }
+        if not wanted:
+            return checkpoint_tuple
+        blobs = await self._fetch_blobs(wanted)
+        if len(blobs) != len(wanted):
+            raise ValueError(f"Missing message blobs for checkpoint {checkpoint_tuple.checkpoint.get('id')}")
+        new_values = dict(channel_values)
+        for channel, value in channel_values.items():
+            if isinstance(value, list) and any(_is_blob_ref(item) for item in value):
+                new_values[channel] = [
+                    self.serde.loads_typed(blobs[item[BLOB_REF_KEY]]) if _is_blob_ref(item) else item
+                    for item in value
+                ]
+        return checkpoint_tuple._replace(checkpoint={**checkpoint_tuple.checkpoint, "channel_values": new_values})
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self._resolve_refs(await super().aget_tuple(config))
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        async for checkpoint_tuple in super().alist(config, filter=filter, before=before, limit=limit):
+            yield await self._resolve_refs(checkpoint_tuple)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await super().adelete_thread(thread_id)
+        # Unreferenced blobs are garbage collected by the compaction task
+        async with self.lock:
+            async with self.conn.execute("DELETE FROM checkpoint_blob_refs WHERE thread_id = ?", (str(thread_id),)):
+                pass
+            await self.conn.commit()
+            self.forget_known_blobs()
+
+    def forget_known_blobs(self):
+        """Called after refs/blobs are deleted so the next writes re-insert them."""
+        self._known_blobs.clear()
+        self._known_refs.clear()
+
+    async def _group_commit(self):
+        # Registering the waiter must happen before any await so that the write
+        # we just executed is guaranteed to be part of the flushed group.
+        waiter = self.loop.create_future()
+        self._pending.append(waiter)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+        # A cancelled run must not cancel the commit other runs are waiting for.
+        await asyncio.shield(waiter)
+
+    async def _flush(self):
+        if self.commit_interval > 0:
+            await asyncio.sleep(self.commit_interval)
+        else:
+            await asyncio.sleep(0)
+        async with self.lock:
+            waiters, self._pending = self._pending, []
+            self._flush_task = None
+            try:
+                await self.conn.commit()
+            except Exception as e:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                return
+        self.commits += 1
+        self.committed_writes += len(waiters)
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        await self.setup()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        checkpoint_id = checkpoint["id"]
+        blobs, hashes = {}, []
+        if self.dedup:
+            checkpoint, blobs, hashes = self._dedup_checkpoint(checkpoint)
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        serialized_metadata = json.dumps(
+            get_checkpoint_metadata(config, metadata), ensure_ascii=False
+        ).encode("utf-8", "ignore")
+        async with self.lock:
+            if blobs:
+                async with self.conn.executemany(
+                    "INSERT OR IGNORE INTO checkpoint_blobs (hash, type, data) VALUES (?, ?, ?)",
+                    [(digest, blob_type, data) for digest, (blob_type, data) in blobs.items()],
+                ):
+                    pass
+            # Blobs are referenced per thread: messages are append-only within a
+            # thread, so this keeps one ref row per message instead of per checkpoint.
+            new_refs = {(str(thread_id), digest) for digest in hashes if (str(thread_id), digest) not in self._known_refs}
+            if new_refs:
+                async with self.conn.executemany(
+                    "INSERT OR IGNORE INTO checkpoint_blob_refs (thread_id, hash) VALUES (?, ?)",
+                    list(new_refs),
+                ):
+                    pass
+            for digest in blobs:
+                self._known_blobs.put(digest, True)
+            for ref in new_refs:
+                self._known_refs.put(ref, True)
+            async with self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(thread_id),
+                    checkpoint_ns,
+                    checkpoint_id,
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    serialized_checkpoint,
+                    serialized_metadata,
+                ),
+            ):
+                pass
+        await self._group_commit()
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        query = (
+            "INSERT OR REPLACE INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            if all(w[0] in WRITES_IDX_MAP for w in writes)
+            else "INSERT OR IGNORE INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+        )
+        await self.setup()
+        async with self.lock, self.conn.cursor() as cur:
+            await cur.executemany(
+                query,
+                [
+                    (
+                        str(config["configurable"]["thread_id"]),
+                        str(config["configurable"]["checkpoint_ns"]),
+                        str(config["configurable"]["checkpoint_id"]),
+                        task_id,
+                        WRITES_IDX_MAP.get(channel, idx),
+                        channel,
+                        *self.serde.dumps_typed(value),
+                    )
+                    for idx, (channel, value) in enumerate(writes)
+                ],
+            )
+        await self._group_commit()
+
+
+async def open_checkpointer(
+    path: str = CHECKPOINT_DB,
+    synchronous: str = CHECKPOINT_SYNCHRONOUS,
+    busy_timeout_ms: int = CHECKPOINT_BUSY_TIMEOUT_MS,
+    **saver_kwargs,
+) -> PooledSqliteSaver:
+    """Opens a tuned connection and returns a ready-to-use shared saver."""
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = await aiosqlite.connect(path)
+    # Only effective for new databases; existing ones are converted by the first compaction
+    await conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    await conn.execute("PRAGMA journal_mode=WAL")
+    await conn.execute(f"PRAGMA synchronous={synchronous}")
+    await conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+    await conn.execute("PRAGMA temp_store=MEMORY")
+    if "serde" not in saver_kwargs:
+        saver_kwargs["serde"] = make_checkpoint_serde()
+    saver = PooledSqliteSaver(conn, **saver_kwargs)
+    await saver.setup()
+    return saver
+
+
+async def close_checkpointer(saver: PooledSqliteSaver):
+    # Let any in-flight group commit finish before closing the connection
+    if saver._flush_task is not None:
+        try:
+            await saver._flush_task
+        except Exception:
+            pass
+    await saver.conn.close()
+
+
+# Process-wide checkpointer, opened in the app lifespan
+_CHECKPOINTER: Optional[PooledSqliteSaver] = None
+
+async def init_graph_checkpointer(path: str = CHECKPOINT_DB) -> PooledSqliteSaver:
+    global _CHECKPOINTER
+    if _CHECKPOINTER is None:
+        _CHECKPOINTER = await open_checkpointer(path)
+    return _CHECKPOINTER
+
+async def shutdown_graph_checkpointer():
+    global _CHECKPOINTER
+    if _CHECKPOINTER is not None:
+        saver, _CHECKPOINTER = _CHECKPOINTER, None
+        await close_checkpointer(saver)
+
+async def get_graph_checkpointer() -> PooledSqliteSaver:
+    """
+    Returns the shared checkpointer. It is normally created by the app lifespan;
+    if the lifespan did not run (or ran on another event loop, as in some test
+    clients) a new one is opened lazily for the current loop.
+    """
+    global _CHECKPOINTER
+    if _CHECKPOINTER is not None and _CHECKPOINTER.loop is not asyncio.get_running_loop():
+        saver, _CHECKPOINTER = _CHECKPOINTER, None
+        await _close_abandoned(saver)
+    return await init_graph_checkpointer()
+
+async def _close_abandoned(saver: PooledSqliteSaver):
+    """
+    Closes a checkpointer left behind by another event loop. Its group-commit
+    task belongs to that loop and cannot be awaited here, so the writes it
+    was batching are committed directly before the connection is closed.
+    """
+    logger.warning("Checkpointer was opened on another event loop; committing and closing it")
+    try:
+        await saver.conn.commit()
+        await saver.conn.close()
+    except Exception as e:
+        logger.warning("Could not close the abandoned checkpointer: %s", e)
@@ -0,0 +1,411 @@
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from app.database import BASE_DIR
+from app.engine.embeddings import get_embedder, normalize
+
+# Root of the RAG collections: one directory per collection with its
+# embedding matrix (float32, memory-mapped), chunk table and IVF index
+VECTOR_STORE_DIR = os.environ.get("AGENTIC_VECTOR_STORE_DIR", os.path.join(BASE_DIR, "resources", "collections"))
+# Embedder of new collections: `hashing[:dimension]` (offline) or `litellm:<model>`
+RAG_EMBEDDER = os.environ.get("AGENTIC_RAG_EMBEDDER", "hashing:384")
+# Chunks a RAG node retrieves when its config sets no `top_k`
+RAG_TOP_K = int(os.environ.get("AGENTIC_RAG_TOP_K", "4"))
+# Collections up to this many chunks are searched exactly, larger ones through an IVF index
+RAG_EXACT_SEARCH_MAX = int(os.environ.get("AGENTIC_RAG_EXACT_SEARCH_MAX", "20000"))
+# IVF lists scanned per query: more is closer to the exact result, and slower
+RAG_IVF_NPROBE = int(os.environ.get("AGENTIC_RAG_IVF_NPROBE", "8"))
+
+COLLECTION_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+CONFIG_FILE = "collection.json"
+VECTORS_FILE = "vectors.f32"
+CHUNKS_DB = "chunks.sqlite"
+INDEX_FILE = "ivf.npz"
+# Rows multiplied at once by the exact scan, bounds its memory use
+SCAN_BLOCK_ROWS = 65536
+# The IVF index is rebuilt once rows appended after it exceed this share of it
+INDEX_STALE_FRACTION = 0.2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    row INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source);
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    chunks INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+
+class IVFIndex(NamedTuple):
+    centroids: np.ndarray  # (lists, dimension), unit rows
+    order: np.ndarray      # matrix rows grouped by list
+    offsets: np.ndarray    # list i is order[offsets[i]:offsets[i + 1]]
+    rows: int              # rows covered; later ones are scanned exactly
+
+
+class _View(NamedTuple):
+    vectors: np.ndarray
+    live: np.ndarray
+    index: Optional[IVFIndex]
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def kmeans(vectors: np.ndarray, lists: int, iterations: int = 8, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of the rows: unit centroids, cosine assignment."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), lists * 32)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+    centroids = sample[rng.choice(sample_size, lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        # Lists left empty keep their previous centroid
+        empty = np.bincount(assignment, minlength=lists) == 0
+        sums[empty] = centroids[empty]
+        centroids = normalize(sums)
+    return centroids
+
+
+def build_ivf(vectors: np.ndarray) -> IVFIndex:
+    lists = max(1, int(np.sqrt(len(vectors))))
+    centroids = kmeans(vectors, lists)
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+        assignment[start:start + SCAN_BLOCK_ROWS] = np.argmax(vectors[start:start + SCAN_BLOCK_ROWS] @ centroids.T, axis=1)
+    order = np.argsort(assignment, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=lists))])
+    return IVFIndex(centroids, order, offsets, len(vectors))
+
+
+class VectorCollection:
+    """
+    A RAG collection on disk:
+
+        collection.json   name, embedder spec and dimension
+        vectors.f32       embedding matrix, float32 unit rows, append-only
+        chunks.sqlite     one row per matrix row: source, text, metadata,
+                          deleted flag (tombstone)
+        ivf.npz           IVF index, once the collection outgrows exact search
+
+    The matrix is memory-mapped, so a collection's size is bounded by disk
+    rather than RAM. Small collections are scanned exactly with NumPy; past
+    `exact_search_max` rows queries only score the `nprobe` nearest IVF lists
+    plus rows appended since the index was built.
+
+    Writers append vectors then commit their rows in one SQLite write
+    transaction, which serializes them across processes; vectors beyond the
+    last committed row (a crashed write) are overwritten by the next one.
+    Searches check SQLite's data_version and remap when anything changed.
+    """
+
+    def __init__(self, path: str, exact_search_max: int = RAG_EXACT_SEARCH_MAX, nprobe: int = RAG_IVF_NPROBE):
+        self.path = path
+        with open(os.path.join(path, CONFIG_FILE), "rb") as f:
+            self.config = json.loads(f.read())
+        self.name = self.config["name"]
+        self.dimension = self.config["dimension"]
+        self.embedder = get_embedder(self.config["embedder"])
+        self.exact_search_max = exact_search_max
+        self.nprobe = nprobe
+
+        self._db = sqlite3.connect(os.path.join(path, CHUNKS_DB), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._view: Optional[_View] = None
+        self._data_version = None
+
+    def add(
+        self,
+        texts: Sequence[str],
+        source: str = "",
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        vectors: Optional[np.ndarray] = None,
+    ) -> List[int]:
+        """Appends chunks (embedded here unless `vectors` are given) and returns their rows."""
+        return self._write(source, texts, metadatas, vectors)
+
+    def write_source(
+        self,
+        source: str,
+        content_hash: str,
+        texts: Sequence[str],
+        vectors: Optional[np.ndarray] = None,
+        stale_rows: Sequence[int] = (),
+    ) -> List[int]:
+        """
+        Applies one (re-)ingested document in a single transaction: its new
+        chunks are appended, `stale_rows` tombstoned and its content hash
+        recorded, so an interrupted ingestion never leaves half a document.
+        """
+        return self._write(source, texts, None, vectors, stale_rows, content_hash)
+
+    def _write(self, source, texts, metadatas, vectors, stale_rows=(), content_hash=None) -> List[int]:
+        if not texts and not stale_rows and content_hash is None:
+            return []
+        if not texts:
+            vectors = np.zeros((0, self.dimension), dtype=np.float32)
+        elif vectors is None:
+            vectors = self.embedder.embed(texts)
+        vectors = normalize(np.ascontiguousarray(vectors, dtype=np.float32))
+        if vectors.shape != (len(texts), self.dimension):
+            raise ValueError(f"Expected {len(texts)} vectors of dimension {self.dimension}, got {vectors.shape}")
+        metadatas = metadatas or [{}] * len(texts)
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                start = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM chunks").fetchone()[0]
+                if texts:
+                    with open(os.path.join(self.path, VECTORS_FILE), "r+b") as f:
+                        f.seek(start * self.dimension * 4)
+                        f.write(vectors.tobytes())
+                        f.truncate()
+                        f.flush()
+                        os.fsync(f.fileno())
+                rows = list(range(start, start + len(texts)))
+                self._db.executemany(
+                    "INSERT INTO chunks (row, source, hash, text, metadata) VALUES (?, ?, ?, ?, ?)",
+                    [(row, source, text_hash(text), text, json.dumps(meta)) for row, text, meta in zip(rows, texts, metadatas)],
+                )
+                self._db.executemany("UPDATE chunks SET deleted = 1 WHERE row = ?", [(row,) for row in stale_rows])
+                if content_hash is not None:
+                    self._db.execute(
+                        "INSERT INTO sources (source, hash, chunks, updated_at) "
+                        "VALUES (?, ?, (SELECT COUNT(*) FROM chunks WHERE source = ? AND deleted = 0), ?) "
+                        "ON CONFLICT (source) DO UPDATE SET hash = excluded.hash, chunks = excluded.chunks, updated_at = excluded.updated_at",
+                        (source, content_hash, source, datetime.utcnow().isoformat()),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._view = None
+
+            if texts:
+                view = self._refresh()
+                index = view.index
+                if len(view.vectors) > self.exact_search_max and (
+                    index is None or len(view.vectors) - index.rows > INDEX_STALE_FRACTION * index.rows
+                ):
+                    self.build_index()
+        return rows
+
+    def sources(self) -> Dict[str, str]:
+        """Content hash of every ingested document, by source."""
+        with self._lock:
+            return dict(self._db.execute("SELECT source, hash FROM sources"))
+
+    def source_chunks(self, source: str) -> Dict[str, int]:
+        """Live chunks of a document: text hash -> row."""
+        with self._lock:
+            return dict(self._db.execute("SELECT hash, row FROM chunks WHERE source = ? AND deleted = 0", (source,)))
+
+    def remove_source(self, source: str) -> int:
+        """Tombstones every chunk of a deleted document and forgets it; returns the chunks removed."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                removed = self._db.execute("UPDATE chunks SET deleted = 1 WHERE source = ? AND deleted = 0", (source,)).rowcount
+                self._db.execute("DELETE FROM sources WHERE source = ?", (source,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._view = None
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        view = self._refresh()
+        with self._lock:
+            sources = self._db.execute("SELECT COUNT(*) FROM sources").fetchone()[0]
+        return {
+            "name": self.name,
+            "embedder": self.embedder.spec,
+            "dimension": self.dimension,
+            "chunks": int(view.live.sum()),
+            "tombstoned": int(len(view.live) - view.live.sum()),
+            "sources": sources,
+            "indexed_rows": view.index.rows if view.index is not None else 0,
+        }
+
+    def delete(self, rows: Sequence[int]):
+        """Tombstones chunks: they are no longer returned, their vectors stay in place."""
+        with self._lock:
+            self._db.executemany("UPDATE chunks SET deleted = 1 WHERE row = ?", [(row,) for row in rows])
+            self._view = None
+
+    def build_index(self):
+        """(Re)builds the IVF index over every current row."""
+        with self._lock:
+            vectors = self._refresh().vectors
+            if not len(vectors):
+                return
+            index = build_ivf(vectors)
+            buffer = io.BytesIO()
+            np.savez(buffer, centroids=index.centroids, order=index.order, offsets=index.offsets, rows=index.rows)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(buffer.getvalue())
+            os.replace(tmp_path, os.path.join(self.path, INDEX_FILE))
+            self._view = None
+
+    def __len__(self) -> int:
+        return int(self._refresh().live.sum())
+
+    def search(self, query: str, top_k: int = RAG_TOP_K) -> List[Dict[str, Any]]:
+        """The `top_k` live chunks most similar to the query, best first."""
+        vector = self.embedder.embed([query])[0]
+        return self.search_vector(vector, top_k)
+
+    def search_vector(self, vector: np.ndarray, top_k: int = RAG_TOP_K) -> List[Dict[str, Any]]:
+        view = self._refresh()
+        vector = np.asarray(vector, dtype=np.float32)
+        count = len(view.vectors)
+        if not count or top_k <= 0:
+            return []
+
+        if view.index is not None and count > self.exact_search_max:
+            index = view.index
+            nprobe = min(self.nprobe, len(index.centroids))
+            probed = np.argpartition(-(index.centroids @ vector), nprobe - 1)[:nprobe]
+            candidates = np.sort(np.concatenate(
+                [index.order[index.offsets[i]:index.offsets[i + 1]] for i in probed] + [np.arange(index.rows, count)]
+            ))
+            candidates = candidates[view.live[candidates]]
+            scores = view.vectors[candidates] @ vector
+        else:
+            candidates = np.flatnonzero(view.live)
+            scores = np.empty(count, dtype=np.float32)
+            for start in range(0, count, SCAN_BLOCK_ROWS):
+                scores[start:start + SCAN_BLOCK_ROWS] = view.vectors[start:start + SCAN_BLOCK_ROWS] @ vector
+            scores = scores[candidates]
+
+        k = min(top_k, len(candidates))
+        if not k:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return self._chunks([int(candidates[i]) for i in best], [float(scores[i]) for i in best])
+
+    def _chunks(self, rows: List[int], scores: List[float]) -> List[Dict[str, Any]]:
+        with self._lock:
+            found = {
+                row: (source, text, metadata)
+                for row, source, text, metadata in self._db.execute(
+                    f"SELECT row, source, text, metadata FROM chunks WHERE row IN ({','.join('?' * len(rows))})", rows
+                )
+            }
+        return [
+            {"row": row, "score": score, "source": found[row][0], "text": found[row][1], "metadata": json.loads(found[row][2])}
+            for row, score in zip(rows, scores)
+            if row in found
+        ]
+
+    def _refresh(self) -> _View:
+        """Current matrix, live mask and index, remapped only when the collection changed."""
+        with self._lock:
+            index_path = os.path.join(self.path, INDEX_FILE)
+            try:
+                index_mtime = os.stat(index_path).st_mtime_ns
+            except FileNotFoundError:
+                index_mtime = None
+            # Rebuilt indexes are picked up too, not just new or deleted rows
+            data_version = (self._db.execute("PRAGMA data_version").fetchone()[0], index_mtime)
+            if self._view is not None and data_version == self._data_version:
+                return self._view
+
+            count = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM chunks").fetchone()[0]
+            if count:
+                vectors = np.memmap(os.path.join(self.path, VECTORS_FILE), dtype=np.float32, mode="r", shape=(count, self.dimension))
+            else:
+                vectors = np.zeros((0, self.dimension), dtype=np.float32)
+            live = np.ones(count, dtype=bool)
+            deleted = [row for (row,) in self._db.execute("SELECT row FROM chunks WHERE deleted = 1")]
+            live[deleted] = False
+
+            index = None
+            if index_mtime is not None:
+                with np.load(index_path) as data:
+                    index = IVFIndex(data["centroids"], data["order"], data["offsets"], int(data["rows"]))
+                if index.rows > count:
+                    index = None
+
+            self._view = _View(vectors, live, index)
+            self._data_version = data_version
+            return self._view
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class VectorStore:
+    """The collections under `root`, opened once per process."""
+
+    def __init__(self, root: str = VECTOR_STORE_DIR):
+        self.root = os.path.abspath(root)
+        self._collections: Dict[str, VectorCollection] = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, name: str) -> str:
+        if not COLLECTION_NAME.match(name):
+            raise ValueError(f"Invalid collection name: {name!r}")
+        return os.path.join(self.root, name)
+
+    def names(self) -> List[str]:
+        try:
+            return sorted(name for name in os.listdir(self.root) if os.path.exists(os.path.join(self.root, name, CONFIG_FILE)))
+        except FileNotFoundError:
+            return []
+
+    def get(self, name: str) -> VectorCollection:
+        """The collection, KeyError if it was never created."""
+        directory = self._dir(name)
+        with self._lock:
+            if name not in self._collections:
+                if not os.path.exists(os.path.join(directory, CONFIG_FILE)):
+                    raise KeyError(f"Collection {name} not found")
+                self._collections[name] = VectorCollection(directory)
+            return self._collections[name]
+
+    def create(self, name: str, embedder: str = RAG_EMBEDDER) -> VectorCollection:
+        """Creates the collection (no-op if it exists, whatever its embedder) and returns it."""
+        directory = self._dir(name)
+        with self._lock:
+            if not os.path.exists(os.path.join(directory, CONFIG_FILE)):
+                model = get_embedder(embedder)
+                dimension = model.dimension or model.embed(["dimension probe"]).shape[1]
+                os.makedirs(directory, exist_ok=True)
+                open(os.path.join(directory, VECTORS_FILE), "ab").close()
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+                with os.fdopen(fd, "w") as f:
+                    json.dump({"name": name, "embedder": model.spec, "dimension": dimension}, f)
+                os.replace(tmp_path, os.path.join(directory, CONFIG_FILE))
+        return self.get(name)
+
+
+vector_store = VectorStore()
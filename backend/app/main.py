@@ -1,24 +1,65 @@
 import argparse
+import asyncio
 import uvicorn
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from sqlmodel import SQLModel
 
-from app.database import engine
+from app.database import async_engine, engine, migrate_schema, backfill_flow_summaries
+from app.engine.storage import init_graph_checkpointer, shutdown_graph_checkpointer
+from app.engine.retention import run_compaction_loop, CHECKPOINT_COMPACTION_INTERVAL_S
 from app.api import settings
 from app.api import run
 from app.api import tools
 from app.api import flows
 from app.api import smart_nodes
+from app.api import admin
+from app.api import runs
+from app.api import batches
+from app.api import collections
+from app.services.run_manager import run_manager
+from app.services.batch_runner import batch_runner
+from app.services.flow_search import ensure_search_index
+from app.services.profile_health import profile_prober
+from app.services.optimization_jobs import optimization_jobs
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Load all models so that SQLModel knows about them
     from app.models import settings as settings_model
     from app.models import flow as flow_model
+    from app.models import flow_version as flow_version_model
+    from app.models import run as run_model
+    from app.models import batch as batch_model
     SQLModel.metadata.create_all(engine)
+    migrate_schema(engine)
+    backfill_flow_summaries(engine)
+    ensure_search_index(engine)
+    # One long-lived checkpointer shared by all runs
+    await init_graph_checkpointer()
+    # Periodic checkpoint pruning + vacuum
+    compaction_task = None
+    if CHECKPOINT_COMPACTION_INTERVAL_S > 0:
+        compaction_task = asyncio.create_task(run_compaction_loop(CHECKPOINT_COMPACTION_INTERVAL_S))
+    # Workers for detached runs (resumes runs still queued from a previous process)
+    await run_manager.start()
+    # Dataset batches interrupted by a restart resume from their results file
+    await batch_runner.start()
+    # Background latency / health probes of the LLM profiles
+    await profile_prober.start()
     yield
+    # Terminates optimization processes still running
+    await optimization_jobs.stop()
+    await profile_prober.stop()
+    await batch_runner.stop()
+    await run_manager.stop()
+    if compaction_task:
+        compaction_task.cancel()
+        # A prune or VACUUM in progress must not run against a closing connection
+        await asyncio.gather(compaction_task, return_exceptions=True)
+    await shutdown_graph_checkpointer()
+    await async_engine.dispose()
 
 app = FastAPI(title="AgentArchitect API", lifespan=lifespan)
 
@@ -34,6 +75,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Conditional requests and flow list pagination
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 app.include_router(settings.router, prefix="/api", tags=["settings"])
@@ -41,6 +84,10 @@ app.include_router(run.router, prefix="/api", tags=["run"])
 app.include_router(tools.router, prefix="/api", tags=["tools"])
 app.include_router(flows.router, prefix="/api", tags=["flows"])
 app.include_router(smart_nodes.router, prefix="/api", tags=["smart-nodes"])
+app.include_router(admin.router, prefix="/api", tags=["admin"])
+app.include_router(runs.router, prefix="/api", tags=["runs"])
+app.include_router(batches.router, prefix="/api", tags=["batches"])
+app.include_router(collections.router, prefix="/api", tags=["collections"])
 
 @app.get("/")
 def read_root():
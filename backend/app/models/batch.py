@@ -0,0 +1,24 @@
+from typing import Optional
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+from app.models.run import RunStatus
+
+class BatchRun(SQLModel, table=True):
+    id: str = Field(primary_key=True)
+    flow_id: int = Field(index=True)
+    flow_version: Optional[int] = None  # Pinned at start so every row runs the same graph
+    dataset_path: str  # JSONL or CSV, one input per row
+    output_path: str  # JSONL results, one line per processed row
+    input_field: str = "input"
+    concurrency: int = 4
+    recursion_limit: int = 50
+    status: RunStatus = Field(default=RunStatus.QUEUED, index=True)
+    total_rows: int = 0
+    completed_rows: int = 0  # Processed rows, including failed ones
+    failed_rows: int = 0
+    elapsed_s: float = 0.0  # Execution time accumulated over all attempts
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
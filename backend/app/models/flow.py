@@ -1,11 +1,38 @@
-from typing import Optional
+import hashlib
+import json
+from typing import Optional, Tuple
 from sqlmodel import SQLModel, Field
 from datetime import datetime
 
+def summarize_flow_data(data: str) -> Tuple[int, int]:
+    """(size in bytes, node count) of a flow's JSON content."""
+    try:
+        nodes = json.loads(data).get("nodes") or []
+    except (ValueError, AttributeError):
+        nodes = []
+    return len(data.encode("utf-8")), len(nodes)
+
+def flow_content_hash(data: str) -> str:
+    """Content address of a flow: sha256 of its canonical JSON (formatting is ignored)."""
+    try:
+        data = json.dumps(json.loads(data), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        pass
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
 class Flow(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     description: Optional[str] = None
     data: str  # JSON content of the flow (nodes, edges, viewport)
+    version: int = Field(default=1)  # Bumped on every change to `data`, used to pin runs
+    # Derived from `data` on every write so list views never read the blob
+    data_size: Optional[int] = None
+    node_count: Optional[int] = None
+    data_hash: Optional[str] = None  # Base that JSON Patch updates are applied against
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+    def refresh_summary(self):
+        self.data_size, self.node_count = summarize_flow_data(self.data)
+        self.data_hash = flow_content_hash(self.data)
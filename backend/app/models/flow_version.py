@@ -0,0 +1,21 @@
+from typing import Optional
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class FlowVersion(SQLModel, table=True):
+    """
+    One entry of a flow's history. A version is either a full snapshot of the
+    flow JSON or an RFC 6902 patch against the previous version.
+    """
+    __table_args__ = (Index("uq_flowversion_flow_id_version", "flow_id", "version", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    flow_id: int = Field(index=True)
+    version: int  # Flow.version this entry materializes to
+    hash: str = Field(index=True)  # Content hash of the materialized flow JSON
+    base_hash: Optional[str] = None  # Hash of the previous version (None for the first)
+    kind: str  # "snapshot" | "delta"
+    content: str  # Flow JSON (snapshot) or JSON Patch operations (delta)
+    size: int = 0  # Bytes stored for this entry
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,30 @@
+from typing import Optional
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+from enum import Enum
+
+class RunStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    INTERRUPTED = "interrupted"  # Process stopped while the run was executing
+    BUDGET_EXCEEDED = "budget_exceeded"  # Stopped by a run budget, state kept at the last checkpoint
+
+class Run(SQLModel, table=True):
+    id: str = Field(primary_key=True)
+    flow_id: int = Field(index=True)
+    flow_version: Optional[int] = None  # Pinned version, None = latest at start
+    thread_id: str
+    input: str
+    priority: int = 0
+    recursion_limit: int = 50
+    budget: Optional[str] = None  # JSON RunBudget request (None = defaults)
+    status: RunStatus = Field(default=RunStatus.QUEUED, index=True)
+    output: Optional[str] = None  # Content of the last message
+    error: Optional[str] = None
+    event_count: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
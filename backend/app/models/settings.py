@@ -1,4 +1,5 @@
 from typing import Optional
+from datetime import datetime
 from sqlmodel import Field, SQLModel
 from enum import Enum
 
@@ -19,3 +20,14 @@ class LLMProfile(SQLModel, table=True):
     api_key_ref: Optional[str] = None # Optional because Ollama might not need it, or it could be nullable
     
     temperature: float = 0.7
+
+class ProfileProbe(SQLModel, table=True):
+    """One health probe of an LLM profile (a tiny streamed completion)."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    profile_id: int = Field(index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    ttft_s: Optional[float] = None  # Time to the first streamed token
+    duration_s: float = 0.0
+    tokens: int = 0
+    tokens_per_s: Optional[float] = None  # Decode speed, after the first token
+    error: Optional[str] = None
@@ -33,7 +33,7 @@ class GenericAgentNode:
              # This is a "Playground" convenience.
              from app.services.llm_factory import get_first_profile
              try:
-                 fallback_profile = get_first_profile()
+                 fallback_profile = await get_first_profile()
                  if fallback_profile:
                      self.profile_id = fallback_profile.id
                  else:
@@ -41,7 +41,7 @@ class GenericAgentNode:
              except Exception:
                  raise ValueError(f"Node {self.node_id} has no profile_id configured")
              
-        profile = get_llm_profile(self.profile_id)
+        profile = await get_llm_profile(self.profile_id)
         llm = create_llm_instance(profile)
         
         # Prepare messages
@@ -1,33 +1,41 @@
 from typing import Any, Dict
-from langchain_core.messages import SystemMessage
+from langchain_core.messages import HumanMessage, SystemMessage
 from app.engine.state import GraphState
+from app.engine.vector_store import RAG_TOP_K, vector_store
 
 class RAGNode:
     def __init__(self, node_id: str, config: dict = None):
         self.node_id = node_id
         self.config = config or {}
         self.collection_name = self.config.get('collection', 'default')
-        
+        self.top_k = int(self.config.get('top_k') or RAG_TOP_K)
+
     def __call__(self, state: GraphState) -> Dict[str, Any]:
         """
-        Retrieves context and adds it as a SystemMessage.
-        Mock implementation for now.
+        Retrieves the chunks of the collection closest to the last user
+        message and adds them as a SystemMessage.
         """
-        # In a real implementation, we would:
-        # 1. Get the query (last user message)
-        # 2. Embed it
-        # 3. Search vector DB (Chroma/Neo4j)
-        # 4. Return top K docs
-        
-        mock_docs = [
-            f"Context from collection '{self.collection_name}': Data point A",
-            f"Context from collection '{self.collection_name}': Data point B"
-        ]
-        
-        context_str = "\n".join(mock_docs)
-        
+        query = next(
+            (m.content for m in reversed(state.get("messages", [])) if isinstance(m, HumanMessage)),
+            None,
+        )
+        try:
+            collection = vector_store.get(self.collection_name)
+        except KeyError:
+            collection = None
+        hits = collection.search(query, self.top_k) if collection is not None and isinstance(query, str) and query else []
+
+        if not hits:
+            # Nothing to add: downstream nodes answer without background context
+            return {"last_sender": self.node_id}
+
+        context_str = "\n".join(
+            f"[{i}] ({hit['source']}) {hit['text']}" if hit["source"] else f"[{i}] {hit['text']}"
+            for i, hit in enumerate(hits, 1)
+        )
+
         system_content = f"Background Context:\n{context_str}"
-        
+
         return {
             "messages": [SystemMessage(content=system_content)],
             "last_sender": self.node_id
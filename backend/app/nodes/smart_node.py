@@ -1,9 +1,19 @@
 
-from typing import Any, Dict, List
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
 import dspy
-from app.engine.dspy_utils import get_dspy_lm
+from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.runnables import RunnableConfig
+from app.engine.budget import BudgetExceededError, budget_tracker
+from app.engine.dspy_utils import BudgetedLM, get_dspy_lm
+from app.engine.events import SMART_NODE_TOKEN_EVENT
+from app.engine.smart_node_cache import smart_node_modules
 from app.models.settings import LLMProfile
 
+# Requests a map-mode node keeps in flight (single items or batches)
+SMART_NODE_MAP_CONCURRENCY = int(os.environ.get("AGENTIC_SMART_NODE_MAP_CONCURRENCY", "8"))
+
 class SmartNode:
     """
     A Node that uses DSPy to execute 'Smart' logic (Predict or ChainOfThought).
@@ -26,8 +36,17 @@ class SmartNode:
         self.inputs = node_data.get("inputs", [{"name": "input", "desc": "Input text"}])
         self.outputs = node_data.get("outputs", [{"name": "output", "desc": "Output text"}])
         self.goal = node_data.get("goal", "Process the input.")
+
+        # Map mode: run the module on every element of this (list) input and
+        # return one list per output, in the same order
+        self.map_input = node_data.get("map_input") or None
+        self.map_concurrency = max(1, int(node_data.get("map_concurrency") or SMART_NODE_MAP_CONCURRENCY))
+        # Elements sent in one LM request (1 = one request per element)
+        self.map_batch_size = max(1, int(node_data.get("map_batch_size") or 1))
+        # Forward output tokens to the run's event stream while they are generated
+        self.stream = node_data.get("stream", True)
         
-    async def invoke(self, state: Dict[str, Any]):
+    async def invoke(self, state: Dict[str, Any], config: Optional[RunnableConfig] = None):
         # 1. Prepare Inputs
         # The 'state' typically contains 'messages' or 'keys'.
         # We need to map state to signature inputs.
@@ -39,6 +58,9 @@ class SmartNode:
             # Try to find key in state (top level) or in last message content?
             if key in state:
                 dspy_inputs[key] = state[key]
+            elif key in (state.get("context") or {}):
+                # e.g. items an upstream agent extracted into the shared context
+                dspy_inputs[key] = state["context"][key]
             else:
                 # Fallback: if single input, use "input" from state messages usually
                 # For Agentic Platform, users might map explicitly. 
@@ -59,51 +81,33 @@ class SmartNode:
              
         profile = LLMProfile(**profile_data)
         dspy_lm = get_dspy_lm(profile)
+        tracker = budget_tracker(config)
+        if tracker is not None:
+            # DSPy calls litellm directly: count them into the run budget here
+            node = (config.get("metadata") or {}).get("langgraph_node", self.node_id)
+            dspy_lm = BudgetedLM(dspy_lm, tracker, node)
         
-        # 3. Dynamic Signature
-        # dspy.make_signature(signature_name, instructions, input_fields, output_fields)
-        # input_fields/output_fields are dicts or tuples
-        
-        signature_fields = {}
-        for i in self.inputs:
-            signature_fields[i["name"]] = dspy.InputField(desc=i.get("desc", ""))
-        for o in self.outputs:
-            signature_fields[o["name"]] = dspy.OutputField(desc=o.get("desc", ""))
-        
-        DynamicSignature = dspy.make_signature(
-            signature_fields,
-            instructions=self.goal,
-            signature_name=f"Node_{self.node_id}"
-        )
-        
-        # 4. Create Module
-        if self.mode == "Predict":
-            module = dspy.Predict(DynamicSignature)
-        else:
-            module = dspy.ChainOfThought(DynamicSignature)
-            
-        # 4.1 Check for Compiled Version and Load
-        import os
-        compiled_path = f"resources/smart_nodes/{self.node_id}_compiled.json"
-        if os.path.exists(compiled_path):
-            try:
-                module.load(compiled_path)
-                # print(f"Loaded compiled module for {self.node_id}")
-            except Exception as e:
-                print(f"Failed to load compiled module for {self.node_id}: {e}")
+        # 3. Signature + Module (with the optimizer's compiled demos, if any)
+        # Built once per signature definition and compiled artifact, then shared
+        module = smart_node_modules.get(self.node_id, self.mode, self.goal, self.inputs, self.outputs)
+
+        # 4. Execute
+        # acall goes through litellm's async client, so cancelling the run
+        # (stop / disconnect) aborts the provider request instead of letting it finish.
+        if self.map_input:
+            items = dspy_inputs.get(self.map_input)
+            if not isinstance(items, (list, tuple)):
+                return {"error": f"Map input '{self.map_input}' of {self.name} must be a list, got {type(items).__name__}"}
+            with dspy.context(lm=dspy_lm):
+                return await self._map(module, dspy_inputs, list(items))
 
-            
-        # 5. Execute
-        # We use 'with dspy.context(lm=dspy_lm):'
-        # DSPy is synchronous by default usually, but dspy-ai 3.x is async friendly?
-        # dspy 2.5 uses `forward`.
-        # We should check if we need to run in executor if it's blocking.
-        # For now assume sync call is acceptable or wrap it.
-        
         with dspy.context(lm=dspy_lm):
-            result = module(**dspy_inputs)
+            if self.stream and config is not None:
+                result = await self._stream(module, dspy_inputs, config)
+            else:
+                result = await module.acall(**dspy_inputs)
             
-        # 6. Map Outputs
+        # 5. Map Outputs
         outputs = {}
         for out in self.outputs:
             key = out["name"]
@@ -119,6 +123,105 @@ class SmartNode:
         # SmartNode is generic -> it updates keys in state.
         return outputs
 
-    def __call__(self, state):
-        import asyncio
-        return asyncio.run(self.invoke(state)) # LangGraph expects sync usually unless async node
+    async def _map(self, module, dspy_inputs: Dict[str, Any], items: List[Any]) -> Dict[str, Any]:
+        """
+        Runs the module over `items` with at most `map_concurrency` requests in
+        flight, in batches of `map_batch_size` elements per request if set.
+        A failing element only fails its own slot: its outputs are None and
+        the error is reported in `_errors` with its index.
+        """
+        names = [out["name"] for out in self.outputs]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        errors: List[Dict[str, Any]] = []
+        semaphore = asyncio.Semaphore(self.map_concurrency)
+
+        def collect(index: int, prediction):
+            results[index] = {name: getattr(prediction, name, None) for name in names + ["rationale"]}
+
+        async def run_item(index: int):
+            async with semaphore:
+                try:
+                    collect(index, await module.acall(**{**dspy_inputs, self.map_input: items[index]}))
+                except BudgetExceededError:
+                    raise
+                except Exception as e:
+                    errors.append({"index": index, "error": str(e)})
+
+        async def run_batch(indices: range):
+            async with semaphore:
+                try:
+                    prediction = await batched.acall(**{**dspy_inputs, self.map_input: [items[i] for i in indices]})
+                    values = {name: list(getattr(prediction, name)) for name in names}
+                    if any(len(column) != len(indices) for column in values.values()):
+                        raise ValueError("answer count does not match the batch")
+                except BudgetExceededError:
+                    raise
+                except Exception:
+                    values = None
+            if values is None:
+                # A batch that failed or did not line up is retried element by element
+                await asyncio.gather(*(run_item(i) for i in indices))
+                return
+            for offset, index in enumerate(indices):
+                results[index] = {name: values[name][offset] for name in names}
+
+        if self.map_batch_size > 1:
+            batched = smart_node_modules.get(self.node_id, self.mode, self.goal, self.inputs, self.outputs, batch_field=self.map_input)
+            size = self.map_batch_size
+            await asyncio.gather(*(run_batch(range(start, min(start + size, len(items)))) for start in range(0, len(items), size)))
+        else:
+            await asyncio.gather(*(run_item(index) for index in range(len(items))))
+
+        outputs = {name: [result[name] if result else None for result in results] for name in names}
+        if any(result and result.get("rationale") is not None for result in results):
+            outputs["_rationale"] = [result.get("rationale") if result else None for result in results]
+        if errors:
+            outputs["_errors"] = sorted(errors, key=lambda error: error["index"])
+        return outputs
+
+    async def _stream(self, module, dspy_inputs: Dict[str, Any], config: RunnableConfig):
+        """
+        Runs the module through DSPy streaming and dispatches each chunk of an
+        output field (and of the reasoning, for ChainOfThought) as a
+        `smart_node_token` event, which the run event stream turns into
+        `token` events like an agent's. Fields that produced no chunks (an
+        answer from the LM cache) are sent whole once the prediction is in.
+        """
+        fields = [out["name"] for out in self.outputs]
+        if self.mode != "Predict" and "reasoning" not in fields:
+            fields.insert(0, "reasoning")
+        program = dspy.streamify(
+            module,
+            stream_listeners=[dspy.streaming.StreamListener(signature_field_name=field) for field in fields],
+            is_async_program=True,
+        )
+        streamed, result = set(), None
+        try:
+            async for value in program(**dspy_inputs):
+                if isinstance(value, dspy.Prediction):
+                    result = value
+                elif isinstance(value, dspy.streaming.StreamResponse) and value.chunk:
+                    streamed.add(value.signature_field_name)
+                    await self._dispatch_token(value.signature_field_name, value.chunk, config)
+        except Exception as e:
+            # streamify runs the program in a task group: surface the program's
+            # own error (e.g. BudgetExceededError), not the exception group
+            errors = getattr(e, "exceptions", None)
+            if errors and len(errors) == 1:
+                raise errors[0] from None
+            raise
+        for field in fields:
+            if field not in streamed and getattr(result, field, None) is not None:
+                await self._dispatch_token(field, str(getattr(result, field)), config)
+        return result
+
+    async def _dispatch_token(self, field: str, content: str, config: RunnableConfig):
+        await adispatch_custom_event(
+            SMART_NODE_TOKEN_EVENT,
+            {"node_id": self.node_id, "field": field, "content": content},
+            config=config,
+        )
+
+    async def __call__(self, state, config: RunnableConfig = None):
+        # Async node: runs on the graph's event loop and can be cancelled
+        return await self.invoke(state, config)
@@ -0,0 +1,38 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class BatchCreate(BaseModel):
+    flow_id: int
+    dataset_path: str  # Server-side JSONL or CSV file
+    input_field: str = "input"  # Column / key holding the user input
+    version: Optional[int] = None
+    concurrency: int = 4
+    recursion_limit: int = 50
+
+class BatchRead(BaseModel):
+    id: str
+    flow_id: int
+    flow_version: Optional[int] = None
+    dataset_path: str
+    output_path: str
+    input_field: str
+    concurrency: int
+    status: str
+    total_rows: int
+    completed_rows: int
+    failed_rows: int
+    elapsed_s: float
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class BatchProgress(BatchRead):
+    rows_per_second: float = 0.0
+    eta_s: Optional[float] = None
+    latency_p50_s: Optional[float] = None
+    latency_p95_s: Optional[float] = None
@@ -0,0 +1,43 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+class CollectionRead(BaseModel):
+    name: str
+    embedder: str
+    dimension: int
+    chunks: int
+    tombstoned: int
+    sources: int
+    indexed_rows: int
+
+class IngestRequest(BaseModel):
+    paths: List[str]  # Server-side files or directories
+    embedder: Optional[str] = None  # For a new collection (default: AGENTIC_RAG_EMBEDDER)
+    chunk_tokens: Optional[int] = None
+    overlap_tokens: Optional[int] = None
+    batch_size: Optional[int] = None
+    concurrency: Optional[int] = None
+    prune: bool = True  # Tombstone documents deleted from the paths
+
+class IngestReport(BaseModel):
+    collection: str
+    documents: int
+    added: int
+    updated: int
+    unchanged: int
+    deleted: int
+    skipped: int
+    failed: int = 0
+    chunks_embedded: int
+    chunks_reused: int
+    chunks_tombstoned: int
+    seconds: float
+    documents_per_s: float
+    chunks_per_s: float
+
+class SearchHit(BaseModel):
+    row: int
+    score: float
+    source: str
+    text: str
+    metadata: Dict[str, Any] = {}
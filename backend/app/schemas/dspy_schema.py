@@ -1,11 +1,18 @@
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
+from datetime import datetime
 from app.schemas.settings import LLMProfileCreate # Assuming we might reuse or just ID
 
 class DSPyExample(BaseModel):
     inputs: Dict[str, Any]
     outputs: Dict[str, Any]
 
+class InferenceBudget(BaseModel):
+    """Limits a compiled program must fit in, measured per LM call on the validation set."""
+    max_prompt_tokens: Optional[float] = None # Mean prompt tokens (demos make prompts grow)
+    max_output_tokens: Optional[float] = None # Mean output tokens (ChainOfThought adds reasoning)
+    max_p95_latency_ms: Optional[float] = None
+
 class OptimizationRequest(BaseModel):
     node_id: str
     goal: str
@@ -14,10 +21,75 @@ class OptimizationRequest(BaseModel):
     outputs: List[Dict[str, str]] # List of {name, desc}
     examples: List[DSPyExample]
     llm_profile_id: int
-    metric: str = "exact_match" # Future: "llm_judge"
+    metric: str = "exact_match" # exact_match, f1, contains, json_match or llm_judge
+    metric_threshold: Optional[float] = None # Score a bootstrapped demo must reach (default per metric)
     max_rounds: Optional[int] = 10
+    val_fraction: float = 0.25 # Examples held out to score the program before / after optimization
+    eval_threads: Optional[int] = None # Parallel evaluation threads (default AGENTIC_OPTIMIZE_EVAL_THREADS)
+    seed: int = 0 # Shuffle of the train / validation split
+    objective: str = "score" # "score": keep the compiled program; "pareto": search modes and demo counts
+    budget: Optional[InferenceBudget] = None # With "pareto": best-scoring program within these limits
+
+class ProgramCandidate(BaseModel):
+    """One program evaluated by a "pareto" optimization."""
+    mode: str
+    demos: int
+    score: float
+    prompt_tokens: float # Mean per LM call
+    output_tokens: float
+    p50_latency_ms: Optional[float] = None
+    p95_latency_ms: Optional[float] = None
+    within_budget: bool = True
+    pareto: bool = False # Not beaten on score, tokens and latency by another candidate
+    selected: bool = False
 
 class OptimizationResponse(BaseModel):
     status: str
     compiled_program_path: str
-    score: float
+    signature_hash: Optional[str] = None # Program store key of the node's signature
+    version: Optional[int] = None # Version of the program written by this optimization
+    score: float # Optimized program on the validation set
+    baseline_score: Optional[float] = None # Unoptimized program on the same set
+    train_size: int = 0
+    val_size: int = 0
+    eval_seconds: float = 0.0 # Wall time of both evaluations
+    lm_cache_hit_rate: Optional[float] = None # Share of this run's LM calls answered from the cache
+    mode: Optional[str] = None # Module type of the saved program (a "pareto" search may switch it)
+    demos: Optional[int] = None
+    candidates: List[ProgramCandidate] = [] # "pareto" objective: every evaluated program
+
+class CompiledProgramVersion(BaseModel):
+    """Metadata of one stored version of a signature's compiled program."""
+    signature_hash: str
+    version: int
+    program_hash: str
+    created_at: datetime
+    node_id: Optional[str] = None # Node that was optimized (other nodes with the same signature share it)
+    optimizer: Optional[str] = None
+    metric: Optional[str] = None
+    score: Optional[float] = None
+    baseline_score: Optional[float] = None
+    train_size: int = 0
+    val_size: int = 0
+    profile: Dict[str, Any] = {}
+    active: bool = False
+
+class CompiledProgramHistory(BaseModel):
+    signature_hash: str
+    signature: Dict[str, Any]
+    current_version: Optional[int] = None
+    versions: List[CompiledProgramVersion]
+
+class OptimizationJobRead(BaseModel):
+    id: str
+    node_id: str
+    status: str
+    progress: Dict[str, Any] = {}  # phase, round, candidates, bootstrapped, best_score, baseline_score...
+    result: Optional[OptimizationResponse] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 class FlowBase(BaseModel):
@@ -17,8 +17,58 @@ class FlowUpdate(BaseModel):
 
 class FlowRead(FlowBase):
     id: int
+    version: int = 1
+    data_size: Optional[int] = None
+    node_count: Optional[int] = None
+    data_hash: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True
+
+class FlowSummary(BaseModel):
+    """List projection of a flow: everything but the `data` blob."""
+    id: int
+    name: str
+    description: Optional[str] = None
+    version: int = 1
+    data_size: Optional[int] = None
+    node_count: Optional[int] = None
+    data_hash: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class FlowPatch(BaseModel):
+    """Incremental save: RFC 6902 operations against the version whose hash is `base_hash`."""
+    base_hash: str
+    patch: List[Dict[str, Any]]
+    name: Optional[str] = None
+    description: Optional[str] = None
+
+class FlowVersionRead(BaseModel):
+    version: int
+    hash: str
+    base_hash: Optional[str] = None
+    kind: str
+    size: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class FlowVersionData(FlowVersionRead):
+    data: str
+
+class FlowSearchResult(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    version: int = 1
+    node_count: Optional[int] = None
+    updated_at: datetime
+    snippet: str  # Best matching passage, hits wrapped in <mark></mark>
+    score: float  # Relevance (higher is better)
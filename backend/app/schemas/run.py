@@ -0,0 +1,33 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+class RunCreate(BaseModel):
+    flow_id: int
+    input: str
+    thread_id: Optional[str] = None
+    version: Optional[int] = None  # Pin a flow version
+    priority: int = 0  # Higher runs first
+    recursion_limit: int = 50
+    # {"max_tokens", "max_llm_calls", "max_seconds", "nodes": {node_id: {"max_tokens", "max_llm_calls"}}}
+    budget: Optional[Dict[str, Any]] = None
+
+class RunRead(BaseModel):
+    id: str
+    flow_id: int
+    flow_version: Optional[int] = None
+    thread_id: str
+    status: str
+    priority: int
+    output: Optional[str] = None
+    error: Optional[str] = None
+    event_count: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class RunCancelRead(RunRead):
+    released_ms: Optional[float] = None  # Time for the run's in-flight work to stop
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional
+from datetime import datetime
 
 class LLMProfileCreate(BaseModel):
     name: str
@@ -7,3 +8,16 @@ class LLMProfileCreate(BaseModel):
     api_key: Optional[str] = None # Optional for Ollama
     model_id: str
     base_url: Optional[str] = None
+
+class ProfileHealth(BaseModel):
+    """Rolling probe statistics of an LLM profile (None until it has been probed)."""
+    profile_id: int
+    samples: int
+    error_rate: Optional[float] = None
+    healthy: Optional[bool] = None  # Outcome of the last probe
+    last_probe_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    ttft_p50_s: Optional[float] = None
+    ttft_p95_s: Optional[float] = None
+    tokens_per_s_p50: Optional[float] = None
+    tokens_per_s_p5: Optional[float] = None
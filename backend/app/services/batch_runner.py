@@ -0,0 +1,334 @@
+import asyncio
+import csv
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from langchain_core.messages import HumanMessage
+from sqlmodel import Session, select
+
+from app.database import BASE_DIR, engine as default_engine
+from app.engine.graph_cache import GraphCache, graph_cache as default_graph_cache
+from app.engine.replay import run_metadata
+from app.engine.storage import get_graph_checkpointer
+from app.models.batch import BatchRun
+from app.models.run import RunStatus
+from app.services.stats import percentile
+
+# Uploaded datasets and result files of batch runs
+BATCHES_DIR = os.environ.get("AGENTIC_BATCHES_DIR", os.path.join(BASE_DIR, "resources", "batches"))
+# Upper bound for the per-batch concurrency requested by clients
+BATCH_MAX_CONCURRENCY = int(os.environ.get("AGENTIC_BATCH_MAX_CONCURRENCY", "32"))
+# How often live progress is written back to the BatchRun row
+BATCH_PROGRESS_FLUSH_S = float(os.environ.get("AGENTIC_BATCH_PROGRESS_FLUSH_S", "1.0"))
+
+
+def iter_dataset(path: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Streams (row_index, row) from a JSONL or CSV file without loading it.
+    CSV rows are dicts keyed by the header; JSONL rows are the raw lines,
+    decoded by `load_row` within the row's own run so a malformed line only
+    fails that row.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            for index, row in enumerate(csv.DictReader(f)):
+                yield index, row
+            return
+        index = 0
+        for line in f:
+            if not line.strip():
+                continue
+            yield index, line
+            index += 1
+
+
+def load_row(row: Any) -> Any:
+    """A dataset row as a value: JSONL lines are decoded, CSV rows are already dicts."""
+    return json.loads(row) if isinstance(row, str) else row
+
+
+def count_rows(path: str) -> int:
+    if path.lower().endswith(".csv"):
+        return sum(1 for _ in iter_dataset(path))
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def row_input(row: Any, input_field: str) -> str:
+    if isinstance(row, dict):
+        if input_field not in row:
+            raise KeyError(f"Row has no '{input_field}' field")
+        value = row[input_field]
+    else:
+        value = row
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def read_completed_rows(output_path: str) -> Tuple[Set[int], int, List[float]]:
+    """
+    Returns (processed row indexes, failed count, durations) from a results file.
+    A line cut short by a crash is truncated so appending can resume cleanly.
+    """
+    done: Set[int] = set()
+    failed = 0
+    durations: List[float] = []
+    if not os.path.exists(output_path):
+        return done, failed, durations
+
+    with open(output_path, "rb+") as f:
+        content = f.read()
+        end = content.rfind(b"\n") + 1
+        if end != len(content):
+            f.truncate(end)
+    for line in content[:end].splitlines():
+        result = json.loads(line)
+        if result["row"] in done:
+            continue
+        done.add(result["row"])
+        durations.append(result.get("duration_s", 0.0))
+        if result.get("error"):
+            failed += 1
+    return done, failed, durations
+
+
+@dataclass
+class _LiveBatch:
+    """In-memory progress of a batch that is currently executing."""
+    completed: int = 0
+    failed: int = 0
+    processed_now: int = 0  # Rows done in this attempt (for throughput)
+    durations: List[float] = field(default_factory=list)
+    started: float = field(default_factory=time.monotonic)
+
+
+class BatchRunner:
+    """
+    Runs one saved flow over every row of a dataset. The flow is compiled once
+    (through the graph cache) and invoked per row with bounded concurrency,
+    each row on its own thread id. Results are appended to a JSONL file as
+    rows finish, which is also what a restarted batch resumes from.
+    """
+
+    def __init__(
+        self,
+        engine=default_engine,
+        graphs: GraphCache = default_graph_cache,
+        checkpointer_factory: Callable[[], Awaitable[Any]] = get_graph_checkpointer,
+        batches_dir: str = BATCHES_DIR,
+    ):
+        self.engine = engine
+        self.graphs = graphs
+        self.checkpointer_factory = checkpointer_factory
+        self.batches_dir = batches_dir
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._live: Dict[str, _LiveBatch] = {}
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        """Resumes batches left queued or running by a previous process."""
+        os.makedirs(self.batches_dir, exist_ok=True)
+
+        def unfinished():
+            with Session(self.engine) as session:
+                statement = select(BatchRun).where(BatchRun.status.in_([RunStatus.QUEUED, RunStatus.RUNNING]))
+                return [batch.id for batch in session.exec(statement).all()]
+
+        for batch_id in await asyncio.to_thread(unfinished):
+            self._launch(batch_id)
+
+    async def stop(self):
+        # Batches keep their 'running' status so the next start resumes them
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    # --- Submission & status ---
+
+    async def submit(
+        self,
+        flow_id: int,
+        dataset_path: str,
+        input_field: str = "input",
+        version: Optional[int] = None,
+        concurrency: int = 4,
+        recursion_limit: int = 50,
+    ) -> BatchRun:
+        if not os.path.isfile(dataset_path):
+            raise FileNotFoundError(f"Dataset '{dataset_path}' not found")
+        batch_id = str(uuid.uuid4())
+        batch = BatchRun(
+            id=batch_id,
+            flow_id=flow_id,
+            flow_version=version,
+            dataset_path=os.path.abspath(dataset_path),
+            output_path=os.path.join(self.batches_dir, f"{batch_id}.results.jsonl"),
+            input_field=input_field,
+            concurrency=max(1, min(concurrency, BATCH_MAX_CONCURRENCY)),
+            recursion_limit=recursion_limit,
+            total_rows=await asyncio.to_thread(count_rows, dataset_path),
+        )
+        batch = await asyncio.to_thread(self._save, batch)
+        self._launch(batch.id)
+        return batch
+
+    async def cancel(self, batch_id: str) -> Optional[BatchRun]:
+        task = self._tasks.pop(batch_id, None)
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        batch = await self.get(batch_id)
+        if batch and batch.status in (RunStatus.QUEUED, RunStatus.RUNNING):
+            batch = await asyncio.to_thread(self._update, batch_id, status=RunStatus.CANCELLED, finished_at=datetime.utcnow())
+        return batch
+
+    async def get(self, batch_id: str) -> Optional[BatchRun]:
+        def load():
+            with Session(self.engine) as session:
+                return session.get(BatchRun, batch_id)
+        return await asyncio.to_thread(load)
+
+    async def list(self, limit: int = 50) -> List[BatchRun]:
+        def load():
+            with Session(self.engine) as session:
+                return list(session.exec(select(BatchRun).order_by(BatchRun.created_at.desc()).limit(limit)).all())
+        return await asyncio.to_thread(load)
+
+    async def progress(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Batch row plus throughput, ETA and latency percentiles (live while running)."""
+        batch = await self.get(batch_id)
+        if batch is None:
+            return None
+        report = batch.model_dump()
+        live = self._live.get(batch_id)
+        if live is None:
+            durations = (await asyncio.to_thread(read_completed_rows, batch.output_path))[2] if batch.completed_rows else []
+            report["rows_per_second"] = batch.completed_rows / batch.elapsed_s if batch.elapsed_s else 0.0
+            report["eta_s"] = None
+        else:
+            elapsed = time.monotonic() - live.started
+            durations = live.durations
+            rate = live.processed_now / elapsed if elapsed > 0 else 0.0
+            report.update(completed_rows=live.completed, failed_rows=live.failed, elapsed_s=batch.elapsed_s)
+            report["rows_per_second"] = rate
+            report["eta_s"] = (batch.total_rows - live.completed) / rate if rate else None
+        report["latency_p50_s"] = percentile(durations, 0.5)
+        report["latency_p95_s"] = percentile(durations, 0.95)
+        return report
+
+    def _save(self, batch: BatchRun) -> BatchRun:
+        with Session(self.engine) as session:
+            session.add(batch)
+            session.commit()
+            session.refresh(batch)
+            return batch
+
+    def _update(self, batch_id: str, **fields) -> Optional[BatchRun]:
+        with Session(self.engine) as session:
+            batch = session.get(BatchRun, batch_id)
+            if batch is None:
+                return None
+            for key, value in fields.items():
+                setattr(batch, key, value)
+            session.add(batch)
+            session.commit()
+            session.refresh(batch)
+            return batch
+
+    # --- Execution ---
+
+    def _launch(self, batch_id: str):
+        task = asyncio.create_task(self._execute(batch_id))
+        self._tasks[batch_id] = task
+
+        def forget(_):
+            if self._tasks.get(batch_id) is task:
+                del self._tasks[batch_id]
+        task.add_done_callback(forget)
+
+    async def _execute(self, batch_id: str):
+        batch = await self.get(batch_id)
+        if batch is None:
+            return
+        done, failed, durations = await asyncio.to_thread(read_completed_rows, batch.output_path)
+        live = _LiveBatch(completed=len(done), failed=failed, durations=durations)
+        self._live[batch_id] = live
+        attempt_started = time.monotonic()
+        last_flush = attempt_started
+
+        async def flush(**fields):
+            await asyncio.to_thread(
+                self._update, batch_id,
+                completed_rows=live.completed, failed_rows=live.failed,
+                elapsed_s=batch.elapsed_s + time.monotonic() - attempt_started, **fields,
+            )
+
+        try:
+            cached = await asyncio.to_thread(self.graphs.get, batch.flow_id, batch.flow_version)
+            app = cached.bind(await self.checkpointer_factory())
+            await asyncio.to_thread(
+                self._update, batch_id,
+                status=RunStatus.RUNNING, flow_version=cached.version,
+                started_at=batch.started_at or datetime.utcnow(),
+            )
+
+            metadata = run_metadata(cached.graph_data)
+            rows = ((index, row) for index, row in iter_dataset(batch.dataset_path) if index not in done)
+
+            async def run_row(output, index: int, row: Any):
+                nonlocal last_flush
+                thread_id = f"batch-{batch_id}-{index}"
+                result = {"row": index, "thread_id": thread_id, "output": None, "error": None}
+                started = time.perf_counter()
+                try:
+                    user_input = row_input(load_row(row), batch.input_field)
+                    result["input"] = user_input
+                    state = await app.ainvoke(
+                        {"messages": [HumanMessage(content=user_input)]},
+                        {"configurable": {"thread_id": thread_id}, "recursion_limit": batch.recursion_limit, "metadata": metadata},
+                    )
+                    messages = state.get("messages", [])
+                    result["output"] = str(messages[-1].content) if messages else None
+                except Exception as e:
+                    result["error"] = str(e)
+                    live.failed += 1
+                result["duration_s"] = time.perf_counter() - started
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+                live.completed += 1
+                live.processed_now += 1
+                live.durations.append(result["duration_s"])
+                if time.monotonic() - last_flush >= BATCH_PROGRESS_FLUSH_S:
+                    last_flush = time.monotonic()
+                    await flush()
+
+            async def worker(output):
+                # Workers share one lazy iterator: the dataset is never fully loaded
+                for index, row in rows:
+                    await run_row(output, index, row)
+
+            with open(batch.output_path, "a", encoding="utf-8") as output:
+                await asyncio.gather(*(worker(output) for _ in range(batch.concurrency)))
+
+            await flush(status=RunStatus.SUCCEEDED, finished_at=datetime.utcnow())
+            elapsed = time.monotonic() - attempt_started
+            print(f"Batch {batch_id}: {live.processed_now} rows in {elapsed:.1f}s ({live.processed_now / elapsed if elapsed else 0:.1f} rows/s), {live.failed} failed")
+        except asyncio.CancelledError:
+            await flush()
+            raise
+        except Exception as e:
+            print(f"Batch {batch_id} failed: {e}")
+            await flush(status=RunStatus.FAILED, error=str(e), finished_at=datetime.utcnow())
+        finally:
+            self._live.pop(batch_id, None)
+
+
+# Process-wide runner, started in the app lifespan
+batch_runner = BatchRunner()
@@ -0,0 +1,130 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import DDL, event, text
+from sqlmodel import Session, select
+
+from app.models.flow import Flow
+
+# Searchable columns of the index, with their bm25 weight (a hit in a flow name counts most)
+SEARCH_FIELDS = {
+    "name": 10.0,
+    "description": 4.0,
+    "labels": 5.0,
+    "prompts": 1.0,
+    "goals": 2.0,
+    "tools": 4.0,
+    "profiles": 3.0,
+}
+
+# The index row of a flow has the flow id as rowid, so updates replace it in place.
+# unicode61 folds accents (flows are written in several languages); prefix indexes
+# keep search-as-you-type queries off full scans.
+_CREATE_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS flow_search USING fts5("
+    + ", ".join(SEARCH_FIELDS)
+    + ", tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+
+# Created together with the flow table (new databases and tests)
+event.listen(Flow.__table__, "after_create", DDL(_CREATE_INDEX))
+
+
+def _texts(values) -> str:
+    return "\n".join(str(v) for v in values if v not in (None, "", [], {}))
+
+
+def extract_search_fields(flow: Flow) -> Dict[str, str]:
+    """Searchable text of a flow: its name and what its nodes are configured with."""
+    try:
+        graph = json.loads(flow.data) if flow.data else {}
+    except ValueError:
+        graph = {}
+    labels, prompts, goals, tools, profiles = [], [], [], [], []
+    for node in graph.get("nodes", []) if isinstance(graph, dict) else []:
+        data = node.get("data") or {}
+        labels.append(data.get("label"))
+        prompts.append(data.get("system_prompt"))
+        prompts.extend(route.get("value") for route in data.get("routes") or [] if isinstance(route, dict))
+        goals.append(data.get("goal"))
+        tools.extend(data.get("tools") or [])
+        if node.get("type") == "tool":
+            tools.append(data.get("tool_name") or data.get("label"))
+        # Agents reference a profile by id (`profile_id`, `modelId` in the editor); smart nodes embed it
+        profile = data.get("llm_profile") if isinstance(data.get("llm_profile"), dict) else {}
+        profiles.extend([
+            data.get("profile_id"), data.get("modelId"), data.get("model_id"), data.get("provider"),
+            profile.get("id"), profile.get("name"), profile.get("model_id"), profile.get("provider"),
+        ])
+    return {
+        "name": flow.name or "",
+        "description": flow.description or "",
+        "labels": _texts(labels),
+        "prompts": _texts(prompts),
+        "goals": _texts(goals),
+        "tools": _texts(tools),
+        "profiles": _texts(profiles),
+    }
+
+
+def index_flow(session: Session, flow: Flow):
+    """(Re)indexes a flow; runs in the caller's transaction."""
+    fields = extract_search_fields(flow)
+    session.exec(text("DELETE FROM flow_search WHERE rowid = :id").bindparams(id=flow.id))
+    session.exec(
+        text(f"INSERT INTO flow_search (rowid, {', '.join(SEARCH_FIELDS)}) VALUES (:id, {', '.join(':' + f for f in SEARCH_FIELDS)})")
+        .bindparams(id=flow.id, **fields)
+    )
+
+
+def unindex_flow(session: Session, flow_id: int):
+    session.exec(text("DELETE FROM flow_search WHERE rowid = :id").bindparams(id=flow_id))
+
+
+def ensure_search_index(target_engine):
+    """Creates the index on existing databases and (re)fills it when it is out of sync with the flows."""
+    with target_engine.begin() as conn:
+        conn.execute(text(_CREATE_INDEX))
+        indexed = conn.execute(text("SELECT COUNT(*) FROM flow_search")).scalar()
+        flows = conn.execute(text("SELECT COUNT(*) FROM flow")).scalar()
+    if indexed == flows:
+        return
+    with Session(target_engine) as session:
+        session.exec(text("DELETE FROM flow_search"))
+        for flow in session.exec(select(Flow)).yield_per(500):
+            index_flow(session, flow)
+        session.commit()
+    print(f"Flow search index rebuilt ({flows} flows)")
+
+
+def build_match_query(query: str, field: Optional[str] = None) -> Optional[str]:
+    """
+    FTS5 MATCH expression for free text: every word must match, the last one
+    as a prefix (search as you type). Words are quoted, so user input can
+    never be parsed as FTS syntax.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    expression = " ".join(terms)
+    return f"{{{field}}} : ({expression})" if field else expression
+
+
+async def search_flows(session, query: str, field: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    """Best matches first (bm25 over the weighted fields), each with a highlighted snippet."""
+    match = build_match_query(query, field)
+    if match is None:
+        return []
+    weights = ", ".join(str(w) for w in SEARCH_FIELDS.values())
+    statement = text(
+        "SELECT f.id, f.name, f.description, f.version, f.node_count, f.updated_at, "
+        "snippet(flow_search, -1, '<mark>', '</mark>', '…', 12) AS snippet, "
+        f"bm25(flow_search, {weights}) AS score "
+        "FROM flow_search JOIN flow f ON f.id = flow_search.rowid "
+        "WHERE flow_search MATCH :match ORDER BY score LIMIT :limit"
+    ).bindparams(match=match, limit=limit)
+    rows = (await session.exec(statement)).mappings().all()
+    # bm25 is lower-is-better; expose a positive relevance score
+    return [{**row, "score": -row["score"]} for row in rows]
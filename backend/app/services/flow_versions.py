@@ -0,0 +1,136 @@
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import jsonpatch
+from sqlalchemy import func
+from sqlmodel import Session, delete, select
+
+from app.models.flow import Flow, flow_content_hash
+from app.models.flow_version import FlowVersion
+
+# Most deltas stored between two snapshots (bounds the patches replayed to read a version);
+# a snapshot is also taken earlier once the deltas outweigh the flow itself
+FLOW_SNAPSHOT_INTERVAL = int(os.environ.get("AGENTIC_FLOW_SNAPSHOT_INTERVAL", "100"))
+
+
+class FlowPatchError(ValueError):
+    """The patch is malformed or does not apply to the flow."""
+
+
+class FlowPatchConflictError(Exception):
+    """The patch was made against a version that is no longer the current one."""
+
+    def __init__(self, base_hash: str, current_hash: Optional[str]):
+        super().__init__(f"Patch base {base_hash} does not match the current version {current_hash}")
+        self.base_hash = base_hash
+        self.current_hash = current_hash
+
+
+def apply_flow_patch(data: str, operations: List[Dict[str, Any]]) -> str:
+    """Flow JSON after applying RFC 6902 `operations` to `data`."""
+    try:
+        document = jsonpatch.apply_patch(json.loads(data), operations)
+    except (jsonpatch.JsonPatchException, jsonpatch.JsonPointerException, ValueError, TypeError) as e:
+        raise FlowPatchError(str(e))
+    return json.dumps(document, separators=(",", ":"))
+
+
+def _delta(previous_data: str, data: str) -> Optional[List[Dict[str, Any]]]:
+    try:
+        return jsonpatch.make_patch(json.loads(previous_data), json.loads(data)).patch
+    except ValueError:
+        return None
+
+
+def _add_entry(session: Session, flow_id: int, version: int, data_hash: str, base_hash: Optional[str], kind: str, content: str) -> FlowVersion:
+    entry = FlowVersion(
+        flow_id=flow_id,
+        version=version,
+        hash=data_hash,
+        base_hash=base_hash,
+        kind=kind,
+        content=content,
+        size=len(content.encode("utf-8")),
+    )
+    session.add(entry)
+    return entry
+
+
+def record_version(
+    session: Session,
+    flow: Flow,
+    previous_data: Optional[str] = None,
+    operations: Optional[List[Dict[str, Any]]] = None,
+) -> FlowVersion:
+    """
+    Adds the flow's current `data` (already bumped to `flow.version`) to its
+    history, as a delta against `previous_data` when that is smaller than a
+    snapshot. `operations` is the patch that produced it, if known.
+    Flows saved before history existed first get their previous data as base.
+    """
+    latest = session.exec(
+        select(FlowVersion).where(FlowVersion.flow_id == flow.id).order_by(FlowVersion.version.desc())
+    ).first()
+    if latest is None and previous_data is not None:
+        latest = _add_entry(session, flow.id, flow.version - 1, flow_content_hash(previous_data), None, "snapshot", previous_data)
+        session.flush()
+
+    if latest is not None and previous_data is not None:
+        last_snapshot = session.exec(
+            select(func.max(FlowVersion.version)).where(FlowVersion.flow_id == flow.id, FlowVersion.kind == "snapshot")
+        ).first() or 0
+        delta_bytes = session.exec(
+            select(func.coalesce(func.sum(FlowVersion.size), 0))
+            .where(FlowVersion.flow_id == flow.id, FlowVersion.kind == "delta", FlowVersion.version > last_snapshot)
+        ).first()
+        if flow.version - last_snapshot <= FLOW_SNAPSHOT_INTERVAL:
+            delta = operations if operations is not None else _delta(previous_data, flow.data)
+            if delta is not None:
+                content = json.dumps(delta, separators=(",", ":"))
+                if delta_bytes + len(content) < len(flow.data):
+                    return _add_entry(session, flow.id, flow.version, flow.data_hash, latest.hash, "delta", content)
+
+    return _add_entry(session, flow.id, flow.version, flow.data_hash, latest.hash if latest else None, "snapshot", flow.data)
+
+
+def list_versions(session: Session, flow_id: int, limit: int = 100) -> List[FlowVersion]:
+    return list(session.exec(
+        select(FlowVersion).where(FlowVersion.flow_id == flow_id).order_by(FlowVersion.version.desc()).limit(limit)
+    ).all())
+
+
+def find_version(session: Session, flow_id: int, ref: str) -> Optional[FlowVersion]:
+    """History entry by version number or content hash (the latest one with that content)."""
+    statement = select(FlowVersion).where(FlowVersion.flow_id == flow_id)
+    if ref.isdigit():
+        statement = statement.where(FlowVersion.version == int(ref))
+    else:
+        statement = statement.where(FlowVersion.hash == ref)
+    return session.exec(statement.order_by(FlowVersion.version.desc())).first()
+
+
+def materialize(session: Session, flow_id: int, version: int) -> Optional[str]:
+    """Flow JSON at `version`: the closest snapshot with the deltas after it applied."""
+    snapshot = session.exec(
+        select(FlowVersion)
+        .where(FlowVersion.flow_id == flow_id, FlowVersion.kind == "snapshot", FlowVersion.version <= version)
+        .order_by(FlowVersion.version.desc())
+    ).first()
+    if snapshot is None:
+        return None
+    deltas = session.exec(
+        select(FlowVersion)
+        .where(FlowVersion.flow_id == flow_id, FlowVersion.kind == "delta", FlowVersion.version > snapshot.version, FlowVersion.version <= version)
+        .order_by(FlowVersion.version)
+    ).all()
+    if not deltas:
+        return snapshot.content
+    document = json.loads(snapshot.content)
+    for delta in deltas:
+        document = jsonpatch.apply_patch(document, json.loads(delta.content), in_place=True)
+    return json.dumps(document, separators=(",", ":"))
+
+
+def delete_versions(session: Session, flow_id: int):
+    session.exec(delete(FlowVersion).where(FlowVersion.flow_id == flow_id))
@@ -1,5 +1,6 @@
-from sqlmodel import Session, select
-from app.database import engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import async_engine
 from app.models.settings import LLMProfile, ProviderType
 from app.services.security import get_api_key
 from langchain_openai import ChatOpenAI
@@ -10,23 +11,19 @@ try:
 except ImportError:
     from langchain_community.chat_models import ChatOllama
 
-def get_llm_profile(profile_id: int) -> LLMProfile:
-    with Session(engine) as session:
-        profile = session.get(LLMProfile, profile_id)
+async def get_llm_profile(profile_id: int) -> LLMProfile:
+    # Called from async nodes: read through the async engine instead of blocking the loop
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        profile = await session.get(LLMProfile, profile_id)
         if not profile:
             raise ValueError(f"Profile {profile_id} not found")
-        # We need to access fields before session closes if they are lazy loaded? 
-        # But here fields are basic types.
-        # api_key_ref is a string.
-        # We'll return a copy or just the object (detached state might be an issue if we try to refresh later)
-        # But for read-only it is fine.
+        # Plain columns only, so the detached instance is safe to read after the session closes
         return profile
 
-def get_first_profile() -> LLMProfile | None:
-    with Session(engine) as session:
-        # Get the first one
+async def get_first_profile() -> LLMProfile | None:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
         statement = select(LLMProfile).limit(1)
-        results = session.exec(statement)
+        results = await session.exec(statement)
         return results.first()
 
 def create_llm_instance(profile: LLMProfile):
@@ -5,7 +5,7 @@ import shutil
 from contextlib import AsyncExitStack
 from typing import Dict, List, Optional, Any
 
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
 from mcp.client.sse import sse_client
 
@@ -155,8 +155,24 @@ class MCPClientManager:
             raise ValueError(f"Server '{server_name}' not connected")
             
         session = self.sessions[server_name]
-        result = await session.call_tool(tool_name, arguments)
+        # Id the SDK assigns to the request below (read before its first await)
+        request_id = session._request_id
+        try:
+            result = await session.call_tool(tool_name, arguments)
+        except asyncio.CancelledError:
+            # The SDK only stops waiting; tell the server to stop working too
+            await asyncio.shield(self._notify_cancelled(session, request_id))
+            raise
         return result
 
+    async def _notify_cancelled(self, session: ClientSession, request_id: int):
+        try:
+            await session.send_notification(types.ClientNotification(types.CancelledNotification(
+                method="notifications/cancelled",
+                params=types.CancelledNotificationParams(requestId=request_id, reason="Run cancelled"),
+            )))
+        except Exception as e:
+            print(f"Failed to send MCP cancellation for request {request_id}: {e}")
+
     async def cleanup(self):
         await self.exit_stack.aclose()
@@ -0,0 +1,200 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from app.models.run import RunStatus
+from app.models.settings import LLMProfile
+from app.schemas.dspy_schema import OptimizationRequest
+from app.services.run_manager import TERMINAL_STATUSES, RunEventLog
+
+# Optimizations executed at the same time (each in its own process); further jobs wait queued
+OPTIMIZE_WORKERS = int(os.environ.get("AGENTIC_OPTIMIZE_WORKERS", "1"))
+# CPUs an optimization process may run on (0 = all); keeps cores free for live runs
+OPTIMIZE_CPUS = int(os.environ.get("AGENTIC_OPTIMIZE_CPUS", "1"))
+# Scheduling priority of optimization processes (0-19, higher yields more to the API process)
+OPTIMIZE_NICE = int(os.environ.get("AGENTIC_OPTIMIZE_NICE", "10"))
+# Finished jobs kept for status and event replay
+OPTIMIZE_JOBS_KEPT = int(os.environ.get("AGENTIC_OPTIMIZE_JOBS_KEPT", "50"))
+
+# Seconds between two checks of a worker process that sends no event
+_POLL_S = 0.2
+
+
+def limit_cpu(cpus: int, nice: int):
+    """Pins the current process to its first `cpus` CPUs and lowers its priority."""
+    if cpus > 0 and hasattr(os, "sched_setaffinity"):
+        allowed = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, allowed[:cpus])
+    if nice > 0 and hasattr(os, "nice"):
+        os.nice(nice)
+
+
+def run_optimization(request: Dict[str, Any], profile: Dict[str, Any], events, cpus: int, nice: int):
+    """Worker process entry point: compiles the program, sending progress and the outcome on `events`."""
+    limit_cpu(cpus, nice)
+    try:
+        # Imported here: DSPy is only needed in the worker process
+        from app.engine.dspy_optimizer import compile_program
+        result = compile_program(
+            OptimizationRequest(**request),
+            LLMProfile(**profile),
+            on_progress=lambda progress: events.put({"type": "progress", **progress}),
+        )
+        events.put({"type": "completed", "result": result.model_dump()})
+    except Exception as e:
+        events.put({"type": "failed", "error": str(e) or type(e).__name__})
+
+
+@dataclass
+class OptimizationJob:
+    id: str
+    node_id: str
+    status: RunStatus = RunStatus.QUEUED
+    progress: Dict[str, Any] = field(default_factory=dict)  # Latest value of each progress field
+    result: Optional[Dict[str, Any]] = None  # OptimizationResponse once completed
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    log: RunEventLog = field(default_factory=RunEventLog, repr=False)
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+
+class OptimizationJobManager:
+    """
+    Smart node optimizations as background jobs. Each job compiles in its own
+    worker process (pinned to a few CPUs, at a lower priority) so the API
+    event loop and live runs keep going; at most `workers` run at a time.
+    Progress is published as events that clients follow like run events;
+    cancelling a running job terminates its process.
+    """
+
+    def __init__(
+        self,
+        workers: int = OPTIMIZE_WORKERS,
+        cpus: int = OPTIMIZE_CPUS,
+        nice: int = OPTIMIZE_NICE,
+        jobs_kept: int = OPTIMIZE_JOBS_KEPT,
+        target: Callable[..., None] = run_optimization,
+    ):
+        self.workers = max(1, workers)
+        self.cpus = cpus
+        self.nice = nice
+        self.jobs_kept = jobs_kept
+        self.target = target
+        # Spawned, not forked: the API process runs threads (DB pools, aiosqlite) that must not be copied mid-state
+        self._context = multiprocessing.get_context("spawn")
+        self._jobs: "OrderedDict[str, OptimizationJob]" = OrderedDict()
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def stop(self):
+        for job in list(self._jobs.values()):
+            if job.task and not job.task.done():
+                await self.cancel(job.id)
+
+    # --- Submission & status ---
+
+    async def submit(self, request: OptimizationRequest, profile: LLMProfile) -> OptimizationJob:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        job = OptimizationJob(id=str(uuid.uuid4()), node_id=request.node_id)
+        self._jobs[job.id] = job
+        self._forget_finished()
+        await job.log.append({"type": "queued", "job_id": job.id, "node_id": job.node_id})
+        job.task = asyncio.create_task(self._execute(job, request.model_dump(), profile.model_dump()))
+        return job
+
+    def get(self, job_id: str) -> Optional[OptimizationJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[OptimizationJob]:
+        return list(reversed(self._jobs.values()))
+
+    async def cancel(self, job_id: str) -> Optional[OptimizationJob]:
+        job = self._jobs.get(job_id)
+        if job and job.task and not job.task.done():
+            job.task.cancel()
+            await asyncio.gather(job.task, return_exceptions=True)
+        return job
+
+    async def wait(self, job_id: str) -> Optional[OptimizationJob]:
+        job = self._jobs.get(job_id)
+        if job and job.task:
+            await asyncio.gather(asyncio.shield(job.task), return_exceptions=True)
+        return job
+
+    def follow(self, job_id: str, offset: int = 0) -> Optional[AsyncIterator[Dict[str, Any]]]:
+        job = self._jobs.get(job_id)
+        return job.log.follow(offset) if job else None
+
+    # --- Execution ---
+
+    async def _execute(self, job: OptimizationJob, request: Dict[str, Any], profile: Dict[str, Any]):
+        process = None
+        try:
+            async with self._slots:
+                events = self._context.Queue()
+                process = self._context.Process(
+                    target=self.target,
+                    args=(request, profile, events, self.cpus, self.nice),
+                    daemon=True,
+                )
+                process.start()
+                job.status = RunStatus.RUNNING
+                job.started_at = datetime.utcnow()
+                await job.log.append({"type": "started", "pid": process.pid})
+                await self._pump(job, process, events)
+                await asyncio.to_thread(process.join)
+        except asyncio.CancelledError:
+            job.status = RunStatus.CANCELLED
+            await job.log.append({"type": "cancelled"})
+        except Exception as e:
+            job.status = RunStatus.FAILED
+            job.error = str(e)
+            await job.log.append({"type": "failed", "error": job.error})
+        finally:
+            if process is not None and process.is_alive():
+                process.terminate()
+                await asyncio.to_thread(process.join)
+            job.finished_at = datetime.utcnow()
+            await job.log.close()
+
+    async def _pump(self, job: OptimizationJob, process, events):
+        """Relays worker events to the job until the worker reports its outcome or dies."""
+        while True:
+            try:
+                event = await asyncio.to_thread(events.get, True, _POLL_S)
+            except queue.Empty:
+                if not process.is_alive():
+                    # Exited without reporting (crash, OOM kill); drain anything sent just before
+                    try:
+                        event = events.get_nowait()
+                    except queue.Empty:
+                        raise RuntimeError(f"Optimization process exited with code {process.exitcode}")
+                else:
+                    continue
+            if event["type"] == "progress":
+                job.progress.update({k: v for k, v in event.items() if k != "type"})
+            elif event["type"] == "completed":
+                job.result = event["result"]
+                job.status = RunStatus.SUCCEEDED
+            elif event["type"] == "failed":
+                job.error = event["error"]
+                job.status = RunStatus.FAILED
+            await job.log.append(event)
+            if job.status in TERMINAL_STATUSES:
+                return
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in TERMINAL_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.jobs_kept)]:
+            del self._jobs[job_id]
+
+
+optimization_jobs = OptimizationJobManager()
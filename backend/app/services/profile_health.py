@@ -0,0 +1,198 @@
+import asyncio
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from sqlmodel import Session, delete, select
+
+from app.database import engine as default_engine
+from app.models.settings import LLMProfile, ProfileProbe
+from app.services.llm_factory import create_llm_instance
+from app.services.stats import percentile
+
+# Seconds between two probes of every profile. Off by default: each probe is a
+# (small) billed request to every configured provider
+PROFILE_PROBE_INTERVAL_S = float(os.environ.get("AGENTIC_PROFILE_PROBE_INTERVAL_S", "0"))
+# Probes kept per profile for the rolling percentiles and error rate
+PROFILE_PROBE_WINDOW = int(os.environ.get("AGENTIC_PROFILE_PROBE_WINDOW", "50"))
+# A probe slower than this counts as a failure
+PROFILE_PROBE_TIMEOUT_S = float(os.environ.get("AGENTIC_PROFILE_PROBE_TIMEOUT_S", "30"))
+# Profiles probed at the same time
+PROFILE_PROBE_CONCURRENCY = int(os.environ.get("AGENTIC_PROFILE_PROBE_CONCURRENCY", "4"))
+
+# Short, deterministic answer of a few tokens: enough to time the first token and decoding
+PROBE_PROMPT = "Count from 1 to 10, separated by spaces. Reply with the numbers only."
+# Streaming stops after this many chunks, so a chatty model cannot make probes expensive
+PROBE_MAX_CHUNKS = 32
+
+
+async def probe_llm(llm) -> Dict[str, Any]:
+    """Streams the probe prompt through `llm` and times it."""
+    started = time.perf_counter()
+    first_token = None
+    chunks = 0
+    usage_tokens = None
+    async for chunk in llm.astream(PROBE_PROMPT):
+        usage = getattr(chunk, "usage_metadata", None)
+        if usage and usage.get("output_tokens"):
+            usage_tokens = usage["output_tokens"]
+        if not chunk.content:
+            continue
+        if first_token is None:
+            first_token = time.perf_counter()
+        chunks += 1
+        if chunks >= PROBE_MAX_CHUNKS:
+            break
+    finished = time.perf_counter()
+    if first_token is None:
+        raise RuntimeError("Model returned no tokens")
+    tokens = usage_tokens or chunks
+    decode_s = finished - first_token
+    return {
+        "ttft_s": first_token - started,
+        "duration_s": finished - started,
+        "tokens": tokens,
+        # The first token is part of the TTFT, decoding speed is measured over the rest
+        "tokens_per_s": (tokens - 1) / decode_s if tokens > 1 and decode_s > 0 else None,
+    }
+
+
+class ProfileHealthProber:
+    """
+    Periodically sends a tiny streamed prompt to every LLM profile and keeps
+    the last `window` probes per profile (in the database, with an in-memory
+    copy) to report time-to-first-token and tokens/s percentiles and the
+    error rate.
+    """
+
+    def __init__(
+        self,
+        engine=default_engine,
+        llm_factory: Callable[[LLMProfile], Any] = create_llm_instance,
+        interval_s: float = PROFILE_PROBE_INTERVAL_S,
+        window: int = PROFILE_PROBE_WINDOW,
+        timeout_s: float = PROFILE_PROBE_TIMEOUT_S,
+        concurrency: int = PROFILE_PROBE_CONCURRENCY,
+    ):
+        self.engine = engine
+        self.llm_factory = llm_factory
+        self.interval_s = interval_s
+        self.window = window
+        self.timeout_s = timeout_s
+        self.concurrency = max(1, concurrency)
+        self._samples: Dict[int, Deque[ProfileProbe]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        """Loads the probes of a previous process and starts the probe loop."""
+        await asyncio.to_thread(self._load)
+        if self.interval_s > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                print(f"Profile probe cycle failed: {e}")
+            await asyncio.sleep(self.interval_s)
+
+    # --- Probing ---
+
+    async def probe_all(self) -> List[ProfileProbe]:
+        profiles = await asyncio.to_thread(self._profiles)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(profile):
+            async with semaphore:
+                return await self.probe(profile)
+        return list(await asyncio.gather(*(bounded(p) for p in profiles)))
+
+    async def probe(self, profile: LLMProfile) -> ProfileProbe:
+        """Probes one profile now; failures are recorded, not raised."""
+        try:
+            # Building the client may read the API key from the keyring
+            llm = await asyncio.to_thread(self.llm_factory, profile)
+            result = await asyncio.wait_for(probe_llm(llm), self.timeout_s)
+            sample = ProfileProbe(profile_id=profile.id, **result)
+        except asyncio.TimeoutError:
+            sample = ProfileProbe(profile_id=profile.id, duration_s=self.timeout_s, error=f"Timed out after {self.timeout_s:g}s")
+        except Exception as e:
+            sample = ProfileProbe(profile_id=profile.id, error=str(e) or type(e).__name__)
+        return await asyncio.to_thread(self._record, sample)
+
+    # --- Stats ---
+
+    def stats(self, profile_id: int) -> Dict[str, Any]:
+        """Rolling health of a profile over its last probes, for routing and the settings UI."""
+        samples = list(self._samples.get(profile_id, ()))
+        ok = [s for s in samples if not s.error]
+        ttfts = [s.ttft_s for s in ok if s.ttft_s is not None]
+        speeds = [s.tokens_per_s for s in ok if s.tokens_per_s is not None]
+        last = samples[-1] if samples else None
+        return {
+            "profile_id": profile_id,
+            "samples": len(samples),
+            "error_rate": (len(samples) - len(ok)) / len(samples) if samples else None,
+            "healthy": None if last is None else last.error is None,
+            "last_probe_at": last.created_at if last else None,
+            "last_error": next((s.error for s in reversed(samples) if s.error), None),
+            "ttft_p50_s": percentile(ttfts, 0.5),
+            "ttft_p95_s": percentile(ttfts, 0.95),
+            # Slow tail of decoding speed: 5% of probes were slower than this
+            "tokens_per_s_p50": percentile(speeds, 0.5),
+            "tokens_per_s_p5": percentile(speeds, 0.05),
+        }
+
+    def all_stats(self) -> List[Dict[str, Any]]:
+        return [self.stats(profile_id) for profile_id in sorted(self._samples)]
+
+    # --- Persistence ---
+
+    def _profiles(self) -> List[LLMProfile]:
+        with Session(self.engine) as session:
+            return list(session.exec(select(LLMProfile)).all())
+
+    def _load(self):
+        with Session(self.engine) as session:
+            for sample in session.exec(select(ProfileProbe).order_by(ProfileProbe.id)).all():
+                self._window(sample.profile_id).append(sample)
+
+    def _window(self, profile_id: int) -> Deque[ProfileProbe]:
+        if profile_id not in self._samples:
+            self._samples[profile_id] = deque(maxlen=self.window)
+        return self._samples[profile_id]
+
+    def _record(self, sample: ProfileProbe) -> ProfileProbe:
+        samples = self._window(sample.profile_id)
+        with Session(self.engine, expire_on_commit=False) as session:
+            session.add(sample)
+            session.flush()
+            # Only the rolling window is kept
+            if len(samples) == samples.maxlen:
+                session.exec(delete(ProfileProbe).where(
+                    ProfileProbe.profile_id == sample.profile_id, ProfileProbe.id <= samples[0].id
+                ))
+            session.commit()
+        samples.append(sample)
+        return sample
+
+    def forget(self, profile_id: int):
+        """Drops the probes of a deleted profile."""
+        self._samples.pop(profile_id, None)
+        with Session(self.engine) as session:
+            session.exec(delete(ProfileProbe).where(ProfileProbe.profile_id == profile_id))
+            session.commit()
+
+
+profile_prober = ProfileHealthProber()
@@ -0,0 +1,330 @@
+import asyncio
+import itertools
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage
+from sqlmodel import Session, select
+
+from app.database import BASE_DIR, engine as default_engine
+from app.engine.budget import BudgetExceededError, BudgetTracker, RunBudget, budget_exceeded_event, enforce_deadline, with_budget
+from app.engine.cancellation import cancel_and_wait
+from app.engine.events import stream_run_events
+from app.engine.graph_cache import GraphCache, graph_cache as default_graph_cache
+from app.engine.replay import run_metadata
+from app.engine.storage import get_graph_checkpointer
+from app.models.run import Run, RunStatus
+
+# Number of runs executed concurrently by the in-process worker pool
+RUN_WORKERS = int(os.environ.get("AGENTIC_RUN_WORKERS", "4"))
+# Finished runs whose event logs are written here for later replay
+RUNS_DIR = os.environ.get("AGENTIC_RUNS_DIR", os.path.join(BASE_DIR, "resources", "runs"))
+# Finished event logs kept in memory (older ones are replayed from disk)
+RUN_LOGS_IN_MEMORY = int(os.environ.get("AGENTIC_RUN_LOGS_IN_MEMORY", "100"))
+
+TERMINAL_STATUSES = {RunStatus.SUCCEEDED, RunStatus.FAILED, RunStatus.CANCELLED, RunStatus.INTERRUPTED, RunStatus.BUDGET_EXCEEDED}
+
+
+class RunEventLog:
+    """
+    Append-only event log of one run. Any number of clients can follow it from
+    an offset; following never affects the run itself.
+    """
+
+    def __init__(self, events: Optional[List[Dict[str, Any]]] = None, closed: bool = False):
+        self.events: List[Dict[str, Any]] = events or []
+        self.closed = closed
+        self._changed = asyncio.Condition()
+
+    async def append(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        async with self._changed:
+            event = {"seq": len(self.events), **event}
+            self.events.append(event)
+            self._changed.notify_all()
+        return event
+
+    async def close(self):
+        async with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+    async def follow(self, offset: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        position = max(0, offset)
+        while True:
+            async with self._changed:
+                while position >= len(self.events) and not self.closed:
+                    await self._changed.wait()
+                batch = self.events[position:]
+                finished = self.closed
+            for event in batch:
+                yield event
+            position += len(batch)
+            if finished and position >= len(self.events):
+                return
+
+
+class RunManager:
+    """
+    Detached runs: submissions are persisted in the `Run` table and executed
+    by a pool of asyncio workers, independently of any client connection.
+    Clients attach to a run's event log (WS or SSE) and may detach at will.
+    """
+
+    def __init__(
+        self,
+        workers: int = RUN_WORKERS,
+        engine=default_engine,
+        graphs: GraphCache = default_graph_cache,
+        checkpointer_factory: Callable[[], Awaitable[Any]] = get_graph_checkpointer,
+        runs_dir: str = RUNS_DIR,
+    ):
+        self.workers = workers
+        self.engine = engine
+        self.graphs = graphs
+        self.checkpointer_factory = checkpointer_factory
+        self.runs_dir = runs_dir
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._order = itertools.count()
+        self._logs: Dict[str, RunEventLog] = {}
+        self._finished: List[str] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        # Set while the process shuts down: runs cancelled then are interrupted, not stopped by a user
+        self._stopping = False
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._stopping = False
+        os.makedirs(self.runs_dir, exist_ok=True)
+        for queued in await asyncio.to_thread(self._recover):
+            self._enqueue(queued)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _recover(self) -> List[Run]:
+        """Runs that were executing when the process stopped are marked interrupted; queued ones are resumed."""
+        with Session(self.engine) as session:
+            for run in session.exec(select(Run).where(Run.status == RunStatus.RUNNING)).all():
+                run.status = RunStatus.INTERRUPTED
+                run.finished_at = datetime.utcnow()
+                session.add(run)
+            session.commit()
+            return list(session.exec(select(Run).where(Run.status == RunStatus.QUEUED)).all())
+
+    # --- Submission & status ---
+
+    async def submit(
+        self,
+        flow_id: int,
+        user_input: str,
+        thread_id: Optional[str] = None,
+        version: Optional[int] = None,
+        priority: int = 0,
+        recursion_limit: int = 50,
+        budget: Optional[Dict[str, Any]] = None,
+    ) -> Run:
+        run = Run(
+            id=str(uuid.uuid4()),
+            flow_id=flow_id,
+            flow_version=version,
+            thread_id=thread_id or f"run-{uuid.uuid4()}",
+            input=user_input,
+            priority=priority,
+            recursion_limit=recursion_limit,
+            budget=json.dumps(budget) if budget else None,
+        )
+        run = await asyncio.to_thread(self._save, run)
+        self._logs[run.id] = RunEventLog()
+        self._enqueue(run)
+        return run
+
+    def _enqueue(self, run: Run):
+        if self._queue is None:
+            raise RuntimeError("RunManager is not started")
+        self._logs.setdefault(run.id, RunEventLog())
+        # PriorityQueue pops the smallest entry: negate priority, FIFO within a priority
+        self._queue.put_nowait((-run.priority, next(self._order), run.id))
+
+    def _save(self, run: Run) -> Run:
+        with Session(self.engine) as session:
+            session.add(run)
+            session.commit()
+            session.refresh(run)
+            return run
+
+    def _update(self, run_id: str, **fields) -> Optional[Run]:
+        with Session(self.engine) as session:
+            run = session.get(Run, run_id)
+            if run is None:
+                return None
+            for key, value in fields.items():
+                setattr(run, key, value)
+            session.add(run)
+            session.commit()
+            session.refresh(run)
+            return run
+
+    async def get(self, run_id: str) -> Optional[Run]:
+        def load():
+            with Session(self.engine) as session:
+                return session.get(Run, run_id)
+        return await asyncio.to_thread(load)
+
+    async def list(self, limit: int = 50, status: Optional[str] = None) -> List[Run]:
+        def load():
+            with Session(self.engine) as session:
+                statement = select(Run).order_by(Run.created_at.desc()).limit(limit)
+                if status:
+                    statement = statement.where(Run.status == status)
+                return list(session.exec(statement).all())
+        return await asyncio.to_thread(load)
+
+    # --- Execution ---
+
+    async def _worker(self, index: int):
+        while True:
+            _, _, run_id = await self._queue.get()
+            # Each run is its own task so it can be cancelled without losing the worker
+            task = asyncio.create_task(self._execute(run_id))
+            self._running[run_id] = task
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise
+            finally:
+                self._running.pop(run_id, None)
+                self._queue.task_done()
+            if not task.cancelled() and task.exception():
+                print(f"Run worker {index} failed on {run_id}: {task.exception()}")
+
+    async def cancel(self, run_id: str) -> Tuple[Optional[Run], Optional[float]]:
+        """Stops a queued or running run. Returns the run and how long its work took to release (ms)."""
+        task = self._running.get(run_id)
+        if task is not None:
+            released_ms = await cancel_and_wait(task, "stop")
+            return await self.get(run_id), released_ms
+
+        run = await self.get(run_id)
+        if run is None or run.status != RunStatus.QUEUED:
+            return run, None
+        run = await asyncio.to_thread(self._update, run_id, status=RunStatus.CANCELLED, finished_at=datetime.utcnow())
+        log = self._logs.setdefault(run_id, RunEventLog())
+        await log.append({"type": "cancelled"})
+        await log.close()
+        await asyncio.to_thread(self._persist_log, run_id, log)
+        self._retire_log(run_id)
+        return run, 0.0
+
+    async def _execute(self, run_id: str):
+        run = await self.get(run_id)
+        if run is None or run.status != RunStatus.QUEUED:
+            # Cancelled while waiting in the queue
+            return
+        run = await asyncio.to_thread(self._update, run_id, status=RunStatus.RUNNING, started_at=datetime.utcnow())
+        log = self._logs.setdefault(run_id, RunEventLog())
+        status, output, error = RunStatus.SUCCEEDED, None, None
+        try:
+            cached = await asyncio.to_thread(self.graphs.get, run.flow_id, run.flow_version)
+            if run.flow_version is None:
+                await asyncio.to_thread(self._update, run_id, flow_version=cached.version)
+            await log.append({"type": "run_started", "run_id": run_id, "flow_id": run.flow_id, "version": cached.version, "thread_id": run.thread_id})
+
+            app = cached.bind(await self.checkpointer_factory())
+            inputs = {"messages": [HumanMessage(content=run.input)]}
+            config = {
+                "configurable": {"thread_id": run.thread_id},
+                "recursion_limit": run.recursion_limit,
+                "metadata": run_metadata(cached.graph_data),
+            }
+            tracker = BudgetTracker(RunBudget.from_request(json.loads(run.budget) if run.budget else None, cached.graph_data))
+            config = with_budget(config, tracker)
+            async with enforce_deadline(tracker):
+                async for ui_event in stream_run_events(app, inputs, config):
+                    await log.append(ui_event)
+
+            state = await app.aget_state({"configurable": {"thread_id": run.thread_id}})
+            messages = state.values.get("messages", []) if state else []
+            if messages:
+                output = str(messages[-1].content)
+            await log.append({"type": "done", "usage": tracker.usage()})
+        except BudgetExceededError as e:
+            status, error = RunStatus.BUDGET_EXCEEDED, str(e)
+            await log.append(await budget_exceeded_event(app, run.thread_id, e))
+        except asyncio.CancelledError:
+            status = RunStatus.INTERRUPTED if self._stopping else RunStatus.CANCELLED
+            await log.append({"type": status.value})
+            raise
+        except Exception as e:
+            status, error = RunStatus.FAILED, str(e)
+            await log.append({"type": "error", "message": str(e)})
+        finally:
+            await log.close()
+            await asyncio.to_thread(
+                self._update, run_id,
+                status=status, output=output, error=error,
+                event_count=len(log.events), finished_at=datetime.utcnow(),
+            )
+            await asyncio.to_thread(self._persist_log, run_id, log)
+            self._retire_log(run_id)
+
+    # --- Event logs ---
+
+    def _log_path(self, run_id: str) -> str:
+        return os.path.join(self.runs_dir, f"{run_id}.jsonl")
+
+    def _persist_log(self, run_id: str, log: RunEventLog):
+        tmp_path = self._log_path(run_id) + ".tmp"
+        with open(tmp_path, "w") as f:
+            for event in log.events:
+                f.write(json.dumps(event) + "\n")
+        os.replace(tmp_path, self._log_path(run_id))
+
+    def _retire_log(self, run_id: str):
+        self._finished.append(run_id)
+        while len(self._finished) > RUN_LOGS_IN_MEMORY:
+            self._logs.pop(self._finished.pop(0), None)
+
+    async def _load_log(self, run_id: str) -> Optional[RunEventLog]:
+        log = self._logs.get(run_id)
+        if log is not None:
+            return log
+        path = self._log_path(run_id)
+        if not os.path.exists(path):
+            return None
+
+        def read():
+            with open(path) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        return RunEventLog(await asyncio.to_thread(read), closed=True)
+
+    async def follow(self, run_id: str, offset: int = 0) -> Optional[AsyncIterator[Dict[str, Any]]]:
+        """Event stream of a run from `offset`; None if the run has no log (unknown run)."""
+        log = await self._load_log(run_id)
+        if log is None:
+            run = await self.get(run_id)
+            if run is None:
+                return None
+            # Known run whose log is gone (e.g. interrupted before it was persisted)
+            log = RunEventLog(closed=run.status in TERMINAL_STATUSES)
+            if not log.closed:
+                self._logs[run_id] = log
+        return log.follow(offset)
+
+
+# Process-wide manager, started in the app lifespan
+run_manager = RunManager()
@@ -0,0 +1,94 @@
+"""
+Bytes per checkpoint and write/read latency for the checkpoint formats.
+
+Simulates conversations that grow by one user and one agent message per
+superstep, and stores every superstep as a checkpoint with:
+  - default: LangGraph's msgpack serializer (previous format)
+  - compact: msgpack + zstd with a trained dictionary
+  - compact+dedup: compact, with messages stored once and referenced
+
+Usage (from backend/):
+    python -m benchmarks.bench_checkpoint_serde --threads 5 --turns 40
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+
+from app.engine.serde import CompactSerializer
+from app.engine.storage import open_checkpointer, close_checkpointer
+
+WORDS = "the agent tool result context flow node input output user answer question data plan step".split()
+
+
+def make_text(rnd: random.Random, words: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(words))
+
+
+async def bench_format(path: str, serde, dedup: bool, threads: int, turns: int):
+    saver = await open_checkpointer(path, serde=serde, dedup=dedup)
+    rnd = random.Random(0)
+    write_latencies, read_latencies = [], []
+    for t in range(threads):
+        config = {"configurable": {"thread_id": f"thread-{t}", "checkpoint_ns": ""}}
+        messages = []
+        for turn in range(turns):
+            messages = messages + [
+                HumanMessage(content=make_text(rnd, 40), id=f"h-{t}-{turn}"),
+                AIMessage(content=make_text(rnd, 250), id=f"a-{t}-{turn}", name="agent_1"),
+            ]
+            checkpoint = empty_checkpoint()
+            checkpoint["channel_values"] = {"messages": messages, "context": {"turn": turn}, "last_sender": "agent_1"}
+            started = time.perf_counter()
+            config = await saver.aput(config, checkpoint, {"step": turn}, {})
+            write_latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await saver.aget_tuple({"configurable": {"thread_id": f"thread-{t}"}})
+            read_latencies.append(time.perf_counter() - started)
+
+    async with saver.conn.execute("SELECT COUNT(*), SUM(LENGTH(checkpoint)) FROM checkpoints") as cur:
+        count, checkpoint_bytes = await cur.fetchone()
+    async with saver.conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM checkpoint_blobs") as cur:
+        (blob_bytes,) = await cur.fetchone()
+    await close_checkpointer(saver)
+    return {
+        "bytes_per_checkpoint": (checkpoint_bytes + blob_bytes) / count,
+        "write_ms": statistics.mean(write_latencies) * 1000,
+        "read_ms": statistics.mean(read_latencies) * 1000,
+        "file_bytes": os.path.getsize(path),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=40)
+    args = parser.parse_args()
+
+    formats = [
+        ("default", lambda: None, False),
+        ("compact", CompactSerializer, False),
+        ("compact+dedup", CompactSerializer, True),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = None
+        for name, make_serde, dedup in formats:
+            result = await bench_format(os.path.join(tmp, f"{name}.sqlite"), make_serde(), dedup, args.threads, args.turns)
+            baseline = baseline or result["bytes_per_checkpoint"]
+            print(
+                f"{name:<14} bytes/checkpoint={result['bytes_per_checkpoint']:>10.0f} "
+                f"({baseline / result['bytes_per_checkpoint']:5.1f}x smaller)  "
+                f"write={result['write_ms']:6.2f}ms  read={result['read_ms']:6.2f}ms  "
+                f"file={result['file_bytes'] / 1024:8.0f}KiB"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+Checkpoint write latency under concurrent runs.
+
+Compares the previous setup (one AsyncSqliteSaver connection per run, one
+commit per write) with the shared, tuned PooledSqliteSaver.
+
+Usage (from backend/):
+    python -m benchmarks.bench_checkpointer --runs 50 --steps 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from app.engine.storage import open_checkpointer, close_checkpointer
+
+
+def make_checkpoint(step: int):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {
+        "messages": [HumanMessage(content="question " * 20)]
+        + [AIMessage(content=f"answer {i} " * 40) for i in range(step)],
+        "context": {"step": step},
+    }
+    return checkpoint
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_writes(saver, thread_id: str, steps: int, latencies: list):
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    for step in range(steps):
+        started = time.perf_counter()
+        config = await saver.aput(config, make_checkpoint(step), {"step": step}, {})
+        latencies.append(time.perf_counter() - started)
+
+
+async def bench_per_run_connection(path: str, runs: int, steps: int):
+    latencies = []
+
+    async def one_run(i):
+        # Previous behaviour: every run opens its own connection
+        async with AsyncSqliteSaver.from_conn_string(path) as saver:
+            await run_writes(saver, f"baseline-{i}", steps, latencies)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_run(i) for i in range(runs)))
+    return latencies, time.perf_counter() - started
+
+
+async def bench_shared(path: str, runs: int, steps: int):
+    latencies = []
+    saver = await open_checkpointer(path)
+    started = time.perf_counter()
+    await asyncio.gather(*(run_writes(saver, f"shared-{i}", steps, latencies) for i in range(runs)))
+    elapsed = time.perf_counter() - started
+    commits = saver.commits
+    await close_checkpointer(saver)
+    return latencies, elapsed, commits
+
+
+def report(name, latencies, elapsed, extra=""):
+    ms = [l * 1000 for l in latencies]
+    print(
+        f"{name:<22} writes={len(ms):>5}  p50={statistics.median(ms):7.2f}ms  "
+        f"p95={percentile(ms, 95):7.2f}ms  p99={percentile(ms, 99):7.2f}ms  "
+        f"total={elapsed:6.2f}s  throughput={len(ms) / elapsed:8.1f} writes/s {extra}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--steps", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        latencies, elapsed = await bench_per_run_connection(os.path.join(tmp, "baseline.sqlite"), args.runs, args.steps)
+        report("per-run connection", latencies, elapsed)
+
+        latencies, elapsed, commits = await bench_shared(os.path.join(tmp, "shared.sqlite"), args.runs, args.steps)
+        report("shared + group commit", latencies, elapsed, f"commits={commits}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""
+Autosave traffic and history growth: full PUT saves vs JSON Patch saves.
+
+Simulates an editor session on a large flow where every autosave moves one
+node, and measures for each save mode:
+  - request bytes sent by the client
+  - response bytes returned
+  - bytes added to the flow history per save (snapshots + deltas), against
+    the flow size that a full copy per version would store
+  - mean save latency
+
+Usage (from backend/):
+    python -m benchmarks.bench_flow_patch --nodes 500 --saves 200
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+from app.database import get_session
+from app.main import app
+from app.models.flow_version import FlowVersion
+
+
+def make_flow(nodes: int) -> dict:
+    return {
+        "nodes": [
+            {
+                "id": f"node-{i}",
+                "type": "agent",
+                "position": {"x": i * 40, "y": i * 20},
+                "data": {"label": f"Agent {i}", "system_prompt": "You are a helpful assistant. " * 20, "tools": []},
+            }
+            for i in range(nodes)
+        ],
+        "edges": [{"id": f"e-{i}", "source": f"node-{i}", "target": f"node-{i + 1}"} for i in range(nodes - 1)],
+        "viewport": {"x": 0, "y": 0, "zoom": 1},
+    }
+
+
+def bench_mode(mode: str, nodes: int, saves: int) -> dict:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    session = Session(engine)
+    app.dependency_overrides[get_session] = lambda: session
+    client = TestClient(app)
+
+    rnd = random.Random(0)
+    graph = make_flow(nodes)
+    flow = client.post("/api/flows", json={"name": "Bench", "data": json.dumps(graph)}).json()
+    base_hash = flow["data_hash"]
+    request_bytes, response_bytes, latencies = 0, 0, []
+
+    for _ in range(saves):
+        index = rnd.randrange(nodes)
+        x, y = rnd.randint(0, 5000), rnd.randint(0, 5000)
+        graph["nodes"][index]["position"] = {"x": x, "y": y}
+        if mode == "put":
+            body = json.dumps({"data": json.dumps(graph)})
+            started = time.perf_counter()
+            res = client.put(f"/api/flows/{flow['id']}", content=body, headers={"Content-Type": "application/json"})
+        else:
+            patch = [{"op": "replace", "path": f"/nodes/{index}/position", "value": {"x": x, "y": y}}]
+            body = json.dumps({"base_hash": base_hash, "patch": patch})
+            started = time.perf_counter()
+            res = client.patch(f"/api/flows/{flow['id']}", content=body, headers={"Content-Type": "application/json"})
+            base_hash = res.json()["data_hash"]
+        latencies.append(time.perf_counter() - started)
+        request_bytes += len(body)
+        response_bytes += len(res.content)
+
+    history_bytes = session.exec(select(func.sum(FlowVersion.size))).first() or 0
+    session.close()
+    app.dependency_overrides.clear()
+    return {
+        "request_bytes": request_bytes / saves,
+        "response_bytes": response_bytes / saves,
+        "history_bytes": history_bytes / (saves + 1),
+        "save_ms": statistics.mean(latencies) * 1000,
+        "flow_bytes": len(json.dumps(graph)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=500)
+    parser.add_argument("--saves", type=int, default=200)
+    args = parser.parse_args()
+
+    baseline = None
+    for mode in ("put", "patch"):
+        result = bench_mode(mode, args.nodes, args.saves)
+        baseline = baseline or result
+        print(
+            f"{mode:<6} request={result['request_bytes']:>10.0f}B "
+            f"({baseline['request_bytes'] / result['request_bytes']:7.1f}x smaller)  "
+            f"response={result['response_bytes']:>10.0f}B  "
+            f"history/save={result['history_bytes']:>10.0f}B "
+            f"({result['flow_bytes'] / result['history_bytes']:6.1f}x smaller than a copy)  "
+            f"save={result['save_ms']:6.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
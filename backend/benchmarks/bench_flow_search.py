@@ -0,0 +1,111 @@
+"""
+Flow search latency at scale: the FTS5 index vs scanning every flow blob.
+
+Generates `--flows` flows with agents, tools, prompts and smart nodes, then
+times the search endpoint's query (ranked, with snippets) against the
+previous approach of loading all `Flow.data` and matching in Python.
+
+Usage (from backend/):
+    python -m benchmarks.bench_flow_search --flows 20000 --queries 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlmodel import Session, SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import create_async_db_engine, create_db_engine
+from app.models.flow import Flow
+from app.services.flow_search import ensure_search_index, search_flows
+
+WORDS = "customer invoice summary sentiment lyrics translate review ticket triage refund report legal contract email".split()
+TOOLS = ["read_local_file", "write_local_file", "web_search", "sql_query", "send_email", "calendar"]
+# Domain vocabulary: each term only appears in a few hundred flows
+TERMS = [f"term{i}" for i in range(5000)]
+
+
+def make_flow(rnd: random.Random, index: int) -> Flow:
+    nodes = []
+    for n in range(rnd.randint(2, 12)):
+        if rnd.random() < 0.2:
+            nodes.append({"id": f"s{n}", "type": "smart_node", "data": {
+                "label": f"{rnd.choice(WORDS)} classifier", "goal": " ".join(rnd.choices(WORDS, k=4) + rnd.choices(TERMS, k=8)),
+                "llm_profile": {"id": rnd.randint(1, 20), "name": f"profile-{rnd.randint(1, 20)}"},
+            }})
+        else:
+            nodes.append({"id": f"a{n}", "type": "agent", "data": {
+                "label": f"{rnd.choice(WORDS)} agent", "system_prompt": " ".join(rnd.choices(WORDS, k=20) + rnd.choices(TERMS, k=40)),
+                "tools": rnd.sample(TOOLS, rnd.randint(0, 2)), "modelId": rnd.randint(1, 20),
+            }})
+    return Flow(name=f"{rnd.choice(WORDS)} flow {index}", data=json.dumps({"nodes": nodes, "edges": []}))
+
+
+def scan_search(engine, query: str):
+    """Previous approach: load every blob and match client-side."""
+    words = query.lower().split()
+    with Session(engine) as session:
+        return [f.id for f in session.exec(select(Flow)).all() if all(w in f.data.lower() or w in f.name.lower() for w in words)][:20]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--flows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scan-queries", type=int, default=5)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    # "selective": domain terms and tool names; "broad": words most flows contain (worst case for ranking)
+    query_sets = {
+        "selective": [rnd.choice([rnd.choice(TERMS), f"{rnd.choice(TERMS)} {rnd.choice(WORDS)}", "send_email", "profile-7"]) for _ in range(args.queries)],
+        "broad": [rnd.choice([*WORDS, "refund tick"]) for _ in range(args.queries)],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "search.db")
+        engine = create_db_engine(f"sqlite:///{path}")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            for i in range(args.flows):
+                session.add(make_flow(rnd, i))
+            session.commit()
+
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DELETE FROM flow_search")
+        started = time.perf_counter()
+        ensure_search_index(engine)
+        print(f"index build: {args.flows} flows in {time.perf_counter() - started:.1f}s")
+
+        async_engine = create_async_db_engine(f"sqlite+aiosqlite:///{path}")
+        medians = {}
+        async with AsyncSession(async_engine) as session:
+            for name, queries in query_sets.items():
+                latencies = []
+                for query in queries:
+                    started = time.perf_counter()
+                    await search_flows(session, query)
+                    latencies.append(time.perf_counter() - started)
+                latencies.sort()
+                medians[name] = statistics.median(latencies)
+                print(
+                    f"fts5 {name:<9} p50={medians[name] * 1000:7.2f}ms  "
+                    f"p95={latencies[int(0.95 * len(latencies))] * 1000:7.2f}ms"
+                )
+        await async_engine.dispose()
+
+        scans = []
+        for query in query_sets["selective"][:args.scan_queries]:
+            started = time.perf_counter()
+            scan_search(engine, query)
+            scans.append(time.perf_counter() - started)
+        print(f"blob scan      p50={statistics.median(scans) * 1000:7.2f}ms  ({statistics.median(scans) / medians['selective']:.0f}x slower than selective)")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
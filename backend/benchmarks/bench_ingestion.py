@@ -0,0 +1,82 @@
+"""
+Documents per second of RAG ingestion: first run, unchanged re-run and partial edit.
+
+Writes `--docs` markdown files of a few sections each and ingests them with
+an embedder answering after `--embed-latency-ms` per request (a remote or
+local model's round trip), first with one request in flight, then with
+`--concurrency`. Then re-ingests unchanged files (hash check only) and
+with `--changed` of them edited in one section (only new chunks embedded).
+
+Usage (from backend/):
+    python -m benchmarks.bench_ingestion --docs 500 --embed-latency-ms 50 --batch-size 64 --concurrency 4
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from unittest.mock import patch
+
+from app.engine.embeddings import HashingEmbedder
+from app.engine.ingestion import ingest
+from app.engine.vector_store import VectorStore
+
+WORDS = "invoice refund shipping delivery europe office holiday payment customer order warranty return parcel".split()
+
+
+def write_docs(root: str, count: int, sections: int, seed: int = 0):
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    for i in range(count):
+        body = "\n\n".join(f"# Section {s}\n" + " ".join(rng.choice(WORDS) for _ in range(150)) for s in range(sections))
+        with open(os.path.join(root, f"doc{i:05d}.md"), "w") as f:
+            f.write(body)
+
+
+def edit_docs(root: str, count: int):
+    for i in range(count):
+        path = os.path.join(root, f"doc{i:05d}.md")
+        with open(path) as f:
+            text = f.read()
+        with open(path, "w") as f:
+            f.write(text.replace("# Section 0\n", "# Section 0\nrevised ", 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--sections", type=int, default=6)
+    parser.add_argument("--changed", type=float, default=0.1)
+    parser.add_argument("--embed-latency-ms", type=float, default=50)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    embed = HashingEmbedder.embed
+
+    def slow_embed(self, texts):
+        time.sleep(args.embed_latency_ms / 1000)
+        return embed(self, texts)
+
+    with tempfile.TemporaryDirectory() as tmp, patch.object(HashingEmbedder, "embed", slow_embed):
+        docs = os.path.join(tmp, "docs")
+        write_docs(docs, args.docs, args.sections)
+        store = VectorStore(os.path.join(tmp, "collections"))
+
+        runs = []
+        for concurrency in (1, args.concurrency):
+            collection = store.create(f"bench-{concurrency}")
+            runs.append((f"first run, {concurrency} in flight", ingest(collection, [docs], batch_size=args.batch_size, concurrency=concurrency)))
+        runs.append(("unchanged re-run", ingest(collection, [docs], batch_size=args.batch_size, concurrency=args.concurrency)))
+        edit_docs(docs, int(args.docs * args.changed))
+        runs.append((f"{args.changed:.0%} edited", ingest(collection, [docs], batch_size=args.batch_size, concurrency=args.concurrency)))
+
+    for name, report in runs:
+        print(
+            f"{name:<24} {report['documents_per_s']:9.1f} docs/s  time={report['seconds']:6.2f}s  "
+            f"embedded={report['chunks_embedded']:5d}  reused={report['chunks_reused']:5d}  tombstoned={report['chunks_tombstoned']:4d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Provider calls and wall time of repeated smart node optimizations with the persistent LM cache.
+
+Runs `compile_program` four times against a fake provider that answers
+after `--latency-ms` (behind the real CachedLM, in a temporary cache dir):
+  - cold: empty cache
+  - repeat: same request again (e.g. re-running after a failure elsewhere)
+  - incremental: `--extra` more examples
+  - new goal: reworded instructions, so every prompt changes (nothing to reuse)
+
+Usage (from backend/):
+    python -m benchmarks.bench_lm_cache --examples 40 --extra 10 --latency-ms 50
+"""
+import argparse
+import re
+import tempfile
+import time
+from unittest.mock import patch
+
+import dspy
+from litellm import ModelResponse
+
+from app.engine import dspy_optimizer, lm_cache as lm_cache_module
+from app.engine.dspy_utils import clear_dspy_lms
+from app.engine.lm_cache import LMCallCache
+from app.engine.program_store import ProgramStore
+from app.models.settings import LLMProfile, ProviderType
+from app.schemas.dspy_schema import DSPyExample, OptimizationRequest
+
+
+class FakeProvider:
+    """Answers `category-N` for `ticket-N` after a fixed delay, in DSPy's chat format."""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def forward(self, lm, prompt=None, messages=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency_s)
+        ticket = int(re.findall(r"ticket-(\d+)", messages[-1]["content"])[-1])
+        content = f"[[ ## category ## ]]\ncategory-{ticket % 7}\n\n[[ ## completed ## ]]"
+        return ModelResponse(
+            model=lm.model,
+            choices=[{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            usage={"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110},
+        )
+
+
+def make_request(examples: int, goal: str) -> OptimizationRequest:
+    return OptimizationRequest(
+        node_id="bench", goal=goal, mode="Predict",
+        inputs=[{"name": "ticket", "desc": "Ticket"}], outputs=[{"name": "category", "desc": "Category"}],
+        examples=[DSPyExample(inputs={"ticket": f"ticket-{i}"}, outputs={"category": f"category-{i % 7}"}) for i in range(examples)],
+        llm_profile_id=1, max_rounds=1, eval_threads=8,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--examples", type=int, default=40)
+    parser.add_argument("--extra", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    provider = FakeProvider(args.latency_ms / 1000)
+    profile = LLMProfile(id=1, name="bench", provider=ProviderType.OPENAI, model_id="gpt-4o-mini")
+    runs = [
+        ("cold", make_request(args.examples, "Categorize the ticket.")),
+        ("repeat", make_request(args.examples, "Categorize the ticket.")),
+        ("incremental", make_request(args.examples + args.extra, "Categorize the ticket.")),
+        ("new goal", make_request(args.examples + args.extra, "Categorize the support ticket.")),
+    ]
+    with tempfile.TemporaryDirectory() as tmp, \
+            patch.object(lm_cache_module, "lm_cache", LMCallCache(directory=f"{tmp}/lm_cache")), \
+            patch.object(dspy_optimizer, "lm_cache", lm_cache_module.lm_cache), \
+            patch.object(dspy_optimizer, "program_store", ProgramStore(tmp)), \
+            patch.object(dspy.LM, "forward", lambda lm, **kwargs: provider.forward(lm, **kwargs)):
+        clear_dspy_lms()
+        cold_time = None
+        for name, request in runs:
+            calls_before = provider.calls
+            started = time.perf_counter()
+            result = dspy_optimizer.compile_program(request, profile)
+            elapsed = time.perf_counter() - started
+            cold_time = cold_time or elapsed
+            print(
+                f"{name:<12} provider calls={provider.calls - calls_before:4d}  "
+                f"cache hit rate={result.lm_cache_hit_rate:6.1%}  time={elapsed:6.2f}s ({cold_time / elapsed:5.1f}x)"
+            )
+        print(f"cache: {lm_cache_module.lm_cache.stats()['entries']} entries, {lm_cache_module.lm_cache.stats()['size_bytes'] / 1024:.0f} KiB")
+        clear_dspy_lms()
+
+
+if __name__ == "__main__":
+    main()
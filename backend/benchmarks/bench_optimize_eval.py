@@ -0,0 +1,77 @@
+"""
+Evaluation wall time of a smart node optimization: serial vs parallel dspy.Evaluate.
+
+Runs `compile_program` end to end (baseline evaluation, BootstrapFewShot,
+optimized evaluation) against a local fake LM that answers after
+`--latency-ms`, like a remote provider would, with 1 evaluation thread and
+with `--threads`. Scores are identical; only the evaluation time changes.
+
+Usage (from backend/):
+    python -m benchmarks.bench_optimize_eval --examples 80 --latency-ms 50 --threads 8
+"""
+import argparse
+import tempfile
+import time
+from unittest.mock import patch
+
+from dspy.utils import DummyLM
+
+from app.engine import dspy_optimizer
+from app.engine.program_store import ProgramStore
+from app.models.settings import LLMProfile, ProviderType
+from app.schemas.dspy_schema import DSPyExample, OptimizationRequest
+
+
+class SlowDummyLM(DummyLM):
+    """Answers from a lookup table after a fixed delay."""
+
+    def __init__(self, answers, latency_s: float):
+        super().__init__(answers)
+        self.latency_s = latency_s
+
+    def __call__(self, *args, **kwargs):
+        time.sleep(self.latency_s)
+        return super().__call__(*args, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--examples", type=int, default=80)
+    parser.add_argument("--val-fraction", type=float, default=0.5)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    # One in four answers is wrong, so the scores are not trivially 1.0
+    answers = {f"ticket-{i:04d}": {"category": "refund" if i % 4 == 0 else f"category-{i % 7}"} for i in range(args.examples)}
+    examples = [
+        DSPyExample(inputs={"ticket": f"ticket-{i:04d}"}, outputs={"category": f"category-{i % 7}"})
+        for i in range(args.examples)
+    ]
+    profile = LLMProfile(id=1, name="bench", provider=ProviderType.OPENAI, model_id="gpt-4o-mini")
+
+    baseline = None
+    for threads in (1, args.threads):
+        request = OptimizationRequest(
+            node_id="bench", goal="Categorize the ticket.", mode="Predict",
+            inputs=[{"name": "ticket", "desc": "Ticket"}], outputs=[{"name": "category", "desc": "Category"}],
+            examples=examples, llm_profile_id=1, max_rounds=1,
+            val_fraction=args.val_fraction, eval_threads=threads,
+        )
+        lm = SlowDummyLM(answers, args.latency_ms / 1000)
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch.object(dspy_optimizer, "get_dspy_lm", return_value=lm), \
+                patch.object(dspy_optimizer, "program_store", ProgramStore(tmp)):
+            started = time.perf_counter()
+            result = dspy_optimizer.compile_program(request, profile)
+            total = time.perf_counter() - started
+        baseline = baseline or result
+        print(
+            f"threads={threads:<3} val={result.val_size} baseline={result.baseline_score:.3f} "
+            f"optimized={result.score:.3f}  eval={result.eval_seconds:6.2f}s "
+            f"({baseline.eval_seconds / result.eval_seconds:4.1f}x)  total={total:6.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
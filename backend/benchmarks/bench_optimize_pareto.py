@@ -0,0 +1,110 @@
+"""
+Score vs inference cost of the programs a smart node optimization can produce.
+
+Runs `compile_program` against a fake provider whose accuracy grows with the
+number of demos in the prompt (ChainOfThought helps a little more) and whose
+latency grows with prompt and output tokens, like a real model's:
+  - score: the default objective, BootstrapFewShot's program as compiled
+  - pareto: every mode and demo count measured; the best score within
+    `--max-prompt-tokens` / `--max-p95-ms` is kept
+
+Prints each candidate (mode, demos, score, tokens per call, p95 latency), the
+Pareto frontier and the program each objective keeps.
+
+Usage (from backend/):
+    python -m benchmarks.bench_optimize_pareto --examples 40 --max-prompt-tokens 400
+"""
+import argparse
+import re
+import tempfile
+import time
+from unittest.mock import patch
+
+import dspy
+from litellm import ModelResponse
+
+from app.engine import dspy_optimizer
+from app.engine.program_store import ProgramStore
+from app.models.settings import LLMProfile, ProviderType
+from app.schemas.dspy_schema import DSPyExample, InferenceBudget, OptimizationRequest
+
+
+class FakeProvider:
+    """Answers `category-N` for `ticket-N`, right more often with demos; slower with longer prompts."""
+
+    def __init__(self, base_ms: float, ms_per_prompt_token: float, ms_per_output_token: float):
+        self.base_ms = base_ms
+        self.ms_per_prompt_token = ms_per_prompt_token
+        self.ms_per_output_token = ms_per_output_token
+
+    def forward(self, lm, prompt=None, messages=None, **kwargs):
+        ticket = int(re.findall(r"ticket-(\d+)", messages[-1]["content"])[-1])
+        demos = (len(messages) - 2) // 2
+        chain_of_thought = "`reasoning`" in messages[0]["content"]
+        skill = 4 + min(demos, 4) + (1 if chain_of_thought else 0)
+        category = f"category-{ticket % 7}" if ticket % 10 < skill else "other"
+        reasoning = "[[ ## reasoning ## ]]\nThe ticket mentions a known issue, so it belongs to its usual category.\n\n" if chain_of_thought else ""
+        content = f"{reasoning}[[ ## category ## ]]\n{category}\n\n[[ ## completed ## ]]"
+
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        output_tokens = len(content) // 4
+        time.sleep((self.base_ms + prompt_tokens * self.ms_per_prompt_token + output_tokens * self.ms_per_output_token) / 1000)
+        return ModelResponse(
+            model=lm.model,
+            choices=[{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            usage={"prompt_tokens": prompt_tokens, "completion_tokens": output_tokens, "total_tokens": prompt_tokens + output_tokens},
+        )
+
+
+def make_request(examples: int, objective: str, budget: InferenceBudget = None) -> OptimizationRequest:
+    return OptimizationRequest(
+        node_id="bench", goal="Categorize the ticket.", mode="ChainOfThought",
+        inputs=[{"name": "ticket", "desc": "Ticket"}], outputs=[{"name": "category", "desc": "Category"}],
+        examples=[DSPyExample(inputs={"ticket": f"ticket-{i}"}, outputs={"category": f"category-{i % 7}"}) for i in range(examples)],
+        llm_profile_id=1, max_rounds=1, eval_threads=8, val_fraction=0.5,
+        objective=objective, budget=budget,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--examples", type=int, default=40)
+    parser.add_argument("--max-prompt-tokens", type=float, default=400)
+    parser.add_argument("--max-p95-ms", type=float, default=None)
+    parser.add_argument("--base-ms", type=float, default=20)
+    parser.add_argument("--ms-per-prompt-token", type=float, default=0.05)
+    parser.add_argument("--ms-per-output-token", type=float, default=2)
+    args = parser.parse_args()
+
+    provider = FakeProvider(args.base_ms, args.ms_per_prompt_token, args.ms_per_output_token)
+    profile = LLMProfile(id=1, name="bench", provider=ProviderType.OPENAI, model_id="gpt-4o-mini")
+    budget = InferenceBudget(max_prompt_tokens=args.max_prompt_tokens, max_p95_latency_ms=args.max_p95_ms)
+    with tempfile.TemporaryDirectory() as tmp, \
+            patch.object(dspy_optimizer, "get_dspy_lm", return_value=dspy.LM("openai/gpt-4o-mini", cache=False)), \
+            patch.object(dspy_optimizer, "program_store", ProgramStore(tmp)), \
+            patch.object(dspy.LM, "forward", lambda lm, **kwargs: provider.forward(lm, **kwargs)):
+        default = dspy_optimizer.compile_program(make_request(args.examples, "score"), profile)
+        pareto = dspy_optimizer.compile_program(make_request(args.examples, "pareto", budget), profile)
+
+    print(f"{'mode':<15}{'demos':>6}{'score':>8}{'prompt tok':>12}{'output tok':>12}{'p95 ms':>9}  ")
+    for c in pareto.candidates:
+        flags = " ".join(flag for flag, on in (("pareto", c.pareto), ("over-budget", not c.within_budget), ("<- kept", c.selected)) if on)
+        print(f"{c.mode:<15}{c.demos:>6}{c.score:>8.3f}{c.prompt_tokens:>12.0f}{c.output_tokens:>12.0f}{c.p95_latency_ms:>9.1f}  {flags}")
+    default_candidate = next(c for c in pareto.candidates if (c.mode, c.demos) == (default.mode, default.demos))
+    print(
+        f"score objective : {default.mode} with {default.demos} demos, score={default.score:.3f}, "
+        f"{default_candidate.prompt_tokens:.0f} prompt tokens, p95={default_candidate.p95_latency_ms:.1f}ms"
+    )
+    kept = next((c for c in pareto.candidates if c.selected), None)
+    if kept:
+        print(
+            f"pareto objective: {kept.mode} with {kept.demos} demos, score={kept.score:.3f}, "
+            f"{kept.prompt_tokens:.0f} prompt tokens ({kept.prompt_tokens / default_candidate.prompt_tokens:.0%}), "
+            f"p95={kept.p95_latency_ms:.1f}ms ({kept.p95_latency_ms / default_candidate.p95_latency_ms:.0%})"
+        )
+    else:
+        print("pareto objective: no program fits the budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Request throughput of the REST read paths: sync sessions vs the async engine.
+
+Serves the hot reads (flow list page, single flow, LLM profiles) with:
+  - sync: `def` endpoints on a default SQLite engine, run in FastAPI's
+    thread pool (the previous setup)
+  - async: the app's flow and settings routers on the tuned aiosqlite engine (WAL,
+    busy_timeout, mmap, pooled connections)
+
+while `--writers` clients keep saving flows, as editor autosaves do.
+
+Usage (from backend/):
+    python -m benchmarks.bench_rest_reads --flows 2000 --requests 3000 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import List
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api import flows as flows_api
+from app.api import settings as settings_api
+from app.database import create_async_db_engine, create_db_engine, get_async_session, get_session
+from app.models.flow import Flow
+from app.models.settings import LLMProfile, ProviderType
+from app.schemas.flow import FlowSummary
+
+
+def build_db(path: str, flows: int, profiles: int):
+    engine = create_db_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    rnd = random.Random(0)
+    with Session(engine) as session:
+        for i in range(flows):
+            data = json.dumps({"nodes": [{"id": str(n), "data": {"label": f"node {n}", "system_prompt": "x" * rnd.randint(50, 500)}} for n in range(rnd.randint(2, 30))]})
+            flow = Flow(name=f"Flow {i}", data=data)
+            flow.refresh_summary()
+            session.add(flow)
+        for i in range(profiles):
+            session.add(LLMProfile(name=f"Profile {i}", provider=ProviderType.OPENAI, model_id="gpt-4o"))
+        session.commit()
+    engine.dispose()
+
+
+def sync_app(path: str) -> FastAPI:
+    """The read endpoints as they were: sync handlers on an untuned engine."""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    baseline = FastAPI()
+
+    def session_dep():
+        with Session(engine) as session:
+            yield session
+
+    @baseline.get("/api/flows")
+    def list_flows(limit: int = 50, session: Session = Depends(session_dep)):
+        columns = [getattr(Flow, name) for name in FlowSummary.model_fields]
+        statement = select(*columns).order_by(Flow.updated_at.desc(), Flow.id.desc()).limit(limit)
+        return [dict(row._mapping) for row in session.exec(statement).all()]
+
+    @baseline.get("/api/flows/{flow_id}")
+    def read_flow(flow_id: int, session: Session = Depends(session_dep)):
+        return session.get(Flow, flow_id)
+
+    @baseline.get("/api/settings/models")
+    def list_profiles(session: Session = Depends(session_dep)):
+        return session.exec(select(LLMProfile)).all()
+
+    @baseline.put("/api/flows/{flow_id}")
+    def update_flow(flow_id: int, body: dict, session: Session = Depends(session_dep)):
+        flow = session.get(Flow, flow_id)
+        flow.data = body["data"]
+        session.add(flow)
+        session.commit()
+        return {"ok": True}
+
+    return baseline
+
+
+def async_app(path: str) -> FastAPI:
+    async_engine = create_async_db_engine(f"sqlite+aiosqlite:///{path}")
+    sync_engine = create_db_engine(f"sqlite:///{path}")
+
+    async def async_session_dep():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    def session_dep():
+        with Session(sync_engine) as session:
+            yield session
+
+    tuned = FastAPI()
+    tuned.include_router(flows_api.router, prefix="/api")
+    tuned.include_router(settings_api.router, prefix="/api")
+    tuned.dependency_overrides[get_async_session] = async_session_dep
+    tuned.dependency_overrides[get_session] = session_dep
+    return tuned
+
+
+async def run_load(target: FastAPI, flows: int, requests: int, concurrency: int, writers: int):
+    rnd = random.Random(1)
+    paths = [
+        *(["/api/flows?limit=50"] * 3),
+        *(f"/api/flows/{rnd.randint(1, flows)}" for _ in range(6)),
+        "/api/settings/models",
+    ]
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+    stop = asyncio.Event()
+    writes = 0
+
+    transport = httpx.ASGITransport(app=target)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def reader():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                path = rnd.choice(paths)
+                started = time.perf_counter()
+                res = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                if res.status_code != 200:
+                    errors += 1
+
+        async def writer():
+            nonlocal writes
+            while not stop.is_set():
+                flow_id = rnd.randint(1, flows)
+                data = json.dumps({"nodes": [{"id": "1", "data": {"label": f"saved {writes}"}}]})
+                await client.put(f"/api/flows/{flow_id}", json={"data": data})
+                writes += 1
+
+        writer_tasks = [asyncio.create_task(writer()) for _ in range(writers)]
+        started = time.perf_counter()
+        await asyncio.gather(*(reader() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*writer_tasks)
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * len(latencies))] * 1000,
+        "errors": errors,
+        "writes": writes,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--flows", type=int, default=2000)
+    parser.add_argument("--profiles", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--writers", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = None
+        for name, make_app in (("sync", sync_app), ("async", async_app)):
+            path = os.path.join(tmp, f"{name}.db")
+            build_db(path, args.flows, args.profiles)
+            result = await run_load(make_app(path), args.flows, args.requests, args.concurrency, args.writers)
+            baseline = baseline or result
+            print(
+                f"{name:<6} {result['rps']:8.0f} req/s ({result['rps'] / baseline['rps']:4.2f}x)  "
+                f"p50={result['p50_ms']:7.2f}ms  p95={result['p95_ms']:7.2f}ms  "
+                f"errors={result['errors']}  concurrent saves={result['writes']}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+"""
+Per-call overhead of a SmartNode: rebuilding the module on every call vs the module cache.
+
+Each call runs the node's ChainOfThought module (with compiled few-shot
+demos loaded from disk) against an in-process LM that answers instantly,
+so the timings are the framework overhead a real provider call pays on top
+of its own latency:
+  - rebuild: make_signature + ChainOfThought + dspy.LM + compiled program
+    load per call (the previous SmartNode.invoke)
+  - cached: SmartNode.invoke with the module cache
+
+Usage (from backend/):
+    python -m benchmarks.bench_smart_node --calls 500 --demos 8
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from unittest.mock import patch
+
+import dspy
+from dspy.utils import DummyLM
+
+from app.engine import smart_node_cache
+from app.engine.program_store import ProgramStore, signature_definition, signature_hash
+from app.engine.dspy_utils import get_dspy_lm
+from app.models.settings import LLMProfile, ProviderType
+from app.nodes.smart_node import SmartNode
+
+NODE_DATA = {
+    "label": "Classifier",
+    "mode": "ChainOfThought",
+    "inputs": [{"name": "ticket", "desc": "Support ticket"}],
+    "outputs": [{"name": "category", "desc": "Ticket category"}, {"name": "priority", "desc": "low, normal or high"}],
+    "goal": "Classify the support ticket.",
+    "llm_profile": {"id": 1, "name": "bench", "provider": "openai", "model_id": "gpt-4o-mini"},
+}
+ANSWER = {"reasoning": "It is about billing.", "category": "billing", "priority": "normal"}
+
+
+SIGNATURE = (NODE_DATA["mode"], NODE_DATA["goal"], NODE_DATA["inputs"], NODE_DATA["outputs"])
+
+
+def write_compiled_program(store: ProgramStore, node_id: str, demos: int):
+    module = smart_node_cache.build_module(node_id, NODE_DATA["mode"], NODE_DATA["goal"], NODE_DATA["inputs"], NODE_DATA["outputs"])
+    module.predict.demos = [
+        dspy.Example(ticket=f"I was charged twice for order {i}", **ANSWER).with_inputs("ticket")
+        for i in range(demos)
+    ]
+    store.save(signature_definition(*SIGNATURE), module.dump_state(), {"node_id": node_id})
+
+
+async def rebuild_call(store: ProgramStore, node_id: str, lm, state):
+    """The previous SmartNode.invoke: everything built per call."""
+    get_dspy_lm(LLMProfile(**NODE_DATA["llm_profile"]))
+    module = smart_node_cache.build_module(node_id, NODE_DATA["mode"], NODE_DATA["goal"], NODE_DATA["inputs"], NODE_DATA["outputs"])
+    record = store.load(signature_hash(*SIGNATURE))
+    if record:
+        module.load_state(record["program"])
+    with dspy.context(lm=lm):
+        return await module.acall(ticket=state["ticket"])
+
+
+async def measure(call, calls: int):
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies), statistics.mean(latencies)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--demos", type=int, default=8)
+    args = parser.parse_args()
+
+    lm = DummyLM([ANSWER] * (2 * args.calls + 10))
+    state = {"ticket": "My invoice shows the wrong amount"}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ProgramStore(tmp)
+        node_id = "bench"
+        write_compiled_program(store, node_id, args.demos)
+        node = SmartNode(node_id, NODE_DATA)
+
+        rebuild = await measure(lambda: rebuild_call(store, node_id, lm, state), args.calls)
+        # The node's own LM is swapped for the instant one; get_dspy_lm still runs per call
+        with patch("app.nodes.smart_node.get_dspy_lm", lambda profile: (get_dspy_lm(profile), lm)[1]), \
+                patch.object(smart_node_cache.smart_node_modules, "store", store):
+            cached = await measure(lambda: node.invoke(state), args.calls)
+
+    for name, (median, mean) in (("rebuild", rebuild), ("cached", cached)):
+        print(f"{name:<8} p50={median * 1000:7.3f}ms  mean={mean * 1000:7.3f}ms  ({rebuild[0] / median:4.1f}x)")
+    print(f"cache: {smart_node_cache.smart_node_modules.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
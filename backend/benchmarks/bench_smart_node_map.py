@@ -0,0 +1,133 @@
+"""
+Throughput of a SmartNode over a list input: looping through the graph vs map mode.
+
+A fake provider (behind the real dspy.LM async path) answers after
+`--latency-ms`, plus `--per-item-ms` for every element of a batched request:
+  - graph loop: one superstep (and checkpoint) per element, the way flows
+    had to iterate before map mode
+  - map: one SmartNode step, `--concurrency` requests in flight
+  - map + batch: the same with `--batch-size` elements per request
+
+Usage (from backend/):
+    python -m benchmarks.bench_smart_node_map --items 200 --latency-ms 100 --concurrency 8 --batch-size 10
+"""
+import argparse
+import asyncio
+import json
+import re
+import tempfile
+import time
+from typing import Annotated, Any, Dict, List
+from unittest.mock import patch
+
+import dspy
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, StateGraph
+from litellm import ModelResponse
+from typing_extensions import TypedDict
+
+from app.engine import smart_node_cache
+from app.engine.program_store import ProgramStore
+from app.engine.state import merge_dicts
+from app.nodes.smart_node import SmartNode
+
+NODE_DATA = {
+    "label": "Tagger",
+    "mode": "Predict",
+    "inputs": [{"name": "item", "desc": "Product review"}],
+    "outputs": [{"name": "tag", "desc": "Review topic"}],
+    "goal": "Tag the review with its topic.",
+    "llm_profile": {"id": 1, "name": "bench", "provider": "openai", "model_id": "gpt-4o-mini"},
+}
+
+
+class FakeProvider:
+    def __init__(self, latency_s: float, per_item_s: float):
+        self.latency_s = latency_s
+        self.per_item_s = per_item_s
+        self.requests = 0
+
+    async def aforward(self, lm, prompt=None, messages=None, **kwargs):
+        self.requests += 1
+        section = messages[-1]["content"].split("[[ ## item ## ]]")[-1].split("[[ ##")[0]
+        items = re.findall(r"review-(\d+)", section)
+        await asyncio.sleep(self.latency_s + self.per_item_s * len(items))
+        tags = [f"topic-{int(i) % 5}" for i in items]
+        # Batched requests carry the elements as a JSON list and expect one back
+        answer = json.dumps(tags) if section.strip().startswith("[") else tags[0]
+        content = f"[[ ## tag ## ]]\n{answer}\n\n[[ ## completed ## ]]"
+        return ModelResponse(
+            model=lm.model,
+            choices=[{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            usage={"prompt_tokens": 100, "completion_tokens": 5 * len(items), "total_tokens": 100 + 5 * len(items)},
+        )
+
+
+class LoopState(TypedDict):
+    context: Annotated[Dict[str, Any], merge_dicts]
+    index: int
+    tags: List[Any]
+
+
+def graph_loop(node: SmartNode):
+    """The pre-map pattern: a node that handles one element, then loops back."""
+    async def step(state: LoopState):
+        item = state["context"]["items"][state["index"]]
+        result = await node.invoke({"item": item})
+        return {"index": state["index"] + 1, "tags": state["tags"] + [result["tag"]]}
+
+    def more(state: LoopState):
+        return "step" if state["index"] < len(state["context"]["items"]) else END
+
+    workflow = StateGraph(LoopState)
+    workflow.add_node("step", step)
+    workflow.add_edge(START, "step")
+    workflow.add_conditional_edges("step", more)
+    return workflow.compile(checkpointer=MemorySaver())
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--per-item-ms", type=float, default=2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=10)
+    args = parser.parse_args()
+
+    provider = FakeProvider(args.latency_ms / 1000, args.per_item_ms / 1000)
+    items = [f"review-{i}: the product arrived late" for i in range(args.items)]
+    expected = [f"topic-{i % 5}" for i in range(args.items)]
+    runs = [
+        ("graph loop", None),
+        ("map", SmartNode("tagger", {**NODE_DATA, "map_input": "item", "map_concurrency": args.concurrency})),
+        ("map + batch", SmartNode("tagger", {**NODE_DATA, "map_input": "item", "map_concurrency": args.concurrency, "map_batch_size": args.batch_size})),
+    ]
+    with tempfile.TemporaryDirectory() as tmp, \
+            patch.object(smart_node_cache.smart_node_modules, "store", ProgramStore(tmp)), \
+            patch("app.nodes.smart_node.get_dspy_lm", lambda profile: dspy.LM("openai/gpt-4o-mini", cache=False)), \
+            patch.object(dspy.LM, "aforward", lambda lm, **kwargs: provider.aforward(lm, **kwargs)):
+        baseline = None
+        for name, node in runs:
+            requests_before = provider.requests
+            started = time.perf_counter()
+            if node is None:
+                app = graph_loop(SmartNode("tagger", NODE_DATA))
+                state = await app.ainvoke(
+                    {"context": {"items": items}, "index": 0, "tags": []},
+                    {"configurable": {"thread_id": "bench"}, "recursion_limit": args.items + 10},
+                )
+                tags = state["tags"]
+            else:
+                tags = (await node.invoke({"context": {"item": items}}))["tag"]
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            accuracy = sum(tag == want for tag, want in zip(tags, expected)) / args.items
+            print(
+                f"{name:<12} {args.items / elapsed:8.1f} items/s  time={elapsed:6.2f}s ({baseline / elapsed:5.1f}x)  "
+                f"requests={provider.requests - requests_before:4d}  correct={accuracy:.0%}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
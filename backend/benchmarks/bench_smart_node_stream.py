@@ -0,0 +1,96 @@
+"""
+Time to first visible token of a ChainOfThought SmartNode, with and without streaming.
+
+Runs a one-node graph through `stream_run_events` (the run event stream the
+UI reads) against a fake provider streaming `--chunks` chunks of reasoning
+then the answer, one every `--chunk-ms`:
+  - whole: `stream` off, the answer appears when the node returns
+  - streamed: `smart_node_token` events forwarded as `token` events
+
+Usage (from backend/):
+    python -m benchmarks.bench_smart_node_stream --chunks 60 --chunk-ms 20 --runs 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from unittest.mock import patch
+
+import dspy
+from langgraph.graph import END, START, StateGraph
+from litellm import ModelResponse, ModelResponseStream
+from litellm.types.utils import Delta, StreamingChoices
+from typing_extensions import TypedDict
+
+from app.engine.events import stream_run_events
+from app.nodes.smart_node import SmartNode
+
+NODE_DATA = {
+    "label": "Explainer",
+    "mode": "ChainOfThought",
+    "inputs": [{"name": "question", "desc": "Question"}],
+    "outputs": [{"name": "answer", "desc": "Answer"}],
+    "goal": "Answer the question.",
+    "llm_profile": {"id": 1, "name": "bench", "provider": "openai", "model_id": "gpt-4o-mini"},
+}
+
+
+class QAState(TypedDict, total=False):
+    question: str
+    answer: str
+
+
+def fake_provider(chunks: int, chunk_s: float):
+    parts = ["[[ ## reasoning ## ]]\n"] + [f"step {i}, " for i in range(chunks)] + ["\n\n[[ ## answer ## ]]\n", "42", "\n\n[[ ## completed ## ]]"]
+
+    async def acompletion(*args, **kwargs):
+        if not kwargs.get("stream"):
+            await asyncio.sleep(chunk_s * len(parts))
+            content = "".join(parts)
+            return ModelResponse(model="gpt-4o-mini", choices=[{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}])
+
+        async def stream():
+            for part in parts:
+                await asyncio.sleep(chunk_s)
+                yield ModelResponseStream(model="gpt-4o-mini", choices=[StreamingChoices(delta=Delta(content=part))])
+        return stream()
+    return acompletion
+
+
+async def first_visible(stream: bool) -> tuple:
+    workflow = StateGraph(QAState)
+    workflow.add_node("smart", SmartNode("explainer", {**NODE_DATA, "stream": stream}))
+    workflow.add_edge(START, "smart")
+    workflow.add_edge("smart", END)
+    app = workflow.compile()
+
+    started = time.perf_counter()
+    first = None
+    async for event in stream_run_events(app, {"question": "What is the answer?"}, {}):
+        visible = event["type"] == "token" or (event["type"] == "node_finished" and event["node_id"] == "smart")
+        if visible and first is None:
+            first = time.perf_counter() - started
+    return first, time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=60)
+    parser.add_argument("--chunk-ms", type=float, default=20)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with patch("app.nodes.smart_node.get_dspy_lm", lambda profile: dspy.LM("openai/gpt-4o-mini", cache=False)), \
+            patch("litellm.acompletion", fake_provider(args.chunks, args.chunk_ms / 1000)), \
+            patch("litellm.completion", side_effect=AssertionError("sync path")):
+        results = {}
+        for name, stream in (("whole", False), ("streamed", True)):
+            samples = [await first_visible(stream) for _ in range(args.runs)]
+            results[name] = (statistics.median(s[0] for s in samples), statistics.median(s[1] for s in samples))
+
+    for name, (first, total) in results.items():
+        print(f"{name:<9} first visible output={first * 1000:8.1f}ms  total={total * 1000:8.1f}ms  ({results['whole'][0] / first:5.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Query latency of a RAG collection against its size: exact NumPy scan vs IVF index.
+
+Fills collections of each `--sizes` with clustered unit vectors (written
+through `VectorCollection.add`, so they are memory-mapped from disk like real
+ones), then times `--queries` searches for the `--top-k` nearest chunks:
+  - exact: every row scored (the default up to AGENTIC_RAG_EXACT_SEARCH_MAX)
+  - ivf: the `--nprobe` nearest of sqrt(rows) lists scored
+and reports the IVF recall against the exact top-k.
+
+Usage (from backend/):
+    python -m benchmarks.bench_vector_search --sizes 1000 10000 100000 --dim 384 --queries 200
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from app.engine.vector_store import VectorCollection, VectorStore
+
+
+def clustered(rng, rows: int, dim: int, clusters: int) -> np.ndarray:
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    return centers[rng.integers(0, clusters, rows)] + 0.3 * rng.normal(size=(rows, dim)).astype(np.float32)
+
+
+def timed(collection: VectorCollection, queries: np.ndarray, top_k: int):
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append([hit["row"] for hit in collection.search_vector(query, top_k)])
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VectorStore(tmp)
+        for size in args.sizes:
+            collection = store.create(f"bench-{size}", embedder=f"hashing:{args.dim}")
+            clusters = max(8, size // 500)
+            data = clustered(rng, size, args.dim, clusters)
+            for start in range(0, size, 50000):
+                collection.add([f"chunk {i}" for i in range(start, min(size, start + 50000))], vectors=data[start:start + 50000])
+            queries = data[rng.integers(0, size, args.queries)] + 0.3 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+            exact = VectorCollection(collection.path, exact_search_max=size, nprobe=args.nprobe)
+            started = time.perf_counter()
+            exact.build_index()
+            build_s = time.perf_counter() - started
+            ivf = VectorCollection(collection.path, exact_search_max=0, nprobe=args.nprobe)
+
+            exact_ms, exact_rows = timed(exact, queries, args.top_k)
+            ivf_ms, ivf_rows = timed(ivf, queries, args.top_k)
+            recall = np.mean([len(set(e) & set(a)) / len(e) for e, a in zip(exact_rows, ivf_rows)])
+            for name, latencies in (("exact", exact_ms), ("ivf", ivf_ms)):
+                print(
+                    f"rows={size:<8} {name:<6} p50={statistics.median(latencies):7.2f}ms  "
+                    f"p95={statistics.quantiles(latencies, n=20)[-1]:7.2f}ms"
+                    + (f"  recall@{args.top_k}={recall:.1%}  index build={build_s:.2f}s" if name == "ivf" else "")
+                )
+            exact.close()
+            ivf.close()
+
+
+if __name__ == "__main__":
+    main()
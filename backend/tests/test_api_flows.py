@@ -1,30 +1,38 @@
 from fastapi.testclient import TestClient
-from sqlmodel import Session, SQLModel, create_engine
-from sqlmodel.pool import StaticPool
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 import pytest
 import json
 from app.main import app
-from app.database import get_session
+from app.database import create_async_db_engine, create_db_engine, get_async_session, get_session
 
 # --- Fixtures Reused ---
 # ideally these should be in conftest.py but keeping self-contained for now
 
 @pytest.fixture(name="session")
-def session_fixture():
-    engine = create_engine(
-        "sqlite://", 
-        connect_args={"check_same_thread": False}, 
-        poolclass=StaticPool
-    )
+def session_fixture(tmp_path):
+    # A file database: writes go through the sync engine, reads through the async one
+    engine = create_db_engine(f"sqlite:///{tmp_path}/test.db")
     SQLModel.metadata.create_all(engine)
     with Session(engine) as session:
         yield session
+    engine.dispose()
+
+@pytest.fixture(name="async_engine")
+def async_engine_fixture(session: Session, tmp_path):
+    return create_async_db_engine(f"sqlite+aiosqlite:///{tmp_path}/test.db", poolclass=NullPool)
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
+def client_fixture(session: Session, async_engine):
     def get_session_override():
         return session
+    async def get_async_session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as async_session:
+            yield async_session
+
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_async_session] = get_async_session_override
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
@@ -63,6 +71,7 @@ def test_flow_crud(client: TestClient):
     assert res.status_code == 200
     updated_flow = res.json()
     assert updated_flow["name"] == "Updated Flow"
+    assert updated_flow["version"] == flow["version"] + 1
     
     # 4. Get One
     res = client.get(f"/api/flows/{flow_id}")
@@ -76,3 +85,195 @@ def test_flow_crud(client: TestClient):
     # Verify Delete
     res = client.get(f"/api/flows/{flow_id}")
     assert res.status_code == 404
+
+def create_flows(client: TestClient, count: int):
+    ids = []
+    for i in range(count):
+        data = json.dumps({"nodes": [{"id": str(n)} for n in range(i)], "edges": []})
+        res = client.post("/api/flows", json={"name": f"Flow {i:02d}", "data": data})
+        ids.append(res.json()["id"])
+    return ids
+
+def test_flow_list_summary_projection(client: TestClient):
+    create_flows(client, 3)
+
+    flows = client.get("/api/flows").json()
+    assert all("data" not in f for f in flows)
+    by_name = {f["name"]: f for f in flows}
+    assert by_name["Flow 02"]["node_count"] == 2
+    assert by_name["Flow 02"]["data_size"] == len(json.dumps({"nodes": [{"id": "0"}, {"id": "1"}], "edges": []}))
+
+    full = client.get("/api/flows", params={"view": "full"}).json()
+    assert all("data" in f for f in full)
+
+def test_flow_list_cursor_pagination(client: TestClient):
+    ids = create_flows(client, 7)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, "sort": "name", "order": "asc"}
+        if cursor:
+            params["cursor"] = cursor
+        res = client.get("/api/flows", params=params)
+        assert res.status_code == 200
+        seen.extend(f["id"] for f in res.json())
+        cursor = res.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == ids
+
+    # Newest first by default; ties on updated_at are broken by id
+    first = client.get("/api/flows", params={"limit": 4})
+    rest = client.get("/api/flows", params={"limit": 4, "cursor": first.headers["X-Next-Cursor"]})
+    assert [f["id"] for f in first.json() + rest.json()] == list(reversed(ids))
+    assert "X-Next-Cursor" not in rest.headers
+
+    # A cursor only continues the ordering it was issued for
+    assert client.get("/api/flows", params={"cursor": first.headers["X-Next-Cursor"], "sort": "id"}).status_code == 400
+    assert client.get("/api/flows", params={"cursor": "bogus"}).status_code == 400
+    assert client.get("/api/flows", params={"sort": "data"}).status_code == 400
+
+def test_flow_etags(client: TestClient):
+    [flow_id] = create_flows(client, 1)
+
+    res = client.get(f"/api/flows/{flow_id}")
+    etag = res.headers["ETag"]
+    assert client.get(f"/api/flows/{flow_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    listing = client.get("/api/flows")
+    list_etag = listing.headers["ETag"]
+    assert client.get("/api/flows", headers={"If-None-Match": list_etag}).status_code == 304
+
+    res = client.put(f"/api/flows/{flow_id}", json={"data": json.dumps({"nodes": [{"id": "a"}, {"id": "b"}]})})
+    assert res.json()["node_count"] == 2
+    assert res.headers["ETag"] != etag
+    assert client.get(f"/api/flows/{flow_id}", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/api/flows", headers={"If-None-Match": list_etag}).status_code == 200
+
+def big_flow(nodes: int):
+    return {"nodes": [{"id": str(i), "type": "agent", "position": {"x": i, "y": 0}, "data": {"label": f"Agent {i}"}} for i in range(nodes)], "edges": []}
+
+def test_flow_json_patch_and_history(client: TestClient):
+    flow = client.post("/api/flows", json={"name": "Big", "data": json.dumps(big_flow(50))}).json()
+    flow_id, base = flow["id"], flow["data_hash"]
+
+    # Autosave: one moved node
+    move = [{"op": "replace", "path": "/nodes/3/position/x", "value": 999}]
+    res = client.patch(f"/api/flows/{flow_id}", json={"base_hash": base, "patch": move})
+    assert res.status_code == 200
+    patched = res.json()
+    assert "data" not in patched
+    assert patched["version"] == flow["version"] + 1
+    assert json.loads(client.get(f"/api/flows/{flow_id}").json()["data"])["nodes"][3]["position"]["x"] == 999
+
+    # A stale base is rejected with the hash to rebase on
+    res = client.patch(f"/api/flows/{flow_id}", json={"base_hash": base, "patch": move})
+    assert res.status_code == 409
+    assert res.json()["detail"]["current_hash"] == patched["data_hash"]
+    bad = [{"op": "remove", "path": "/nodes/500"}]
+    assert client.patch(f"/api/flows/{flow_id}", json={"base_hash": patched["data_hash"], "patch": bad}).status_code == 422
+
+    # History: a snapshot, then a delta far smaller than the flow
+    versions = client.get(f"/api/flows/{flow_id}/versions").json()
+    assert [v["kind"] for v in versions] == ["delta", "snapshot"]
+    assert versions[0]["size"] * 50 < versions[1]["size"]
+    assert versions[0]["base_hash"] == base
+
+    # Restore by content hash
+    old = client.get(f"/api/flows/{flow_id}/versions/{base}").json()
+    assert json.loads(old["data"]) == big_flow(50)
+    res = client.post(f"/api/flows/{flow_id}/versions/{base}/restore")
+    assert res.status_code == 200
+    assert res.json()["data_hash"] == base
+    assert res.json()["version"] == patched["version"] + 1
+    assert len(client.get(f"/api/flows/{flow_id}/versions").json()) == 3
+
+def test_concurrent_patches_on_the_same_base_conflict(client: TestClient, session: Session, monkeypatch):
+    import threading
+    from app.api import flows as flows_api
+
+    flow = client.post("/api/flows", json={"name": "Race", "data": json.dumps({"nodes": [], "edges": []})}).json()
+    flow_id, base = flow["id"], flow["data_hash"]
+
+    # One session per request, as in the app, and both saves held at the same point
+    def own_session():
+        with Session(session.get_bind()) as request_session:
+            yield request_session
+    app.dependency_overrides[get_session] = own_session
+    barrier = threading.Barrier(2)
+    apply = flows_api.apply_flow_patch
+
+    def apply_together(data, operations):
+        try:
+            barrier.wait(timeout=1)
+        except threading.BrokenBarrierError:
+            pass
+        return apply(data, operations)
+    monkeypatch.setattr(flows_api, "apply_flow_patch", apply_together)
+
+    statuses = {}
+    def save(key):
+        patch = [{"op": "add", "path": f"/{key}", "value": True}]
+        statuses[key] = client.patch(f"/api/flows/{flow_id}", json={"base_hash": base, "patch": patch}).status_code
+    threads = [threading.Thread(target=save, args=(key,)) for key in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses.values()) == [200, 409]
+    winner = next(key for key, status in statuses.items() if status == 200)
+    assert set(json.loads(client.get(f"/api/flows/{flow_id}").json()["data"])) == {"nodes", "edges", winner}
+    assert [v["version"] for v in client.get(f"/api/flows/{flow_id}/versions").json()] == [2, 1]
+
+def test_flow_history_snapshots_and_materializes(client: TestClient, monkeypatch):
+    from app.services import flow_versions
+    monkeypatch.setattr(flow_versions, "FLOW_SNAPSHOT_INTERVAL", 3)
+
+    data = big_flow(10)
+    flow = client.post("/api/flows", json={"name": "Edited", "data": json.dumps(data)}).json()
+    expected = {flow["version"]: json.dumps(data)}
+    for i in range(7):
+        data["nodes"][i]["data"]["label"] = f"Renamed {i}"
+        flow = client.put(f"/api/flows/{flow['id']}", json={"data": json.dumps(data)}).json()
+        expected[flow["version"]] = json.dumps(data)
+
+    kinds = {v["version"]: v["kind"] for v in client.get(f"/api/flows/{flow['id']}/versions").json()}
+    assert [kinds[v] for v in sorted(kinds)] == ["snapshot", "delta", "delta", "delta", "snapshot", "delta", "delta", "delta"]
+    for version, content in expected.items():
+        stored = client.get(f"/api/flows/{flow['id']}/versions/{version}").json()["data"]
+        assert json.loads(stored) == json.loads(content)
+
+def test_flow_search(client: TestClient):
+    support = {"nodes": [
+        {"id": "a", "type": "agent", "data": {"label": "Triage", "system_prompt": "Classify the customer request", "tools": ["read_local_file"], "modelId": 3}},
+        {"id": "s", "type": "smart_node", "data": {"label": "Sentiment", "goal": "Détecter le sentiment de l'avis", "llm_profile": {"id": 7, "name": "local-llama"}}},
+    ]}
+    lyrics = {"nodes": [{"id": "w", "type": "agent", "data": {"label": "Lyrics writer", "system_prompt": "Write song lyrics about the customer", "tools": []}}]}
+    support_id = client.post("/api/flows", json={"name": "Support desk", "data": json.dumps(support)}).json()["id"]
+    lyrics_id = client.post("/api/flows", json={"name": "Songs", "data": json.dumps(lyrics)}).json()["id"]
+
+    res = client.get("/api/flows/search", params={"q": "read_local_file"})
+    assert res.status_code == 200
+    assert [r["id"] for r in res.json()] == [support_id]
+
+    # Accents are folded, the last word matches as a prefix
+    assert [r["id"] for r in client.get("/api/flows/search", params={"q": "detecter senti"}).json()] == [support_id]
+    assert [r["id"] for r in client.get("/api/flows/search", params={"q": "llama", "field": "profiles"}).json()] == [support_id]
+
+    # Both flows mention "customer"; the name match ranks first
+    client.put(f"/api/flows/{lyrics_id}", json={"name": "Customer songs"})
+    results = client.get("/api/flows/search", params={"q": "customer"}).json()
+    assert [r["id"] for r in results] == [lyrics_id, support_id]
+    assert "<mark>" in results[1]["snippet"]
+    assert results[0]["score"] > results[1]["score"]
+
+    # FTS syntax in user input is treated as text
+    assert client.get("/api/flows/search", params={"q": 'NEAR("x" AND'}).status_code == 200
+    assert client.get("/api/flows/search", params={"q": "x", "field": "data"}).status_code == 400
+
+    # Updates and deletes keep the index in sync
+    client.put(f"/api/flows/{support_id}", json={"data": json.dumps({"nodes": []})})
+    assert client.get("/api/flows/search", params={"q": "read_local_file"}).json() == []
+    client.delete(f"/api/flows/{lyrics_id}")
+    assert client.get("/api/flows/search", params={"q": "lyrics"}).json() == []
@@ -1,29 +1,38 @@
 from fastapi.testclient import TestClient
-from sqlmodel import Session, SQLModel, create_engine
-from sqlmodel.pool import StaticPool
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 import pytest
 from app.main import app
-from app.database import get_session
+from app.database import create_async_db_engine, create_db_engine, get_async_session, get_session
+from app.models.settings import LLMProfile, ProviderType
 
 # --- Fixtures ---
 
 @pytest.fixture(name="session")
-def session_fixture():
-    engine = create_engine(
-        "sqlite://", 
-        connect_args={"check_same_thread": False}, 
-        poolclass=StaticPool
-    )
+def session_fixture(tmp_path):
+    # A file database: writes go through the sync engine, reads through the async one
+    engine = create_db_engine(f"sqlite:///{tmp_path}/test.db")
     SQLModel.metadata.create_all(engine)
     with Session(engine) as session:
         yield session
+    engine.dispose()
+
+@pytest.fixture(name="async_engine")
+def async_engine_fixture(session: Session, tmp_path):
+    return create_async_db_engine(f"sqlite+aiosqlite:///{tmp_path}/test.db", poolclass=NullPool)
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
+def client_fixture(session: Session, async_engine):
     def get_session_override():
         return session
 
+    async def get_async_session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as async_session:
+            yield async_session
+
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_async_session] = get_async_session_override
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
@@ -85,3 +94,41 @@ def test_ollama_scan(client: TestClient):
     else:
         # Acceptable failure mode if local ollama is missing
         assert response.status_code in [500, 503, 404]
+
+def test_list_models_sees_committed_profiles(client: TestClient, session: Session):
+    """Profiles written through the sync engine are read back through the async one."""
+    session.add(LLMProfile(name="Local", provider=ProviderType.OLLAMA, model_id="llama3"))
+    session.commit()
+
+    response = client.get("/api/settings/models")
+    assert response.status_code == 200
+    assert [m["name"] for m in response.json()] == ["Local"]
+
+def test_model_health_endpoints(client: TestClient, session: Session, monkeypatch):
+    """Health is empty until a profile is probed, then reports its measurements."""
+    from langchain_core.messages import AIMessageChunk
+    from app.api import settings as settings_api
+    from app.services.profile_health import ProfileHealthProber
+
+    class FakeLLM:
+        async def astream(self, prompt):
+            for token in "1 2 3 4".split():
+                yield AIMessageChunk(content=token)
+
+    prober = ProfileHealthProber(engine=session.get_bind(), llm_factory=lambda profile: FakeLLM(), interval_s=0)
+    monkeypatch.setattr(settings_api, "profile_prober", prober)
+    session.add(LLMProfile(name="Local", provider=ProviderType.OLLAMA, model_id="llama3"))
+    session.commit()
+
+    response = client.get("/api/settings/models/health")
+    assert response.status_code == 200
+    assert response.json() == [{**response.json()[0], "profile_id": 1, "samples": 0, "healthy": None}]
+
+    response = client.post("/api/settings/models/1/health/probe")
+    assert response.status_code == 200
+    assert response.json()["samples"] == 1
+    assert response.json()["healthy"] is True
+    assert response.json()["tokens_per_s_p50"] > 0
+
+    assert client.get("/api/settings/models/1/health").json()["samples"] == 1
+    assert client.get("/api/settings/models/99/health").status_code == 404
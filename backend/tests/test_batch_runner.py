@@ -0,0 +1,110 @@
+import asyncio
+import json
+import pytest
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, START, END
+from sqlmodel import SQLModel, create_engine
+
+from app.engine.graph_cache import CachedGraph
+from app.engine.state import GraphState
+from app.models.batch import BatchRun
+from app.models.run import RunStatus
+from app.services.batch_runner import BatchRunner, read_completed_rows
+
+class EchoGraphs:
+    """Graph cache stand-in: one flow that upper-cases its input and tracks concurrency."""
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.seen = []
+
+        async def agent(state: GraphState):
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            await asyncio.sleep(0.01)
+            self.active -= 1
+            text = state["messages"][-1].content
+            self.seen.append(text)
+            return {"messages": [AIMessage(content=text.upper())], "last_sender": "agent"}
+
+        workflow = StateGraph(GraphState)
+        workflow.add_node("agent", agent)
+        workflow.add_edge(START, "agent")
+        workflow.add_edge("agent", END)
+        self.app = workflow.compile()
+
+    def get(self, flow_id, version=None):
+        return CachedGraph(flow_id=flow_id, version=1, graph_data={}, app=self.app)
+
+def make_runner(tmp_path):
+    # A file database: the manager writes from worker threads, which must not share one connection
+    engine = create_engine(f"sqlite:///{tmp_path / 'batches.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    saver = MemorySaver()
+
+    async def checkpointer():
+        return saver
+    return BatchRunner(engine=engine, graphs=EchoGraphs(), checkpointer_factory=checkpointer, batches_dir=str(tmp_path))
+
+async def wait_finished(runner, batch_id):
+    for _ in range(500):
+        batch = await runner.get(batch_id)
+        if batch.status not in (RunStatus.QUEUED, RunStatus.RUNNING):
+            return batch
+        await asyncio.sleep(0.01)
+    raise AssertionError("batch did not finish")
+
+@pytest.mark.asyncio
+async def test_jsonl_batch_bounded_concurrency(tmp_path):
+    dataset = tmp_path / "data.jsonl"
+    rows = [{"input": f"q{i}"} for i in range(20)] + [{"other": "no input"}]
+    dataset.write_text("\n".join(json.dumps(r) for r in rows) + "\n{not json\n")
+
+    runner = make_runner(tmp_path)
+    await runner.start()
+    try:
+        batch = await runner.submit(1, str(dataset), concurrency=4)
+        assert batch.total_rows == 22
+        batch = await wait_finished(runner, batch.id)
+        assert batch.status == RunStatus.SUCCEEDED
+        assert (batch.completed_rows, batch.failed_rows) == (22, 2)
+        assert runner.graphs.peak == 4
+
+        results = {r["row"]: r for r in map(json.loads, open(batch.output_path))}
+        assert results[3]["output"] == "Q3"
+        assert results[3]["thread_id"] == f"batch-{batch.id}-3"
+        assert "no 'input' field" in results[20]["error"]
+        assert results[21]["error"] and results[21]["output"] is None
+
+        report = await runner.progress(batch.id)
+        assert report["rows_per_second"] > 0
+        assert report["latency_p50_s"] is not None
+    finally:
+        await runner.stop()
+
+@pytest.mark.asyncio
+async def test_batch_resumes_after_crash(tmp_path):
+    dataset = tmp_path / "data.csv"
+    dataset.write_text("id,question\n" + "".join(f"{i},q{i}\n" for i in range(10)))
+    runner = make_runner(tmp_path)
+
+    # State left by a crashed process: 4 rows written, the 5th cut mid-line
+    output = tmp_path / "crashed.results.jsonl"
+    lines = [json.dumps({"row": i, "output": f"Q{i}", "error": None, "duration_s": 0.1}) for i in range(4)]
+    output.write_text("\n".join(lines) + '\n{"row": 4, "outp')
+    runner._save(BatchRun(
+        id="crashed", flow_id=1, dataset_path=str(dataset), output_path=str(output),
+        input_field="question", total_rows=10, completed_rows=4, status=RunStatus.RUNNING,
+    ))
+
+    await runner.start()
+    try:
+        batch = await wait_finished(runner, "crashed")
+        assert batch.status == RunStatus.SUCCEEDED
+        assert batch.completed_rows == 10
+        assert sorted(runner.graphs.seen) == sorted(f"q{i}" for i in range(4, 10))
+        done, failed, _ = read_completed_rows(str(output))
+        assert done == set(range(10)) and failed == 0
+    finally:
+        await runner.stop()
@@ -0,0 +1,91 @@
+import time
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+
+from app.engine.storage import open_checkpointer, close_checkpointer
+from app.engine.retention import (
+    RetentionPolicy,
+    checkpoint_id_for_time,
+    checkpoint_id_to_time,
+    compact_checkpoints,
+    get_checkpoint_stats,
+    prune_checkpoints,
+)
+
+HOUR = 3600
+
+async def put_checkpoint(saver, thread_id: str, created_at: float, payload: str = ""):
+    checkpoint = empty_checkpoint()
+    # Fake the creation time through the time-ordered UUIDv6 id
+    checkpoint["id"] = checkpoint_id_for_time(created_at)[:-12] + f"{int(created_at * 1000) % 10**12:012d}"
+    checkpoint["channel_values"] = {"payload": payload}
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    config = await saver.aput(config, checkpoint, {}, {})
+    await saver.aput_writes(config, [("payload", payload)], task_id="task")
+    return config
+
+def test_checkpoint_id_time_roundtrip():
+    now = time.time()
+    assert abs(checkpoint_id_to_time(checkpoint_id_for_time(now)) - now) < 1e-3
+    assert checkpoint_id_for_time(now - 10) < checkpoint_id_for_time(now)
+
+@pytest.mark.asyncio
+async def test_prune_keep_last_and_age(tmp_path):
+    saver = await open_checkpointer(str(tmp_path / "cp.sqlite"))
+    now = time.time()
+    try:
+        # Active thread with 10 checkpoints, the 5 oldest two days old
+        for i in range(10):
+            age = 48 * HOUR + i if i < 5 else i
+            await put_checkpoint(saver, "active", now - age)
+        # Inactive thread, last touched 40 days ago
+        for i in range(3):
+            await put_checkpoint(saver, "stale", now - 40 * 24 * HOUR + i)
+
+        deleted = await prune_checkpoints(
+            saver, RetentionPolicy(keep_last=3, max_age_hours=24, thread_ttl_hours=30 * 24), now=now
+        )
+        assert deleted["threads"] == 1
+        assert deleted["expired_threads_checkpoints"] == 3
+        assert deleted["aged_checkpoints"] == 5
+        assert deleted["excess_checkpoints"] == 2
+
+        stats = await get_checkpoint_stats(saver)
+        assert stats["threads"] == 1
+        assert stats["checkpoints"] == 3
+        # Writes of deleted checkpoints are gone too
+        assert stats["writes"] == 3
+
+        latest = await saver.aget_tuple({"configurable": {"thread_id": "active"}})
+        assert latest is not None
+    finally:
+        await close_checkpointer(saver)
+
+@pytest.mark.asyncio
+async def test_max_age_keeps_latest_checkpoint(tmp_path):
+    saver = await open_checkpointer(str(tmp_path / "cp.sqlite"))
+    now = time.time()
+    try:
+        for i in range(3):
+            await put_checkpoint(saver, "old", now - 72 * HOUR + i)
+        await prune_checkpoints(saver, RetentionPolicy(keep_last=0, max_age_hours=24, thread_ttl_hours=0), now=now)
+        stats = await get_checkpoint_stats(saver)
+        assert stats["checkpoints"] == 1
+    finally:
+        await close_checkpointer(saver)
+
+@pytest.mark.asyncio
+async def test_compaction_reclaims_space(tmp_path):
+    saver = await open_checkpointer(str(tmp_path / "cp.sqlite"))
+    now = time.time()
+    try:
+        for i in range(200):
+            await put_checkpoint(saver, f"t{i % 4}", now - i, payload="x" * 4000)
+        report = await compact_checkpoints(saver, RetentionPolicy(keep_last=1, max_age_hours=0, thread_ttl_hours=0))
+        assert report["deleted"]["excess_checkpoints"] == 196
+        assert report["reclaimed_bytes"] > 0
+        stats = await get_checkpoint_stats(saver)
+        assert stats["auto_vacuum"] == "incremental"
+        assert stats["checkpoints"] == 4
+    finally:
+        await close_checkpointer(saver)
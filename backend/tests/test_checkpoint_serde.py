@@ -0,0 +1,96 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.graph import StateGraph, START, END
+
+from app.engine.serde import CompactSerializer, sample_message_payloads, train_dictionary
+from app.engine.state import GraphState
+from app.engine.storage import open_checkpointer, close_checkpointer
+from app.engine.retention import RetentionPolicy, get_checkpoint_stats, prune_checkpoints
+
+def test_compact_serializer_roundtrip_with_dictionary():
+    serde = CompactSerializer()
+    serde.add_dictionary(train_dictionary(sample_message_payloads(), dict_id=1))
+
+    message = AIMessage(content="the agent answer " * 50, id="m1", name="agent_1")
+    type_, data = serde.dumps_typed(message)
+    assert type_ == "zstd+msgpack"
+    assert len(data) < len(JsonPlusSerializer().dumps_typed(message)[1])
+    assert serde.loads_typed((type_, data)) == message
+
+    # Frames written with an older dictionary remain readable after retraining
+    serde.add_dictionary(train_dictionary(sample_message_payloads(seed=1), dict_id=2))
+    assert serde.active_dict_id == 2
+    assert serde.loads_typed((type_, data)) == message
+
+def test_compact_serializer_reads_legacy_payloads():
+    legacy = JsonPlusSerializer().dumps_typed({"messages": [HumanMessage(content="hi", id="1")]})
+    assert CompactSerializer().loads_typed(legacy)["messages"][0].content == "hi"
+
+def build_chat_graph(checkpointer):
+    def reply(state: GraphState):
+        return {"messages": [AIMessage(content="reply " * 100)], "last_sender": "agent"}
+
+    workflow = StateGraph(GraphState)
+    workflow.add_node("agent", reply)
+    workflow.add_edge(START, "agent")
+    workflow.add_edge("agent", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+@pytest.mark.asyncio
+async def test_message_dedup_across_checkpoints(tmp_path):
+    saver = await open_checkpointer(str(tmp_path / "cp.sqlite"))
+    app = build_chat_graph(saver)
+    config = {"configurable": {"thread_id": "chat"}}
+    try:
+        for turn in range(5):
+            await app.ainvoke({"messages": [HumanMessage(content=f"question {turn}")]}, config)
+
+        state = await app.aget_state(config)
+        assert len(state.values["messages"]) == 10
+        assert state.values["messages"][0].content == "question 0"
+
+        # Every message stored once although it appears in many checkpoints
+        stats = await get_checkpoint_stats(saver)
+        assert stats["message_blobs"] == 10
+        assert stats["serde_dictionaries"] == 1
+
+        # History (alist) resolves references too
+        history = [s async for s in app.aget_state_history(config)]
+        assert all(isinstance(m, (HumanMessage, AIMessage)) for s in history for m in s.values.get("messages", []))
+    finally:
+        await close_checkpointer(saver)
+
+@pytest.mark.asyncio
+async def test_orphan_blobs_are_collected(tmp_path):
+    saver = await open_checkpointer(str(tmp_path / "cp.sqlite"))
+    app = build_chat_graph(saver)
+    try:
+        await app.ainvoke({"messages": [HumanMessage(content="a")]}, {"configurable": {"thread_id": "t1"}})
+        await app.ainvoke({"messages": [HumanMessage(content="b")]}, {"configurable": {"thread_id": "t2"}})
+        await saver.adelete_thread("t1")
+
+        deleted = await prune_checkpoints(saver, RetentionPolicy(keep_last=0, max_age_hours=0, thread_ttl_hours=0))
+        assert deleted["orphan_blobs"] == 2
+        assert (await get_checkpoint_stats(saver))["message_blobs"] == 2
+
+        # New writes after GC must still be readable
+        await app.ainvoke({"messages": [HumanMessage(content="c")]}, {"configurable": {"thread_id": "t2"}})
+        state = await app.aget_state({"configurable": {"thread_id": "t2"}})
+        assert [m.content for m in state.values["messages"]][::2] == ["b", "c"]
+    finally:
+        await close_checkpointer(saver)
+
+@pytest.mark.asyncio
+async def test_retrain_dictionary_from_stored_messages(tmp_path):
+    saver = await open_checkpointer(str(tmp_path / "cp.sqlite"))
+    app = build_chat_graph(saver)
+    try:
+        for turn in range(40):
+            await app.ainvoke({"messages": [HumanMessage(content=f"question {turn} " * 10)]}, {"configurable": {"thread_id": f"t{turn}"}})
+        new_id = await saver.retrain_dictionary()
+        assert new_id == 2
+        state = await app.aget_state({"configurable": {"thread_id": "t3"}})
+        assert state.values["messages"][0].content.startswith("question 3")
+    finally:
+        await close_checkpointer(saver)
@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import StateGraph, START, END
+
+from app.engine.storage import open_checkpointer, close_checkpointer
+
+def make_config(thread_id: str):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+@pytest.mark.asyncio
+async def test_checkpointer_pragmas(tmp_path):
+    saver = await open_checkpointer(str(tmp_path / "cp.sqlite"), busy_timeout_ms=1234)
+    try:
+        async with saver.conn.execute("PRAGMA journal_mode") as cur:
+            assert (await cur.fetchone())[0] == "wal"
+        async with saver.conn.execute("PRAGMA busy_timeout") as cur:
+            assert (await cur.fetchone())[0] == 1234
+        async with saver.conn.execute("PRAGMA synchronous") as cur:
+            assert (await cur.fetchone())[0] == 1  # NORMAL
+    finally:
+        await close_checkpointer(saver)
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_are_grouped_and_durable(tmp_path):
+    path = str(tmp_path / "cp.sqlite")
+    saver = await open_checkpointer(path)
+
+    async def run(i: int):
+        config = make_config(f"thread-{i}")
+        for _ in range(5):
+            checkpoint = empty_checkpoint()
+            config = await saver.aput(config, checkpoint, {}, {})
+
+    await asyncio.gather(*(run(i) for i in range(20)))
+    # Grouped commits: far fewer commits than writes
+    assert saver.committed_writes == 100
+    assert saver.commits < 100
+    await close_checkpointer(saver)
+
+    # Everything must have been committed to disk
+    reopened = await open_checkpointer(path)
+    try:
+        async with reopened.conn.execute("SELECT COUNT(*) FROM checkpoints") as cur:
+            assert (await cur.fetchone())[0] == 100
+        latest = await reopened.aget_tuple({"configurable": {"thread_id": "thread-3"}})
+        assert latest is not None
+    finally:
+        await close_checkpointer(reopened)
+
+@pytest.mark.asyncio
+async def test_shared_checkpointer_with_graph(tmp_path):
+    saver = await open_checkpointer(str(tmp_path / "cp.sqlite"))
+
+    workflow = StateGraph(dict)
+    workflow.add_node("step", lambda state: {"count": state.get("count", 0) + 1})
+    workflow.add_edge(START, "step")
+    workflow.add_edge("step", END)
+    app = workflow.compile(checkpointer=saver)
+
+    try:
+        results = await asyncio.gather(*(
+            app.ainvoke({"count": i}, {"configurable": {"thread_id": f"t{i}"}}) for i in range(10)
+        ))
+        assert [r["count"] for r in results] == [i + 1 for i in range(10)]
+        state = await app.aget_state({"configurable": {"thread_id": "t4"}})
+        assert state.values["count"] == 5
+    finally:
+        await close_checkpointer(saver)
+
+def test_checkpointer_from_another_loop_is_closed(tmp_path, monkeypatch):
+    from app.engine import storage
+    path = str(tmp_path / "cp.sqlite")
+    monkeypatch.setattr(storage, "open_checkpointer", lambda *args, **kwargs: open_checkpointer(path))
+    monkeypatch.setattr(storage, "_CHECKPOINTER", None)
+
+    first = asyncio.run(storage.init_graph_checkpointer())
+
+    async def on_new_loop():
+        current = await storage.get_graph_checkpointer()
+        try:
+            assert current is not first
+            with pytest.raises(ValueError):
+                await first.conn.execute("SELECT 1")
+        finally:
+            await storage.shutdown_graph_checkpointer()
+
+    asyncio.run(on_new_loop())
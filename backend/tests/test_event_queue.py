@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+
+from app.engine.events import EventQueue, stream_stats
+
+def token(text):
+    return {"type": "token", "content": text}
+
+async def drain(queue, delay=0.0):
+    received = []
+    while (event := await queue.get()) is not None:
+        received.append(event)
+        await asyncio.sleep(delay)
+    return received
+
+@pytest.mark.asyncio
+async def test_coalesce_keeps_producer_running_and_text_intact():
+    queue = EventQueue(maxsize=4, policy="coalesce")
+    consumer = asyncio.create_task(drain(queue, delay=0.01))
+    await queue.put({"type": "node_active", "node_id": "agent"})
+    for i in range(500):
+        await queue.put(token(f"{i} "))
+    await queue.put({"type": "node_finished", "node_id": "agent"})
+    # The producer finished long before the slow client could read 500 events
+    assert queue.paused_s == 0
+    await queue.close()
+    received = await consumer
+
+    assert "".join(e["content"] for e in received if e["type"] == "token") == "".join(f"{i} " for i in range(500))
+    assert received[-1]["type"] == "node_finished"
+    assert queue.coalesced > 400
+    assert queue.max_depth <= 4
+
+@pytest.mark.asyncio
+async def test_coalesce_keeps_smart_node_fields_apart():
+    queue = EventQueue(maxsize=8, policy="coalesce")
+    for field, text in [("reasoning", "Two "), ("reasoning", "plus two"), ("answer", "4"), ("answer", ".")]:
+        await queue.put({**token(text), "node_id": "smart", "field": field})
+    await queue.close()
+    received = await drain(queue)
+    assert [(e["field"], e["content"]) for e in received] == [("reasoning", "Two plus two"), ("answer", "4.")]
+
+@pytest.mark.asyncio
+async def test_drop_policy_discards_tokens_only():
+    queue = EventQueue(maxsize=3, policy="drop")
+    for i in range(10):
+        await queue.put(token(str(i)))
+    await queue.put({"type": "tool_start", "name": "search", "input": {}})
+    await queue.close()
+    received = await drain(queue)
+    assert received[-1]["type"] == "tool_start"
+    assert queue.dropped == 8
+    assert len(received) == 3
+
+@pytest.mark.asyncio
+async def test_pause_policy_applies_backpressure():
+    queue = EventQueue(maxsize=2, policy="pause")
+    consumer = asyncio.create_task(drain(queue, delay=0.01))
+    for i in range(10):
+        await queue.put(token(str(i)))
+    await queue.close()
+    assert len(await consumer) == 10
+    assert queue.paused_s > 0
+    assert queue.dropped == queue.coalesced == 0
+
+@pytest.mark.asyncio
+async def test_abort_stops_producer_and_reports_metrics():
+    queue = EventQueue(maxsize=1, policy="pause")
+    await queue.put(token("a"))
+    assert stream_stats()["connections"] >= 1
+
+    blocked = asyncio.create_task(queue.put({"type": "node_finished", "node_id": "x"}))
+    await asyncio.sleep(0)
+    await queue.abort(ConnectionError("client gone"))
+    with pytest.raises(ConnectionError):
+        await blocked
+    with pytest.raises(ValueError):
+        EventQueue(policy="unknown")
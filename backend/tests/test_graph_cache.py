@@ -0,0 +1,107 @@
+import pytest
+from sqlalchemy import inspect, text
+from sqlmodel import SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+from app.database import migrate_schema
+from app.engine.graph_cache import GraphCache, FlowNotFoundError, FlowVersionUnavailableError
+from app.models.flow import Flow
+
+# Minimal graph that compiles without touching LLM profiles
+GRAPH_V1 = {"nodes": [{"id": "router_1", "type": "router", "data": {"routes": []}}], "edges": []}
+GRAPH_V2 = {"nodes": [{"id": "router_2", "type": "router", "data": {"routes": []}}], "edges": []}
+
+class FakeFlowTable:
+    def __init__(self):
+        self.rows = {1: (1, GRAPH_V1)}
+        self.loads = 0
+
+    def __call__(self, flow_id):
+        self.loads += 1
+        if flow_id not in self.rows:
+            raise FlowNotFoundError(f"Flow {flow_id} not found")
+        return self.rows[flow_id]
+
+def test_cache_hit_and_invalidation():
+    table = FakeFlowTable()
+    cache = GraphCache(loader=table)
+
+    first = cache.get(1)
+    second = cache.get(1)
+    assert first is second
+    assert table.loads == 1
+    assert first.version == 1
+
+    # Simulate update_flow: new version in DB + invalidate
+    table.rows[1] = (2, GRAPH_V2)
+    cache.invalidate(1)
+
+    latest = cache.get(1)
+    assert latest.version == 2
+    assert latest.graph_data == GRAPH_V2
+    assert table.loads == 2
+
+    # Pinned runs keep the version they started with
+    pinned = cache.get(1, version=1)
+    assert pinned is first
+
+def test_cache_version_pin_unavailable():
+    table = FakeFlowTable()
+    cache = GraphCache(loader=table)
+
+    with pytest.raises(FlowVersionUnavailableError):
+        cache.get(1, version=5)
+
+    with pytest.raises(FlowNotFoundError):
+        cache.get(42)
+
+def test_cache_version_pin_rebuilt_from_history():
+    table = FakeFlowTable()
+    table.rows[1] = (3, GRAPH_V2)
+    history = {(1, 2): GRAPH_V1}
+    cache = GraphCache(loader=table, version_loader=lambda flow_id, version: history.get((flow_id, version)))
+
+    # Evicted or compiled by a previous process: rebuilt from the version history
+    pinned = cache.get(1, version=2)
+    assert (pinned.version, pinned.graph_data) == (2, GRAPH_V1)
+    assert cache.get(1, version=2) is pinned
+    assert cache.get(1).version == 3
+
+    with pytest.raises(FlowVersionUnavailableError):
+        cache.get(1, version=1)
+
+def test_cache_delete_drops_versions():
+    table = FakeFlowTable()
+    cache = GraphCache(loader=table)
+    cache.get(1)
+
+    del table.rows[1]
+    cache.invalidate(1, drop_versions=True)
+    with pytest.raises(FlowNotFoundError):
+        cache.get(1, version=1)
+
+def test_cache_is_bounded():
+    table = FakeFlowTable()
+    table.rows = {i: (1, GRAPH_V1) for i in range(5)}
+    cache = GraphCache(loader=table, max_entries=2)
+    for i in range(5):
+        cache.get(i)
+    assert cache.stats()["entries"] == 2
+
+def test_migrate_schema_adds_missing_columns():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    # Legacy table without the `version` column
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE flow (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, description VARCHAR, "
+            "data VARCHAR NOT NULL, created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)"
+        ))
+        conn.execute(text("INSERT INTO flow (name, data, created_at, updated_at) VALUES ('f', '{}', '2024-01-01', '2024-01-01')"))
+
+    SQLModel.metadata.create_all(engine)
+    migrate_schema(engine)
+
+    columns = {c["name"] for c in inspect(engine).get_columns("flow")}
+    assert "version" in columns
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT version FROM flow")).scalar() == 1
@@ -0,0 +1,89 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.engine.ingestion import TOKEN_PATTERN, chunk_text, ingest
+from app.engine.vector_store import VectorStore
+from app.main import app
+
+def section(title, word, n=60):
+    return f"# {title}\n" + " ".join(f"{word}{i}" for i in range(n))
+
+@pytest.fixture
+def store(tmp_path):
+    return VectorStore(str(tmp_path / "collections"))
+
+def test_chunks_respect_size_overlap_and_sections():
+    text = "\n\n".join(section(f"Part {i}", f"w{i}x") for i in range(4))
+    chunks = chunk_text(text, chunk_tokens=100, overlap_tokens=10)
+    assert all(len(TOKEN_PATTERN.findall(c)) <= 100 for c in chunks)
+    # Cut at the section boundary, the next chunk repeats the previous tail
+    assert chunks[0].endswith("w0x59") and chunks[1].startswith("w0x50")
+    assert chunks[-1].endswith("w3x59")
+    assert chunk_text("   ") == []
+    # A long unbroken paragraph is still split
+    assert len(chunk_text(" ".join(["word"] * 500), chunk_tokens=100, overlap_tokens=0)) == 5
+
+def test_incremental_reingestion(store, tmp_path):
+    docs = tmp_path / "docs"
+    (docs / "sub").mkdir(parents=True)
+    (docs / "a.md").write_text("\n\n".join([section("Refunds", "refund"), section("Shipping", "ship")]))
+    (docs / "sub" / "b.txt").write_text(section("Office", "office"))
+    (docs / "sub" / "page.html").write_text("<html><head><style>p {}</style></head><body><p>Holiday opening hours</p></body></html>")
+    (docs / "image.png").write_bytes(b"\x89PNG")
+    collection = store.create("kb")
+
+    first = ingest(collection, [str(docs)], chunk_tokens=80, overlap_tokens=8, batch_size=3, concurrency=2)
+    assert (first["documents"], first["added"], first["skipped"]) == (3, 3, 1)
+    assert first["chunks_embedded"] == len(collection) and first["documents_per_s"] > 0
+    assert collection.search("holiday opening hours", top_k=1)[0]["text"] == "Holiday opening hours"
+
+    second = ingest(collection, [str(docs)], chunk_tokens=80, overlap_tokens=8)
+    assert (second["unchanged"], second["chunks_embedded"]) == (3, 0)
+
+    # One section edited, one file deleted: only the edited chunks are embedded again
+    (docs / "a.md").write_text("\n\n".join([section("Refunds", "refund"), section("Shipping", "parcel")]))
+    (docs / "sub" / "b.txt").unlink()
+    third = ingest(collection, [str(docs)], chunk_tokens=80, overlap_tokens=8)
+    assert (third["updated"], third["unchanged"], third["deleted"]) == (1, 1, 1)
+    assert third["chunks_reused"] >= 1 and third["chunks_embedded"] < first["chunks_embedded"]
+    texts = [hit["text"] for hit in collection.search("office ship0 parcel0", top_k=10)]
+    assert not any("office" in t or "ship0" in t for t in texts) and any("parcel0" in t for t in texts)
+    assert set(collection.sources()) == {str(docs / "a.md"), str(docs / "sub" / "page.html")}
+
+    # Ingesting another path does not tombstone documents outside of it
+    other = tmp_path / "other.txt"
+    other.write_text("Separate note")
+    assert ingest(collection, [str(other)])["deleted"] == 0
+    assert len(collection.sources()) == 3
+
+def test_unreadable_file_does_not_abort_ingestion(store, tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.md").write_text(section("Refunds", "refund"))
+    (docs / "broken.log").write_text("corrupt")
+    (docs / "c.txt").write_text(section("Office", "office"))
+    collection = store.create("kb")
+
+    def broken(data):
+        raise ValueError("cannot parse")
+
+    with patch.dict("app.engine.ingestion.LOADERS", {".log": broken}):
+        report = ingest(collection, [str(docs)])
+    assert (report["documents"], report["added"], report["failed"]) == (3, 2, 1)
+    assert set(collection.sources()) == {str(docs / "a.md"), str(docs / "c.txt")}
+
+def test_ingest_and_search_endpoints(store, tmp_path):
+    (tmp_path / "faq.md").write_text("Refunds are issued to the original payment method.")
+    with patch("app.api.collections.vector_store", store):
+        client = TestClient(app)
+        report = client.post("/api/collections/faq/ingest", json={"paths": [str(tmp_path / "faq.md")]}).json()
+        assert report["added"] == 1 and report["chunks_embedded"] == 1
+
+        assert client.get("/api/collections").json()[0]["chunks"] == 1
+        hits = client.get("/api/collections/faq/search", params={"q": "refund payment", "top_k": 1}).json()
+        assert hits[0]["source"] == str(tmp_path / "faq.md")
+
+        assert client.post("/api/collections/faq/ingest", json={"paths": [str(tmp_path / "missing")]}).status_code == 400
+        assert client.get("/api/collections/nope").status_code == 404
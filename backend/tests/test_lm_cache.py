@@ -0,0 +1,96 @@
+import pytest
+import dspy
+from unittest.mock import patch
+
+from app.engine import lm_cache as lm_cache_module
+from app.engine.dspy_utils import clear_dspy_lms, get_dspy_lm
+from app.engine.lm_cache import CachedLM, LMCallCache
+from app.models.settings import LLMProfile, ProviderType
+
+class FakeResponse:
+    """Picklable stand-in for a LiteLLM response."""
+    def __init__(self, text):
+        self.text = text
+        self.usage = {"total_tokens": 10}
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LMCallCache(directory=str(tmp_path / "lm_cache"), size_limit_mb=10)
+    with patch.object(lm_cache_module, "lm_cache", cache):
+        yield cache
+
+@pytest.fixture
+def provider():
+    """Counts the calls that reach the provider."""
+    calls = []
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        calls.append(messages)
+        return FakeResponse(f"answer {len(calls)}")
+    with patch.object(dspy.LM, "forward", forward):
+        yield calls
+
+def test_cached_lm_hits_and_namespaces(cache, provider):
+    lm = CachedLM("openai/gpt-4o", namespace="profile-1", api_key="sk-1")
+    messages = [{"role": "user", "content": "Hi"}]
+
+    first = lm.forward(messages=messages)
+    second = lm.forward(messages=messages)
+    assert len(provider) == 1
+    assert second.text == first.text
+    assert second.cache_hit and second.usage == {}
+    # What the answer cost when it was fetched is kept for measurements
+    assert second.cached_usage == {"total_tokens": 10} and second.provider_latency_s >= 0
+
+    # Different sampling parameters or rollout are different requests
+    lm.forward(messages=messages, temperature=1.0, rollout_id=1)
+    assert len(provider) == 2
+    # Same model on another profile (e.g. another endpoint) does not share answers
+    other = CachedLM("openai/gpt-4o", namespace="profile-2", api_key="sk-2")
+    other.forward(messages=messages)
+    assert len(provider) == 3
+    # Copies made by optimizers keep the namespace and the cache
+    lm.copy(rollout_id=1, temperature=1.0).forward(messages=messages)
+    assert len(provider) == 3
+
+    stats = cache.stats()
+    assert stats["entries"] == 3
+    assert stats["namespaces"]["profile-1"] == {"hits": 2, "misses": 2, "hit_rate": 0.5}
+    assert stats["namespaces"]["profile-2"]["misses"] == 1
+
+    assert cache.clear("profile-1") == 2
+    lm.forward(messages=messages)
+    assert len(provider) == 4
+
+@pytest.mark.asyncio
+async def test_cached_lm_async_path(cache):
+    calls = []
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        calls.append(messages)
+        return FakeResponse("async")
+    lm = CachedLM("openai/gpt-4o", namespace="profile-1")
+    with patch.object(dspy.LM, "aforward", aforward):
+        await lm.aforward(prompt="Hi")
+        assert (await lm.aforward(prompt="Hi")).text == "async"
+    assert len(calls) == 1
+
+def test_cache_is_shared_on_disk(cache, provider):
+    CachedLM("openai/gpt-4o", namespace="profile-1").forward(prompt="Hi")
+    # Another process (an optimization worker) opening the same directory
+    reopened = LMCallCache(directory=cache.directory)
+    with patch.object(lm_cache_module, "lm_cache", reopened):
+        assert CachedLM("openai/gpt-4o", namespace="profile-1").forward(prompt="Hi").cache_hit
+    assert len(provider) == 1
+    assert reopened.namespace_stats("profile-1") == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+def test_dspy_lm_reused_per_profile():
+    clear_dspy_lms()
+    profile = LLMProfile(id=7, name="Local", provider=ProviderType.OLLAMA, model_id="llama3")
+    lm = get_dspy_lm(profile)
+    assert get_dspy_lm(LLMProfile(id=7, name="Local", provider=ProviderType.OLLAMA, model_id="llama3")) is lm
+    assert lm.namespace == "profile-7"
+    # An edited profile gets a new client
+    edited = LLMProfile(id=7, name="Local", provider=ProviderType.OLLAMA, model_id="llama3", base_url="http://gpu:11434")
+    assert get_dspy_lm(edited) is not lm
+    clear_dspy_lms()
@@ -0,0 +1,201 @@
+import asyncio
+import os
+import time
+import pytest
+from unittest.mock import patch
+import dspy
+from dspy.utils import DummyLM
+
+from litellm import ModelResponse
+
+from app.engine.dspy_metrics import make_metric
+from app.engine.dspy_pareto import demo_counts, mark_frontier, select_candidate
+from app.engine.dspy_optimizer import compile_program, split_examples
+from app.engine.program_store import ProgramStore
+from app.models.run import RunStatus
+from app.models.settings import LLMProfile, ProviderType
+from app.schemas.dspy_schema import DSPyExample, InferenceBudget, OptimizationRequest, ProgramCandidate
+from app.services.optimization_jobs import OptimizationJobManager
+
+PROFILE = LLMProfile(id=1, name="Test", provider=ProviderType.OPENAI, model_id="gpt-4o-mini")
+
+def make_request(node_id="node_1", examples=4, **kwargs):
+    return OptimizationRequest(
+        node_id=node_id,
+        goal="Uppercase the text.",
+        mode="Predict",
+        inputs=[{"name": "text", "desc": "Text"}],
+        outputs=[{"name": "upper", "desc": "Uppercased text"}],
+        examples=[DSPyExample(inputs={"text": f"word{i}"}, outputs={"upper": f"WORD{i}"}) for i in range(examples)],
+        llm_profile_id=1,
+        max_rounds=2,
+        **kwargs,
+    )
+
+def uppercasing_provider(lm, prompt=None, messages=None, **kwargs):
+    """Always right; prompt tokens grow with the demos, ChainOfThought answers are longer."""
+    word = messages[-1]["content"].split("[[ ## text ## ]]")[-1].split()[0]
+    reasoning = "[[ ## reasoning ## ]]\nUppercase every letter.\n\n" if "`reasoning`" in messages[0]["content"] else ""
+    content = f"{reasoning}[[ ## upper ## ]]\n{word.upper()}\n\n[[ ## completed ## ]]"
+    prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+    return ModelResponse(
+        model=lm.model,
+        choices=[{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        usage={"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4, "total_tokens": prompt_tokens + len(content) // 4},
+    )
+
+# Worker process targets (module level, so spawned processes can import them)
+
+def fake_optimization(request, profile, events, cpus, nice):
+    for round_ in range(3):
+        events.put({"type": "progress", "round": round_ + 1, "candidates": round_ + 1, "best_score": round_ / 2})
+    events.put({"type": "completed", "result": {"status": "success", "compiled_program_path": "x.json", "score": 1.0}})
+
+def slow_optimization(request, profile, events, cpus, nice):
+    events.put({"type": "progress", "round": 1})
+    time.sleep(60)
+
+def crashing_optimization(request, profile, events, cpus, nice):
+    os._exit(3)
+
+async def wait_for_status(manager, job_id, status):
+    for _ in range(500):
+        if manager.get(job_id).status == status:
+            return
+        await asyncio.sleep(0.05)
+    raise AssertionError(f"job never reached {status}")
+
+def test_compile_program_reports_progress_and_scores(tmp_path):
+    # The LM gets word2 wrong; word1 is held out for validation
+    answers = {f"word{i}": {"upper": "nope" if i == 2 else f"WORD{i}"} for i in range(4)}
+    progress = []
+    with patch("app.engine.dspy_optimizer.get_dspy_lm", return_value=DummyLM(answers)), \
+         patch("app.engine.dspy_optimizer.program_store", ProgramStore(str(tmp_path))):
+        result = compile_program(make_request(), PROFILE, on_progress=progress.append)
+
+    assert result.status == "success"
+    assert os.path.exists(result.compiled_program_path)
+    assert result.version == 1
+    stored = ProgramStore(str(tmp_path)).history(result.signature_hash)[0]
+    assert (stored["node_id"], stored["score"], stored["profile"]["id"]) == ("node_1", 1.0, 1)
+    assert (result.train_size, result.val_size) == (3, 1)
+    assert result.baseline_score == 1.0 and result.score == 1.0
+    assert result.eval_seconds > 0
+    bootstrap = [p for p in progress if p["phase"] == "bootstrap"]
+    # word2 fails both rounds, the two others pass on the first one
+    assert [p["candidates"] for p in bootstrap] == [1, 2, 3, 4]
+    assert bootstrap[-1]["bootstrapped"] == 2
+    assert [p["phase"] for p in progress if p["phase"] != "bootstrap"] == ["baseline", "evaluation"]
+
+def test_bootstrap_progress_hook_exists():
+    # Progress relies on overriding a private DSPy method: fail loudly if an upgrade drops it
+    from dspy.teleprompt import BootstrapFewShot
+    from app.engine.dspy_optimizer import BOOTSTRAP_HOOK, ProgressBootstrapFewShot
+    assert callable(getattr(BootstrapFewShot, BOOTSTRAP_HOOK, None))
+    assert BOOTSTRAP_HOOK in vars(ProgressBootstrapFewShot)
+
+def test_pareto_objective_picks_best_program_within_budget(tmp_path):
+    lm = dspy.LM("openai/gpt-4o-mini", cache=False)
+    store = ProgramStore(str(tmp_path))
+    with patch("app.engine.dspy_optimizer.get_dspy_lm", return_value=lm), \
+         patch("app.engine.dspy_optimizer.program_store", store), \
+         patch.object(dspy.LM, "forward", uppercasing_provider):
+        unbounded = compile_program(make_request(examples=8, objective="pareto"), PROFILE)
+        no_demo_prompt = min(c.prompt_tokens for c in unbounded.candidates if c.demos == 0)
+        bounded = compile_program(make_request(examples=8, objective="pareto", budget=InferenceBudget(max_prompt_tokens=no_demo_prompt + 1)), PROFILE)
+        impossible = compile_program(make_request(examples=8, objective="pareto", budget=InferenceBudget(max_prompt_tokens=1)), PROFILE)
+
+    # Every program is right: the smallest one wins (latencies are noise here)
+    assert {(c.mode, c.demos) for c in unbounded.candidates} >= {("Predict", 0), ("ChainOfThought", 0), ("Predict", 1)}
+    assert all(c.score == 1.0 and c.p95_latency_ms is not None for c in unbounded.candidates)
+    assert (unbounded.mode, unbounded.demos) == ("Predict", 0)
+    assert [(c.mode, c.demos) for c in unbounded.candidates if c.selected] == [("Predict", 0)]
+    assert next(c for c in unbounded.candidates if c.selected).pareto
+
+    assert bounded.status == "success" and bounded.demos == 0
+    assert [c.demos for c in bounded.candidates if c.within_budget] == [0]
+    stored = store.history(bounded.signature_hash)[-1]
+    assert stored["objective"] == "pareto" and stored["prompt_tokens"] <= no_demo_prompt + 1
+
+    assert impossible.status == "over_budget" and impossible.version is None
+    assert not any(c.within_budget for c in impossible.candidates)
+
+def test_pareto_frontier_and_selection():
+    assert demo_counts(0) == [0] and demo_counts(6) == [0, 1, 2, 4, 6]
+    small = ProgramCandidate(mode="Predict", demos=0, score=0.6, prompt_tokens=100, output_tokens=10, p95_latency_ms=200)
+    large = ProgramCandidate(mode="Predict", demos=4, score=0.9, prompt_tokens=900, output_tokens=10, p95_latency_ms=400)
+    worse = ProgramCandidate(mode="ChainOfThought", demos=4, score=0.8, prompt_tokens=950, output_tokens=60, p95_latency_ms=900)
+    candidates = [small, large, worse]
+    mark_frontier(candidates)
+    assert [c.pareto for c in candidates] == [True, True, False]
+    assert select_candidate(candidates) is large
+    large.within_budget = False
+    assert select_candidate(candidates) is worse
+
+def test_split_examples_holds_out_validation():
+    train, val = split_examples(list(range(100)), 0.3, seed=1)
+    assert 15 < len(val) < 45 and sorted(train + val) == list(range(100))
+    assert split_examples(list(range(100)), 0.3, seed=1) == (train, val)
+    # New examples never move existing ones to the other side
+    more_train, more_val = split_examples(list(range(150)), 0.3, seed=1)
+    assert set(val) <= set(more_val) and set(train) <= set(more_train)
+    # Nothing to hold out from a single example
+    assert split_examples([1], 0.5) == ([1], [1])
+
+@pytest.mark.parametrize("name,expected,predicted,score", [
+    ("exact_match", "Paris", " paris ", 1.0),
+    ("exact_match", "Paris", "Paris, France", 0.0),
+    ("contains", "Paris", "It is Paris, France", 1.0),
+    ("f1", "the cat sat", "the cat", 0.8),
+    ("json_match", '{"a": 1, "b": "x"}', '{"a": 1, "b": "y"}', 0.5),
+    ("json_match", '{"a": 1}', "not json", 0.0),
+])
+def test_metrics(name, expected, predicted, score):
+    metric = make_metric(name, [{"name": "answer"}])
+    example, pred = dspy.Example(answer=expected), dspy.Prediction(answer=predicted)
+    assert metric(example, pred) == pytest.approx(score)
+
+def test_llm_judge_metric_asks_the_lm():
+    metric = make_metric("llm_judge", [{"name": "answer", "desc": "Capital city"}])
+    with dspy.context(lm=DummyLM([{"correct": True}])):
+        assert metric(dspy.Example(answer="Paris"), dspy.Prediction(answer="The capital is Paris")) == 1.0
+    with pytest.raises(ValueError):
+        make_metric("bleu", [{"name": "answer"}])
+
+@pytest.mark.asyncio
+async def test_job_streams_progress_and_result():
+    manager = OptimizationJobManager(target=fake_optimization, cpus=0, nice=0)
+    job = await manager.submit(make_request(), PROFILE)
+    await manager.wait(job.id)
+
+    assert job.status == RunStatus.SUCCEEDED
+    assert job.result["score"] == 1.0
+    assert job.progress["round"] == 3
+    events = [event async for event in manager.follow(job.id)]
+    assert [e["type"] for e in events] == ["queued", "started", "progress", "progress", "progress", "completed"]
+    assert [e["seq"] for e in events] == list(range(6))
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_and_cancel():
+    manager = OptimizationJobManager(workers=1, target=slow_optimization, cpus=0, nice=0)
+    first = await manager.submit(make_request("a"), PROFILE)
+    second = await manager.submit(make_request("b"), PROFILE)
+    await wait_for_status(manager, first.id, RunStatus.RUNNING)
+    assert second.status == RunStatus.QUEUED
+
+    # Cancelling the queued job never starts it; cancelling the running one kills its process
+    await manager.cancel(second.id)
+    assert second.status == RunStatus.CANCELLED and second.started_at is None
+    await manager.cancel(first.id)
+    assert first.status == RunStatus.CANCELLED
+    started = next(e for e in first.log.events if e["type"] == "started")
+    with pytest.raises(ProcessLookupError):
+        os.kill(started["pid"], 0)
+
+@pytest.mark.asyncio
+async def test_crashed_worker_fails_the_job():
+    manager = OptimizationJobManager(target=crashing_optimization, cpus=0, nice=0)
+    job = await manager.submit(make_request(), PROFILE)
+    await manager.wait(job.id)
+    assert job.status == RunStatus.FAILED
+    assert "exited with code 3" in job.error
@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from langchain_core.messages import AIMessageChunk
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+from app.models.settings import LLMProfile, ProfileProbe, ProviderType
+from app.services.profile_health import ProfileHealthProber
+
+class FakeStreamingLLM:
+    """Streams `tokens` chunks after `delay` seconds, or fails."""
+    def __init__(self, tokens=5, delay=0.0, error=None):
+        self.tokens = tokens
+        self.delay = delay
+        self.error = error
+
+    async def astream(self, prompt):
+        if self.error:
+            raise self.error
+        await asyncio.sleep(self.delay)
+        for i in range(self.tokens):
+            yield AIMessageChunk(content=f"{i} ")
+            await asyncio.sleep(0.001)
+
+def make_prober(llms, **kwargs):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        for name in llms:
+            session.add(LLMProfile(name=name, provider=ProviderType.OPENAI, model_id="gpt-4o"))
+        session.commit()
+    return ProfileHealthProber(engine=engine, llm_factory=lambda profile: llms[profile.name], interval_s=0, **kwargs)
+
+@pytest.mark.asyncio
+async def test_probe_measures_ttft_speed_and_errors():
+    prober = make_prober({
+        "fast": FakeStreamingLLM(tokens=8, delay=0.01),
+        "broken": FakeStreamingLLM(error=RuntimeError("401 Unauthorized")),
+        "hung": FakeStreamingLLM(delay=5),
+    }, timeout_s=0.2)
+    await prober.probe_all()
+
+    fast, broken, hung = prober.stats(1), prober.stats(2), prober.stats(3)
+    assert fast["healthy"] is True and fast["error_rate"] == 0
+    assert fast["ttft_p50_s"] >= 0.01
+    assert fast["tokens_per_s_p50"] > 0
+    assert broken["healthy"] is False and broken["error_rate"] == 1
+    assert broken["last_error"] == "401 Unauthorized"
+    assert hung["healthy"] is False and "Timed out" in hung["last_error"]
+    # Never probed
+    assert prober.stats(42)["samples"] == 0
+
+@pytest.mark.asyncio
+async def test_rolling_window_is_persisted():
+    prober = make_prober({"fast": FakeStreamingLLM()}, window=3)
+    for _ in range(5):
+        await prober.probe_all()
+    assert prober.stats(1)["samples"] == 3
+    with Session(prober.engine) as session:
+        assert len(session.exec(select(ProfileProbe)).all()) == 3
+
+    # A restarted process picks up the stored probes
+    restarted = ProfileHealthProber(engine=prober.engine, interval_s=0, window=3)
+    await restarted.start()
+    assert restarted.stats(1)["samples"] == 3
+    assert restarted.stats(1)["healthy"] is True
+    await restarted.stop()
@@ -0,0 +1,79 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import dspy
+import pytest
+from fastapi.testclient import TestClient
+
+from app.engine.program_store import ProgramStore, signature_definition, signature_hash
+from app.engine.smart_node_cache import build_module
+from app.main import app
+
+INPUTS = [{"name": "question", "desc": "Question"}]
+OUTPUTS = [{"name": "answer", "desc": "Answer"}]
+SIGNATURE = signature_definition("Predict", "Answer the question.", INPUTS, OUTPUTS)
+
+@pytest.fixture
+def store(tmp_path):
+    return ProgramStore(str(tmp_path / "programs"))
+
+def test_signature_hash_ignores_node_and_follows_signature():
+    sig_hash = signature_hash("Predict", "Answer the question.", INPUTS, OUTPUTS)
+    assert len(sig_hash) == 64
+    assert signature_hash("Predict", "Answer the question.", [{"name": "question", "desc": "Question", "extra": 1}], OUTPUTS) == sig_hash
+    assert signature_hash("ChainOfThought", "Answer the question.", INPUTS, OUTPUTS) != sig_hash
+    assert signature_hash("Predict", "Answer the question.", INPUTS, [{"name": "reply", "desc": "Answer"}]) != sig_hash
+
+def test_versions_metadata_and_rollback(store):
+    first = store.save(SIGNATURE, {"demos": [1]}, {"score": 0.5, "optimizer": "BootstrapFewShot"})
+    second = store.save(SIGNATURE, {"demos": [2]}, {"score": 0.8, "optimizer": "BootstrapFewShot"})
+    sig_hash = first["signature_hash"]
+
+    assert (first["version"], second["version"]) == (1, 2)
+    assert store.current_version(sig_hash) == 2
+    assert store.load(sig_hash)["program"] == {"demos": [2]}
+    assert store.signature(sig_hash) == SIGNATURE
+    history = store.history(sig_hash)
+    assert [(v["version"], v["score"]) for v in history] == [(1, 0.5), (2, 0.8)]
+    assert all("program" not in v and v["created_at"] for v in history)
+
+    store.activate(sig_hash, 1)
+    assert store.load(sig_hash)["program"] == {"demos": [1]}
+    with pytest.raises(KeyError):
+        store.activate(sig_hash, 3)
+    # Only complete files: no temporary files left behind
+    assert sorted(os.listdir(os.path.dirname(store.path(sig_hash, 1)))) == ["current", "signature.json", "v0001.json", "v0002.json"]
+
+def test_concurrent_saves_get_distinct_versions(store):
+    with ThreadPoolExecutor(8) as pool:
+        records = list(pool.map(lambda i: store.save(SIGNATURE, {"demos": [i]}, {}), range(16)))
+    assert sorted(r["version"] for r in records) == list(range(1, 17))
+    sig_hash = records[0]["signature_hash"]
+    assert {store.load(sig_hash, r["version"])["program"]["demos"][0] for r in records} == set(range(16))
+
+def test_compiled_module_round_trip(store):
+    module = build_module("node_1", "Predict", "Answer the question.", INPUTS, OUTPUTS)
+    module.demos = [dspy.Example(question="2+2?", answer="4").with_inputs("question")]
+    record = store.save(SIGNATURE, module.dump_state(), {})
+
+    # Loaded into another node with the same signature
+    copy = build_module("node_2", "Predict", "Answer the question.", INPUTS, OUTPUTS)
+    copy.load_state(store.load(record["signature_hash"])["program"])
+    assert copy.demos[0]["answer"] == "4"
+
+def test_program_endpoints(store):
+    record = store.save(SIGNATURE, {"demos": []}, {"score": 0.9, "node_id": "node_1", "profile": {"id": 1}})
+    store.save(SIGNATURE, {"demos": []}, {"score": 0.7})
+    sig_hash = record["signature_hash"]
+    with patch("app.api.smart_nodes.program_store", store):
+        client = TestClient(app)
+        history = client.get(f"/api/smart-nodes/programs/{sig_hash}").json()
+        assert history["current_version"] == 2
+        assert [(v["version"], v["active"]) for v in history["versions"]] == [(1, False), (2, True)]
+
+        history = client.post(f"/api/smart-nodes/programs/{sig_hash}/versions/1/activate").json()
+        assert history["current_version"] == 1 and history["versions"][0]["score"] == 0.9
+        assert client.post(f"/api/smart-nodes/programs/{sig_hash}/versions/9/activate").status_code == 404
+        assert client.get(f"/api/smart-nodes/programs/{'0' * 64}").status_code == 404
+        assert client.get("/api/smart-nodes/programs/..").status_code in (404, 422)
@@ -0,0 +1,89 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, START, END
+
+from app.engine.replay import prepare_replay, run_metadata
+from app.engine.state import GraphState
+
+def graph_data(b_reply="b1"):
+    return {
+        "nodes": [
+            {"id": "a", "type": "echo", "data": {"reply": "a1"}, "position": {"x": 0, "y": 0}},
+            {"id": "b", "type": "echo", "data": {"reply": b_reply}},
+            {"id": "c", "type": "echo", "data": {"reply": "c1"}},
+        ],
+        "edges": [{"source": "a", "target": "b"}, {"source": "b", "target": "c"}],
+    }
+
+def compile_echo(data, checkpointer, calls):
+    """Stand-in for compile_graph: each node appends its configured reply."""
+    workflow = StateGraph(GraphState)
+    for node in data["nodes"]:
+        def run(state, node_id=node["id"], reply=node["data"]["reply"]):
+            calls.append(node_id)
+            return {"messages": [AIMessage(content=reply)], "last_sender": node_id}
+        workflow.add_node(node["id"], run)
+    workflow.add_edge(START, "a")
+    for edge in data["edges"]:
+        workflow.add_edge(edge["source"], edge["target"])
+    workflow.add_edge("c", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+async def run_source(saver, calls):
+    data = graph_data()
+    app = compile_echo(data, saver, calls)
+    config = {"configurable": {"thread_id": "source"}, "metadata": run_metadata(data)}
+    await app.ainvoke({"messages": [HumanMessage(content="go")]}, config)
+    calls.clear()
+
+@pytest.mark.asyncio
+async def test_replay_reruns_only_changed_node_and_descendants():
+    saver, calls = MemorySaver(), []
+    await run_source(saver, calls)
+
+    edited = graph_data(b_reply="b2")
+    app = compile_echo(edited, saver, calls)
+    plan = await prepare_replay(app, edited, "source", "replay")
+    assert plan.changed_nodes == ["b"]
+    assert plan.reused_nodes == ["a"]
+    assert plan.rerun_from == ["b"]
+
+    await app.ainvoke(None, {"configurable": {"thread_id": "replay"}, "metadata": run_metadata(edited)})
+    assert calls == ["b", "c"]
+
+    replayed = await app.aget_state({"configurable": {"thread_id": "replay"}})
+    assert [m.content for m in replayed.values["messages"]] == ["go", "a1", "b2", "c1"]
+    source = await app.aget_state({"configurable": {"thread_id": "source"}})
+    assert [m.content for m in source.values["messages"]] == ["go", "a1", "b1", "c1"]
+
+@pytest.mark.asyncio
+async def test_replay_without_changes_reuses_everything():
+    saver, calls = MemorySaver(), []
+    await run_source(saver, calls)
+    data = graph_data()
+    # UI-only changes (node position) do not invalidate anything
+    data["nodes"][0]["position"] = {"x": 10, "y": 10}
+    app = compile_echo(data, saver, calls)
+
+    plan = await prepare_replay(app, data, "source", "replay")
+    assert plan.reused_nodes == ["a", "b", "c"] and plan.rerun_from == []
+    await app.ainvoke(None, {"configurable": {"thread_id": "replay"}})
+    assert calls == []
+
+@pytest.mark.asyncio
+async def test_replay_from_chosen_checkpoint():
+    saver, calls = MemorySaver(), []
+    await run_source(saver, calls)
+    data = graph_data()
+    app = compile_echo(data, saver, calls)
+
+    history = [s async for s in app.aget_state_history({"configurable": {"thread_id": "source"}})]
+    before_c = next(s for s in history if s.next == ("c",))
+    plan = await prepare_replay(app, data, "source", "replay", checkpoint_id=before_c.config["configurable"]["checkpoint_id"])
+    assert plan.reused_nodes == ["a", "b"]
+    await app.ainvoke(None, {"configurable": {"thread_id": "replay"}})
+    assert calls == ["c"]
+
+    with pytest.raises(LookupError):
+        await prepare_replay(app, data, "missing", "replay-2")
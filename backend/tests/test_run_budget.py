@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, START, END
+
+from app.engine.budget import (
+    BudgetExceededError,
+    BudgetTracker,
+    NodeBudget,
+    RunBudget,
+    budget_exceeded_event,
+    enforce_deadline,
+    with_budget,
+)
+from app.engine.events import stream_run_events
+from app.engine.state import GraphState
+
+def reply(tokens):
+    return AIMessage(content="step", usage_metadata={"input_tokens": tokens - 10, "output_tokens": 10, "total_tokens": tokens})
+
+def build_loop(delay=0.0):
+    """Runaway cycle: writer -> reviewer -> writer ... each node makes one LLM call."""
+    llm = FakeMessagesListChatModel(responses=[reply(100) for _ in range(100)])
+
+    async def call(state: GraphState):
+        await asyncio.sleep(delay)
+        return {"messages": [await llm.ainvoke(state["messages"])]}
+
+    workflow = StateGraph(GraphState)
+    workflow.add_node("writer", call)
+    workflow.add_node("reviewer", call)
+    workflow.add_edge(START, "writer")
+    workflow.add_edge("writer", "reviewer")
+    workflow.add_edge("reviewer", "writer")
+    return workflow.compile(checkpointer=MemorySaver())
+
+async def run(app, budget, thread_id="t"):
+    tracker = BudgetTracker(budget)
+    config = with_budget({"configurable": {"thread_id": thread_id}, "recursion_limit": 1000}, tracker)
+    events = []
+    with pytest.raises(BudgetExceededError) as info:
+        async with enforce_deadline(tracker):
+            async for event in stream_run_events(app, {"messages": [HumanMessage(content="go")]}, config):
+                events.append(event)
+    return info.value, tracker
+
+@pytest.mark.asyncio
+async def test_token_budget_stops_run_at_next_node():
+    app = build_loop()
+    error, tracker = await run(app, RunBudget(max_tokens=450))
+    assert (error.limit, error.scope) == ("tokens", "run")
+    # The 5th response crossed the limit and is kept; the 6th call never happened
+    assert tracker.llm_calls == 5 and tracker.tokens == 500
+
+    event = await budget_exceeded_event(app, "t", error)
+    assert event["type"] == "budget_exceeded" and event["checkpoint_id"]
+    state = await app.aget_state({"configurable": {"thread_id": "t"}})
+    assert len(state.values["messages"]) == 6
+
+@pytest.mark.asyncio
+async def test_call_budget_and_node_sub_budget():
+    error, tracker = await run(build_loop(), RunBudget(max_llm_calls=3))
+    assert error.limit == "llm_calls" and tracker.llm_calls == 3
+
+    error, tracker = await run(build_loop(), RunBudget(nodes={"reviewer": NodeBudget(max_llm_calls=2)}))
+    assert (error.limit, error.scope) == ("llm_calls", "reviewer")
+    assert error.usage["nodes"]["reviewer"]["llm_calls"] == 2
+
+@pytest.mark.asyncio
+async def test_wall_clock_deadline_cancels_in_flight_node():
+    error, tracker = await run(build_loop(delay=0.05), RunBudget(max_seconds=0.2))
+    assert error.limit == "wall_clock"
+    assert 0.15 < error.usage["elapsed_s"] < 1
+
+def test_budget_from_request_and_flow():
+    graph_data = {"nodes": [{"id": "a", "data": {"budget": {"max_tokens": 10}}}, {"id": "b", "data": {}}]}
+    budget = RunBudget.from_request({"max_llm_calls": 5, "nodes": {"b": {"max_llm_calls": 1}}}, graph_data)
+    assert budget.max_llm_calls == 5 and budget.max_tokens is None
+    assert budget.nodes["a"].max_tokens == 10 and budget.nodes["b"].max_llm_calls == 1
+    assert RunBudget.from_request().unlimited
+
+@pytest.mark.asyncio
+async def test_budget_counts_smart_node_calls(tmp_path):
+    """Smart nodes call their LM through DSPy / litellm, not LangChain: still counted."""
+    import dspy
+    from unittest.mock import patch
+    from litellm import ModelResponse
+    from typing_extensions import TypedDict
+    from app.engine.program_store import ProgramStore
+    from app.engine.smart_node_cache import smart_node_modules
+    from app.nodes.smart_node import SmartNode
+
+    class QAState(TypedDict, total=False):
+        question: str
+        answer: str
+
+    async def aforward(lm, prompt=None, messages=None, **kwargs):
+        return ModelResponse(
+            model=lm.model,
+            choices=[{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "[[ ## answer ## ]]\nagain\n\n[[ ## completed ## ]]"}}],
+            usage={"prompt_tokens": 90, "completion_tokens": 10, "total_tokens": 100},
+        )
+
+    node = SmartNode("smart", {
+        "mode": "Predict", "goal": "Answer.",
+        "inputs": [{"name": "question", "desc": "Question"}], "outputs": [{"name": "answer", "desc": "Answer"}],
+        "llm_profile": {"id": 1, "name": "test", "provider": "openai", "model_id": "gpt-4o-mini"},
+    })
+    workflow = StateGraph(QAState)
+    workflow.add_node("smart", node)
+    workflow.add_edge(START, "smart")
+    workflow.add_conditional_edges("smart", lambda state: "smart")
+    app = workflow.compile(checkpointer=MemorySaver())
+
+    async def run_smart(budget):
+        tracker = BudgetTracker(budget)
+        config = with_budget({"configurable": {"thread_id": "smart"}, "recursion_limit": 1000}, tracker)
+        with pytest.raises(BudgetExceededError) as info:
+            async for _ in stream_run_events(app, {"question": "Done yet?"}, config):
+                pass
+        return info.value, tracker
+
+    smart_node_modules.clear()
+    with patch.object(smart_node_modules, "store", ProgramStore(str(tmp_path))), \
+            patch("app.nodes.smart_node.get_dspy_lm", return_value=dspy.LM("openai/gpt-4o-mini", cache=False)), \
+            patch.object(dspy.LM, "aforward", aforward):
+        error, tracker = await run_smart(RunBudget(max_llm_calls=3))
+        assert error.limit == "llm_calls" and tracker.llm_calls == 3
+        assert tracker.usage()["nodes"]["smart"] == {"tokens": 300, "llm_calls": 3}
+
+        error, tracker = await run_smart(RunBudget(max_tokens=250))
+        assert error.limit == "tokens" and (tracker.llm_calls, tracker.tokens) == (3, 300)
+    smart_node_modules.clear()
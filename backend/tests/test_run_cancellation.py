@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, START, END
+
+from app.api import run as run_api
+from app.engine.state import GraphState
+from app.main import app
+
+class SlowGraph:
+    """Graph whose single node blocks like a long LLM call until cancelled."""
+    def __init__(self):
+        self.started = threading.Event()
+        self.cancelled = threading.Event()
+
+    def compile(self, graph_data, checkpointer=None):
+        async def agent(state: GraphState):
+            self.started.set()
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                self.cancelled.set()
+                raise
+            return {"messages": [AIMessage(content="late")]}
+
+        workflow = StateGraph(GraphState)
+        workflow.add_node("agent", agent)
+        workflow.add_edge(START, "agent")
+        workflow.add_edge("agent", END)
+        return workflow.compile(checkpointer=checkpointer)
+
+@pytest.fixture
+def slow_graph(monkeypatch):
+    graph = SlowGraph()
+    saver = MemorySaver()
+
+    async def checkpointer():
+        return saver
+    monkeypatch.setattr(run_api, "compile_graph", graph.compile)
+    monkeypatch.setattr(run_api, "get_graph_checkpointer", checkpointer)
+    return graph
+
+INIT = {"graph": {"nodes": [], "edges": []}, "input": "hello"}
+
+def test_stop_message_cancels_in_flight_node(slow_graph):
+    client = TestClient(app)
+    with client.websocket_connect("/api/ws/run/playground") as ws:
+        ws.send_json(INIT)
+        assert ws.receive_json() == {"type": "node_active", "node_id": "agent"}
+        assert slow_graph.started.wait(5)
+        ws.send_json({"type": "stop"})
+        message = ws.receive_json()
+        assert message["type"] == "cancelled"
+        assert message["released_ms"] is not None and message["released_ms"] < 1000
+    assert slow_graph.cancelled.is_set()
+
+def test_disconnect_cancels_in_flight_node(slow_graph):
+    client = TestClient(app)
+    with client.websocket_connect("/api/ws/run/playground") as ws:
+        ws.send_json(INIT)
+        assert slow_graph.started.wait(5)
+    # No send is needed to notice the client is gone
+    assert slow_graph.cancelled.wait(5)
+
+def test_wall_clock_budget_ends_ws_run_gracefully(slow_graph):
+    client = TestClient(app)
+    with client.websocket_connect("/api/ws/run/playground") as ws:
+        ws.send_json({**INIT, "budget": {"max_seconds": 0.2}})
+        assert ws.receive_json()["type"] == "node_active"
+        message = ws.receive_json()
+        assert message["type"] == "budget_exceeded"
+        assert message["limit"] == "wall_clock"
+        assert message["thread_id"].startswith("run-")
+    assert slow_graph.cancelled.is_set()
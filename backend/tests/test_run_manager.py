@@ -0,0 +1,173 @@
+import asyncio
+import pytest
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, START, END
+from sqlmodel import SQLModel, create_engine
+
+from app.engine.graph_cache import CachedGraph, FlowNotFoundError
+from app.engine.state import GraphState
+from app.models.run import RunStatus
+from app.services.run_manager import RunManager
+
+class FakeGraphs:
+    """Stands in for the graph cache: one flow whose agent waits for a release signal."""
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.order = []
+
+        async def agent(state: GraphState):
+            self.order.append(state["messages"][-1].content)
+            await self.release.wait()
+            return {"messages": [AIMessage(content="answer")], "last_sender": "agent"}
+
+        workflow = StateGraph(GraphState)
+        workflow.add_node("agent", agent)
+        workflow.add_edge(START, "agent")
+        workflow.add_edge("agent", END)
+        self.app = workflow.compile()
+
+    def get(self, flow_id, version=None):
+        if flow_id != 1:
+            raise FlowNotFoundError(f"Flow {flow_id} not found")
+        return CachedGraph(flow_id=1, version=3, graph_data={}, app=self.app)
+
+def make_manager(tmp_path, workers=1):
+    # A file database: the manager writes from worker threads, which must not share one connection
+    engine = create_engine(f"sqlite:///{tmp_path / 'runs.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    saver = MemorySaver()
+
+    async def checkpointer():
+        return saver
+    return RunManager(workers=workers, engine=engine, graphs=FakeGraphs(), checkpointer_factory=checkpointer, runs_dir=str(tmp_path))
+
+async def wait_for(manager, run_id, status):
+    for _ in range(500):
+        run = await manager.get(run_id)
+        if run.status == status:
+            return run
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"run {run_id} stuck in {run.status}")
+
+@pytest.mark.asyncio
+async def test_detached_run_completes_and_replays(tmp_path):
+    manager = make_manager(tmp_path)
+    await manager.start()
+    try:
+        run = await manager.submit(1, "hello")
+        assert run.status == RunStatus.QUEUED
+
+        # A client attaches, then detaches mid-run: the run keeps going
+        follower = await manager.follow(run.id)
+        first = await follower.__anext__()
+        assert first["type"] == "run_started" and first["seq"] == 0
+        await follower.aclose()
+
+        manager.graphs.release.set()
+        done = await wait_for(manager, run.id, RunStatus.SUCCEEDED)
+        assert done.output == "answer"
+        assert done.flow_version == 3
+
+        # Late subscriber replays everything from an offset, including 'done'
+        events = [e async for e in await manager.follow(run.id, offset=1)]
+        assert events[0]["seq"] == 1
+        assert events[-1]["type"] == "done"
+        assert len(events) == done.event_count - 1
+
+        # Replay from disk once the in-memory log is gone
+        manager._logs.clear()
+        replay = [e async for e in await manager.follow(run.id)]
+        assert [e["seq"] for e in replay] == list(range(done.event_count))
+    finally:
+        await manager.stop()
+
+@pytest.mark.asyncio
+async def test_priority_order_and_failures(tmp_path):
+    manager = make_manager(tmp_path)
+    # Queue before starting workers so the order is decided by priority only
+    manager._queue = asyncio.PriorityQueue()
+    low = await manager.submit(1, "low")
+    high = await manager.submit(1, "high", priority=10)
+    missing = await manager.submit(2, "missing", priority=5)
+    manager.graphs.release.set()
+    await manager.start()
+    try:
+        await wait_for(manager, low.id, RunStatus.SUCCEEDED)
+        await wait_for(manager, high.id, RunStatus.SUCCEEDED)
+        failed = await wait_for(manager, missing.id, RunStatus.FAILED)
+        assert "not found" in failed.error
+        assert manager.graphs.order == ["high", "low"]
+    finally:
+        await manager.stop()
+
+@pytest.mark.asyncio
+async def test_restart_recovers_runs(tmp_path):
+    manager = make_manager(tmp_path)
+    manager._queue = asyncio.PriorityQueue()
+    queued = await manager.submit(1, "queued")
+    running = await manager.submit(1, "running")
+    manager._update(running.id, status=RunStatus.RUNNING)
+
+    # A fresh manager on the same DB: stale 'running' runs are interrupted, queued ones resumed
+    restarted = RunManager(workers=1, engine=manager.engine, graphs=manager.graphs,
+                           checkpointer_factory=manager.checkpointer_factory, runs_dir=str(tmp_path))
+    restarted.graphs.release.set()
+    await restarted.start()
+    try:
+        await wait_for(restarted, queued.id, RunStatus.SUCCEEDED)
+        assert (await restarted.get(running.id)).status == RunStatus.INTERRUPTED
+    finally:
+        await restarted.stop()
+
+@pytest.mark.asyncio
+async def test_shutdown_interrupts_running_runs(tmp_path):
+    manager = make_manager(tmp_path)
+    await manager.start()
+    running = await manager.submit(1, "running")
+    await wait_for(manager, running.id, RunStatus.RUNNING)
+    await manager.stop()
+
+    # A restart is not a user stop
+    assert (await manager.get(running.id)).status == RunStatus.INTERRUPTED
+    events = [e async for e in await manager.follow(running.id)]
+    assert events[-1]["type"] == "interrupted"
+
+@pytest.mark.asyncio
+async def test_cancel_running_and_queued_runs(tmp_path):
+    manager = make_manager(tmp_path)
+    await manager.start()
+    try:
+        running = await manager.submit(1, "running")
+        queued = await manager.submit(1, "queued")
+        await wait_for(manager, running.id, RunStatus.RUNNING)
+        while not manager.graphs.order:
+            await asyncio.sleep(0.01)
+
+        # The single worker is busy: the second run is still queued
+        run, released_ms = await manager.cancel(queued.id)
+        assert run.status == RunStatus.CANCELLED
+        events = [e async for e in await manager.follow(queued.id)]
+        assert events[-1]["type"] == "cancelled"
+
+        run, released_ms = await manager.cancel(running.id)
+        assert run.status == RunStatus.CANCELLED
+        assert released_ms is not None and released_ms < 1000
+        assert manager.graphs.order == ["running"]
+    finally:
+        await manager.stop()
+
+@pytest.mark.asyncio
+async def test_wall_clock_budget_ends_run(tmp_path):
+    manager = make_manager(tmp_path)
+    await manager.start()
+    try:
+        # The agent never gets released: only the deadline can end the run
+        run = await manager.submit(1, "stuck", budget={"max_seconds": 0.2})
+        done = await wait_for(manager, run.id, RunStatus.BUDGET_EXCEEDED)
+        events = [e async for e in await manager.follow(run.id)]
+        assert events[-1]["type"] == "budget_exceeded"
+        assert events[-1]["limit"] == "wall_clock"
+        assert "budget exceeded" in done.error
+    finally:
+        await manager.stop()
@@ -1,12 +1,35 @@
+import asyncio
 import pytest
-from unittest.mock import MagicMock, patch, mock_open
+from types import SimpleNamespace
+from typing_extensions import TypedDict
+import dspy
+from dspy.utils import DummyLM
+from langgraph.graph import StateGraph, START, END
+from litellm import ModelResponseStream
+from litellm.types.utils import Delta, StreamingChoices
+from unittest.mock import AsyncMock, MagicMock, patch, mock_open
 from app.nodes.smart_node import SmartNode
 from app.models.settings import LLMProfile
+from app.engine.program_store import ProgramStore, signature_definition
+from app.engine.events import stream_run_events
+from app.engine.smart_node_cache import smart_node_modules
 
 @pytest.fixture
 def mock_dspy():
-    with patch('app.nodes.smart_node.dspy') as mock:
+    # Modules are built (and cached) by the smart node module cache
+    smart_node_modules.clear()
+    with patch('app.nodes.smart_node.dspy') as mock, patch('app.engine.smart_node_cache.dspy', mock):
+        # Modules are executed through their async entry point
+        mock.Predict.return_value.acall = AsyncMock()
+        mock.ChainOfThought.return_value.acall = AsyncMock()
         yield mock
+    smart_node_modules.clear()
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProgramStore(str(tmp_path / "programs"))
+    with patch.object(smart_node_modules, "store", store):
+        yield store
 
 @pytest.fixture
 def mock_get_dspy_lm():
@@ -43,7 +66,7 @@ async def test_smart_node_signature_creation(mock_dspy, mock_get_dspy_lm):
     assert "answer" in call_args.kwargs['output_fields']
 
 @pytest.mark.asyncio
-async def test_smart_node_loads_compiled_json(mock_dspy, mock_get_dspy_lm):
+async def test_smart_node_loads_compiled_program(mock_dspy, mock_get_dspy_lm, store):
     # Setup
     node_data = {
         "label": "Compiled Node",
@@ -52,16 +75,157 @@ async def test_smart_node_loads_compiled_json(mock_dspy, mock_get_dspy_lm):
         "outputs": [{"name": "y"}],
         "llm_profile": {"id": 1, "model_id": "gpt-3.5"}
     }
+    # Optimized as another node (e.g. in the flow this one was copied from)
+    signature = signature_definition("Predict", "Process the input.", node_data["inputs"], node_data["outputs"])
+    store.save(signature, {"demos": ["v1"]}, {"node_id": "original"})
     node = SmartNode("node_compiled", node_data)
-    
+
     # Mock module
     mock_module = MagicMock()
+    mock_module.acall = AsyncMock()
     mock_dspy.Predict.return_value = mock_module
 
-    # Mock file existence and loading
-    with patch('os.path.exists', return_value=True):
-        await node.invoke({"x": "test"})
-    
-    # Verify load called
-    mock_module.load.assert_called_with("resources/smart_nodes/node_compiled_compiled.json")
+    await node.invoke({"x": "test"})
+    # Second call reuses the loaded module
+    await node.invoke({"x": "again"})
+
+    # Verify load called once, with the stored program
+    mock_module.load_state.assert_called_once_with({"demos": ["v1"]})
+    assert mock_dspy.Predict.call_count == 1
+    assert mock_module.acall.await_count == 2
+
+    # A changed signature does not pick up the program
+    await SmartNode("node_compiled", {**node_data, "goal": "Something else."}).invoke({"x": "test"})
+    assert mock_module.load_state.call_count == 1
+
+@pytest.mark.asyncio
+async def test_smart_node_module_rebuilt_when_recompiled(mock_dspy, mock_get_dspy_lm, store):
+    before = smart_node_modules.stats()
+    node = SmartNode("node_recompiled", {"mode": "Predict", "inputs": [{"name": "x"}], "outputs": [{"name": "y"}], "llm_profile": {"id": 1, "model_id": "gpt-3.5"}})
+    signature = signature_definition(node.mode, node.goal, node.inputs, node.outputs)
+
+    v1 = store.save(signature, {"demos": ["v1"]}, {})
+    await node.invoke({"x": "a"})
+    await node.invoke({"x": "b"})
+    store.save(signature, {"demos": ["v2"]}, {})
+    await node.invoke({"x": "c"})
+    # Rolling back reuses the module built for v1
+    store.activate(v1["signature_hash"], 1)
+    await node.invoke({"x": "d"})
+
+    assert mock_dspy.Predict.call_count == 2
+    after = smart_node_modules.stats()
+    assert after["entries"] == 2
+    assert (after["hits"] - before["hits"], after["misses"] - before["misses"]) == (2, 2)
+
+MAP_NODE = {
+    "mode": "Predict",
+    "inputs": [{"name": "item", "desc": "Item"}, {"name": "topic", "desc": "Topic"}],
+    "outputs": [{"name": "tag", "desc": "Tag"}],
+    "llm_profile": {"id": 1, "model_id": "gpt-3.5"},
+    "map_input": "item",
+}
+
+@pytest.mark.asyncio
+async def test_smart_node_map_mode_isolates_errors(mock_dspy, mock_get_dspy_lm, store):
+    in_flight, peak = 0, 0
+
+    async def answer(item, topic):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if item == "bad":
+            raise ValueError("provider error")
+        return SimpleNamespace(tag=f"{topic}:{item}")
+    mock_dspy.Predict.return_value.acall = AsyncMock(side_effect=answer)
+
+    node = SmartNode("node_map", {**MAP_NODE, "map_concurrency": 3})
+    # The list comes from the shared context, the other input is passed to every call
+    items = ["a", "b", "bad", "c", "d", "e"]
+    result = await node.invoke({"topic": "fruit", "context": {"item": items}})
+
+    assert result["tag"] == ["fruit:a", "fruit:b", None, "fruit:c", "fruit:d", "fruit:e"]
+    assert result["_errors"] == [{"index": 2, "error": "provider error"}]
+    assert peak == 3
+    assert "error" in await node.invoke({"topic": "fruit", "item": "not a list"})
 
+@pytest.mark.asyncio
+async def test_smart_node_map_mode_batches_requests(mock_dspy, mock_get_dspy_lm, store):
+    calls = []
+
+    async def answer(item, topic):
+        calls.append(item)
+        if not isinstance(item, list):
+            return SimpleNamespace(tag=item.upper())
+        if "z" in item:
+            # A batch answered with the wrong number of values
+            return SimpleNamespace(tag=["?"])
+        return SimpleNamespace(tag=[i.upper() for i in item])
+    mock_dspy.Predict.return_value.acall = AsyncMock(side_effect=answer)
+
+    node = SmartNode("node_batch", {**MAP_NODE, "map_batch_size": 2})
+    result = await node.invoke({"topic": "t", "item": ["a", "b", "c", "z", "e"]})
+
+    assert result["tag"] == ["A", "B", "C", "Z", "E"]
+    assert "_errors" not in result
+    # Three batches, then the mismatched one retried item by item
+    assert sorted(map(str, calls)) == sorted(map(str, [["a", "b"], ["c", "z"], ["e"], "c", "z"]))
+    # The batched module has list fields and is cached next to the per-item one
+    fields = mock_dspy.make_signature.call_args_list[-1].args[0]
+    assert fields["item"][0] is list and fields["tag"][0] is list
+
+STREAM_CHUNKS = ["[[ ## reasoning ## ]]\n", "Two plus", " two is four.", "\n\n[[ ## answer ## ]]\n", "4", "\n\n[[ ## completed ## ]]"]
+
+async def streaming_acompletion(*args, **kwargs):
+    assert kwargs.get("stream")
+
+    async def chunks():
+        for content in STREAM_CHUNKS:
+            yield ModelResponseStream(model="gpt-4o-mini", choices=[StreamingChoices(delta=Delta(content=content))])
+    return chunks()
+
+class QAState(TypedDict, total=False):
+    question: str
+    answer: str
+
+def smart_node_graph(node):
+    workflow = StateGraph(QAState)
+    workflow.add_node("smart", node)
+    workflow.add_edge(START, "smart")
+    workflow.add_edge("smart", END)
+    return workflow.compile()
+
+@pytest.mark.asyncio
+async def test_smart_node_streams_output_tokens(store):
+    smart_node_modules.clear()
+    node = SmartNode("node_stream", {
+        "mode": "ChainOfThought",
+        "inputs": [{"name": "question"}],
+        "outputs": [{"name": "answer"}],
+        "llm_profile": {"id": 1, "model_id": "gpt-4o-mini"},
+    })
+    with patch("app.nodes.smart_node.get_dspy_lm", return_value=dspy.LM("openai/gpt-4o-mini", cache=False)), \
+         patch("litellm.acompletion", streaming_acompletion):
+        events = [e async for e in stream_run_events(smart_node_graph(node), {"question": "2+2?"}, {})]
+
+    tokens = [e for e in events if e["type"] == "token"]
+    assert [(e["field"], e["content"]) for e in tokens] == [("reasoning", "Two plus"), ("reasoning", " two is four."), ("answer", "4")]
+    assert all(e["node_id"] == "node_stream" for e in tokens)
+    # Tokens arrive while the node runs, before it finishes
+    assert events.index(tokens[-1]) < max(i for i, e in enumerate(events) if e == {"type": "node_finished", "node_id": "smart"})
+
+@pytest.mark.asyncio
+async def test_smart_node_sends_unstreamed_answers_whole(store):
+    smart_node_modules.clear()
+    node = SmartNode("node_whole", {
+        "mode": "Predict",
+        "inputs": [{"name": "question"}],
+        "outputs": [{"name": "answer"}],
+        "llm_profile": {"id": 1, "model_id": "gpt-4o-mini"},
+    })
+    # An LM that answers without streaming (like a cache hit)
+    with patch("app.nodes.smart_node.get_dspy_lm", return_value=DummyLM([{"answer": "4"}])):
+        events = [e async for e in stream_run_events(smart_node_graph(node), {"question": "2+2?"}, {})]
+    assert [e for e in events if e["type"] == "token"] == [{"type": "token", "content": "4", "node_id": "node_whole", "field": "answer"}]
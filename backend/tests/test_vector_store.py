@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.engine.embeddings import HashingEmbedder, get_embedder
+from app.engine.vector_store import VectorCollection, VectorStore
+from app.nodes.rag_node import RAGNode
+
+DOCS = [
+    "The invoice total is due within thirty days of delivery.",
+    "Refunds are issued to the original payment method.",
+    "Our office is closed on public holidays.",
+    "Shipping to Europe takes five business days.",
+]
+
+@pytest.fixture
+def store(tmp_path):
+    return VectorStore(str(tmp_path / "collections"))
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(64)
+    a, b = embedder.embed(["refund policy", "refund policy"])
+    assert np.allclose(a, b) and np.isclose(np.linalg.norm(a), 1.0)
+    assert get_embedder("hashing:64").dimension == 64
+    with pytest.raises(ValueError):
+        get_embedder("word2vec")
+
+def test_search_tombstones_and_reopen(store):
+    collection = store.create("docs")
+    rows = collection.add(DOCS, source="faq.md", metadatas=[{"line": i} for i in range(len(DOCS))])
+    assert rows == [0, 1, 2, 3] and len(collection) == 4
+
+    hits = collection.search("when are refunds issued", top_k=2)
+    assert hits[0]["text"] == DOCS[1] and hits[0]["source"] == "faq.md" and hits[0]["metadata"] == {"line": 1}
+    assert len(hits) == 2 and hits[0]["score"] >= hits[1]["score"]
+
+    collection.delete([1])
+    assert DOCS[1] not in [hit["text"] for hit in collection.search("when are refunds issued", top_k=4)]
+    assert len(collection) == 3
+
+    # Another process opening the same directory sees the same rows
+    reopened = VectorStore(store.root).get("docs")
+    assert [hit["text"] for hit in reopened.search("shipping to Europe", top_k=1)] == [DOCS[3]]
+    assert store.names() == ["docs"]
+    with pytest.raises(KeyError):
+        store.get("missing")
+    with pytest.raises(ValueError):
+        store.get("../docs")
+
+def test_ivf_index_matches_exact_search(store):
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 32))
+    vectors = centers[rng.integers(0, 20, 3000)] + 0.1 * rng.normal(size=(3000, 32))
+    collection = store.create("vectors", embedder="hashing:32")
+    collection.add([f"chunk {i}" for i in range(3000)], vectors=vectors)
+
+    queries = centers + 0.1 * rng.normal(size=(20, 32))
+    exact = [[hit["row"] for hit in collection.search_vector(q, top_k=10)] for q in queries]
+    indexed = VectorCollection(collection.path, exact_search_max=1000, nprobe=4)
+    indexed.build_index()
+    # Rows appended after the index was built are still found
+    tail = indexed.add(["late chunk"], vectors=queries[:1])[0]
+    approximate = [[hit["row"] for hit in indexed.search_vector(q, top_k=10)] for q in queries]
+
+    assert approximate[0][0] == tail
+    recall = np.mean([len(set(e) & set(a)) / 10 for e, a in zip(exact[1:], approximate[1:])])
+    assert recall >= 0.9
+
+def test_rag_node_adds_retrieved_context(store):
+    store.create("docs").add(DOCS, source="faq.md")
+    with patch("app.nodes.rag_node.vector_store", store):
+        result = RAGNode("rag_1", {"collection": "docs", "top_k": 1})({"messages": [HumanMessage(content="How long does shipping to Europe take?")]})
+        assert isinstance(result["messages"][0], SystemMessage)
+        assert result["messages"][0].content == f"Background Context:\n[1] (faq.md) {DOCS[3]}"
+
+        # Unknown collection: no context rather than a failed run
+        assert RAGNode("rag_2", {"collection": "other"})({"messages": [HumanMessage(content="hi")]}) == {"last_sender": "rag_2"}
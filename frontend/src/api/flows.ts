@@ -17,6 +17,10 @@ export interface Flow {
     name: string;
     description?: string;
     data: string; // JSON string
+    version?: number;
+    data_size?: number;
+    node_count?: number;
+    data_hash?: string; // Base for incremental (JSON Patch) saves
     created_at?: string;
     updated_at?: string;
 }
@@ -29,11 +33,20 @@ const getBaseUrl = async () => {
     return "http://localhost:8000/api";
 };
 
+// List entries omit `data` (summary projection)
+export type FlowSummary = Omit<Flow, 'data'>;
+
 export const flowApi = {
-    getAll: async (): Promise<Flow[]> => {
+    getAll: async (): Promise<FlowSummary[]> => {
         const baseUrl = await getBaseUrl();
-        const res = await axios.get(`${baseUrl}/flows`);
-        return res.data;
+        const flows: FlowSummary[] = [];
+        let cursor: string | undefined;
+        do {
+            const res = await axios.get(`${baseUrl}/flows`, { params: { limit: 200, cursor } });
+            flows.push(...res.data);
+            cursor = res.headers['x-next-cursor'];
+        } while (cursor);
+        return flows;
     },
 
     getOne: async (id: number): Promise<Flow> => {
@@ -54,8 +67,45 @@ export const flowApi = {
         return res.data;
     },
 
+    // RFC 6902 operations against `baseHash`; 409 means the flow changed meanwhile
+    patch: async (id: number, baseHash: string, patch: object[], fields: Partial<Pick<Flow, 'name' | 'description'>> = {}): Promise<FlowSummary> => {
+        const baseUrl = await getBaseUrl();
+        const res = await axios.patch(`${baseUrl}/flows/${id}`, { base_hash: baseHash, patch, ...fields });
+        return res.data;
+    },
+
     delete: async (id: number): Promise<void> => {
         const baseUrl = await getBaseUrl();
         await axios.delete(`${baseUrl}/flows/${id}`);
     }
 };
+
+const pointerToken = (key: string | number) => String(key).replace(/~/g, '~0').replace(/\//g, '~1');
+
+// RFC 6902 operations turning the JSON value `from` into `to`
+export const diffJson = (from: any, to: any, path = ''): object[] => {
+    if (from === to) return [];
+    const bothArrays = Array.isArray(from) && Array.isArray(to);
+    const bothObjects = from !== null && to !== null && typeof from === 'object' && typeof to === 'object'
+        && !Array.isArray(from) && !Array.isArray(to);
+    if (bothArrays) {
+        const ops: object[] = [];
+        const common = Math.min(from.length, to.length);
+        for (let i = 0; i < common; i++) ops.push(...diffJson(from[i], to[i], `${path}/${i}`));
+        for (let i = from.length - 1; i >= common; i--) ops.push({ op: 'remove', path: `${path}/${i}` });
+        for (let i = common; i < to.length; i++) ops.push({ op: 'add', path: `${path}/${i}`, value: to[i] });
+        return ops;
+    }
+    if (bothObjects) {
+        const ops: object[] = [];
+        for (const key of Object.keys(from)) {
+            const child = `${path}/${pointerToken(key)}`;
+            ops.push(...(key in to ? diffJson(from[key], to[key], child) : [{ op: 'remove', path: child }]));
+        }
+        for (const key of Object.keys(to)) {
+            if (!(key in from)) ops.push({ op: 'add', path: `${path}/${pointerToken(key)}`, value: to[key] });
+        }
+        return ops;
+    }
+    return [{ op: 'replace', path, value: to }];
+};
@@ -27,6 +27,31 @@ export const getModels = async (): Promise<LLMProfile[]> => {
     return response.data;
 };
 
+export interface ProfileHealth {
+    profile_id: number;
+    samples: number;
+    error_rate: number | null;
+    healthy: boolean | null;
+    last_probe_at: string | null;
+    last_error: string | null;
+    ttft_p50_s: number | null;
+    ttft_p95_s: number | null;
+    tokens_per_s_p50: number | null;
+    tokens_per_s_p5: number | null;
+}
+
+export const getModelsHealth = async (): Promise<ProfileHealth[]> => {
+    const baseUrl = await getBaseUrl();
+    const response = await axios.get(`${baseUrl}/settings/models/health`);
+    return response.data;
+};
+
+export const probeModel = async (modelId: number): Promise<ProfileHealth> => {
+    const baseUrl = await getBaseUrl();
+    const response = await axios.post(`${baseUrl}/settings/models/${modelId}/health/probe`);
+    return response.data;
+};
+
 export const createModel = async (profile: LLMProfileCreate): Promise<LLMProfile> => {
     const baseUrl = await getBaseUrl();
     const response = await axios.post(`${baseUrl}/settings/models`, profile);
@@ -12,7 +12,27 @@ export interface OptimizationPayload {
     outputs: { name: string; desc: string }[];
     examples: any[];
     llm_profile_id: number;
-    metric: string;
+    metric: 'exact_match' | 'f1' | 'contains' | 'json_match' | 'llm_judge';
+    metric_threshold?: number;
+    max_rounds?: number;
+    val_fraction?: number;
+    eval_threads?: number;
+    seed?: number;
+    objective?: 'score' | 'pareto';
+    budget?: { max_prompt_tokens?: number; max_output_tokens?: number; max_p95_latency_ms?: number };
+}
+
+export interface ProgramCandidate {
+    mode: string;
+    demos: number;
+    score: number;
+    prompt_tokens: number;
+    output_tokens: number;
+    p50_latency_ms: number | null;
+    p95_latency_ms: number | null;
+    within_budget: boolean;
+    pareto: boolean;
+    selected: boolean;
 }
 
 export const optimizeNode = async (payload: OptimizationPayload) => {
@@ -20,3 +40,88 @@ export const optimizeNode = async (payload: OptimizationPayload) => {
     const response = await axios.post(`${baseUrl}/smart-nodes/optimize`, payload);
     return response.data;
 };
+
+export interface OptimizationJob {
+    id: string;
+    node_id: string;
+    status: 'queued' | 'running' | 'succeeded' | 'failed' | 'cancelled';
+    progress: { phase?: string; round?: number; candidates?: number; bootstrapped?: number; best_score?: number; baseline_score?: number };
+    result: {
+        status: string;
+        compiled_program_path: string;
+        signature_hash: string | null;
+        version: number | null;
+        score: number;
+        baseline_score: number | null;
+        train_size: number;
+        val_size: number;
+        eval_seconds: number;
+        lm_cache_hit_rate: number | null;
+        mode: string | null;
+        demos: number | null;
+        candidates: ProgramCandidate[];
+    } | null;
+    error: string | null;
+    created_at: string;
+    started_at: string | null;
+    finished_at: string | null;
+}
+
+export const submitOptimization = async (payload: OptimizationPayload): Promise<OptimizationJob> => {
+    const baseUrl = await getBaseUrl();
+    const response = await axios.post(`${baseUrl}/smart-nodes/optimize/jobs`, payload);
+    return response.data;
+};
+
+export const getOptimization = async (jobId: string): Promise<OptimizationJob> => {
+    const baseUrl = await getBaseUrl();
+    const response = await axios.get(`${baseUrl}/smart-nodes/optimize/jobs/${jobId}`);
+    return response.data;
+};
+
+export const cancelOptimization = async (jobId: string): Promise<OptimizationJob> => {
+    const baseUrl = await getBaseUrl();
+    const response = await axios.post(`${baseUrl}/smart-nodes/optimize/jobs/${jobId}/cancel`);
+    return response.data;
+};
+
+// Server-Sent Events: started, progress (rounds, candidates, best score), completed / failed / cancelled
+export const optimizationEventsUrl = async (jobId: string): Promise<string> => {
+    const baseUrl = await getBaseUrl();
+    return `${baseUrl}/smart-nodes/optimize/jobs/${jobId}/events`;
+};
+
+export interface CompiledProgramVersion {
+    signature_hash: string;
+    version: number;
+    program_hash: string;
+    created_at: string;
+    node_id: string | null;
+    optimizer: string | null;
+    metric: string | null;
+    score: number | null;
+    baseline_score: number | null;
+    train_size: number;
+    val_size: number;
+    profile: { id?: number; name?: string; provider?: string; model_id?: string };
+    active: boolean;
+}
+
+export interface CompiledProgramHistory {
+    signature_hash: string;
+    signature: { mode: string; goal: string; inputs: { name: string; desc: string }[]; outputs: { name: string; desc: string }[] };
+    current_version: number | null;
+    versions: CompiledProgramVersion[];
+}
+
+export const getProgramHistory = async (signatureHash: string): Promise<CompiledProgramHistory> => {
+    const baseUrl = await getBaseUrl();
+    const response = await axios.get(`${baseUrl}/smart-nodes/programs/${signatureHash}`);
+    return response.data;
+};
+
+export const activateProgramVersion = async (signatureHash: string, version: number): Promise<CompiledProgramHistory> => {
+    const baseUrl = await getBaseUrl();
+    const response = await axios.post(`${baseUrl}/smart-nodes/programs/${signatureHash}/versions/${version}/activate`);
+    return response.data;
+};
@@ -1,4 +1,4 @@
-import { useCallback, useEffect, useState } from 'react';
+import { useCallback, useEffect, useRef, useState } from 'react';
 import {
     ReactFlow,
     Background,
@@ -15,7 +15,7 @@ import { Save, Loader2, ArrowLeft } from 'lucide-react';
 import { useParams, useNavigate } from 'react-router-dom';
 
 import { useGraphStore } from '../store/graphStore';
-import { flowApi } from '../api/flows';
+import { diffJson, flowApi, type FlowSummary } from '../api/flows';
 import { AgentNode } from '../nodes/AgentNode';
 import { RouterNode } from '../nodes/RouterNode';
 import { ToolNode } from '../nodes/ToolNode';
@@ -33,12 +33,14 @@ const nodeTypes = {
 function FlowEditorInstance() {
     const { id } = useParams();
     const navigate = useNavigate();
-    const { nodes, edges, onNodesChange, onEdgesChange, onConnect, addNode, setNodes, setEdges } = useGraphStore();
+    const { nodes, edges, onNodesChange, onEdgesChange, onConnect, addNode, setNodes, setEdges, setSavedFlow } = useGraphStore();
     const { screenToFlowPosition, toObject } = useReactFlow();
 
     const [flowName, setFlowName] = useState("Untitled Flow");
     const [loading, setLoading] = useState(false);
     const [saving, setSaving] = useState(false);
+    // Last saved graph and its hash: saves send only the changes since then
+    const savedRef = useRef<{ hash?: string; graph: any } | null>(null);
 
     // Load flow data if ID is present
     useEffect(() => {
@@ -48,13 +50,18 @@ function FlowEditorInstance() {
                     setLoading(true);
                     const flow = await flowApi.getOne(parseInt(id));
                     setFlowName(flow.name);
+                    savedRef.current = null;
+                    setSavedFlow(null);
 
                     if (flow.data) {
                         const parsedData = JSON.parse(flow.data);
+                        savedRef.current = { hash: flow.data_hash, graph: parsedData };
                         // Assuming saved data structure is { nodes, edges, viewport }
                         if (parsedData.nodes) setNodes(parsedData.nodes);
                         if (parsedData.edges) setEdges(parsedData.edges);
                         // Viewport restore could be added here
+                        const loaded = useGraphStore.getState();
+                        setSavedFlow({ id: flow.id!, version: flow.version, nodes: loaded.nodes, edges: loaded.edges });
                     }
                 } catch (error: any) {
                     console.error("Failed to load flow", error);
@@ -67,12 +74,14 @@ function FlowEditorInstance() {
             loadFlow();
         } else {
             // Reset for new flow
+            savedRef.current = null;
+            setSavedFlow(null);
             setNodes([]);
             setEdges([]);
             setFlowName("New Untitled Flow");
             setLoading(false);
         }
-    }, [id, setNodes, setEdges, navigate]);
+    }, [id, setNodes, setEdges, setSavedFlow, navigate]);
 
     const onDragOver = useCallback((event: React.DragEvent) => {
         event.preventDefault();
@@ -127,13 +136,31 @@ function FlowEditorInstance() {
         try {
             const currentGraph = toObject(); // Gets nodes, edges, viewport
             const dataString = JSON.stringify(currentGraph);
+            // Arrays being saved: runs go by flow id until they are edited
+            const { nodes: savedNodes, edges: savedEdges } = useGraphStore.getState();
 
             if (id && id !== 'new') {
-                // Update existing
-                await flowApi.update(parseInt(id), {
-                    name: flowName,
-                    data: dataString
-                });
+                // Update existing: JSON Patch against the last saved version,
+                // full PUT when there is none or the flow changed meanwhile
+                const saved = savedRef.current;
+                const graph = JSON.parse(dataString);
+                let result: FlowSummary | undefined;
+                if (saved?.hash) {
+                    try {
+                        const ops = diffJson(saved.graph, graph);
+                        result = await flowApi.patch(parseInt(id), saved.hash, ops, { name: flowName });
+                    } catch (error: any) {
+                        if (error.response?.status !== 409) throw error;
+                    }
+                }
+                if (!result?.data_hash) {
+                    result = await flowApi.update(parseInt(id), {
+                        name: flowName,
+                        data: dataString
+                    });
+                }
+                savedRef.current = { hash: result.data_hash, graph };
+                setSavedFlow({ id: parseInt(id), version: result.version, nodes: savedNodes, edges: savedEdges });
                 toast.success("Flow saved successfully");
             } else {
                 // Create new
@@ -141,6 +168,7 @@ function FlowEditorInstance() {
                     name: flowName,
                     data: dataString
                 });
+                setSavedFlow({ id: newFlow.id!, version: newFlow.version, nodes: savedNodes, edges: savedEdges });
                 toast.success("Flow created");
                 navigate(`/editor/${newFlow.id}`, { replace: true });
             }
@@ -3,7 +3,7 @@ import { useRunStore } from '../../store/runStore';
 import { useAgentRuntime } from '../../hooks/useAgentRuntime';
 import { ChatMessage } from './ChatMessage';
 import { Play, Square, Eraser, Loader2, Send } from 'lucide-react';
-import { useGraphStore } from '../../store/graphStore';
+import { currentSavedFlow, useGraphStore } from '../../store/graphStore';
 import clsx from 'clsx';
 // Wait, I need to check where useGraphStore is. Assuming standard path.
 
@@ -19,6 +19,7 @@ export function ChatPanel() {
     // Assuming `useGraphStore` has `nodes` and `edges` and I can structure it.
     const nodes = useGraphStore((state) => state.nodes);
     const edges = useGraphStore((state) => state.edges);
+    const savedFlow = useGraphStore(currentSavedFlow);
 
     useEffect(() => {
         // Auto-scroll
@@ -39,7 +40,7 @@ export function ChatPanel() {
         const graphJson = { nodes, edges };
         const prompt = input || "Start"; // Default prompt if re-running without input?
 
-        connect(graphJson, prompt);
+        connect(graphJson, prompt, savedFlow);
         setInput('');
     };
 
@@ -1,6 +1,7 @@
 import { useRef, useCallback, useEffect } from 'react';
 import { useRunStore } from '../store/runStore';
 import { toast } from 'sonner';
+import type { SavedFlow } from '../store/graphStore';
 
 // I need to use the relative path so Vite handles it, OR find the port.
 // In this template, normally there is a proxy.
@@ -9,6 +10,8 @@ const BACKEND_WS_URL = 'ws://localhost:8000/api/ws/run';
 
 export function useAgentRuntime() {
   const socketRef = useRef<WebSocket | null>(null);
+  // Node and field of the last smart node token, to label a new field's output
+  const tokenSourceRef = useRef<string | null>(null);
   const { 
     setStatus, 
     appendToken, 
@@ -18,15 +21,16 @@ export function useAgentRuntime() {
     clearSession 
   } = useRunStore();
 
-  const connect = useCallback((graphJson: any, input: string) => {
+  // A saved, unedited flow runs by id (the server uses its compiled copy);
+  // unsaved playground graphs are sent inline
+  const connect = useCallback((graphJson: any, input: string, savedFlow: SavedFlow | null = null) => {
     // 1. Reset state
     clearSession();
     setStatus('connecting');
     addMessage({ role: 'user', content: input });
     
     // 2. Open WebSocket
-    // Generate a temporary graph ID or use a fixed one for playground
-    const graphId = 'playground-' + Date.now();
+    const graphId = savedFlow ? String(savedFlow.id) : 'playground-' + Date.now();
 
     const startSocket = async () => {
         try {
@@ -44,13 +48,14 @@ export function useAgentRuntime() {
             
             socket.onopen = () => {
                 setStatus('running');
+                tokenSourceRef.current = null;
                 addLog({ event: 'Connection Established', level: 'info', details: { url } });
                 
                 // 3. Send Initialization Data
                 const payload = {
-                    graph: graphJson,
                     input: input,
-                    thread_id: 'session-' + Date.now()
+                    thread_id: 'session-' + Date.now(),
+                    ...(savedFlow ? { version: savedFlow.version } : { graph: graphJson })
                 };
                 socket.send(JSON.stringify(payload));
             };
@@ -60,9 +65,16 @@ export function useAgentRuntime() {
                     const data = JSON.parse(event.data);
                     
                     switch (data.type) {
-                        case 'token':
+                        case 'token': {
+                            // Smart nodes stream per output field: label each field as it starts
+                            const source = data.field ? `${data.node_id}:${data.field}` : null;
+                            if (source && source !== tokenSourceRef.current) {
+                                appendToken(`${tokenSourceRef.current ? '\n\n' : ''}${data.field}: `);
+                            }
+                            tokenSourceRef.current = source;
                             appendToken(data.content);
                             break;
+                        }
                         case 'node_active':
                             setActiveNode(data.node_id);
                             addLog({ event: 'Node Active', level: 'info', details: { nodeId: data.node_id } });
@@ -21,9 +21,9 @@ export function RAGNode({ selected, data }: NodeProps) {
                 Retrieves documents from vector store and adds to context.
             </div>
 
-            {/* Configuration Mock */}
+            {/* Configuration */}
             <div className="mt-2 text-[10px] bg-slate-50 p-1 rounded border border-slate-100 text-slate-400">
-                Collection: {String(data.collection || "default")}
+                Collection: {String(data.collection || "default")} · top {String(data.top_k || 4)}
             </div>
 
             <div className="absolute -left-3 top-1/2 -translate-y-6 flex items-center">
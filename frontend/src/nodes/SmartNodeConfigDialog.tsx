@@ -22,7 +22,10 @@ export function SmartNodeConfigDialog({ open, onOpenChange, data, onUpdate }: Sm
             mode: data.mode || 'ChainOfThought',
             inputs: data.inputs || [{ name: 'input', desc: 'Main input' }],
             outputs: data.outputs || [{ name: 'output', desc: 'Main output' }],
-            llm_profile: data.llm_profile ? data.llm_profile.id?.toString() : ""
+            llm_profile: data.llm_profile ? data.llm_profile.id?.toString() : "",
+            map_input: data.map_input || '',
+            map_concurrency: data.map_concurrency || 8,
+            map_batch_size: data.map_batch_size || 1
         },
         shouldUnregister: false // Keep values validation state when unmounting components (switching tabs)
     });
@@ -155,10 +158,13 @@ export function SmartNodeConfigDialog({ open, onOpenChange, data, onUpdate }: Sm
 
             const result = await optimizeNode(payload);
             setOptimizationResult(result);
+            // A "pareto" optimization may keep the other module type
+            if (result.mode) setValue('mode', result.mode);
 
             // Save again with result
             onUpdate({
                 ...formData,
+                mode: result.mode || formData.mode,
                 llm_profile: selectedModel,
                 examples: examples,
                 maxRounds: maxRounds,
@@ -394,6 +400,39 @@ export function SmartNodeConfigDialog({ open, onOpenChange, data, onUpdate }: Sm
                                     <p className="text-[10px] text-slate-400">This will be compiled into the DSPy signature instructions.</p>
                                 </div>
 
+                                {/* Map mode */}
+                                <div className="space-y-2">
+                                    <label className="text-sm font-semibold text-slate-700">Map Over Input (optional)</label>
+                                    <div className="grid grid-cols-3 gap-4">
+                                        <select
+                                            {...register('map_input')}
+                                            className="w-full h-10 px-3 rounded-lg border border-slate-300 bg-white text-sm focus:ring-2 focus:ring-amber-500 outline-none"
+                                        >
+                                            <option value="">Off (one call)</option>
+                                            {inputFields.map((f: any, i: number) => (
+                                                <option key={f.id} value={watch(`inputs.${i}.name`)}>{watch(`inputs.${i}.name`)}</option>
+                                            ))}
+                                        </select>
+                                        <input
+                                            type="number"
+                                            min={1}
+                                            {...register('map_concurrency', { valueAsNumber: true })}
+                                            title="Requests in flight"
+                                            disabled={!watch('map_input')}
+                                            className="w-full h-10 px-3 rounded-lg border border-slate-300 bg-white text-sm outline-none disabled:opacity-50"
+                                        />
+                                        <input
+                                            type="number"
+                                            min={1}
+                                            {...register('map_batch_size', { valueAsNumber: true })}
+                                            title="Elements per request"
+                                            disabled={!watch('map_input')}
+                                            className="w-full h-10 px-3 rounded-lg border border-slate-300 bg-white text-sm outline-none disabled:opacity-50"
+                                        />
+                                    </div>
+                                    <p className="text-[10px] text-slate-400">Runs the node on every element of a list input (from the state or the shared context) and returns one list per output, in order. Failed elements are reported in <code>_errors</code>.</p>
+                                </div>
+
                                 {/* Inputs & Outputs (The Signature) */}
                                 <div className="grid grid-cols-2 gap-8 border-t border-slate-100 pt-6">
                                     {/* Inputs */}
@@ -1,12 +1,12 @@
 import { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Plus, Trash2, Folder, Loader2, ArrowRight } from 'lucide-react';
-import { Flow, flowApi } from '../api/flows';
+import { FlowSummary, flowApi } from '../api/flows';
 import { toast } from 'sonner';
 
 export default function DashboardPage() {
     const navigate = useNavigate();
-    const [flows, setFlows] = useState<Flow[]>([]);
+    const [flows, setFlows] = useState<FlowSummary[]>([]);
     const [loading, setLoading] = useState(true);
     const [retryCount, setRetryCount] = useState(0);
 
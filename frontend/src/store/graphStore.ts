@@ -13,20 +13,32 @@ import {
     Connection,
 } from '@xyflow/react';
 
+// A saved flow and the exact node/edge arrays it was saved with: runs can
+// use it by id (and the server's compiled copy) until the graph is edited
+export type SavedFlow = {
+    id: number;
+    version?: number;
+    nodes: Node[];
+    edges: Edge[];
+};
+
 type GraphState = {
     nodes: Node[];
     edges: Edge[];
+    savedFlow: SavedFlow | null;
     onNodesChange: OnNodesChange;
     onEdgesChange: OnEdgesChange;
     onConnect: OnConnect;
     setNodes: (nodes: Node[]) => void;
     setEdges: (edges: Edge[]) => void;
     addNode: (node: Node) => void;
+    setSavedFlow: (savedFlow: SavedFlow | null) => void;
 };
 
 export const useGraphStore = create<GraphState>((set, get) => ({
     nodes: [],
     edges: [],
+    savedFlow: null,
     onNodesChange: (changes: NodeChange[]) => {
         set({
             nodes: applyNodeChanges(changes, get().nodes),
@@ -45,4 +57,11 @@ export const useGraphStore = create<GraphState>((set, get) => ({
     setNodes: (nodes: Node[]) => set({ nodes }),
     setEdges: (edges: Edge[]) => set({ edges }),
     addNode: (node: Node) => set({ nodes: [...get().nodes, node] }),
+    setSavedFlow: (savedFlow: SavedFlow | null) => set({ savedFlow }),
 }));
+
+// The saved flow the current graph is unchanged from, if any
+export const currentSavedFlow = (state: GraphState): SavedFlow | null => {
+    const saved = state.savedFlow;
+    return saved && saved.nodes === state.nodes && saved.edges === state.edges ? saved : null;
+};